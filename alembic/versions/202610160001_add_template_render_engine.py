@@ -0,0 +1,26 @@
+"""add render engine selection to templates
+
+Revision ID: 202610160001
+Revises: 20250915075842
+Create Date: 2026-10-16 00:01:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160001'
+down_revision = '20250915075842'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add templates.render_engine (docx = python-docx, ooxml = streaming zip renderer)"""
+    op.execute("ALTER TABLE templates ADD COLUMN IF NOT EXISTS render_engine VARCHAR(20) NOT NULL DEFAULT 'docx'")
+
+
+def downgrade() -> None:
+    """Drop templates.render_engine"""
+    op.drop_column('templates', 'render_engine')
@@ -0,0 +1,26 @@
+"""add token version to users
+
+Revision ID: 202610160002
+Revises: 202610160001
+Create Date: 2026-10-16 00:02:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160002'
+down_revision = '202610160001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add users.token_version, carried in JWTs as the "tv" claim"""
+    op.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0")
+
+
+def downgrade() -> None:
+    """Drop users.token_version"""
+    op.drop_column('users', 'token_version')
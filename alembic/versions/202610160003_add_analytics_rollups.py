@@ -0,0 +1,102 @@
+"""add hourly/daily analytics rollups and watermarks
+
+Revision ID: 202610160003
+Revises: 202610160002
+Create Date: 2026-10-16 00:03:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160003'
+down_revision = '202610160002'
+branch_labels = None
+depends_on = None
+
+
+ROLLUP_COLUMNS = [
+    ('granularity', "VARCHAR(8) NOT NULL DEFAULT 'day'"),
+    ('payments_completed', 'INTEGER DEFAULT 0'),
+    ('visit_duration_total', 'DOUBLE PRECISION DEFAULT 0'),
+    ('visits_with_duration', 'INTEGER DEFAULT 0'),
+    ('device_breakdown', 'TEXT'),
+    ('browser_breakdown', 'TEXT'),
+    ('updated_at', 'TIMESTAMP'),
+]
+
+SOURCE_INDEXES = [
+    ('ix_users_created_at', 'users', 'created_at'),
+    ('ix_documents_created_at', 'documents', 'created_at'),
+    ('ix_payments_created_at', 'payments', 'created_at'),
+    ('ix_payments_updated_at', 'payments', 'updated_at'),
+]
+
+
+def upgrade() -> None:
+    """Extend analytics_summaries into hourly/daily rollups and index the source timestamps"""
+    inspector = sa.inspect(op.get_bind())
+
+    # The table was only ever created by create_all, so it may be missing
+    if not inspector.has_table('analytics_summaries'):
+        op.create_table(
+            'analytics_summaries',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('date', sa.DateTime(), nullable=False),
+            sa.Column('total_users', sa.Integer(), default=0),
+            sa.Column('new_users', sa.Integer(), default=0),
+            sa.Column('active_users', sa.Integer(), default=0),
+            sa.Column('documents_created', sa.Integer(), default=0),
+            sa.Column('documents_downloaded', sa.Integer(), default=0),
+            sa.Column('template_submissions', sa.Integer(), default=0),
+            sa.Column('revenue_amount', sa.Float(), default=0.0),
+            sa.Column('revenue_currency', sa.String(3), default='NGN'),
+            sa.Column('subscription_revenue', sa.Float(), default=0.0),
+            sa.Column('pay_as_you_go_revenue', sa.Float(), default=0.0),
+            sa.Column('total_visits', sa.Integer(), default=0),
+            sa.Column('unique_visitors', sa.Integer(), default=0),
+            sa.Column('avg_visit_duration', sa.Float(), default=0.0),
+            sa.Column('bounce_rate', sa.Float(), default=0.0),
+            sa.Column('top_pages', sa.Text(), nullable=True),
+            sa.Column('avg_response_time', sa.Float(), default=0.0),
+            sa.Column('error_count', sa.Integer(), default=0),
+            sa.Column('created_at', sa.DateTime()),
+        )
+        op.create_index('ix_analytics_summaries_id', 'analytics_summaries', ['id'])
+        op.create_index('ix_analytics_summaries_date', 'analytics_summaries', ['date'])
+
+    for column, ddl in ROLLUP_COLUMNS:
+        op.execute(f"ALTER TABLE analytics_summaries ADD COLUMN IF NOT EXISTS {column} {ddl}")
+
+    # Old daily summaries may hold duplicates; keep the newest per day
+    op.execute("""
+        DELETE FROM analytics_summaries a
+        USING analytics_summaries b
+        WHERE a.granularity = b.granularity AND a.date = b.date AND a.id < b.id
+    """)
+    op.create_unique_constraint(
+        'uq_analytics_summaries_period', 'analytics_summaries', ['granularity', 'date']
+    )
+
+    op.create_table(
+        'analytics_rollup_watermarks',
+        sa.Column('source', sa.String(50), primary_key=True),
+        sa.Column('watermark', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime()),
+    )
+
+    for name, table, column in SOURCE_INDEXES:
+        op.create_index(name, table, [column], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Drop the watermarks, rollup columns and source indexes"""
+    for name, table, _ in SOURCE_INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+    op.drop_table('analytics_rollup_watermarks')
+    op.drop_constraint('uq_analytics_summaries_period', 'analytics_summaries', type_='unique')
+    op.execute("DELETE FROM analytics_summaries WHERE granularity = 'hour'")
+    for column, _ in ROLLUP_COLUMNS:
+        op.drop_column('analytics_summaries', column)
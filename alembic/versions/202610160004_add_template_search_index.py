@@ -0,0 +1,68 @@
+"""add weighted full-text and trigram search indexes to templates
+
+Revision ID: 202610160004
+Revises: 202610160003
+Create Date: 2026-10-16 00:04:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160004'
+down_revision = '202610160003'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION templates_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.keywords, '') || ' ' || coalesce((
+            SELECT string_agg(tag, ' ')
+            FROM json_array_elements_text(
+                CASE WHEN json_typeof(NEW.tags::json) = 'array' THEN NEW.tags::json ELSE '[]'::json END
+            ) AS tag
+        ), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.category, '') || ' ' || coalesce(NEW.type, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Replace the unused text search_vector with a trigger-maintained tsvector and backfill it"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.execute("ALTER TABLE templates ADD COLUMN IF NOT EXISTS keywords TEXT")
+    op.execute("ALTER TABLE templates ADD COLUMN IF NOT EXISTS tags JSON")
+    op.execute("ALTER TABLE templates DROP COLUMN IF EXISTS search_vector")
+    op.add_column('templates', sa.Column('search_vector', sa.dialects.postgresql.TSVECTOR(), nullable=True))
+
+    op.execute(SEARCH_FUNCTION)
+    op.execute("""
+        CREATE TRIGGER templates_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description, keywords, tags, category, type ON templates
+        FOR EACH ROW EXECUTE FUNCTION templates_search_vector_update()
+    """)
+
+    # Backfill existing rows through the trigger
+    op.execute("UPDATE templates SET name = name")
+
+    op.create_index('ix_templates_search_vector', 'templates', ['search_vector'], postgresql_using='gin')
+    op.execute("CREATE INDEX IF NOT EXISTS ix_templates_name_trgm ON templates USING gin (name gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Drop the search indexes, trigger and tsvector column"""
+    op.execute("DROP INDEX IF EXISTS ix_templates_name_trgm")
+    op.drop_index('ix_templates_search_vector', table_name='templates')
+    op.execute("DROP TRIGGER IF EXISTS templates_search_vector_trigger ON templates")
+    op.execute("DROP FUNCTION IF EXISTS templates_search_vector_update()")
+    op.drop_column('templates', 'search_vector')
+    op.add_column('templates', sa.Column('search_vector', sa.Text(), nullable=True))
@@ -0,0 +1,38 @@
+"""add precomputed search suggestion prefix table
+
+Revision ID: 202610160005
+Revises: 202610160004
+Create Date: 2026-10-16 00:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160005'
+down_revision = '202610160004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create search_suggestions; rebuild_search_suggestions_task fills it"""
+    op.create_table(
+        'search_suggestions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('prefix', sa.String(64), nullable=False),
+        sa.Column('suggestion', sa.String(255), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('rank', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_search_suggestions_id', 'search_suggestions', ['id'])
+    op.create_index('ix_search_suggestions_prefix', 'search_suggestions', ['prefix'])
+
+
+def downgrade() -> None:
+    """Drop search_suggestions"""
+    op.drop_index('ix_search_suggestions_prefix', table_name='search_suggestions')
+    op.drop_index('ix_search_suggestions_id', table_name='search_suggestions')
+    op.drop_table('search_suggestions')
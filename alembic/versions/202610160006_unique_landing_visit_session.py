@@ -0,0 +1,117 @@
+"""make landing_visits.session_id unique
+
+Revision ID: 202610160006
+Revises: 202610160005
+Create Date: 2026-10-16 00:06:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '202610160006'
+down_revision = '202610160005'
+branch_labels = None
+depends_on = None
+
+
+# How duplicate rows of one session are folded into the surviving (lowest id)
+# row; every other column keeps the survivor's value, or the first non-null
+_SUMMED = ("duration", "time_on_page_seconds", "active_time_seconds", "clicks_count",
+           "templates_viewed_count", "searches_performed")
+_MAXED = ("scroll_depth", "session_quality_score", "engagement_depth", "form_completion",
+          "conversion_probability", "ab_test_performance", "last_interaction_at")
+_ANY = ("created_document", "registered", "downloaded_document", "converted_to_paid",
+        "form_abandonment")
+_ALL = ("bounce",)
+_LISTS = ("pages_viewed", "viewed_templates", "searched_terms", "template_interactions",
+          "form_interactions")
+_LATEST = ("exit_page", "funnel_stage", "last_interaction_field")
+
+BACKUP_TABLE = "landing_visits_merged_duplicates"
+
+
+def _as_list(value):
+    # Interaction columns hold JSON arrays, or JSON-encoded strings of them
+    if isinstance(value, str):
+        value = json.loads(value or "[]")
+    return list(value or [])
+
+
+def _merge(rows):
+    """Column values for the survivor of one session's rows (ordered by id)"""
+    merged = dict(rows[0])
+    for row in rows[1:]:
+        for name, value in row.items():
+            if name == "id" or value is None:
+                continue
+            current = merged.get(name)
+            if name in _SUMMED:
+                merged[name] = (current or 0) + value
+            elif name in _MAXED:
+                merged[name] = value if current is None else max(current, value)
+            elif name in _ANY:
+                merged[name] = bool(current) or bool(value)
+            elif name in _ALL:
+                merged[name] = bool(current if current is not None else True) and bool(value)
+            elif name in _LISTS:
+                merged[name] = _as_list(current) + _as_list(value)
+            elif name in _LATEST:
+                merged[name] = value
+            elif name == "created_at":
+                merged[name] = value if current is None else min(current, value)
+            elif name == "visit_metadata":
+                metadata = {**value, **(current or {})}
+                # Ingest entries applied to either row stay applied
+                for key in set(current or {}) & set(value):
+                    if isinstance(current[key], list) and isinstance(value[key], list):
+                        metadata[key] = sorted(set(current[key]) | set(value[key]))
+                merged[name] = metadata
+            elif current is None:
+                merged[name] = value
+    return merged
+
+
+def upgrade() -> None:
+    """One visit row per session, so the ingest worker can upsert on session_id
+
+    Sessions recorded twice by the old check-then-insert path are merged into
+    their first row: counters are summed, flags and peaks combined, event
+    lists concatenated and metadata unioned. The rows folded away are kept in
+    landing_visits_merged_duplicates.
+    """
+    bind = op.get_bind()
+    visits = sa.Table("landing_visits", sa.MetaData(), autoload_with=bind)
+
+    duplicated = bind.execute(
+        sa.select(visits.c.session_id).group_by(visits.c.session_id).having(sa.func.count() > 1)
+    ).scalars().all()
+    if duplicated:
+        if not sa.inspect(bind).has_table(BACKUP_TABLE):
+            op.create_table(BACKUP_TABLE, *[sa.Column(column.name, column.type) for column in visits.columns])
+        backup = sa.Table(BACKUP_TABLE, sa.MetaData(), autoload_with=bind)
+
+    for session_id in duplicated:
+        rows = [dict(row._mapping) for row in bind.execute(
+            sa.select(visits).where(visits.c.session_id == session_id).order_by(visits.c.id)
+        )]
+        merged = _merge(rows)
+        bind.execute(backup.insert(), rows[1:])
+        bind.execute(visits.update().where(visits.c.id == merged.pop("id")).values(**merged))
+        bind.execute(visits.delete().where(visits.c.id.in_([row["id"] for row in rows[1:]])))
+
+    op.drop_index('landing_visits_session_id_idx', table_name='landing_visits')
+    op.create_index('landing_visits_session_id_idx', 'landing_visits', ['session_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Back to a plain index on session_id
+
+    Merged survivors keep their combined values; the folded rows stay in
+    landing_visits_merged_duplicates for inspection.
+    """
+    op.drop_index('landing_visits_session_id_idx', table_name='landing_visits')
+    op.create_index('landing_visits_session_id_idx', 'landing_visits', ['session_id'])
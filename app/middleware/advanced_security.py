@@ -10,6 +10,8 @@ from starlette.middleware.base import BaseHTTPMiddleware
 import redis.asyncio as aioredis
 
 from config import settings
+from app.middleware.pipeline import PipelineStage
+from app.middleware.threat_scanner import ADVANCED_PROFILE, threat_scanner
 from app.services.audit_service import AuditService
 
 
@@ -18,24 +20,10 @@ class AdvancedSecurityMiddleware(BaseHTTPMiddleware):
     
     def __init__(self, app):
         super().__init__(app)
-        self.suspicious_patterns = {
-            # SQL injection patterns
-            r"(?i)(union\s+select|drop\s+table|insert\s+into|delete\s+from)",
-            # XSS patterns
-            r"(?i)(<script|javascript:|on\w+\s*=)",
-            # Path traversal
-            r"(\.\./|\.\.\\|%2e%2e)",
-            # Command injection
-            r"(?i)(;|\||&|\$\(|\`|nc\s+|wget\s+|curl\s+)"
-        }
-        self.blocked_user_agents = {
-            "sqlmap", "nikto", "dirbuster", "burpsuite", "nessus"
-        }
     
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Security checks
         await self._check_suspicious_patterns(request)
-        await self._check_user_agent(request)
         await self._check_request_size(request)
         await self._check_rate_limits(request)
         
@@ -48,32 +36,25 @@ class AdvancedSecurityMiddleware(BaseHTTPMiddleware):
         return response
     
     async def _check_suspicious_patterns(self, request: Request):
-        """Check for suspicious request patterns"""
-        import re
-        
-        # Check URL path
-        path = str(request.url.path)
-        query = str(request.url.query) if request.url.query else ""
+        """Check for suspicious request patterns and malicious user agents"""
+        match = threat_scanner.scan_request(ADVANCED_PROFILE, request)
+        if match is None:
+            return
         
-        for pattern in self.suspicious_patterns:
-            if re.search(pattern, path + query):
-                await self._log_security_incident(request, "suspicious_pattern", {"pattern": pattern})
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Malicious request detected"
-                )
-    
-    async def _check_user_agent(self, request: Request):
-        """Check for malicious user agents"""
-        user_agent = request.headers.get("user-agent", "").lower()
+        if match.category == "scanner_agent":
+            await self._log_security_incident(
+                request, "blocked_user_agent", {"user_agent": threat_scanner.inspect(request).user_agent}
+            )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied"
+            )
         
-        for blocked_agent in self.blocked_user_agents:
-            if blocked_agent in user_agent:
-                await self._log_security_incident(request, "blocked_user_agent", {"user_agent": user_agent})
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Access denied"
-                )
+        await self._log_security_incident(request, "suspicious_pattern", {"pattern": match.rule})
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malicious request detected"
+        )
     
     async def _check_request_size(self, request: Request):
         """Check request size limits"""
@@ -168,20 +149,21 @@ class AdvancedSecurityMiddleware(BaseHTTPMiddleware):
             pass
 
 
-class RequestValidationMiddleware(BaseHTTPMiddleware):
+class RequestValidationMiddleware(PipelineStage):
     """Validate request structure and content"""
     
+    name = "request_validation"
+    
     MAX_HEADERS = 50
     MAX_HEADER_SIZE = 8192
     MAX_URL_LENGTH = 2048
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Validate request structure
+    async def on_request(self, request: Request):
+        # Validate request structure; HTTPExceptions become error responses
         await self._validate_headers(request)
         await self._validate_url(request)
         await self._validate_method(request)
-        
-        return await call_next(request)
+        return None
     
     async def _validate_headers(self, request: Request):
         """Validate request headers"""
@@ -204,9 +186,8 @@ class RequestValidationMiddleware(BaseHTTPMiddleware):
     
     async def _validate_url(self, request: Request):
         """Validate URL length and format"""
-        url_str = str(request.url)
-        
-        if len(url_str) > self.MAX_URL_LENGTH:
+        # Shared with the security stages, so the URL is not rebuilt here
+        if threat_scanner.inspect(request).url_length > self.MAX_URL_LENGTH:
             raise HTTPException(
                 status_code=status.HTTP_414_REQUEST_URI_TOO_LONG,
                 detail="URL too long"
@@ -5,17 +5,19 @@ Audit logging middleware
 import time
 import json
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
+from app.middleware.pipeline import PipelineStage, ResponseHead
 from app.services.audit_service import AuditService
 from app.models.audit import AuditEventType, AuditLevel
 
 
-class AuditMiddleware(BaseHTTPMiddleware):
+class AuditMiddleware(PipelineStage):
     """Middleware for automatic audit logging"""
     
-    def __init__(self, app):
+    name = "audit"
+    
+    def __init__(self, app=None):
         super().__init__(app)
         
         # Routes that should be audited
@@ -38,34 +40,32 @@ class AuditMiddleware(BaseHTTPMiddleware):
             "/api/signatures/external/"
         ]
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request through audit middleware"""
-        
-        # Record start time
-        start_time = time.time()
+    async def on_request(self, request: Request):
+        """Capture request details for routes that are audited"""
         
         # Check if route should be audited
-        should_audit = self._should_audit_route(request.url.path)
-        is_sensitive = self._is_sensitive_route(request.url.path)
+        if not self._should_audit_route(request.url.path):
+            return None
         
-        # Get request details for audit
-        request_details = None
-        if should_audit:
-            request_details = await self._extract_request_details(request)
+        # Record start time and request details for audit
+        request.state.audit_start_time = time.time()
+        request.state.audit_details = await self._extract_request_details(request)
+        return None
+    
+    async def on_complete(self, request: Request, response: ResponseHead):
+        """Log the audit event once the response has been sent"""
         
-        # Process request
-        response = await call_next(request)
+        request_details = getattr(request.state, "audit_details", None)
+        if request_details is None:
+            return
         
         # Calculate processing time
-        processing_time = time.time() - start_time
-        
-        # Log audit event if needed
-        if should_audit:
-            await self._log_audit_event(
-                request, response, request_details, processing_time, is_sensitive
-            )
+        processing_time = time.time() - request.state.audit_start_time
+        is_sensitive = self._is_sensitive_route(request.url.path)
         
-        return response
+        await self._log_audit_event(
+            request, response, request_details, processing_time, is_sensitive
+        )
     
     def _should_audit_route(self, path: str) -> bool:
         """Check if route should be audited"""
@@ -5,17 +5,24 @@ Authentication middleware
 from jose import jwt
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
 
 from config import settings
-from database import SessionLocal, get_db
+from database import get_db
+from app.middleware.pipeline import PipelineStage
 from app.models.user import User
 from app.services.auth_service import AuthService
+from app.services.principal_service import PrincipalService
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    """Authentication middleware for protecting routes"""
+class AuthMiddleware(PipelineStage):
+    """Authentication middleware for protecting routes
+
+    request.state.current_user is a cached Principal snapshot, not an ORM
+    User; route dependencies that need the full row still load it.
+    """
+    
+    name = "auth"
     
     # Routes that don't require authentication
     PUBLIC_ROUTES = [
@@ -33,16 +40,16 @@ class AuthMiddleware(BaseHTTPMiddleware):
         "/api/signatures/external/"
     ]
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request through authentication middleware"""
+    async def on_request(self, request: Request):
+        """Authenticate the request and attach the cached principal"""
         
         # Skip authentication for public routes
         if self._is_public_route(request.url.path):
-            return await call_next(request)
+            return None
         
         # Skip authentication for OPTIONS requests
         if request.method == "OPTIONS":
-            return await call_next(request)
+            return None
         
         # Get authorization header
         auth_header = request.headers.get("Authorization")
@@ -81,22 +88,27 @@ class AuthMiddleware(BaseHTTPMiddleware):
                     headers={"WWW-Authenticate": "Bearer"}
                 )
             
-            # Load user from database
-            db = SessionLocal()
-            try:
-                user = db.query(User).filter(User.id == int(user_id)).first()
-                if not user or not user.is_active:
-                    raise HTTPException(
-                        status_code=status.HTTP_401_UNAUTHORIZED,
-                        detail="User not found or inactive",
-                        headers={"WWW-Authenticate": "Bearer"}
-                    )
-                
-                # Add user to request state
-                request.state.current_user = user
-                request.state.token_payload = payload
-            finally:
-                db.close()
+            # Resolve the cached user snapshot (no database query on a hit)
+            token_version = payload.get("tv")
+            principal = await PrincipalService.get_principal(
+                int(user_id), int(token_version) if token_version is not None else None
+            )
+            if not principal or not principal.is_active:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found or inactive",
+                    headers={"WWW-Authenticate": "Bearer"}
+                )
+            if not PrincipalService.token_is_current(principal, payload):
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Token has been revoked",
+                    headers={"WWW-Authenticate": "Bearer"}
+                )
+            
+            # Add user to request state
+            request.state.current_user = principal
+            request.state.token_payload = payload
         
         except ValueError:
             raise HTTPException(
@@ -104,22 +116,18 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 detail="Invalid authorization header format",
                 headers={"WWW-Authenticate": "Bearer"}
             )
-        except jwt.PyJWTError:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
         
-        response = await call_next(request)
-        return response
+        return None
     
     def _is_public_route(self, path: str) -> bool:
         """Check if route is public"""
         
         for public_route in self.PUBLIC_ROUTES:
-            if path.startswith(public_route):
+            # "/" is the landing page only, not a prefix of every path
+            if path == public_route or (public_route != "/" and path.startswith(public_route)):
                 return True
+        
+        return False
 
 
 # Dependency function for getting current user in FastAPI routes
@@ -11,18 +11,20 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Set
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import redis.asyncio as aioredis
 
 from config import settings
+from app.middleware.pipeline import PipelineStage, ResponseHead
 from app.services.audit_service import AuditService
 
 
-class CSRFProtectionMiddleware(BaseHTTPMiddleware):
+class CSRFProtectionMiddleware(PipelineStage):
     """CSRF Protection Middleware with multiple validation methods"""
 
-    def __init__(self, app):
+    name = "csrf"
+
+    def __init__(self, app=None):
         super().__init__(app)
 
         # Configuration
@@ -55,23 +57,22 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
         except:
             self.redis = None
 
-    async def dispatch(self, request: Request, call_next):
-        """Process request through CSRF protection"""
+    async def on_request(self, request: Request):
+        """Validate CSRF protection before the request reaches the application"""
 
         # Skip CSRF protection for safe methods
         if request.method not in self.protected_methods:
-            response = await call_next(request)
             # Add CSRF token to safe responses for future use
-            await self._add_csrf_token_to_response(request, response)
-            return response
+            request.state.csrf_refresh = True
+            return None
 
         # Skip CSRF protection for exempt paths
         if self._is_exempt_path(request.url.path):
-            return await call_next(request)
+            return None
 
         # Skip CSRF protection for API key authenticated requests
         if self._is_api_key_request(request):
-            return await call_next(request)
+            return None
 
         # Perform CSRF validation
         validation_result = await self._validate_csrf_protection(request)
@@ -92,13 +93,14 @@ class CSRFProtectionMiddleware(BaseHTTPMiddleware):
                 }
             )
 
-        # Process request
-        response = await call_next(request)
-
         # Refresh CSRF token in response
-        await self._add_csrf_token_to_response(request, response)
+        request.state.csrf_refresh = True
+        return None
 
-        return response
+    async def on_response(self, request: Request, response: ResponseHead):
+        """Issue fresh CSRF tokens on responses that qualify"""
+        if getattr(request.state, "csrf_refresh", False):
+            await self._add_csrf_token_to_response(request, response)
 
     async def _validate_csrf_protection(self, request: Request) -> Dict[str, any]:
         """Validate CSRF protection using multiple methods"""
@@ -1,28 +1,29 @@
 """Guest session middleware for anonymous users"""
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
 
+from app.middleware.pipeline import PipelineStage, ResponseHead
 from app.utils.guest_session import get_or_create_guest_session
 
 
-class GuestSessionMiddleware(BaseHTTPMiddleware):
+class GuestSessionMiddleware(PipelineStage):
     """Middleware to handle anonymous guest sessions"""
     
-    async def dispatch(self, request: Request, call_next) -> Response:
+    name = "guest_session"
+    
+    async def on_request(self, request: Request):
         # Skip for authenticated requests
         if request.cookies.get("access_token"):
-            return await call_next(request)
+            return None
             
         # Get or create guest session
-        session_id = await get_or_create_guest_session(request)
-        
-        # Process request
-        response = await call_next(request)
-        
+        request.state.guest_session_id = await get_or_create_guest_session(request)
+        return None
+    
+    async def on_response(self, request: Request, response: ResponseHead):
         # Set guest session cookie if not present
-        if not request.cookies.get("guest_session_id"):
+        session_id = getattr(request.state, "guest_session_id", None)
+        if session_id and not request.cookies.get("guest_session_id"):
             response.set_cookie(
                 "guest_session_id",
                 session_id,
@@ -30,5 +31,3 @@ class GuestSessionMiddleware(BaseHTTPMiddleware):
                 httponly=True,
                 samesite="strict"
             )
-        
-        return response
\ No newline at end of file
@@ -3,36 +3,54 @@ Performance monitoring and optimization middleware
 """
 
 import time
+import zlib
 import asyncio
-from typing import Callable, Dict, Any
+from typing import Callable, Dict, Any, Optional
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import Message, Send
 
+from app.middleware.pipeline import PipelineStage, ResponseHead
 from app.services.audit_service import AuditService
 
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    brotli = None
+    BROTLI_AVAILABLE = False
 
-class PerformanceMiddleware(BaseHTTPMiddleware):
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+class PerformanceMiddleware(PipelineStage):
     """Monitor and optimize request performance"""
     
-    def __init__(self, app, slow_request_threshold: float = 1.0):
+    name = "performance"
+    
+    def __init__(self, app=None, slow_request_threshold: float = 1.0):
         super().__init__(app)
         self.slow_request_threshold = slow_request_threshold
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def on_request(self, request: Request):
         # Record start time
-        start_time = time.time()
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Calculate processing time
-        process_time = time.time() - start_time
-        
+        request.state.perf_start_time = time.time()
+        return None
+    
+    async def on_response(self, request: Request, response: ResponseHead):
         # Add performance headers
-        response.headers["X-Process-Time"] = str(process_time)
+        start_time = request.state.perf_start_time
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
         response.headers["X-Timestamp"] = str(int(start_time))
-        
-        # Log slow requests
+    
+    async def on_complete(self, request: Request, response: ResponseHead):
+        # Log slow requests, measured up to the last body chunk
+        process_time = time.time() - request.state.perf_start_time
         if process_time > self.slow_request_threshold:
             try:
                 AuditService.log_system_event(
@@ -41,6 +59,7 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
                         "url": str(request.url),
                         "method": request.method,
                         "process_time": round(process_time, 3),
+                        "status_code": response.status_code,
                         "user_agent": request.headers.get("user-agent", ""),
                         "ip": request.client.host if request.client else "unknown"
                     }
@@ -48,62 +67,175 @@ class PerformanceMiddleware(BaseHTTPMiddleware):
             except Exception:
                 # Fail silently if audit logging fails
                 pass
-        
-        return response
 
 
-class CompressionMiddleware(BaseHTTPMiddleware):
-    """Advanced response compression"""
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class CompressionMiddleware(PipelineStage):
+    """Streaming response compression
+
+    Picks br, zstd or gzip from Accept-Encoding (server preference in that
+    order among the codings the client accepts and that are installed) and
+    compresses the body chunk by chunk as the application sends it. Only
+    the first body chunk is held back, to decide whether a small response
+    is worth compressing; after that memory use is bounded by the encoder
+    window. Responses that are already compressed, partial, or of a media
+    type that does not shrink (docx, zip, pdf, images, ...) pass through
+    untouched.
+    """
+    
+    name = "compression"
+    
+    # Media types that are already compressed or otherwise not worth it
+    SKIP_MEDIA_TYPES = {
+        "application/zip",
+        "application/gzip",
+        "application/x-gzip",
+        "application/x-7z-compressed",
+        "application/x-rar-compressed",
+        "application/pdf",
+        "application/octet-stream",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "text/event-stream",
+    }
+    SKIP_MEDIA_PREFIXES = ("image/", "video/", "audio/", "font/woff")
     
-    def __init__(self, app, minimum_size: int = 1024, compression_level: int = 6):
+    def __init__(self, app=None, minimum_size: int = 1024, compression_level: int = 6,
+                 brotli_quality: int = 4, zstd_level: int = 3):
         super().__init__(app)
         self.minimum_size = minimum_size
         self.compression_level = compression_level
+        self.encoders: Dict[str, Callable[[], Any]] = {}
+        if BROTLI_AVAILABLE:
+            self.encoders["br"] = lambda: _BrotliEncoder(brotli_quality)
+        if ZSTD_AVAILABLE:
+            self.encoders["zstd"] = lambda: _ZstdEncoder(zstd_level)
+        self.encoders["gzip"] = lambda: _GzipEncoder(compression_level)
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+    def select_encoding(self, accept_encoding: str) -> Optional[str]:
+        """Pick the preferred coding the client accepts (q > 0), if any"""
+        accepted: Dict[str, float] = {}
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.strip().partition(";")
+            quality = 1.0
+            params = params.strip()
+            if params.startswith("q="):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            if coding:
+                accepted[coding] = quality
         
-        # Check if compression is beneficial
-        accept_encoding = request.headers.get("accept-encoding", "")
-        if "gzip" not in accept_encoding:
-            return response
+        wildcard = accepted.get("*", 0.0)
+        for coding in self.encoders:
+            if accepted.get(coding, wildcard) > 0:
+                return coding
+        return None
+    
+    def _compressible(self, message: Message, headers: MutableHeaders) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 206, 304):
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
         
-        # Get response body
-        body = b""
-        async for chunk in response.body_iterator:
-            body += chunk
+        media_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        if media_type in self.SKIP_MEDIA_TYPES or media_type.startswith(self.SKIP_MEDIA_PREFIXES):
+            return False
         
-        # Compress if beneficial
-        if len(body) >= self.minimum_size:
-            try:
-                import gzip
-                compressed_body = gzip.compress(body, compresslevel=self.compression_level)
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) < self.minimum_size:
+            return False
+        return True
+    
+    def wrap_send(self, request: Request, send: Send) -> Send:
+        coding = self.select_encoding(request.headers.get("accept-encoding", ""))
+        if coding is None:
+            return send
+        
+        # State: pending start message until the first body chunk decides
+        start_message: Optional[Message] = None
+        encoder = None
+        passthrough = False
+        
+        async def compressing_send(message: Message) -> None:
+            nonlocal start_message, encoder, passthrough
+            message_type = message["type"]
+            
+            if message_type == "http.response.start":
+                headers = MutableHeaders(raw=list(message.get("headers", [])))
+                if self._compressible(message, headers):
+                    start_message = message
+                    return
+                passthrough = True
+                await send(message)
+                return
+            
+            if passthrough or message_type != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            
+            if encoder is None:
+                # First body chunk: a small, complete body is sent as-is
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
                 
-                # Only use compression if it actually reduces size
-                if len(compressed_body) < len(body):
-                    response.headers["content-encoding"] = "gzip"
-                    response.headers["content-length"] = str(len(compressed_body))
-                    
-                    # Create new response with compressed body
-                    from fastapi.responses import Response as FastAPIResponse
-                    return FastAPIResponse(
-                        content=compressed_body,
-                        status_code=response.status_code,
-                        headers=dict(response.headers),
-                        media_type=response.media_type
-                    )
-            except Exception:
-                # Fall back to uncompressed if compression fails
-                pass
+                encoder = self.encoders[coding]()
+                headers = MutableHeaders(raw=list(start_message.get("headers", [])))
+                headers["content-encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                start_message["headers"] = headers.raw
+                await send(start_message)
+            
+            chunk = encoder.compress(body)
+            if not more_body:
+                chunk += encoder.finish()
+            
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
         
-        # Return original response
-        from fastapi.responses import Response as FastAPIResponse
-        return FastAPIResponse(
-            content=body,
-            status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.media_type
-        )
+        return compressing_send
 
 
 class ConnectionPoolMonitor:
@@ -0,0 +1,202 @@
+"""
+Composed pure-ASGI middleware pipeline
+
+BaseHTTPMiddleware runs every layer in its own task and re-wraps the
+response body stream once per layer, so a ten-deep chain pays ten task
+hand-offs and ten stream copies per request. Stages in this pipeline are
+plain hook objects instead: all of them run in
+the request's task, share one Request object, and only stages that touch
+the response are inserted into the send chain.
+
+Hooks, in order:
+    on_request(request)           may return a Response to short-circuit
+    wrap_send(request, send)      body transforms (e.g. compression)
+    on_response(request, head)    mutate status/headers on response start
+    on_complete(request, head)    after the response has been sent
+
+A short-circuit response is post-processed by the stages outside the one
+that produced it, exactly like a nested middleware chain. HTTPExceptions
+raised from on_request become JSON error responses.
+
+Every stage can also be mounted on its own with app.add_middleware().
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+ROUTE_TABLE_CACHE_SIZE = 4096
+
+
+class ResponseHead(Response):
+    """Status and mutable headers of an in-flight response
+
+    Wraps an http.response.start message so stages can use the familiar
+    Response API (headers, set_cookie, delete_cookie) without the body.
+    """
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.status_code = message["status"]
+        self.raw_headers = message["headers"] = list(message.get("headers", []))
+
+
+class PipelineStage:
+    """Base class for pipeline stages; override only the hooks you need"""
+
+    name = "stage"
+
+    def __init__(self, app: Optional[ASGIApp] = None):
+        self.app = app
+
+    async def on_request(self, request: Request) -> Optional[Response]:
+        return None
+
+    def wrap_send(self, request: Request, send: Send) -> Send:
+        return send
+
+    async def on_response(self, request: Request, response: ResponseHead) -> None:
+        pass
+
+    async def on_complete(self, request: Request, response: ResponseHead) -> None:
+        pass
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Run this stage alone as ordinary ASGI middleware"""
+        pipeline = self.__dict__.get("_standalone")
+        if pipeline is None:
+            pipeline = self._standalone = MiddlewarePipeline(self.app, [self])
+        await pipeline(scope, receive, send)
+
+
+def _overrides(stage: PipelineStage, hook: str) -> bool:
+    return getattr(type(stage), hook) is not getattr(PipelineStage, hook)
+
+
+class _StagePlan:
+    """Hook lists for one ordered set of stages, computed once"""
+
+    def __init__(self, stages: Sequence[PipelineStage]):
+        self.stages = tuple(stages)
+        self.request_hooks = tuple(s for s in self.stages if _overrides(s, "on_request"))
+        self.complete_hooks = tuple(s for s in reversed(self.stages) if _overrides(s, "on_complete"))
+        self.send_stages = frozenset(
+            s for s in self.stages if _overrides(s, "wrap_send") or _overrides(s, "on_response")
+        )
+
+
+class RouteTable:
+    """Maps request paths to the stages that run for them
+
+    skip maps a path prefix to the stage names that do not run under it.
+    The stage list for every distinct skip combination is built up front;
+    path lookups are memoized in a bounded dict.
+    """
+
+    def __init__(self, stages: Sequence[PipelineStage], skip: Optional[Dict[str, Iterable[str]]] = None):
+        self.stages = tuple(stages)
+        self.skip: List[Tuple[str, frozenset]] = sorted(
+            ((prefix, frozenset(names)) for prefix, names in (skip or {}).items()),
+            key=lambda item: len(item[0]), reverse=True
+        )
+        self._plans: Dict[frozenset, _StagePlan] = {frozenset(): _StagePlan(self.stages)}
+        for _, names in self.skip:
+            self._plan_for(names)
+        self._paths: Dict[str, _StagePlan] = {}
+
+    def _plan_for(self, skipped: frozenset) -> _StagePlan:
+        plan = self._plans.get(skipped)
+        if plan is None:
+            plan = self._plans[skipped] = _StagePlan([s for s in self.stages if s.name not in skipped])
+        return plan
+
+    def resolve(self, path: str) -> _StagePlan:
+        plan = self._paths.get(path)
+        if plan is None:
+            skipped: Set[str] = set()
+            for prefix, names in self.skip:
+                if path.startswith(prefix):
+                    skipped |= names
+            plan = self._plan_for(frozenset(skipped))
+            if len(self._paths) >= ROUTE_TABLE_CACHE_SIZE:
+                self._paths.clear()
+            self._paths[path] = plan
+        return plan
+
+
+class MiddlewarePipeline:
+    """Pure-ASGI middleware running a list of stages, outermost first"""
+
+    def __init__(self, app: ASGIApp, stages: Sequence[PipelineStage],
+                 skip: Optional[Dict[str, Iterable[str]]] = None):
+        self.app = app
+        self.routes = RouteTable(stages, skip)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        plan = self.routes.resolve(scope["path"])
+        if not plan.stages:
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
+        response: Optional[Response] = None
+        entered = len(plan.stages)
+
+        for stage in plan.request_hooks:
+            try:
+                response = await stage.on_request(request)
+            except HTTPException as exc:
+                response = JSONResponse(
+                    status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers
+                )
+            if response is not None:
+                entered = plan.stages.index(stage)
+                break
+
+        active = plan.stages[:entered]
+        final_head: List[ResponseHead] = []
+        chain = self._capture(send, final_head) if plan.complete_hooks else send
+        for stage in active:
+            if stage in plan.send_stages:
+                chain = self._stage_send(stage, request, chain)
+
+        if response is not None:
+            await response(scope, receive, chain)
+        else:
+            await self.app(scope, receive, chain)
+
+        if final_head:
+            for stage in plan.complete_hooks:
+                if stage in active:
+                    await stage.on_complete(request, final_head[0])
+
+    @staticmethod
+    def _capture(send: Send, holder: List[ResponseHead]) -> Send:
+        """Outermost send wrapper recording the response head that went out"""
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                holder.append(ResponseHead(message))
+            await send(message)
+        return capture
+
+    @staticmethod
+    def _stage_send(stage: PipelineStage, request: Request, send: Send) -> Send:
+        if not _overrides(stage, "on_response"):
+            return stage.wrap_send(request, send)
+
+        async def hooked(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                head = ResponseHead(message)
+                await stage.on_response(request, head)
+                message["status"] = head.status_code
+            await send(message)
+
+        return stage.wrap_send(request, hooked)
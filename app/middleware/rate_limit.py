@@ -2,22 +2,92 @@
 Rate limiting middleware
 """
 
+import math
 import time
-import json
-from typing import Dict, Any
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
 import redis
+import redis.asyncio as aioredis
 
 from config import settings
+from app.middleware.pipeline import PipelineStage, ResponseHead
 
+logger = logging.getLogger(__name__)
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# GCRA (generic cell rate algorithm) in one atomic round trip.
+# The key stores the theoretical arrival time (TAT) in milliseconds; each
+# request advances it by window/limit and is rejected if that would push it
+# more than one window past now. Redis TIME keeps all workers on one clock.
+# Returns {allowed, remaining, retry_after_ms, reset_after_ms}.
+GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local emission = window / limit
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission
+local allow_at = new_tat - window
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+local remaining = math.floor((window - (new_tat - now)) / emission)
+return {1, remaining, 0, math.ceil(new_tat - now)}
+"""
+
+# How long to skip Redis after an error before trying it again
+REDIS_RETRY_INTERVAL = 5.0
+LOCAL_BUCKET_MAX_KEYS = 10000
+
+
+class LocalTokenBucket:
+    """Per-process token buckets used while Redis is unreachable"""
+
+    def __init__(self, max_keys: int = LOCAL_BUCKET_MAX_KEYS):
+        self.max_keys = max_keys
+        # key -> (tokens, last_refill)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, limit: int, window: int) -> Tuple[bool, int, float, float]:
+        """Consume one token; returns (allowed, remaining, retry_after, reset_after) in seconds"""
+        now = time.monotonic()
+        rate = limit / window
+        tokens, last = self._buckets.pop(key, (float(limit), now))
+        tokens = min(float(limit), tokens + (now - last) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        retry_after = 0.0 if allowed else (1 - tokens) / rate
+        return allowed, int(tokens), retry_after, (limit - tokens) / rate
+
+
+class RateLimitMiddleware(PipelineStage):
     """Rate limiting middleware using Redis"""
     
-    def __init__(self, app, redis_client: redis.Redis):
+    name = "rate_limit"
+    
+    def __init__(self, app=None, redis_client: Optional[aioredis.Redis] = None, local_fallback: bool = True):
         super().__init__(app)
-        self.redis_client = redis_client
+        self.redis_client = redis_client or aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self.local_bucket = LocalTokenBucket() if local_fallback else None
+        self._limit_script = self.redis_client.register_script(GCRA_SCRIPT)
+        self._redis_retry_at = 0.0
         
         # Rate limit configurations
         self.rate_limits = {
@@ -27,37 +97,40 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             "upload": {"requests": 50, "window": 3600},  # 50 uploads per hour
         }
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request through rate limiting"""
+    async def on_request(self, request: Request):
+        """Count the request and reject it once the client is over its limit"""
         
         # Get client identifier
         client_id = self._get_client_id(request)
         
         # Determine rate limit category
         category = self._get_rate_limit_category(request.url.path)
+        config = self.rate_limits[category]
         
-        # Check rate limit
-        if not self._check_rate_limit(client_id, category):
-            raise HTTPException(
+        # Check rate limit (one round trip; also yields the header values)
+        allowed, remaining, retry_after, reset_time = await self._check_rate_limit(client_id, category)
+        if not allowed:
+            return JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded. Please try again later.",
+                content={"detail": "Rate limit exceeded. Please try again later."},
                 headers={
-                    "Retry-After": str(self.rate_limits[category]["window"]),
-                    "X-RateLimit-Limit": str(self.rate_limits[category]["requests"]),
-                    "X-RateLimit-Window": str(self.rate_limits[category]["window"])
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(config["requests"]),
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(reset_time),
+                    "X-RateLimit-Window": str(config["window"])
                 }
             )
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        remaining, reset_time = self._get_rate_limit_info(client_id, category)
-        response.headers["X-RateLimit-Limit"] = str(self.rate_limits[category]["requests"])
+        request.state.rate_limit = (config["requests"], remaining, reset_time)
+        return None
+    
+    async def on_response(self, request: Request, response: ResponseHead):
+        """Add rate limit headers"""
+        limit, remaining, reset_time = request.state.rate_limit
+        response.headers["X-RateLimit-Limit"] = str(limit)
         response.headers["X-RateLimit-Remaining"] = str(remaining)
         response.headers["X-RateLimit-Reset"] = str(reset_time)
-        
-        return response
     
     def _get_client_id(self, request: Request) -> str:
         """Get client identifier for rate limiting"""
@@ -89,103 +162,69 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         else:
             return "default"
     
-    def _check_rate_limit(self, client_id: str, category: str) -> bool:
-        """Check if client is within rate limit"""
-        
-        config = self.rate_limits[category]
-        key = f"rate_limit:{category}:{client_id}"
-        
-        try:
-            # Get current count
-            current_count = self.redis_client.get(key)
-            
-            if current_count is None:
-                # First request in window
-                self.redis_client.setex(key, config["window"], 1)
-                return True
-            
-            current_count = int(current_count)
-            
-            if current_count >= config["requests"]:
-                return False
-            
-            # Increment count
-            self.redis_client.incr(key)
-            return True
-        
-        except redis.RedisError:
-            # If Redis is down, allow request but log error
-            print("Redis error in rate limiting - allowing request")
-            return True
-    
-    def _get_rate_limit_info(self, client_id: str, category: str) -> tuple[int, int]:
-        """Get remaining requests and reset time"""
+    async def _check_rate_limit(self, client_id: str, category: str) -> Tuple[bool, int, int, int]:
+        """Check and count a request
+
+        Returns (allowed, remaining, retry_after_seconds, reset_epoch_seconds).
+        Falls back to the local token bucket while Redis is unavailable, or
+        allows the request if the fallback is disabled.
+        """
         
         config = self.rate_limits[category]
         key = f"rate_limit:{category}:{client_id}"
+        now = time.time()
         
-        try:
-            current_count = self.redis_client.get(key)
-            if current_count is None:
-                return config["requests"], int(time.time()) + config["window"]
-            
-            current_count = int(current_count)
-            remaining = max(0, config["requests"] - current_count)
-            
-            # Get TTL for reset time
-            ttl = self.redis_client.ttl(key)
-            reset_time = int(time.time()) + max(ttl, 0)
-            
-            return remaining, reset_time
-        
-        except redis.RedisError:
-            return config["requests"], int(time.time()) + config["window"]
+        if now >= self._redis_retry_at:
+            try:
+                allowed, remaining, retry_after_ms, reset_after_ms = await self._limit_script(
+                    keys=[key], args=[config["requests"], config["window"] * 1000]
+                )
+                return (
+                    bool(allowed),
+                    int(remaining),
+                    math.ceil(int(retry_after_ms) / 1000),
+                    int(now + math.ceil(int(reset_after_ms) / 1000))
+                )
+            except redis.RedisError as e:
+                self._redis_retry_at = now + REDIS_RETRY_INTERVAL
+                logger.warning(f"Redis error in rate limiting, using local limiter: {e}")
+        
+        if self.local_bucket is None:
+            return True, config["requests"], 0, int(now) + config["window"]
+        
+        allowed, remaining, retry_after, reset_after = self.local_bucket.take(
+            key, config["requests"], config["window"]
+        )
+        return allowed, remaining, math.ceil(retry_after), int(now + math.ceil(reset_after))
     
-    def reset_rate_limit(self, client_id: str, category: str = None) -> None:
+    async def reset_rate_limit(self, client_id: str, category: str = None) -> None:
         """Reset rate limit for client (admin function)"""
         
-        if category:
-            key = f"rate_limit:{category}:{client_id}"
-            self.redis_client.delete(key)
-        else:
-            # Reset all categories for client
-            for cat in self.rate_limits.keys():
-                key = f"rate_limit:{cat}:{client_id}"
-                self.redis_client.delete(key)
+        categories = [category] if category else list(self.rate_limits.keys())
+        await self.redis_client.delete(*[f"rate_limit:{cat}:{client_id}" for cat in categories])
     
-    def get_rate_limit_status(self, client_id: str) -> Dict[str, Any]:
-        """Get rate limit status for client"""
+    async def get_rate_limit_status(self, client_id: str) -> Dict[str, Any]:
+        """Get rate limit status for client without counting a request"""
         
         status = {}
+        now_ms = int(time.time() * 1000)
+        keys = [f"rate_limit:{category}:{client_id}" for category in self.rate_limits]
         
-        for category, config in self.rate_limits.items():
-            key = f"rate_limit:{category}:{client_id}"
-            
-            try:
-                current_count = self.redis_client.get(key)
-                if current_count is None:
-                    remaining = config["requests"]
-                    reset_time = int(time.time()) + config["window"]
-                else:
-                    current_count = int(current_count)
-                    remaining = max(0, config["requests"] - current_count)
-                    ttl = self.redis_client.ttl(key)
-                    reset_time = int(time.time()) + max(ttl, 0)
-                
-                status[category] = {
-                    "limit": config["requests"],
-                    "remaining": remaining,
-                    "reset_time": reset_time,
-                    "window": config["window"]
-                }
-            
-            except redis.RedisError:
-                status[category] = {
-                    "limit": config["requests"],
-                    "remaining": config["requests"],
-                    "reset_time": int(time.time()) + config["window"],
-                    "window": config["window"]
-                }
+        try:
+            stored = await self.redis_client.mget(keys)
+        except redis.RedisError:
+            stored = [None] * len(keys)
+        
+        for (category, config), tat in zip(self.rate_limits.items(), stored):
+            window_ms = config["window"] * 1000
+            backlog_ms = max(0.0, float(tat) - now_ms) if tat is not None else 0.0
+            remaining = int((window_ms - backlog_ms) * config["requests"] / window_ms)
+            status[category] = {
+                "limit": config["requests"],
+                "remaining": max(0, remaining),
+                "reset_time": int((now_ms + backlog_ms) / 1000),
+                "window": config["window"]
+            }
         
         return status
 
@@ -5,16 +5,19 @@ Security middleware for headers and protection
 import time
 import uuid
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
+from app.middleware.pipeline import PipelineStage, ResponseHead
+from app.middleware.threat_scanner import SECURITY_PROFILE, threat_scanner
 from config import settings
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware(PipelineStage):
     """Security middleware for adding security headers and protection"""
+
+    name = "security"
     
-    def __init__(self, app):
+    def __init__(self, app=None):
         super().__init__(app)
         
         # Security headers
@@ -40,12 +43,11 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         if settings.DEBUG:
             del self.security_headers["Strict-Transport-Security"]
     
-    async def dispatch(self, request: Request, call_next):
-        """Process request through security middleware"""
+    async def on_request(self, request: Request):
+        """Validate the request before it reaches the application"""
         
         # Generate request ID
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        request.state.request_id = str(uuid.uuid4())
         
         # Add request start time
         request.state.start_time = time.time()
@@ -74,15 +76,17 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 headers={"Content-Type": "text/plain"}
             )
         
-        # Process request
-        response = await call_next(request)
+        return None
+    
+    async def on_response(self, request: Request, response: ResponseHead):
+        """Add security headers to the outgoing response"""
         
         # Add security headers
         for header, value in self.security_headers.items():
             response.headers[header] = value
         
         # Add request ID to response
-        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Request-ID"] = request.state.request_id
         
         # Add response time
         if hasattr(request.state, 'start_time'):
@@ -92,8 +96,6 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         # Remove server information
         if "server" in response.headers:
             del response.headers["server"]
-        
-        return response
     
     def _validate_request_size(self, request: Request) -> bool:
         """Validate request size"""
@@ -141,40 +143,12 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     def _detect_suspicious_patterns(self, request: Request) -> bool:
         """Detect suspicious request patterns"""
         
-        # Check for SQL injection patterns in URL
-        sql_patterns = [
-            "union select", "drop table", "delete from", "insert into",
-            "update set", "exec(", "script>", "javascript:", "vbscript:",
-            "onload=", "onerror=", "<iframe", "<object", "<embed"
-        ]
-        
-        url_path = request.url.path.lower()
-        query_string = str(request.url.query).lower()
-        
-        for pattern in sql_patterns:
-            if pattern in url_path or pattern in query_string:
-                return True
-        
-        # Check for path traversal
-        if "../" in url_path or "..%2f" in url_path or "..%5c" in url_path:
-            return True
-        
         # Check for excessive path length
-        if len(url_path) > 2000:
+        if len(threat_scanner.inspect(request).path) > 2000:
             return True
         
-        # Check user agent
-        user_agent = request.headers.get("user-agent", "").lower()
-        suspicious_agents = [
-            "sqlmap", "nikto", "dirbuster", "burp", "nessus",
-            "whatweb", "wpscan", "metasploit"
-        ]
-        
-        for agent in suspicious_agents:
-            if agent in user_agent:
-                return True
-        
-        return False
+        # Injection, path traversal and scanner user agents, in one pass
+        return threat_scanner.scan_request(SECURITY_PROFILE, request) is not None
     
     def _sanitize_header_value(self, value: str) -> str:
         """Sanitize header value"""
@@ -0,0 +1,179 @@
+"""
+Shared request threat scanner
+
+Each security middleware used to run its own loop of substring checks or
+uncompiled re.search calls over the same request fields. Their pattern
+sets now live here as profiles. Each profile is compiled once into a
+single alternation regex with one named group per rule. The path, query
+string and user agent are joined with NUL separators and scanned in one
+pass. A rule only counts in the fields it is scoped to.
+
+Verdicts are memoized per (profile, path, query, user agent) in a bounded
+LRU, so repeated URLs from the same clients are not rescanned. The fields
+are extracted once per request and shared between middlewares through
+request.state.
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+from fastapi import Request
+
+PATH = "path"
+QUERY = "query"
+AGENT = "agent"
+URL_FIELDS = frozenset({PATH, QUERY})
+
+VERDICT_CACHE_SIZE = 8192
+# Very long URLs are rare and mostly hostile; don't let them churn the cache
+MAX_CACHED_URL_LENGTH = 1024
+
+_SEPARATOR = "\x00"
+
+
+@dataclass(frozen=True)
+class ThreatRule:
+    """One pattern and the request fields it applies to"""
+    name: str
+    category: str
+    pattern: str
+    fields: FrozenSet[str] = URL_FIELDS
+
+
+@dataclass(frozen=True)
+class ThreatMatch:
+    """First rule a request tripped"""
+    rule: str
+    category: str
+    field: str
+    fragment: str
+
+
+@dataclass(frozen=True)
+class RequestInspection:
+    """Request fields the security middlewares look at, extracted once"""
+    path: str
+    query: str
+    user_agent: str
+    url_length: int
+
+
+def literal_rules(category: str, fragments: Iterable[str], fields: FrozenSet[str] = URL_FIELDS) -> List[ThreatRule]:
+    """Case-insensitive substring rules"""
+    return [ThreatRule(f"{category}:{fragment}", category, re.escape(fragment), fields) for fragment in fragments]
+
+
+class ThreatProfile:
+    """A named rule set compiled into one alternation regex"""
+
+    def __init__(self, name: str, rules: List[ThreatRule]):
+        self.name = name
+        self.rules = {f"r{index}": rule for index, rule in enumerate(rules)}
+        self.regex = re.compile(
+            "|".join(f"(?P<{group}>{rule.pattern})" for group, rule in self.rules.items()),
+            re.IGNORECASE
+        )
+
+    def scan(self, path: str, query: str, user_agent: str) -> Optional[ThreatMatch]:
+        text = _SEPARATOR.join((path, query, user_agent))
+        query_start = len(path) + 1
+        agent_start = query_start + len(query) + 1
+
+        position = 0
+        while True:
+            match = self.regex.search(text, position)
+            if match is None:
+                return None
+            rule = self.rules[match.lastgroup]
+            start = match.start()
+            field = PATH if start < query_start else QUERY if start < agent_start else AGENT
+            if field in rule.fields:
+                return ThreatMatch(rule.name, rule.category, field, match.group())
+            position = start + 1
+
+
+class ThreatScanner:
+    """Registry of compiled profiles with a shared verdict cache"""
+
+    def __init__(self, cache_size: int = VERDICT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.profiles: Dict[str, ThreatProfile] = {}
+        self._verdicts: "OrderedDict[Tuple[str, str, str, str], Optional[ThreatMatch]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name: str, rules: List[ThreatRule]) -> ThreatProfile:
+        profile = self.profiles[name] = ThreatProfile(name, rules)
+        self._verdicts.clear()
+        return profile
+
+    def scan(self, profile: str, path: str, query: str = "", user_agent: str = "") -> Optional[ThreatMatch]:
+        """Return the first rule of the profile the fields trip, if any"""
+        key = (profile, path, query, user_agent)
+        try:
+            verdict = self._verdicts[key]
+            self._verdicts.move_to_end(key)
+            self.hits += 1
+            return verdict
+        except KeyError:
+            self.misses += 1
+
+        verdict = self.profiles[profile].scan(path, query, user_agent)
+        if len(path) + len(query) <= MAX_CACHED_URL_LENGTH:
+            self._verdicts[key] = verdict
+            if len(self._verdicts) > self.cache_size:
+                self._verdicts.popitem(last=False)
+        return verdict
+
+    @staticmethod
+    def inspect(request: Request) -> RequestInspection:
+        """Extract (once per request) the fields every profile scans"""
+        inspection = getattr(request.state, "threat_inspection", None)
+        if inspection is None:
+            scope = request.scope
+            raw_query = scope.get("query_string", b"").decode("latin-1")
+            inspection = RequestInspection(
+                path=scope["path"],
+                # Payloads arrive percent-encoded; scan what the app will see
+                query=unquote_plus(raw_query),
+                user_agent=request.headers.get("user-agent", ""),
+                url_length=len(scope.get("raw_path") or scope["path"]) + (len(raw_query) + 1 if raw_query else 0)
+            )
+            request.state.threat_inspection = inspection
+        return inspection
+
+    def scan_request(self, profile: str, request: Request) -> Optional[ThreatMatch]:
+        inspection = self.inspect(request)
+        return self.scan(profile, inspection.path, inspection.query, inspection.user_agent)
+
+
+# SecurityMiddleware: the substring checks it has always applied
+SECURITY_PROFILE = "security"
+SECURITY_RULES = (
+    literal_rules("injection", [
+        "union select", "drop table", "delete from", "insert into",
+        "update set", "exec(", "script>", "javascript:", "vbscript:",
+        "onload=", "onerror=", "<iframe", "<object", "<embed"
+    ])
+    + literal_rules("path_traversal", ["../", "..%2f", "..%5c"], frozenset({PATH}))
+    + literal_rules("scanner_agent", [
+        "sqlmap", "nikto", "dirbuster", "burp", "nessus",
+        "whatweb", "wpscan", "metasploit"
+    ], frozenset({AGENT}))
+)
+
+# AdvancedSecurityMiddleware: its regexes and blocked agents
+ADVANCED_PROFILE = "advanced"
+ADVANCED_RULES = [
+    ThreatRule("sql_injection", "injection", r"union\s+select|drop\s+table|insert\s+into|delete\s+from"),
+    ThreatRule("xss", "injection", r"<script|javascript:|on\w+\s*="),
+    ThreatRule("path_traversal", "path_traversal", r"\.\./|\.\.\\|%2e%2e"),
+    ThreatRule("command_injection", "injection", r";|\||&|\$\(|`|nc\s+|wget\s+|curl\s+"),
+] + literal_rules("scanner_agent", ["sqlmap", "nikto", "dirbuster", "burpsuite", "nessus"], frozenset({AGENT}))
+
+threat_scanner = ThreatScanner()
+threat_scanner.register(SECURITY_PROFILE, SECURITY_RULES)
+threat_scanner.register(ADVANCED_PROFILE, ADVANCED_RULES)
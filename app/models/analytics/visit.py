@@ -89,6 +89,9 @@ class LandingVisit(BaseVisit):
     """Enhanced tracking for landing page visits and conversions"""
     __tablename__ = "landing_visits"
 
+    # One row per session; the ingest worker upserts on it
+    session_id = Column(String(100), nullable=False, unique=True, index=True)
+
     # Page tracking
     entry_page = Column(String(500), nullable=True)
     exit_page = Column(String(500), nullable=True)
@@ -96,7 +96,7 @@ class Document(Base):
     signatures = relationship("Signature", back_populates="document", cascade="all, delete-orphan")
     
     # Timestamps
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     completed_at = Column(DateTime, nullable=True)
     deleted_at = Column(DateTime, nullable=True)
@@ -2,16 +2,46 @@
 Template and Placeholder models
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON, Float, DDL, Index, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
 from database import Base
 
+# Weighted search document: name (A), keywords and tags (B), description (C),
+# category and type (D). Kept in sync by a trigger so every writer is covered.
+TEMPLATE_SEARCH_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION templates_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.keywords, '') || ' ' || coalesce((
+            SELECT string_agg(tag, ' ')
+            FROM json_array_elements_text(
+                CASE WHEN json_typeof(NEW.tags::json) = 'array' THEN NEW.tags::json ELSE '[]'::json END
+            ) AS tag
+        ), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(NEW.category, '') || ' ' || coalesce(NEW.type, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+TEMPLATE_SEARCH_TRIGGER_SQL = """
+CREATE TRIGGER templates_search_vector_trigger
+BEFORE INSERT OR UPDATE OF name, description, keywords, tags, category, type ON templates
+FOR EACH ROW EXECUTE FUNCTION templates_search_vector_update()
+"""
+
 
 class Template(Base):
     """Document template model"""
     __tablename__ = "templates"
+    __table_args__ = (
+        Index("ix_templates_search_vector", "search_vector", postgresql_using="gin"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -35,6 +65,7 @@ class Template(Base):
     font_family = Column(String(100), nullable=False, default="Times New Roman")
     font_size = Column(Integer, nullable=False, default=12)
     page_margins = Column(JSON, nullable=True)  # {top, bottom, left, right}
+    render_engine = Column(String(20), nullable=False, default="docx", server_default="docx")  # docx, ooxml
     
     # Usage and access
     is_active = Column(Boolean, nullable=False, default=True)
@@ -63,7 +94,7 @@ class Template(Base):
     # SEO and discoverability
     tags = Column(JSON, nullable=True)  # JSON array of tags
     keywords = Column(Text, nullable=True)
-    search_vector = Column(Text, nullable=True)  # For full-text search
+    search_vector = Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True)  # Maintained by trigger
     
     # Relationships
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -82,6 +113,16 @@ class Template(Base):
         return f"<Template(id={self.id}, name='{self.name}', category='{self.category}')>"
 
 
+# Tables created with create_all get the same trigger and trigram index the migration installs
+for statement in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    TEMPLATE_SEARCH_FUNCTION_SQL,
+    TEMPLATE_SEARCH_TRIGGER_SQL,
+    "CREATE INDEX IF NOT EXISTS ix_templates_name_trgm ON templates USING gin (name gin_trgm_ops)",
+):
+    event.listen(Template.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
 class Placeholder(Base):
     """Placeholder model for template variables"""
     __tablename__ = "placeholders"
@@ -61,6 +61,7 @@ class User(Base):
     last_login_at = Column(DateTime, nullable=True)
     last_login_ip = Column(String(45), nullable=True)
     password_changed_at = Column(DateTime, nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped to revoke issued tokens
 
     # GDPR compliance
     gdpr_consent = Column(Boolean, nullable=False, default=False)
@@ -69,7 +70,7 @@ class User(Base):
     data_retention_consent = Column(Boolean, nullable=False, default=True)
 
     # Timestamps
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     deleted_at = Column(DateTime, nullable=True)
 
@@ -5,6 +5,7 @@ Analytics and tracking routes
 from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_
 
@@ -13,11 +14,13 @@ from config import settings
 from app.models.document import Document
 from app.models.user import User
 from app.models.analytics.visit import DocumentVisit, PageVisit
+from app.models.audit import AuditEventType
 from app.services.analytics.visit_tracking import VisitTrackingService
 from app.services.audit_service import AuditService
 from app.services.performance_service import PerformanceService
 from app.schemas.analytics import TimePeriod
 from app.utils.security import get_current_active_user
+from app.utils.streaming_export import EXPORT_MEDIA_TYPES, export_headers
 
 router = APIRouter()
 
@@ -463,12 +466,13 @@ async def export_analytics(
     format: str = "csv",
     document_id: Optional[int] = None,
     days: int = 30,
+    cursor: Optional[int] = None,
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
-    """Export analytics data"""
+    """Export analytics data as a CSV, NDJSON or JSON stream; pass the last visit_id received as cursor to resume"""
     
-    if format not in ["csv", "json"]:
+    if format not in EXPORT_MEDIA_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Unsupported export format"
@@ -476,8 +480,8 @@ async def export_analytics(
     
     # Get analytics data
     visit_tracking = VisitTrackingService()
-    analytics_data = visit_tracking.export_analytics_data(
-        db, current_user.id, document_id, days, format
+    rows = visit_tracking.export_analytics_data(
+        current_user.id, document_id, days, format, cursor=cursor
     )
     
     # Log data export
@@ -489,11 +493,15 @@ async def export_analytics(
             "format": format,
             "document_id": document_id,
             "days": days,
-            "record_count": len(analytics_data.get("visits", []))
+            "cursor": cursor
         }
     )
     
-    return analytics_data
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers("analytics", format)
+    )
 
 
 @router.delete("/visits/{visit_id}")
@@ -562,3 +570,34 @@ async def anonymize_analytics_data(
         "message": f"Anonymized {anonymized_count} analytics records",
         "anonymized_count": anonymized_count
     }
+
+
+@router.get("/gdpr/audit-export")
+async def export_audit_data(
+    format: str = "json",
+    cursor: Optional[int] = None,
+    request: Request = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Export the user's audit trail as a CSV, NDJSON or JSON stream (GDPR); pass the last id received as cursor to resume"""
+    
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported export format"
+        )
+    
+    rows = AuditService.export_audit_data(current_user.id, format, cursor=cursor)
+    
+    AuditService.log_user_event(
+        AuditEventType.DATA_EXPORT.value,
+        current_user.id,
+        request,
+        {"export": "audit", "format": format, "cursor": cursor}
+    )
+    
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers=export_headers("audit", format)
+    )
@@ -93,8 +93,8 @@ async def register(
         db.commit()
 
     # Generate tokens
-    access_token = AuthService.create_access_token({"sub": str(user.id)})
-    refresh_token = AuthService.create_refresh_token({"sub": str(user.id)})
+    access_token = AuthService.create_access_token({"sub": str(user.id), "tv": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": str(user.id), "tv": user.token_version})
 
     # Send welcome email with verification
     try:
@@ -194,8 +194,8 @@ async def login(
     db.commit()
 
     # Generate tokens
-    access_token = AuthService.create_access_token({"sub": str(user.id)})
-    refresh_token = AuthService.create_refresh_token({"sub": str(user.id)})
+    access_token = AuthService.create_access_token({"sub": str(user.id), "tv": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": str(user.id), "tv": user.token_version})
 
     # Set refresh token as httpOnly cookie if remember_me is True
     if credentials.remember_me:
@@ -281,8 +281,15 @@ async def refresh_token(
             detail="User not found or inactive"
         )
 
+    # Refresh tokens issued before a password change are revoked
+    if payload.get("tv") is not None and int(payload["tv"]) != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token has been revoked"
+        )
+
     # Generate new access token
-    access_token = AuthService.create_access_token({"sub": str(user.id)})
+    access_token = AuthService.create_access_token({"sub": str(user.id), "tv": user.token_version})
 
     return TokenResponse(
         access_token=access_token,
@@ -392,7 +399,12 @@ async def change_password(
         {"email": current_user.email}
     )
 
-    return {"message": "Password changed successfully"}
+    # The commit bumped token_version, revoking older tokens; hand out fresh ones
+    return {
+        "message": "Password changed successfully",
+        "access_token": AuthService.create_access_token({"sub": str(current_user.id), "tv": current_user.token_version}),
+        "refresh_token": AuthService.create_refresh_token({"sub": str(current_user.id), "tv": current_user.token_version})
+    }
 
 
 @router.post("/forgot-password")
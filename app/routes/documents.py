@@ -24,9 +24,11 @@ from app.schemas.document import (
     DocumentBatch, DocumentBatchResponse, DocumentDownload, DocumentPreview
 )
 from app.services.document_service import DocumentService
+from app.services.principal_service import Principal
 from app.services.audit_service import AuditService
-from app.utils.security import get_current_active_user
-from app.tasks.document_tasks import generate_document_task, generate_batch_documents_task
+from app.utils.pagination import CursorError, paginate
+from app.utils.security import get_current_active_user, get_current_principal
+from app.tasks.document_tasks import generate_document_task, generate_batch_documents_task, get_batch_progress
 
 router = APIRouter()
 
@@ -138,10 +140,15 @@ async def list_documents(
     status_filter: Optional[DocumentStatus] = None,
     template_id: Optional[int] = None,
     search: Optional[str] = None,
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """List user's documents with pagination and filters"""
+    """List user's documents with pagination and filters
+
+    Pass next_cursor from a response as cursor to fetch the following page.
+    """
 
     # Build query
     query = db.query(Document).filter(Document.user_id == current_user.id)
@@ -161,52 +168,52 @@ async def list_documents(
             )
         )
 
-    # Get total count
-    total = query.count()
-
-    # Apply pagination and ordering
-    documents = query.order_by(desc(Document.created_at)).offset(
-        (page - 1) * per_page
-    ).limit(per_page).all()
-
-    # Calculate pagination info
-    pages = (total + per_page - 1) // per_page
+    try:
+        result = paginate(
+            query, [(Document.created_at, True)], Document.id, per_page,
+            cursor=cursor, page=page, exact_count=exact_count
+        )
+    except CursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     return DocumentList(
-        documents=[DocumentResponse.from_orm(doc) for doc in documents],
-        total=total,
+        documents=[DocumentResponse.from_orm(doc) for doc in result.items],
+        total=result.total,
         page=page,
         per_page=per_page,
-        pages=pages
+        pages=result.pages(per_page),
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor
     )
 
 
 @router.get("/search", response_model=DocumentList)
 async def search_documents(
     search_params: DocumentSearch = Depends(),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Advanced document search"""
 
-    documents, total = DocumentService.search_documents(
-        db, current_user.id, search_params
-    )
-
-    pages = (total + search_params.per_page - 1) // search_params.per_page
+    try:
+        result = DocumentService.search_documents(db, current_user.id, search_params)
+    except CursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     return DocumentList(
-        documents=[DocumentResponse.from_orm(doc) for doc in documents],
-        total=total,
+        documents=[DocumentResponse.from_orm(doc) for doc in result.items],
+        total=result.total,
         page=search_params.page,
         per_page=search_params.per_page,
-        pages=pages
+        pages=result.pages(search_params.per_page),
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor
     )
 
 
 @router.get("/stats", response_model=DocumentStats)
 async def get_document_stats(
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get document statistics for user"""
@@ -219,7 +226,7 @@ async def get_document_stats(
 async def get_document(
     document_id: int,
     request: Request,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get document by ID"""
@@ -423,23 +430,19 @@ async def generate_batch_documents(
         batch_documents=batch_data.documents
     )
 
-    # Create batch documents
+    # Create batch documents in one INSERT
     batch_id = str(uuid.uuid4())
-    documents = []
-
-    for doc_data in batch_data.documents:
-        document = DocumentService.create_document_for_batch(
-            db, doc_data.template_id, doc_data, current_user.id, batch_id
-        )
-        documents.append(document)
+    documents = DocumentService.create_documents_for_batch(
+        db, [doc_data.dict() for doc_data in batch_data.documents], current_user.id, batch_id
+    )
 
-    # Start advanced batch generation task
+    # Start advanced batch generation task (placeholder data is read from the documents)
     background_tasks.add_task(
         generate_batch_documents_task.delay,
         batch_id,
         [doc.id for doc in documents],
-        consolidated_inputs,
-        batch_data.batch_settings if hasattr(batch_data, 'batch_settings') else {}
+        None,
+        batch_data.batch_settings.dict() if batch_data.batch_settings else {}
     )
 
     # Log batch generation
@@ -470,7 +473,7 @@ async def generate_batch_documents(
 async def download_document(
     document_id: int,
     request: Request,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Download document file with guest restrictions"""
@@ -601,7 +604,7 @@ async def download_batch_documents(
 @router.get("/batch/{batch_id}/preview")
 async def preview_batch_documents(
     batch_id: str,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Preview all documents in a batch before download"""
@@ -652,6 +655,24 @@ async def preview_batch_documents(
     }
 
 
+@router.get("/batch/{batch_id}/status")
+async def get_batch_generation_status(
+    batch_id: str,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Get aggregated generation progress for a batch"""
+
+    progress = get_batch_progress(batch_id, current_user.id)
+    if not progress or progress.get("user_id") != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Batch not found"
+        )
+
+    progress.pop("user_id", None)
+    return {"batch_id": batch_id, **progress}
+
+
 @router.post("/batch/{batch_id}/token-debit")
 async def debit_tokens_for_batch(
     batch_id: str,
@@ -773,7 +794,7 @@ async def share_document(
 @router.get("/{document_id}/preview", response_model=DocumentPreview)
 async def preview_document(
     document_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """Get document preview"""
@@ -102,11 +102,6 @@ async def track_landing_visit(
             session_id=session_info["session_id"],
             request=request,
             utm_params=utm_params if utm_params else None
-            device_fingerprint=session_info["device_fingerprint"],
-            ip_address=session_info["ip_address"],
-            user_agent=session_info["user_agent"],
-            referrer=track_request.referrer,
-            utm_params=utm_params
         )
 
         # Track in real-time analytics
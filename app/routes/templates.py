@@ -21,9 +21,12 @@ from app.schemas.template import (
     TemplateSearch, TemplatePreview, TemplateUpload, TemplateRating,
     TemplateStats, PlaceholderCreate, PlaceholderResponse
 )
-from app.services.template_service import TemplateService
+from app.services.template_service import TEMPLATE_LIST_CACHE_TAG, TemplateService
+from app.services.cache_service import cache_response
+from app.services.principal_service import Principal
 from app.services.audit_service import AuditService
-from app.utils.security import get_current_active_user
+from app.utils.pagination import CursorError, paginate
+from app.utils.security import get_current_active_user, get_current_principal
 from app.services.auth_service import AuthService
 
 # Provide a compatible dependency name used across routes
@@ -108,6 +111,7 @@ async def create_template(
 
 
 @router.get("/", response_model=TemplateList)
+@cache_response(expire=60, key_prefix="templates", tags=[TEMPLATE_LIST_CACHE_TAG])
 async def list_templates(
     page: int = 1,
     per_page: int = 20,
@@ -115,10 +119,15 @@ async def list_templates(
     type: Optional[str] = None,
     is_public: Optional[bool] = None,
     my_templates: bool = False,
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    exact_count: bool = False,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """List templates with pagination and filters"""
+    """List templates with pagination and filters
+
+    Pass next_cursor from a response as cursor to fetch the following page.
+    """
 
     # Build query
     query = db.query(Template).filter(Template.is_active == True)
@@ -145,13 +154,13 @@ async def list_templates(
     if is_public is not None:
         query = query.filter(Template.is_public == is_public)
 
-    # Get total count
-    total = query.count()
-
-    # Apply pagination and ordering
-    templates = query.order_by(desc(Template.created_at)).offset(
-        (page - 1) * per_page
-    ).limit(per_page).all()
+    try:
+        result = paginate(
+            query, [(Template.created_at, True)], Template.id, per_page,
+            cursor=cursor, page=page, exact_count=exact_count
+        )
+    except CursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
     # Get categories and types for filtering UI
     categories = db.query(Template.category).distinct().filter(
@@ -166,15 +175,14 @@ async def list_templates(
     ).all()
     types = [typ[0] for typ in types]
 
-    # Calculate pagination info
-    pages = (total + per_page - 1) // per_page
-
     return TemplateList(
-        templates=[TemplateResponse.from_orm(tmpl) for tmpl in templates],
-        total=total,
+        templates=[TemplateResponse.from_orm(tmpl) for tmpl in result.items],
+        total=result.total,
         page=page,
         per_page=per_page,
-        pages=pages,
+        pages=result.pages(per_page),
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
         categories=categories,
         types=types
     )
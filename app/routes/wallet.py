@@ -12,6 +12,7 @@ import logging
 
 from database import get_db
 from app.models.user import User
+from app.utils.pagination import CursorError
 from app.utils.security import get_current_active_user, get_client_ip
 from app.services.wallet_service import WalletService
 from app.services.audit_service import AuditService
@@ -349,18 +350,22 @@ async def get_transaction_history(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     transaction_type: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    exact_count: bool = Query(False),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """Get user's transaction history with pagination"""
 
     try:
-        history = await WalletService.get_transaction_history(
+        history = WalletService.get_transaction_history(
             db=db,
             user_id=current_user.id,
             page=page,
             per_page=per_page,
-            transaction_type=transaction_type
+            transaction_type=transaction_type,
+            cursor=cursor,
+            exact_count=exact_count
         )
 
         return {
@@ -370,10 +375,14 @@ async def get_transaction_history(
                 "page": page,
                 "per_page": per_page,
                 "total": history["total"],
-                "pages": (history["total"] + per_page - 1) // per_page
+                "total_is_estimate": history["total_is_estimate"],
+                "pages": history["pages"],
+                "next_cursor": history["next_cursor"]
             }
         }
 
+    except CursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Get transaction history failed: {e}")
         raise HTTPException(
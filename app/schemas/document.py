@@ -119,6 +119,8 @@ class DocumentList(BaseModel):
     page: int
     per_page: int
     pages: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
 
 
 class DocumentDownload(BaseModel):
@@ -151,6 +153,8 @@ class DocumentSearch(BaseModel):
     sort_order: str = Field("desc", pattern=r"^(asc|desc)$")
     page: int = Field(1, ge=1)
     per_page: int = Field(20, ge=1, le=100)
+    cursor: Optional[str] = None  # next_cursor from the previous page; overrides page
+    exact_count: bool = False
 
 
 class DocumentStats(BaseModel):
@@ -90,6 +90,7 @@ class TemplateUpdate(BaseModel):
     tags: Optional[List[str]] = None
     keywords: Optional[str] = Field(None, max_length=500)
     is_active: Optional[bool] = None
+    render_engine: Optional[str] = Field(None, pattern=r"^(docx|ooxml)$")
 
 
 class TemplateResponse(BaseModel):
@@ -106,6 +107,7 @@ class TemplateResponse(BaseModel):
     language: str
     font_family: str
     font_size: int
+    render_engine: str = "docx"
     is_active: bool
     is_public: bool
     is_premium: bool
@@ -132,6 +134,8 @@ class TemplateList(BaseModel):
     page: int
     per_page: int
     pages: int
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
     categories: List[str] = []
     types: List[str] = []
 
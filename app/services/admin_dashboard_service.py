@@ -8,7 +8,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, func, desc, and_, or_
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey, UniqueConstraint, distinct, func, desc, and_, or_
 from database import Base
 from app.models.user import User
 from app.models.template import Template
@@ -1454,11 +1454,19 @@ class AdminDashboardService:
 
 
 class AnalyticsSummary(Base):
-    """Daily analytics summary for quick dashboard access"""
+    """Hourly and daily analytics rollups for quick dashboard access
+
+    Rows are maintained incrementally by MetricsRollupService; date is the
+    start of the hour or day the row covers.
+    """
     __tablename__ = "analytics_summaries"
+    __table_args__ = (
+        UniqueConstraint("granularity", "date", name="uq_analytics_summaries_period"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(DateTime, nullable=False, index=True)
+    granularity = Column(String(8), nullable=False, default="day")  # hour, day
 
     # User metrics
     total_users = Column(Integer, default=0)
@@ -1475,21 +1483,37 @@ class AnalyticsSummary(Base):
     revenue_currency = Column(String(3), default="NGN")
     subscription_revenue = Column(Float, default=0.0)
     pay_as_you_go_revenue = Column(Float, default=0.0)
+    payments_completed = Column(Integer, default=0)
 
     # Visit metrics
     total_visits = Column(Integer, default=0)
     unique_visitors = Column(Integer, default=0)
     avg_visit_duration = Column(Float, default=0.0)  # seconds
     bounce_rate = Column(Float, default=0.0)  # percentage
+    visit_duration_total = Column(Float, default=0.0)  # seconds, visits with a duration
+    visits_with_duration = Column(Integer, default=0)
 
     # Most visited pages (JSON array of {path, count})
     top_pages = Column(Text, nullable=True)
+    # Visits by device type and browser (JSON objects of name -> count)
+    device_breakdown = Column(Text, nullable=True)
+    browser_breakdown = Column(Text, nullable=True)
 
     # Performance metrics
     avg_response_time = Column(Float, default=0.0)  # milliseconds
     error_count = Column(Integer, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class AnalyticsRollupWatermark(Base):
+    """How far each source table has been folded into analytics_summaries"""
+    __tablename__ = "analytics_rollup_watermarks"
+
+    source = Column(String(50), primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 class DocumentShare(Base):
@@ -1522,42 +1546,20 @@ class AdminDashboardService:
         """
         Get all dashboard statistics including earnings, customers, visits, and analytics
         """
+        from app.services.metrics_rollup_service import MetricsRollupService
+
         try:
-            # Time ranges for analytics
-            today = datetime.utcnow().date()
-            yesterday = today - timedelta(days=1)
-            week_ago = today - timedelta(days=7)
-            month_ago = today - timedelta(days=30)
-
-            # User Statistics
-            total_users = db.query(User).count()
-            new_users_today = db.query(User).filter(
-                func.date(User.created_at) == today
-            ).count()
-            new_users_week = db.query(User).filter(
-                func.date(User.created_at) >= week_ago
-            ).count()
-            new_users_month = db.query(User).filter(
-                func.date(User.created_at) >= month_ago
-            ).count()
+            # Counts, revenue and visits come from the hourly/daily rollups
+            # plus a live delta for rows newer than the rollup watermark
+            metrics = MetricsRollupService.get_dashboard_metrics(db)
+            totals = metrics["totals"]
+            windows = metrics["windows"]
 
             # Active users (visited in last 7 days)
-            active_users = db.query(PageVisit).filter(
+            active_users = db.query(func.count(distinct(PageVisit.user_id))).filter(
                 PageVisit.created_at >= datetime.utcnow() - timedelta(days=7),
                 PageVisit.user_id.isnot(None)
-            ).distinct(PageVisit.user_id).count()
-
-            # Document Statistics
-            total_documents = db.query(Document).count()
-            documents_today = db.query(Document).filter(
-                func.date(Document.created_at) == today
-            ).count()
-            documents_week = db.query(Document).filter(
-                func.date(Document.created_at) >= week_ago
-            ).count()
-            documents_month = db.query(Document).filter(
-                func.date(Document.created_at) >= month_ago
-            ).count()
+            ).scalar() or 0
 
             # Template Statistics
             total_templates = db.query(Template).count()
@@ -1565,48 +1567,6 @@ class AdminDashboardService:
                 Template.is_active == True
             ).count()
 
-            # Payment/Revenue Statistics
-            total_revenue = db.query(func.sum(Payment.amount)).filter(
-                Payment.status == "completed"
-            ).scalar() or 0
-
-            revenue_today = db.query(func.sum(Payment.amount)).filter(
-                Payment.status == "completed",
-                func.date(Payment.created_at) == today
-            ).scalar() or 0
-
-            revenue_week = db.query(func.sum(Payment.amount)).filter(
-                Payment.status == "completed",
-                func.date(Payment.created_at) >= week_ago
-            ).scalar() or 0
-
-            revenue_month = db.query(func.sum(Payment.amount)).filter(
-                Payment.status == "completed",
-                func.date(Payment.created_at) >= month_ago
-            ).scalar() or 0
-
-            # Page Visit Statistics
-            total_visits = db.query(PageVisit).count()
-            visits_today = db.query(PageVisit).filter(
-                func.date(PageVisit.created_at) == today
-            ).count()
-            visits_week = db.query(PageVisit).filter(
-                func.date(PageVisit.created_at) >= week_ago
-            ).count()
-
-            # Average visit duration
-            avg_visit_duration = db.query(func.avg(PageVisit.visit_duration)).filter(
-                PageVisit.visit_duration > 0
-            ).scalar() or 0
-
-            # Most visited pages
-            popular_pages = db.query(
-                PageVisit.page_path,
-                func.count(PageVisit.id).label('visit_count')
-            ).group_by(PageVisit.page_path).order_by(
-                desc('visit_count')
-            ).limit(10).all()
-
             # User role distribution
             role_distribution = db.query(
                 User.role,
@@ -1618,59 +1578,44 @@ class AdminDashboardService:
             recent_documents = db.query(Document).order_by(desc(Document.created_at)).limit(5).all()
             recent_payments = db.query(Payment).order_by(desc(Payment.created_at)).limit(5).all()
 
-            # Device and browser analytics
-            device_stats = db.query(
-                PageVisit.device_type,
-                func.count(PageVisit.id).label('count')
-            ).filter(
-                PageVisit.device_type.isnot(None)
-            ).group_by(PageVisit.device_type).all()
-
-            browser_stats = db.query(
-                PageVisit.browser,
-                func.count(PageVisit.id).label('count')
-            ).filter(
-                PageVisit.browser.isnot(None)
-            ).group_by(PageVisit.browser).limit(10).all()
-
             return {
                 "success": True,
                 "timestamp": datetime.utcnow().isoformat(),
                 "overview": {
-                    "total_users": total_users,
-                    "total_documents": total_documents,
+                    "total_users": totals["new_users"],
+                    "total_documents": totals["documents_created"],
                     "total_templates": total_templates,
-                    "total_revenue": float(total_revenue),
-                    "total_visits": total_visits,
+                    "total_revenue": float(totals["revenue_amount"]),
+                    "total_visits": totals["total_visits"],
                     "active_users": active_users,
                     "active_templates": active_templates
                 },
                 "growth": {
                     "users": {
-                        "today": new_users_today,
-                        "week": new_users_week,
-                        "month": new_users_month
+                        "today": windows["today"]["new_users"],
+                        "week": windows["week"]["new_users"],
+                        "month": windows["month"]["new_users"]
                     },
                     "documents": {
-                        "today": documents_today,
-                        "week": documents_week,
-                        "month": documents_month
+                        "today": windows["today"]["documents_created"],
+                        "week": windows["week"]["documents_created"],
+                        "month": windows["month"]["documents_created"]
                     },
                     "revenue": {
-                        "today": float(revenue_today),
-                        "week": float(revenue_week),
-                        "month": float(revenue_month)
+                        "today": float(windows["today"]["revenue_amount"]),
+                        "week": float(windows["week"]["revenue_amount"]),
+                        "month": float(windows["month"]["revenue_amount"])
                     },
                     "visits": {
-                        "today": visits_today,
-                        "week": visits_week,
-                        "average_duration": float(avg_visit_duration)
+                        "today": windows["today"]["total_visits"],
+                        "week": windows["week"]["total_visits"],
+                        "average_duration": float(metrics["average_visit_duration"])
                     }
                 },
                 "analytics": {
                     "popular_pages": [
                         {"page": page, "visits": count}
-                        for page, count in popular_pages
+                        for page, count in metrics["popular_pages"]
                     ],
                     "user_roles": [
                         {"role": role, "count": count}
@@ -1678,13 +1623,15 @@ class AdminDashboardService:
                     ],
                     "devices": [
                         {"device": device, "count": count}
-                        for device, count in device_stats
+                        for device, count in metrics["devices"]
                     ],
                     "browsers": [
                         {"browser": browser, "count": count}
-                        for browser, count in browser_stats
-                    ]
+                        for browser, count in metrics["browsers"]
+                    ],
+                    "hourly": metrics["hourly"]
                 },
+                "rollup_as_of": metrics["as_of"],
                 "recent_activity": {
                     "users": [
                         {
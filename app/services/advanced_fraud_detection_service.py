@@ -11,6 +11,7 @@ from typing import Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, Float, and_, or_
 from database import Base
+from app.services.user_agent_service import user_agent_classifier
 
 logger = logging.getLogger(__name__)
 
@@ -401,8 +402,7 @@ class AdvancedFraudDetectionService:
         risk_score = 0.0
 
         # User agent analysis
-        user_agent = device_data.get("user_agent", "").lower()
-        if "bot" in user_agent or "crawler" in user_agent:
+        if user_agent_classifier.classify(device_data.get("user_agent")).is_bot:
             risk_score += 50
 
         # Common fraud indicators
@@ -14,9 +14,33 @@ import math
 
 from database import Base
 from app.models.template import Template
+from app.models.template_purchase import TemplatePurchase
 from app.models.document import Document
 from app.models.user import User
 from app.services.analytics.visit_tracking import VisitTrackingService
+from app.services.search_log_writer import search_log_writer
+from app.services.search_suggestions import search_suggestions
+from app.utils.pagination import Page, count_rows, paginate
+
+# Text search configuration used by the templates.search_vector trigger
+SEARCH_CONFIG = "english"
+
+# Keyset sort columns per sort_by; relevance is an expression and is absent
+TEMPLATE_SORT_KEYS = {
+    "price_low": [(Template.price, False)],
+    "price_high": [(Template.price, True)],
+    "rating": [(Template.rating, True), (Template.rating_count, True)],
+    "popularity": [(Template.usage_count, True)],
+    "newest": [(Template.created_at, True)],
+    "name": [(Template.name, False)],
+}
+DOCUMENT_SORT_KEYS = {
+    "created_at": [(Document.created_at, True)],
+    "updated_at": [(Document.updated_at, True)],
+    "title": [(Document.title, False)],
+    "status": [(Document.status, False)],
+    "relevance": [(Document.updated_at, True)],
+}
 
 
 class SearchQuery(Base):
@@ -46,6 +70,18 @@ class SearchQuery(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
 
+class SearchSuggestion(Base):
+    """Precomputed top completions per typed prefix, rebuilt from search history"""
+    __tablename__ = "search_suggestions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    prefix = Column(String(64), nullable=False, index=True)
+    suggestion = Column(String(255), nullable=False)
+    score = Column(Float, nullable=False, default=0.0)
+    rank = Column(Integer, nullable=False, default=0)  # 0 is the best completion for the prefix
+    built_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class SearchRecommendation(Base):
     """Search recommendations based on user behavior"""
     __tablename__ = "search_recommendations"
@@ -83,8 +119,13 @@ class AdvancedSearchService:
     def search_templates(db: Session, query: str, user_id: Optional[int] = None,
                         category: str = None, min_price: float = None, max_price: float = None,
                         rating: float = None, language: str = None, tags: List[str] = None,
-                        sort_by: str = "relevance", page: int = 1, per_page: int = 20) -> Dict:
-        """Advanced template search with full-text search and ranking"""
+                        sort_by: str = "relevance", page: int = 1, per_page: int = 20,
+                        cursor: str = None, exact_count: bool = False) -> Dict:
+        """Advanced template search with full-text search and ranking
+
+        Column sorts page by cursor; relevance ranks are computed per query,
+        so relevance pages by page number only.
+        """
 
         start_time = datetime.utcnow()
 
@@ -95,36 +136,31 @@ class AdvancedSearchService:
         )
 
         # Text search with ranking
+        rank = None
         if query:
             # Clean and prepare search terms
             search_terms = AdvancedSearchService._prepare_search_terms(query)
 
-            # Build search conditions with weighted scoring
-            search_conditions = []
-
-            for term in search_terms:
-                # Exact name match (highest weight)
-                search_conditions.append(
-                    Template.name.ilike(f"%{term}%")
-                )
-
-                # Description match (medium weight)
-                search_conditions.append(
-                    Template.description.ilike(f"%{term}%")
-                )
-
-                # Keywords match (medium weight)
-                search_conditions.append(
-                    Template.keywords.ilike(f"%{term}%")
-                )
-
-                # Tags match (lower weight)
-                if Template.tags:
-                    search_conditions.append(
+            if search_terms and AdvancedSearchService._uses_full_text(db):
+                # Weighted tsvector (GIN) for words and prefixes, trigram
+                # similarity on the name (GIN) for typos
+                ts_query = AdvancedSearchService._template_tsquery(search_terms)
+                base_query = base_query.filter(or_(
+                    Template.search_vector.op("@@")(ts_query),
+                    Template.name.op("%")(query)
+                ))
+                rank = func.ts_rank_cd(Template.search_vector, ts_query) + func.similarity(Template.name, query)
+
+            elif search_terms:
+                # Databases without full-text support (SQLite in development)
+                search_conditions = []
+                for term in search_terms:
+                    search_conditions.extend([
+                        Template.name.ilike(f"%{term}%"),
+                        Template.description.ilike(f"%{term}%"),
+                        Template.keywords.ilike(f"%{term}%"),
                         Template.tags.contains(f'"{term}"')
-                    )
-
-            if search_conditions:
+                    ])
                 base_query = base_query.filter(or_(*search_conditions))
 
         # Apply filters
@@ -147,25 +183,28 @@ class AdvancedSearchService:
             for tag in tags:
                 base_query = base_query.filter(Template.tags.contains(f'"{tag}"'))
 
-        # Apply sorting
-        base_query = AdvancedSearchService._apply_template_sorting(base_query, sort_by, query)
-
-        # Get total count
-        total = base_query.count()
-
-        # Apply pagination
-        templates = base_query.offset((page - 1) * per_page).limit(per_page).all()
+        # Apply sorting and pagination
+        sort_keys = TEMPLATE_SORT_KEYS.get(sort_by)
+        if sort_keys:
+            result = paginate(base_query, sort_keys, Template.id, per_page,
+                              cursor=cursor, page=page, exact_count=exact_count)
+        else:
+            result = AdvancedSearchService._offset_page(
+                AdvancedSearchService._apply_template_sorting(base_query, sort_by, query, rank),
+                page, per_page, exact_count
+            )
+        templates, total = result.items, result.total
 
         # Calculate response time
         response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
 
-        # Log search query
+        # Log search query off the request path
         if query:
-            search_log = SearchQuery(
-                user_id=user_id,
-                query_text=query,
-                search_type="template",
-                filters_applied={
+            search_log_writer.submit({
+                "user_id": user_id,
+                "query_text": query,
+                "search_type": "template",
+                "filters_applied": {
                     "category": category,
                     "min_price": min_price,
                     "max_price": max_price,
@@ -174,16 +213,13 @@ class AdvancedSearchService:
                     "tags": tags,
                     "sort_by": sort_by
                 },
-                results_count=total,
-                response_time_ms=int(response_time)
-            )
-            db.add(search_log)
-            db.commit()
+                "results_count": total,
+                "response_time_ms": int(response_time)
+            })
 
         # Get user's purchased templates (if logged in)
         purchased_template_ids = set()
         if user_id:
-            from app.models.template import Template
             purchases = db.query(TemplatePurchase.template_id).filter(
                 TemplatePurchase.user_id == user_id,
                 TemplatePurchase.is_active == True
@@ -199,9 +235,11 @@ class AdvancedSearchService:
                 for t in templates
             ],
             "total": total,
+            "total_is_estimate": result.total_is_estimate,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": result.pages(per_page),
+            "next_cursor": result.next_cursor,
             "response_time_ms": int(response_time),
             "filters": {
                 "query": query,
@@ -213,14 +251,15 @@ class AdvancedSearchService:
                 "tags": tags,
                 "sort_by": sort_by
             },
-            "suggestions": AdvancedSearchService._get_search_suggestions(db, query) if query else []
+            "suggestions": AdvancedSearchService._get_search_suggestions(query) if query else []
         }
 
     @staticmethod
     def search_documents(db: Session, user_id: int, query: str,
                         status: str = None, template_id: int = None,
                         start_date: datetime = None, end_date: datetime = None,
-                        sort_by: str = "relevance", page: int = 1, per_page: int = 20) -> Dict:
+                        sort_by: str = "relevance", page: int = 1, per_page: int = 20,
+                        cursor: str = None, exact_count: bool = False) -> Dict:
         """Advanced document search for user's documents"""
 
         start_time = datetime.utcnow()
@@ -256,36 +295,30 @@ class AdvancedSearchService:
         if end_date:
             base_query = base_query.filter(Document.created_at <= end_date)
 
-        # Apply sorting
-        base_query = AdvancedSearchService._apply_document_sorting(base_query, sort_by, query)
-
-        # Get total count
-        total = base_query.count()
-
-        # Apply pagination
-        documents = base_query.offset((page - 1) * per_page).limit(per_page).all()
+        # Apply sorting and pagination
+        result = paginate(base_query, DOCUMENT_SORT_KEYS.get(sort_by, DOCUMENT_SORT_KEYS["relevance"]),
+                          Document.id, per_page, cursor=cursor, page=page, exact_count=exact_count)
+        documents, total = result.items, result.total
 
         # Calculate response time
         response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
 
-        # Log search query
+        # Log search query off the request path
         if query:
-            search_log = SearchQuery(
-                user_id=user_id,
-                query_text=query,
-                search_type="document",
-                filters_applied={
+            search_log_writer.submit({
+                "user_id": user_id,
+                "query_text": query,
+                "search_type": "document",
+                "filters_applied": {
                     "status": status,
                     "template_id": template_id,
                     "start_date": start_date.isoformat() if start_date else None,
                     "end_date": end_date.isoformat() if end_date else None,
                     "sort_by": sort_by
                 },
-                results_count=total,
-                response_time_ms=int(response_time)
-            )
-            db.add(search_log)
-            db.commit()
+                "results_count": total,
+                "response_time_ms": int(response_time)
+            })
 
         return {
             "documents": [
@@ -293,9 +326,11 @@ class AdvancedSearchService:
                 for d in documents
             ],
             "total": total,
+            "total_is_estimate": result.total_is_estimate,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page,
+            "pages": result.pages(per_page),
+            "next_cursor": result.next_cursor,
             "response_time_ms": int(response_time),
             "filters": {
                 "query": query,
@@ -465,7 +500,17 @@ class AdvancedSearchService:
         return terms
 
     @staticmethod
-    def _apply_template_sorting(query, sort_by: str, search_query: str = None):
+    def _uses_full_text(db: Session) -> bool:
+        """Whether the templates table has the tsvector/trigram indexes"""
+        return db.get_bind().dialect.name == "postgresql"
+
+    @staticmethod
+    def _template_tsquery(search_terms: List[str]):
+        """Prefix tsquery matching any of the terms; ts_rank_cd favours rows matching more"""
+        return func.to_tsquery(SEARCH_CONFIG, " | ".join(f"{term}:*" for term in search_terms))
+
+    @staticmethod
+    def _apply_template_sorting(query, sort_by: str, search_query: str = None, rank=None):
         """Apply sorting to template query"""
         if sort_by == "price_low":
             return query.order_by(Template.price)
@@ -480,6 +525,8 @@ class AdvancedSearchService:
         elif sort_by == "name":
             return query.order_by(Template.name)
         else:  # relevance (default)
+            if rank is not None:
+                return query.order_by(desc(rank), desc(Template.rating), Template.id)
             if search_query:
                 # Boost exact matches and higher rated templates
                 return query.order_by(
@@ -489,18 +536,11 @@ class AdvancedSearchService:
                 return query.order_by(desc(Template.rating), desc(Template.usage_count))
 
     @staticmethod
-    def _apply_document_sorting(query, sort_by: str, search_query: str = None):
-        """Apply sorting to document query"""
-        if sort_by == "created_at":
-            return query.order_by(desc(Document.created_at))
-        elif sort_by == "updated_at":
-            return query.order_by(desc(Document.updated_at))
-        elif sort_by == "title":
-            return query.order_by(Document.title)
-        elif sort_by == "status":
-            return query.order_by(Document.status)
-        else:  # relevance (default)
-            return query.order_by(desc(Document.updated_at))
+    def _offset_page(query, page: int, per_page: int, exact_count: bool) -> Page:
+        """Page number pagination for orderings a cursor cannot resume"""
+        total, total_is_estimate = count_rows(query, exact=exact_count)
+        items = query.offset((page - 1) * per_page).limit(per_page).all()
+        return Page(items=items, total=total, total_is_estimate=total_is_estimate, next_cursor=None)
 
     @staticmethod
     def _format_template_result(template: Template, query: str = None) -> Dict:
@@ -583,29 +623,9 @@ class AdvancedSearchService:
         return highlights
 
     @staticmethod
-    def _get_search_suggestions(db: Session, query: str) -> List[str]:
-        """Get search suggestions based on query"""
-        if not query or len(query) < 3:
-            return []
-
-        # Get popular searches that start with or contain the query
-        similar_searches = db.query(SearchQuery.query_text, func.count(SearchQuery.id).label('count')).filter(
-            SearchQuery.query_text.ilike(f"%{query}%"),
-            SearchQuery.created_at >= datetime.utcnow() - timedelta(days=30)
-        ).group_by(SearchQuery.query_text).order_by(desc('count')).limit(5).all()
-
-        suggestions = [search[0] for search in similar_searches if search[0].lower() != query.lower()]
-
-        # Add template name suggestions
-        template_suggestions = db.query(Template.name).filter(
-            Template.name.ilike(f"%{query}%"),
-            Template.is_active == True,
-            Template.is_public == True
-        ).limit(3).all()
-
-        suggestions.extend([t[0] for t in template_suggestions])
-
-        return list(set(suggestions))[:5]  # Remove duplicates and limit
+    def _get_search_suggestions(query: str) -> List[str]:
+        """Get search suggestions from the precomputed prefix table"""
+        return search_suggestions.suggest(query)
 
     @staticmethod
     def _get_collaborative_recommendations(db: Session, user_id: int, limit: int) -> List[Dict]:
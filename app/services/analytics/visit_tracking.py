@@ -5,13 +5,18 @@ Shared analytics services
 import json
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Iterator, Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from fastapi import Request
 
+from database import SessionLocal
+from app.models.document import Document
 from app.models.analytics.visit import BaseVisit, DocumentVisit, LandingVisit, PageVisit
 from app.services.cache_service import CacheService
+from app.services.geoip_service import geoip_resolver
+from app.services.user_agent_service import user_agent_classifier
+from app.utils.streaming_export import stream_export
 
 logger = logging.getLogger(__name__)
 
@@ -51,45 +56,7 @@ class VisitTrackingService:
     @staticmethod
     def _parse_user_agent(user_agent: str) -> Dict[str, str]:
         """Extract browser and OS info from user agent string"""
-        try:
-            from user_agents import parse
-            ua = parse(user_agent)
-            
-            return {
-                'browser_name': ua.browser.family,
-                'browser_version': ua.browser.version_string,
-                'os_name': ua.os.family,
-                'os_version': ua.os.version_string,
-                'device_type': ('mobile' if ua.is_mobile else 
-                              'tablet' if ua.is_tablet else 'desktop')
-            }
-        except ImportError:
-            # Fallback to basic parsing if user-agents package not available
-            ua_lower = user_agent.lower()
-            
-            browser = "Unknown"
-            if "chrome" in ua_lower:
-                browser = "Chrome"
-            elif "firefox" in ua_lower:
-                browser = "Firefox"
-            elif "safari" in ua_lower:
-                browser = "Safari"
-            elif "edge" in ua_lower:
-                browser = "Edge"
-            
-            device_type = "desktop"
-            if any(x in ua_lower for x in ["mobile", "android", "iphone"]):
-                device_type = "mobile"
-            elif any(x in ua_lower for x in ["ipad", "tablet"]):
-                device_type = "tablet"
-            
-            return {
-                'browser_name': browser,
-                'browser_version': None,
-                'os_name': None,
-                'os_version': None,
-                'device_type': device_type
-            }
+        return user_agent_classifier.classify(user_agent).visit_fields()
     
     @staticmethod
     def update_session_metrics(visit: BaseVisit, current_time: datetime) -> None:
@@ -261,23 +228,10 @@ class VisitTrackingService:
                 "city": None
             }
             
-        try:
-            import geoip2.database
-            from pathlib import Path
-            
-            db_path = Path("/usr/share/GeoIP/GeoLite2-City.mmdb")
-            if not db_path.exists():
-                return {"country": "Nigeria", "region": None, "city": None}
-                
-            with geoip2.database.Reader(db_path) as reader:
-                response = reader.city(ip_address)
-                return {
-                    "country": response.country.name,
-                    "region": response.subdivisions.most_specific.name if response.subdivisions else None,
-                    "city": response.city.name
-                }
-        except:
+        location = geoip_resolver.lookup(ip_address)
+        if location is None:
             return {"country": "Nigeria", "region": None, "city": None}
+        return {"country": location.country, "region": location.region, "city": location.city}
     
     @staticmethod
     def _calculate_growth(current: int, previous: int) -> float:
@@ -286,86 +240,92 @@ class VisitTrackingService:
             return 100 if current > 0 else 0
         return ((current - previous) / previous) * 100
 
+    # Columns of a CSV analytics export, in order
+    EXPORT_CSV_FIELDS = [
+        "visit_id", "document_id", "visit_type", "country", "city", "device_type",
+        "browser_name", "os_name", "created_at", "session_quality_score",
+        "active_time_seconds", "bounce", "device_fingerprint"
+    ]
+
     def export_analytics_data(
         self,
-        db: Session,
         user_id: int,
         document_id: Optional[int],
         days: int,
-        format: str
-    ) -> Dict[str, Any]:
-        """Export analytics data in specified format"""
-        
+        format: str,
+        cursor: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ) -> Iterator[bytes]:
+        """Stream analytics data as CSV, NDJSON or JSON, resuming after visit id cursor"""
+
         start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # Build query
-        query = db.query(DocumentVisit).join(Document).filter(
-            Document.user_id == user_id,
-            DocumentVisit.created_at >= start_date
-        )
-        
-        if document_id:
-            query = query.filter(DocumentVisit.document_id == document_id)
-        
-        visits = query.all()
-        
-        if format == "csv":
-            # Prepare CSV data
-            csv_data = []
-            for visit in visits:
-                csv_data.append({
-                    "visit_id": visit.id,
-                    "document_id": visit.document_id,
-                    "visit_type": visit.visit_type,
-                    "country": visit.country,
-                    "city": visit.city,
-                    "device_type": visit.device_type,
-                    "browser_name": visit.browser_name,
-                    "os_name": visit.os_name,
-                    "created_at": visit.created_at.isoformat(),
-                    "session_quality_score": visit.session_quality_score,
-                    "active_time_seconds": visit.active_time_seconds,
-                    "bounce": visit.bounce,
-                    "device_fingerprint": visit.device_fingerprint
-                })
-            
-            return {
-                "format": "csv",
-                "data": csv_data,
-                "total_records": len(csv_data)
-            }
-        
-        else:  # JSON format
-            json_data = []
-            for visit in visits:
-                json_data.append({
-                    "visit_id": visit.id,
-                    "document_id": visit.document_id,
-                    "visit_type": visit.visit_type,
-                    "visitor_info": {
-                        "country": visit.country,
-                        "city": visit.city,
-                        "device_type": visit.device_type,
-                        "browser": visit.browser_name,
-                        "os": visit.os_name,
-                        "device_fingerprint": visit.device_fingerprint
-                    },
-                    "engagement": {
-                        "session_quality_score": visit.session_quality_score,
-                        "active_time_seconds": visit.active_time_seconds,
-                        "bounce": visit.bounce
-                    },
-                    "created_at": visit.created_at.isoformat(),
-                    "metadata": visit.metadata
-                })
-            
-            return {
+
+        def build_query(db: Session):
+            query = db.query(DocumentVisit).join(Document).filter(
+                Document.user_id == user_id,
+                DocumentVisit.created_at >= start_date
+            )
+            if document_id:
+                query = query.filter(DocumentVisit.document_id == document_id)
+            return query
+
+        return stream_export(
+            build_query,
+            DocumentVisit.id,
+            self._export_csv_row if format == "csv" else self._export_json_row,
+            format,
+            fieldnames=self.EXPORT_CSV_FIELDS,
+            cursor=cursor,
+            session_factory=session_factory,
+            envelope={
                 "format": "json",
                 "export_date": datetime.utcnow().isoformat(),
-                "period_days": days,
-                "total_records": len(json_data),
-                "visits": json_data
-            }
+                "period_days": days
+            },
+            items_key="visits",
+            count_key="total_records"
+        )
+    
+    @staticmethod
+    def _export_csv_row(visit: DocumentVisit) -> Dict[str, Any]:
+        return {
+            "visit_id": visit.id,
+            "document_id": visit.document_id,
+            "visit_type": visit.visit_type,
+            "country": visit.country,
+            "city": visit.city,
+            "device_type": visit.device_type,
+            "browser_name": visit.browser_name,
+            "os_name": visit.os_name,
+            "created_at": visit.created_at.isoformat(),
+            "session_quality_score": visit.session_quality_score,
+            "active_time_seconds": visit.active_time_seconds,
+            "bounce": visit.bounce,
+            "device_fingerprint": visit.device_fingerprint
+        }
+
+    @staticmethod
+    def _export_json_row(visit: DocumentVisit) -> Dict[str, Any]:
+        return {
+            "visit_id": visit.id,
+            "document_id": visit.document_id,
+            "visit_type": visit.visit_type,
+            "visitor_info": {
+                "country": visit.country,
+                "city": visit.city,
+                "device_type": visit.device_type,
+                "browser": visit.browser_name,
+                "os": visit.os_name,
+                "device_fingerprint": visit.device_fingerprint
+            },
+            "engagement": {
+                "session_quality_score": visit.session_quality_score,
+                "active_time_seconds": visit.active_time_seconds,
+                "bounce": visit.bounce
+            },
+            "created_at": visit.created_at.isoformat(),
+            "metadata": visit.visit_metadata
+        }
     
     def anonymize_user_analytics(
         self,
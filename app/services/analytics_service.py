@@ -14,6 +14,7 @@ from app.models.template import Template
 from app.models.user import User
 from app.models.analytics.visit import DocumentVisit, LandingVisit, PageVisit
 from app.services.analytics.visit_tracking import VisitTrackingService
+from app.services.user_agent_service import user_agent_classifier
 
 
 class AnalyticsService:
@@ -380,49 +381,16 @@ class AnalyticsService:
     
     @staticmethod
     def _parse_user_agent(user_agent: Optional[str]) -> Dict[str, str]:
-        """Parse user agent string for device information - simplified without user_agents library"""
+        """Parse user agent string for device information"""
         
         if not user_agent:
             return {"device_type": "unknown", "browser": "unknown", "os": "unknown"}
         
-        # Simplified user agent parsing without external dependency
-        user_agent_lower = user_agent.lower()
-        
-        # Basic browser detection
-        browser = "Unknown"
-        if "chrome" in user_agent_lower:
-            browser = "Chrome"
-        elif "firefox" in user_agent_lower:
-            browser = "Firefox"
-        elif "safari" in user_agent_lower:
-            browser = "Safari"
-        elif "edge" in user_agent_lower:
-            browser = "Edge"
-        
-        # Basic device type detection
-        device_type = "desktop"
-        if any(x in user_agent_lower for x in ["mobile", "android", "iphone"]):
-            device_type = "mobile"
-        elif "tablet" in user_agent_lower or "ipad" in user_agent_lower:
-            device_type = "tablet"
-        
-        # Basic OS detection
-        os = "Unknown"
-        if "windows" in user_agent_lower:
-            os = "Windows"
-        elif "mac os" in user_agent_lower:
-            os = "macOS"
-        elif "linux" in user_agent_lower:
-            os = "Linux"
-        elif "android" in user_agent_lower:
-            os = "Android"
-        elif "ios" in user_agent_lower:
-            os = "iOS"
-        
+        info = user_agent_classifier.classify(user_agent)
         return {
-            "device_type": device_type,
-            "browser": browser,
-            "os": os
+            "device_type": info.device_type,
+            "browser": info.browser_name,
+            "os": info.os_name
         }
     
     @staticmethod
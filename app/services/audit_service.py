@@ -5,19 +5,14 @@ Audit logging and compliance service
 import json
 import uuid
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Iterator, Optional, List
 from fastapi import Request
 from sqlalchemy.orm import Session
-try:
-    from geoip2 import database as geoip_db
-    GEOIP_AVAILABLE = True
-except ImportError:
-    geoip_db = None
-    GEOIP_AVAILABLE = False
-
 from config import settings
 from app.models.audit import AuditLog, AuditEventType, AuditLevel
-from database import get_db
+from app.services.audit_writer import audit_writer
+from app.services.geoip_service import geoip_resolver
+from database import SessionLocal, get_db
 
 
 class AuditService:
@@ -33,92 +28,80 @@ class AuditService:
         event_details: Optional[Dict[str, Any]] = None,
         resource_type: Optional[str] = None,
         resource_id: Optional[str] = None,
-        resource_name: Optional[str] = None
+        resource_name: Optional[str] = None,
+        processing_time: Optional[float] = None
     ) -> AuditLog:
-        """Log audit event"""
+        """Log audit event
+
+        The row is built here, on the caller's thread, and handed to the
+        batched audit writer. The returned AuditLog is not attached to a
+        session and has no id yet.
+        """
+        
+        # Generate request ID if not present
+        request_id = str(uuid.uuid4())
+        if request and hasattr(request.state, 'request_id'):
+            request_id = request.state.request_id
+        
+        # Extract request information
+        ip_address = None
+        user_agent = None
+        request_method = None
+        request_path = None
+        request_params = None
+        country = None
+        city = None
+        
+        if request:
+            ip_address = AuditService._get_client_ip(request)
+            user_agent = request.headers.get("user-agent")
+            request_method = request.method
+            request_path = str(request.url.path)
+            request_params = dict(request.query_params) if request.query_params else None
+            
+            # Get geographic information
+            country, city = AuditService._get_location_from_ip(ip_address)
         
-        db = next(get_db())
+        # Risk score without the DB-backed checks; the writer adds those per batch
+        risk_score = AuditService._base_risk_score(event_type, event_level, event_details)
         
-        try:
-            # Generate request ID if not present
-            request_id = str(uuid.uuid4())
-            if request and hasattr(request.state, 'request_id'):
-                request_id = request.state.request_id
-            
-            # Extract request information
-            ip_address = None
-            user_agent = None
-            request_method = None
-            request_path = None
-            request_params = None
-            country = None
-            city = None
-            
-            if request:
-                ip_address = AuditService._get_client_ip(request)
-                user_agent = request.headers.get("user-agent")
-                request_method = request.method
-                request_path = str(request.url.path)
-                request_params = dict(request.query_params) if request.query_params else None
-                
-                # Get geographic information
-                country, city = AuditService._get_location_from_ip(ip_address)
-            
-            # Determine if event is GDPR relevant
-            gdpr_relevant = AuditService._is_gdpr_relevant(event_type, event_details)
-            pii_accessed = AuditService._contains_pii(event_details)
-            sensitive_operation = AuditService._is_sensitive_operation(event_type)
-            
-            # Calculate risk score
-            risk_score = AuditService._calculate_risk_score(
-                event_type, event_level, event_details, user_id, ip_address
-            )
-            
-            # Detect anomalies
-            anomaly_detected = AuditService._detect_anomaly(
-                event_type, user_id, ip_address
-            )
-            
-            # Create audit log entry
-            audit_log = AuditLog(
-                event_type=event_type,
-                event_level=event_level,
-                event_message=event_message,
-                event_details=event_details,
-                user_id=user_id,
-                request_id=request_id,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                request_method=request_method,
-                request_path=request_path,
-                request_params=request_params,
-                resource_type=resource_type,
-                resource_id=resource_id,
-                resource_name=resource_name,
-                country=country,
-                city=city,
-                gdpr_relevant=gdpr_relevant,
-                pii_accessed=pii_accessed,
-                sensitive_operation=sensitive_operation,
-                risk_score=risk_score,
-                anomaly_detected=anomaly_detected,
-                environment="production" if not settings.DEBUG else "development",
-                service_version=settings.APP_VERSION,
-                correlation_id=str(uuid.uuid4())
-            )
-            
-            db.add(audit_log)
-            db.commit()
-            db.refresh(audit_log)
-            
-            # Trigger alerts for high-risk events
-            if audit_log.requires_alert:
-                AuditService._send_security_alert(audit_log)
-            
-            return audit_log
-            
-        finally:
-            db.close()
+        row = {
+            "event_type": event_type,
+            "event_level": event_level,
+            "event_message": event_message,
+            "event_details": event_details,
+            "user_id": user_id,
+            "request_id": request_id,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "request_method": request_method,
+            "request_path": request_path,
+            "request_params": request_params,
+            "resource_type": resource_type,
+            "resource_id": resource_id,
+            "resource_name": resource_name,
+            "processing_time": processing_time,
+            "country": country,
+            "city": city,
+            "gdpr_relevant": AuditService._is_gdpr_relevant(event_type, event_details),
+            "pii_accessed": AuditService._contains_pii(event_details),
+            "sensitive_operation": AuditService._is_sensitive_operation(event_type),
+            "risk_score": risk_score,
+            "anomaly_detected": False,
+            "environment": "production" if not settings.DEBUG else "development",
+            "service_version": settings.APP_VERSION,
+            "correlation_id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow(),
+        }
+        audit_log = AuditLog(**row)
+        
+        # Alert on high-risk events right away and flush them without waiting for a batch
+        if audit_log.requires_alert:
+            AuditService._send_security_alert(audit_log)
+            row["_alerted"] = row["_urgent"] = True
+        
+        audit_writer.submit(row)
+        return audit_log
     
     @staticmethod
     def log_auth_event(
@@ -385,24 +368,11 @@ class AuditService:
         if not ip_address or ip_address in ["127.0.0.1", "localhost", "::1"]:
             return None, None
         
-        try:
-            if GEOIP_AVAILABLE and hasattr(settings, 'GEOIP_DATABASE_PATH'):
-                # Use MaxMind GeoIP2 database for accurate location data
-                with geoip_db.Reader(settings.GEOIP_DATABASE_PATH) as reader:
-                    response = reader.city(ip_address)
-                    country = response.country.name
-                    city = response.city.name
-                    return country, city
-            else:
-                # Fallback for Nigerian businesses when GeoIP is not available
-                return "Nigeria", "Lagos"
-                
-        except Exception as e:
-            # Log error and return fallback
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"GeoIP lookup failed for {ip_address}: {e}")
+        location = geoip_resolver.lookup(ip_address)
+        if location is None:
+            # Fallback for Nigerian businesses when GeoIP has no answer
             return "Nigeria", "Lagos"
+        return location.country, location.city
     
     @staticmethod
     def _is_gdpr_relevant(event_type: AuditEventType, event_details: Optional[Dict[str, Any]]) -> bool:
@@ -452,14 +422,16 @@ class AuditService:
         return event_type in sensitive_events
     
     @staticmethod
-    def _calculate_risk_score(
+    def _base_risk_score(
         event_type: AuditEventType,
         event_level: AuditLevel,
-        event_details: Optional[Dict[str, Any]],
-        user_id: Optional[int],
-        ip_address: Optional[str]
+        event_details: Optional[Dict[str, Any]]
     ) -> int:
-        """Calculate risk score for event (0-100)"""
+        """Risk score (0-100) from the event alone
+
+        The unusual-IP adjustment and failed-login anomaly check need the
+        audit history and are applied per batch by the audit writer.
+        """
         
         base_score = 0
         
@@ -487,59 +459,8 @@ class AuditService:
         if event_details and "failed" in str(event_details).lower():
             base_score += 15
         
-        # Adjust for unusual IP
-        if ip_address and AuditService._is_unusual_ip(user_id, ip_address):
-            base_score += 25
-        
         return min(base_score, 100)
     
-    @staticmethod
-    def _detect_anomaly(
-        event_type: AuditEventType,
-        user_id: Optional[int],
-        ip_address: Optional[str]
-    ) -> bool:
-        """Detect anomalous behavior"""
-        
-        if not user_id:
-            return False
-        
-        # Simple anomaly detection - multiple failed logins
-        if event_type == AuditEventType.LOGIN_FAILED:
-            db = next(get_db())
-            try:
-                recent_failures = db.query(AuditLog).filter(
-                    AuditLog.user_id == user_id,
-                    AuditLog.event_type == AuditEventType.LOGIN_FAILED,
-                    AuditLog.timestamp > datetime.utcnow() - timedelta(minutes=15)
-                ).count()
-                
-                return recent_failures >= 3
-            finally:
-                db.close()
-        
-        return False
-    
-    @staticmethod
-    def _is_unusual_ip(user_id: Optional[int], ip_address: str) -> bool:
-        """Check if IP is unusual for user"""
-        
-        if not user_id:
-            return False
-        
-        # Check if IP has been seen before for this user
-        db = next(get_db())
-        try:
-            previous_logins = db.query(AuditLog).filter(
-                AuditLog.user_id == user_id,
-                AuditLog.ip_address == ip_address,
-                AuditLog.event_type == AuditEventType.LOGIN
-            ).count()
-            
-            return previous_logins == 0
-        finally:
-            db.close()
-    
     @staticmethod
     def _send_security_alert(audit_log: AuditLog) -> None:
         """Send security alert for high-risk events"""
@@ -578,24 +499,26 @@ class AuditService:
         finally:
             db.close()
     
+    # Columns of a CSV audit export, in order
+    EXPORT_CSV_FIELDS = [
+        "id", "timestamp", "event_type", "event_level", "event_message",
+        "ip_address", "user_agent", "country", "city"
+    ]
+
     @staticmethod
     def export_audit_data(
         user_id: int,
-        format: str = "json"
-    ) -> Dict[str, Any]:
-        """Export audit data for GDPR compliance"""
-        
-        audit_logs = AuditService.get_audit_trail(user_id)
-        
-        exported_data = {
-            "user_id": user_id,
-            "export_date": datetime.utcnow().isoformat(),
-            "total_events": len(audit_logs),
-            "events": []
-        }
-        
-        for log in audit_logs:
-            event_data = {
+        format: str = "json",
+        cursor: Optional[int] = None,
+        session_factory: Callable[[], Session] = SessionLocal
+    ) -> Iterator[bytes]:
+        """Stream audit data for GDPR compliance, resuming after audit log id cursor"""
+        # Imported here: app.utils pulls in security -> auth_service -> this module
+        from app.utils.streaming_export import stream_export
+
+        def serialize(log: AuditLog) -> Dict[str, Any]:
+            return {
+                "id": log.id,
                 "timestamp": log.timestamp.isoformat(),
                 "event_type": log.event_type.value,
                 "event_level": log.event_level.value,
@@ -605,9 +528,19 @@ class AuditService:
                 "country": log.country,
                 "city": log.city
             }
-            exported_data["events"].append(event_data)
-        
-        return exported_data
+
+        return stream_export(
+            lambda db: db.query(AuditLog).filter(AuditLog.user_id == user_id),
+            AuditLog.id,
+            serialize,
+            format,
+            fieldnames=AuditService.EXPORT_CSV_FIELDS,
+            cursor=cursor,
+            session_factory=session_factory,
+            envelope={"user_id": user_id, "export_date": datetime.utcnow().isoformat()},
+            items_key="events",
+            count_key="total_events"
+        )
     
     @staticmethod
     def anonymize_user_audit_data(user_id: int) -> int:
@@ -0,0 +1,415 @@
+"""
+Batched background writer for audit log rows
+
+AuditService.log_event used to open a session and commit one AuditLog per
+event on the caller's thread. Events now go into a bounded in-process queue
+and a daemon thread bulk-inserts them in batches of AUDIT_BATCH_SIZE rows or
+every AUDIT_FLUSH_INTERVAL seconds, whichever comes first. The writer also
+computes, per batch, the DB-backed parts of the risk score (unusual IP,
+repeated failed logins) with two grouped queries instead of two per event.
+
+Durability: when the queue is full (backpressure policy "spill") or a bulk
+insert fails, rows are appended to the audit:spool Redis stream, or to a
+local JSONL spool file when Redis is unreachable. The flusher replays both
+into the database once inserts succeed again, and the queue is drained on
+interpreter exit. High-risk events alert on the caller's thread before they
+are queued and force an immediate flush.
+
+A spool file is renamed to <spool>.<pid>.replay while it is replayed. If the
+replaying process dies part way, the next replay in any worker on the host
+(the first one runs as soon as a flusher thread starts) takes over the
+claimed file of the dead pid.
+
+Loss window: rows still in the in-memory queue are not durable. If the
+process is killed (SIGKILL, OOM, a crash) rather than shut down, everything
+queued since the last flush is lost. That is at most one
+AUDIT_FLUSH_INTERVAL of events, or one batch when the queue fills faster.
+Deployments that cannot accept this window should set AUDIT_ASYNC_WRITES=false,
+which writes each event on the caller's thread and spools it on failure.
+"""
+
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis
+from sqlalchemy import func, insert, select
+
+from config import settings
+from database import SessionLocal
+from app.models.audit import AuditLog, AuditEventType, AuditLevel
+from app.services.batch_writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+SPOOL_STREAM = "audit:spool"
+SPOOL_GROUP = "audit-writers"
+SPOOL_STREAM_MAXLEN = 1_000_000
+SPOOL_CLAIM_IDLE_MS = 60_000
+REPLAY_INTERVAL = 30.0
+
+# Keys carried on queued rows that are not AuditLog columns
+_URGENT = "_urgent"
+_ALERTED = "_alerted"
+
+
+@dataclass
+class AuditWriterConfig:
+    """Queue, batching and backpressure settings"""
+    async_writes: bool = settings.AUDIT_ASYNC_WRITES
+    queue_size: int = settings.AUDIT_QUEUE_SIZE
+    batch_size: int = settings.AUDIT_BATCH_SIZE
+    flush_interval: float = settings.AUDIT_FLUSH_INTERVAL
+    backpressure: str = settings.AUDIT_BACKPRESSURE  # spill, block, drop
+    block_timeout: float = 0.05
+    spool_path: str = settings.AUDIT_SPOOL_PATH
+
+
+@dataclass
+class AuditWriterStats:
+    """Counters for monitoring the writer"""
+    enqueued: int = 0
+    written: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    spilled: int = 0
+    replayed: int = 0
+    dropped: int = 0
+    last_flush: Optional[float] = None
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditWriter(BatchWriter):
+    """Bounded queue plus background bulk-insert thread"""
+
+    thread_name = "audit-writer"
+
+    def __init__(self, config: Optional[AuditWriterConfig] = None, redis_client: Optional[redis.Redis] = None):
+        super().__init__(config or AuditWriterConfig())
+        self.stats = AuditWriterStats()
+        self.consumer_name = f"writer-{uuid.uuid4().hex[:8]}"
+        self._redis = redis_client
+        self._spool_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._next_replay = 0.0
+
+    # Producer side
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        """Queue one AuditLog row (a dict of column values)"""
+        if not self.config.async_writes:
+            self.write_now([row])
+            return
+
+        self.stats.enqueued += 1
+        if self._enqueue(row):
+            return
+
+        policy = self.config.backpressure
+        if policy == "block":
+            try:
+                self._queue.put(row, timeout=self.config.block_timeout)
+                return
+            except queue.Full:
+                pass
+        elif policy == "drop" and row.get("event_level") == AuditLevel.INFO and not row.get(_URGENT):
+            self.stats.dropped += 1
+            return
+
+        # Never lose warnings, errors or urgent events to backpressure
+        self.spill([row])
+
+    def write_now(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert rows synchronously on the calling thread (spooled on failure)"""
+        return self._flush(rows)
+
+    # Consumer side
+
+    def _ends_batch(self, row: Dict[str, Any]) -> bool:
+        return bool(row.get(_URGENT))
+
+    def _idle(self) -> None:
+        if time.time() >= self._next_replay:
+            self._next_replay = time.time() + REPLAY_INTERVAL
+            self.replay_spool()
+
+    def _flush(self, rows: List[Dict[str, Any]]) -> bool:
+        db = SessionLocal()
+        try:
+            self._enrich(db, rows)
+            db.execute(insert(AuditLog), [self._columns(row) for row in rows])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats.failed_flushes += 1
+            self.stats.last_error = str(e)
+            logger.error(f"Audit batch of {len(rows)} rows failed, spooling: {e}")
+            self.spill(rows)
+            return False
+        finally:
+            db.close()
+
+        self.stats.flushes += 1
+        self.stats.written += len(rows)
+        self.stats.last_flush = time.time()
+        self._alert(rows)
+        return True
+
+    @staticmethod
+    def _columns(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in row.items() if not key.startswith("_")}
+
+    @staticmethod
+    def _enrich(db, rows: List[Dict[str, Any]]) -> None:
+        """Finish the DB-backed risk checks for a whole batch at once
+
+        Rows are scored in queue order, each one also counting the rows
+        before it in the same batch, as if they had been written one by one.
+        """
+        ip_rows = [row for row in rows if row["user_id"] and row["ip_address"]]
+        if ip_rows:
+            seen = set(db.execute(
+                select(AuditLog.user_id, AuditLog.ip_address).distinct().where(
+                    AuditLog.event_type == AuditEventType.LOGIN,
+                    AuditLog.user_id.in_({row["user_id"] for row in ip_rows}),
+                    AuditLog.ip_address.in_({row["ip_address"] for row in ip_rows})
+                )
+            ).all())
+            for row in ip_rows:
+                login = (row["user_id"], row["ip_address"])
+                if login not in seen:
+                    row["risk_score"] = min(row["risk_score"] + 25, 100)
+                if row["event_type"] == AuditEventType.LOGIN:
+                    seen.add(login)
+
+        failed_users = {row["user_id"] for row in rows
+                        if row["user_id"] and row["event_type"] == AuditEventType.LOGIN_FAILED}
+        if failed_users:
+            since = datetime.utcnow() - timedelta(minutes=15)
+            recent = dict(db.execute(
+                select(AuditLog.user_id, func.count()).where(
+                    AuditLog.user_id.in_(failed_users),
+                    AuditLog.event_type == AuditEventType.LOGIN_FAILED,
+                    AuditLog.timestamp > since
+                ).group_by(AuditLog.user_id)
+            ).all())
+            for row in rows:
+                if row["event_type"] != AuditEventType.LOGIN_FAILED or not row["user_id"]:
+                    continue
+                if recent.get(row["user_id"], 0) >= 3:
+                    row["anomaly_detected"] = True
+                # Replayed rows can be older than the window
+                if (row.get("timestamp") or since) > since:
+                    recent[row["user_id"]] = recent.get(row["user_id"], 0) + 1
+
+    @staticmethod
+    def _alert(rows: List[Dict[str, Any]]) -> None:
+        """Alert on rows that only became high-risk after enrichment"""
+        from app.services.audit_service import AuditService
+
+        for row in rows:
+            if row.get(_ALERTED):
+                continue
+            audit_log = AuditLog(**AuditWriter._columns(row))
+            if audit_log.requires_alert:
+                AuditService._send_security_alert(audit_log)
+
+    # Durable spool
+
+    def _redis_client(self) -> Optional[redis.Redis]:
+        if self._redis is None and settings.REDIS_ENABLED:
+            try:
+                self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+            except Exception:
+                return None
+        return self._redis
+
+    def spill(self, rows: List[Dict[str, Any]]) -> None:
+        """Persist rows outside the database until they can be replayed"""
+        if not rows:
+            return
+        payloads = [json.dumps(self._columns(row), default=str) for row in rows]
+        self.stats.spilled += len(rows)
+
+        client = self._redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for payload in payloads:
+                    pipe.xadd(SPOOL_STREAM, {"row": payload}, maxlen=SPOOL_STREAM_MAXLEN, approximate=True)
+                pipe.execute()
+                return
+            except redis.RedisError as e:
+                logger.warning(f"Audit spool stream unavailable, using {self.config.spool_path}: {e}")
+
+        try:
+            with self._spool_lock:
+                os.makedirs(os.path.dirname(self.config.spool_path) or ".", exist_ok=True)
+                with open(self.config.spool_path, "a", encoding="utf-8") as spool:
+                    spool.write("\n".join(payloads) + "\n")
+                    spool.flush()
+                    os.fsync(spool.fileno())
+        except OSError as e:
+            logger.critical(f"Audit events lost, spool file not writable: {e}")
+
+    @staticmethod
+    def _decode(payload: str) -> Dict[str, Any]:
+        row = json.loads(payload)
+        row["event_type"] = AuditEventType(row["event_type"])
+        row["event_level"] = AuditLevel(row["event_level"])
+        if row.get("timestamp"):
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        row[_ALERTED] = True
+        return row
+
+    def replay_spool(self) -> int:
+        """Move spooled rows into the database; returns how many were written"""
+        return self._replay_stream() + self._replay_file()
+
+    def _replay_stream(self) -> int:
+        client = self._redis_client()
+        if client is None:
+            return 0
+        replayed = 0
+        try:
+            try:
+                client.xgroup_create(SPOOL_STREAM, SPOOL_GROUP, id="0", mkstream=True)
+            except redis.ResponseError:
+                pass  # group already exists
+
+            # Rows claimed by a writer that died mid-replay come back after a minute
+            _, claimed, *_ = client.xautoclaim(
+                SPOOL_STREAM, SPOOL_GROUP, self.consumer_name, SPOOL_CLAIM_IDLE_MS,
+                count=self.config.batch_size
+            )
+            entries = list(claimed)
+            while True:
+                if not entries:
+                    response = client.xreadgroup(
+                        SPOOL_GROUP, self.consumer_name, {SPOOL_STREAM: ">"}, count=self.config.batch_size
+                    )
+                    entries = response[0][1] if response else []
+                if not entries:
+                    break
+                ids = [entry_id for entry_id, _ in entries]
+                rows = [self._decode(fields[b"row"].decode()) for _, fields in entries if fields]
+                if rows and not self._flush_replayed(rows):
+                    break
+                client.xack(SPOOL_STREAM, SPOOL_GROUP, *ids)
+                client.xdel(SPOOL_STREAM, *ids)
+                replayed += len(rows)
+                entries = []
+        except redis.RedisError as e:
+            logger.warning(f"Audit spool stream replay failed: {e}")
+        return replayed
+
+    def _replay_file(self) -> int:
+        path = self.config.spool_path
+        with self._replay_lock:
+            replayed = sum(self._replay_claimed(claimed) for claimed in self._orphaned_claims())
+            if not os.path.exists(path):
+                return replayed
+
+            # Rename first so new spills go to a fresh file while we replay
+            claimed = self._claim_name(os.getpid())
+            with self._spool_lock:
+                try:
+                    os.replace(path, claimed)
+                except OSError:
+                    return replayed
+            return replayed + self._replay_claimed(claimed)
+
+    def _claim_name(self, owner) -> str:
+        return f"{self.config.spool_path}.{owner}.replay"
+
+    def _orphaned_claims(self) -> List[str]:
+        """Claimed spool files left by a process that died mid-replay, taken over by this one"""
+        orphans = []
+        prefix = f"{self.config.spool_path}."
+        for claimed in glob.glob(f"{glob.escape(prefix)}*.replay"):
+            owner = claimed[len(prefix):-len(".replay")].split("-")[0]
+            if not owner.isdigit():
+                continue
+            if int(owner) != os.getpid():
+                if _process_alive(int(owner)):
+                    continue
+                # Renaming is atomic, so only one surviving process takes it over
+                own = self._claim_name(f"{os.getpid()}-{claimed[len(prefix):-len('.replay')]}")
+                try:
+                    os.replace(claimed, own)
+                except OSError:
+                    continue
+                claimed = own
+            # A file under our own pid is from an earlier process that had it;
+            # replays in this process hold _replay_lock and remove theirs
+            orphans.append(claimed)
+        return orphans
+
+    def _replay_claimed(self, claimed: str) -> int:
+        with open(claimed, encoding="utf-8") as spool:
+            rows = [self._decode(line) for line in spool if line.strip()]
+
+        replayed = 0
+        for start in range(0, len(rows), self.config.batch_size):
+            batch = rows[start:start + self.config.batch_size]
+            if not self._flush_replayed(batch):
+                # Put back what is left; spill() appends to the live spool file
+                self.spill(rows[start:])
+                break
+            replayed += len(batch)
+        os.remove(claimed)
+        return replayed
+
+    def _flush_replayed(self, rows: List[Dict[str, Any]]) -> bool:
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), [self._columns(row) for row in rows])
+            db.commit()
+            self.stats.replayed += len(rows)
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Audit spool replay deferred: {e}")
+            return False
+        finally:
+            db.close()
+
+    # Lifecycle
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "queue_size": self.config.queue_size,
+            "backpressure": self.config.backpressure,
+            "enqueued": self.stats.enqueued,
+            "written": self.stats.written,
+            "flushes": self.stats.flushes,
+            "failed_flushes": self.stats.failed_flushes,
+            "spilled": self.stats.spilled,
+            "replayed": self.stats.replayed,
+            "dropped": self.stats.dropped,
+            "last_flush": self.stats.last_flush,
+            "last_error": self.stats.last_error,
+        }
+
+
+audit_writer = AuditWriter()
@@ -18,6 +18,7 @@ from config import settings
 from app.models.user import User, UserRole, UserStatus
 from app.schemas.user import UserCreate
 from app.services.audit_service import AuditService
+from app.services.principal_service import role_permissions
 from database import get_db
 
 # Password hashing context
@@ -199,32 +200,8 @@ class AuthService:
     def check_user_permissions(user: User, resource: str, action: str) -> bool:
         """Check if user has permission to perform action on resource"""
         
-        # Admin has all permissions
-        if user.role == UserRole.ADMIN:
-            return True
-        
-        # Define permission matrix
-        permissions = {
-            UserRole.STANDARD: {
-                "documents": ["create", "read", "update", "delete"],
-                "templates": ["read", "use"],
-                "signatures": ["create", "read"],
-                "payments": ["create", "read"],
-                "analytics": ["read"]
-            },
-            UserRole.GUEST: {
-                "documents": ["read"],
-                "templates": ["read"],
-                "signatures": ["read"],
-                "payments": [],
-                "analytics": []
-            }
-        }
-        
-        user_permissions = permissions.get(user.role, {})
-        resource_permissions = user_permissions.get(resource, [])
-        
-        return action in resource_permissions
+        # Works for both User rows and cached Principal snapshots
+        return f"{resource}:{action}" in role_permissions(user.role) or user.role == UserRole.ADMIN
     
     @staticmethod
     async def generate_api_key(db: Session, user_id: int, name: str = None) -> str:
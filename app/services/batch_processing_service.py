@@ -382,11 +382,17 @@ class BatchDocumentGenerator:
     async def generate_batch_with_consolidation(
         db: Session,
         batch_id: str,
-        document_ids: List[int],
+        document_ids: Optional[List[int]],
         consolidated_inputs: Dict[str, Any],
-        user_input_data: Dict[str, Any]
+        user_input_data: Dict[str, Any],
+        user_id: Optional[int] = None,
+        batch_documents: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
-        """Generate batch documents using consolidated inputs"""
+        """Generate batch documents using consolidated inputs
+
+        When document_ids is None the batch rows are created here in bulk from
+        batch_documents (one INSERT for the whole batch) for user_id.
+        """
 
         try:
             # Apply consolidated inputs to individual documents
@@ -399,20 +405,29 @@ class BatchDocumentGenerator:
             if not application_result["success"]:
                 return application_result
 
+            if document_ids is None:
+                documents = BatchDocumentGenerator.create_batch_documents(
+                    db, batch_id, user_id, batch_documents or [], application_result["document_data"]
+                )
+                document_ids = [document.id for document in documents]
+            else:
+                documents = db.query(Document).filter(Document.id.in_(document_ids)).all()
+
+            documents_by_id = {document.id: document for document in documents}
+
             # Generate documents with applied data
             generation_results = []
 
-            for doc_id in document_ids:
-                document = db.query(Document).filter(Document.id == doc_id).first()
+            for doc_idx, doc_id in enumerate(document_ids):
+                document = documents_by_id.get(doc_id)
                 if not document:
                     continue
 
-                doc_key = f"document_{document_ids.index(doc_id)}"
-                doc_data = application_result["document_data"].get(doc_key, {})
+                doc_data = application_result["document_data"].get(f"document_{doc_idx}", {})
 
                 # Generate individual document
                 result = await BatchDocumentGenerator._generate_single_document(
-                    db, document, doc_data["placeholder_data"]
+                    db, document, doc_data.get("placeholder_data", {})
                 )
 
                 generation_results.append({
@@ -438,6 +453,30 @@ class BatchDocumentGenerator:
                 "results": []
             }
 
+    @staticmethod
+    def create_batch_documents(
+        db: Session,
+        batch_id: str,
+        user_id: int,
+        batch_documents: List[Dict[str, Any]],
+        document_data: Dict[str, Any]
+    ) -> List[Document]:
+        """Create the batch's document rows in one statement, in batch order"""
+
+        from app.services.document_service import DocumentService
+
+        rows = []
+        for doc_idx, doc in enumerate(batch_documents):
+            applied = document_data.get(f"document_{doc_idx}", {})
+            rows.append({
+                "title": doc["title"],
+                "description": doc.get("description"),
+                "template_id": applied.get("template_id", doc.get("template_id")),
+                "placeholder_data": applied.get("placeholder_data", doc.get("placeholder_data", {}))
+            })
+
+        return DocumentService.create_documents_for_batch(db, rows, user_id, batch_id)
+
     @staticmethod
     async def _generate_single_document(
         db: Session,
@@ -450,11 +489,15 @@ class BatchDocumentGenerator:
             # This would integrate with your document generation service
             from app.services.document_service import DocumentService
 
-            result = await DocumentService.generate_document_with_placeholders(
-                db, document.id, placeholder_data
+            success = await DocumentService.generate_document_from_template(
+                document.id, placeholder_data
             )
 
-            return result
+            return {
+                "success": success,
+                "file_path": document.file_path if success else None,
+                "error": None if success else "Document generation failed"
+            }
 
         except Exception as e:
             logger.error(f"Single document generation failed: {e}")
@@ -0,0 +1,143 @@
+"""
+Bounded queue plus background flusher thread shared by the batched writers
+
+Rows go into an in-process queue and a daemon thread hands them to _flush()
+in batches of config.batch_size rows or every config.flush_interval
+seconds, whichever comes first. Subclasses only supply _flush() and, where
+they need them, the _ends_batch() and _idle() hooks; starting the thread in
+forked workers, waiting for the queue to drain and the final flush at
+interpreter exit live here once.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """Queue rows and flush them in batches from a daemon thread
+
+    config must provide queue_size, batch_size and flush_interval.
+    """
+
+    thread_name = "batch-writer"
+
+    def __init__(self, config):
+        self.config = config
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=self.config.queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    # Hooks
+
+    def _flush(self, rows: List[Dict[str, Any]]) -> bool:
+        """Write one batch; returns False when it could not be written"""
+        raise NotImplementedError
+
+    def _ends_batch(self, row: Dict[str, Any]) -> bool:
+        """Whether a row should be flushed without waiting for more"""
+        return False
+
+    def _idle(self) -> None:
+        """Called when a flush interval passes without any rows"""
+
+    # Producer side
+
+    def _enqueue(self, row: Dict[str, Any]) -> bool:
+        """Queue a row without blocking; False when the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+
+    def _ensure_started(self) -> None:
+        # Forked workers (gunicorn, Celery prefork) inherit a dead thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.config.queue_size)
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    # Consumer side
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._flush(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            else:
+                self._idle()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """Collect up to batch_size rows or whatever arrived within flush_interval"""
+        try:
+            first = self._queue.get(timeout=self.config.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.config.flush_interval
+        while len(batch) < self.config.batch_size and not self._ends_batch(first):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(row)
+            if self._ends_batch(row):
+                break
+
+        # Take whatever else is already queued without waiting
+        while len(batch) < self.config.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    # Lifecycle
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until everything queued so far has been handed to _flush()"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the flusher and flush whatever is still queued"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.flush(timeout)
+        self._stopping.set()
+        self._thread.join(timeout=self.config.flush_interval + timeout)
+        self._thread = None
+
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover and not self._flush(leftover):
+            logger.warning(f"{self.thread_name}: {len(leftover)} queued rows not written at shutdown")
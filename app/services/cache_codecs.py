@@ -0,0 +1,198 @@
+"""
+Pluggable serialization codecs for cached values
+
+Every payload written by CacheService starts with one header byte:
+
+    bits 7-6  envelope version (always 0b10, so the byte is 0x80-0xBF and can
+              never be confused with legacy JSON text or a gzip stream)
+    bits 5-3  serializer id (json, orjson, msgpack)
+    bits 2-0  compressor id (none, zlib, lz4, zstd)
+
+Readers dispatch on the header, so entries written with any codec stay
+readable after the configured codec changes. orjson, msgpack, lz4 and
+zstandard are optional; missing ones fall back to stdlib json and zlib.
+"""
+
+import gzip
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import lz4.frame as lz4_frame
+    LZ4_AVAILABLE = True
+except ImportError:
+    lz4_frame = None
+    LZ4_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+ENVELOPE_VERSION = 0b10
+
+SERIALIZER_JSON = 0
+SERIALIZER_ORJSON = 1
+SERIALIZER_MSGPACK = 2
+
+COMPRESSOR_NONE = 0
+COMPRESSOR_ZLIB = 1
+COMPRESSOR_LZ4 = 2
+COMPRESSOR_ZSTD = 3
+
+SERIALIZER_NAMES = {"json": SERIALIZER_JSON, "orjson": SERIALIZER_ORJSON, "msgpack": SERIALIZER_MSGPACK}
+
+# Legacy prefixes written by earlier CacheService versions
+_LEGACY_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _json_dumps(data: Any) -> bytes:
+    return json.dumps(data, default=str).encode("utf-8")
+
+
+def _json_loads(payload: bytes) -> Any:
+    return json.loads(payload)
+
+
+def _orjson_dumps(data: Any) -> bytes:
+    try:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # orjson rejects e.g. integers wider than 64 bits; json handles them
+        return _json_dumps(data)
+
+
+def _msgpack_dumps(data: Any) -> bytes:
+    return msgpack.packb(data, default=str, use_bin_type=True)
+
+
+def _msgpack_loads(payload: bytes) -> Any:
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+_SERIALIZERS: Dict[int, Tuple[Optional[Callable[[Any], bytes]], Optional[Callable[[bytes], Any]]]] = {
+    SERIALIZER_JSON: (_json_dumps, _json_loads),
+    SERIALIZER_ORJSON: (_orjson_dumps, orjson.loads) if ORJSON_AVAILABLE else (None, None),
+    SERIALIZER_MSGPACK: (_msgpack_dumps, _msgpack_loads) if MSGPACK_AVAILABLE else (None, None),
+}
+
+
+def _zstd_compress(payload: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(payload)
+
+
+def _zstd_decompress(payload: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(payload)
+
+
+_COMPRESSORS: Dict[int, Tuple[Optional[Callable[[bytes], bytes]], Optional[Callable[[bytes], bytes]]]] = {
+    COMPRESSOR_NONE: (lambda payload: payload, lambda payload: payload),
+    COMPRESSOR_ZLIB: (lambda payload: zlib.compress(payload, 1), zlib.decompress),
+    COMPRESSOR_LZ4: (lz4_frame.compress, lz4_frame.decompress) if LZ4_AVAILABLE else (None, None),
+    COMPRESSOR_ZSTD: (_zstd_compress, _zstd_decompress) if ZSTD_AVAILABLE else (None, None),
+}
+
+
+def default_serializer() -> str:
+    """Fastest serializer installed in this environment"""
+    if ORJSON_AVAILABLE:
+        return "orjson"
+    if MSGPACK_AVAILABLE:
+        return "msgpack"
+    return "json"
+
+
+class CodecError(ValueError):
+    """Raised when a payload cannot be encoded or decoded"""
+
+
+@dataclass
+class CacheCodec:
+    """
+    Encodes cache values as header byte + serialized (optionally compressed) body.
+
+    Payloads under compression_threshold are stored as-is. Larger ones use
+    lz4 for speed, and payloads over large_payload_threshold use zstd for
+    ratio; whichever of the two is missing is substituted by the other, and
+    zlib at level 1 is the last resort.
+    """
+    serializer: str = "auto"
+    compression_threshold: int = 1024
+    large_payload_threshold: int = 64 * 1024
+
+    def __post_init__(self):
+        name = default_serializer() if self.serializer == "auto" else self.serializer
+        if name not in SERIALIZER_NAMES:
+            raise CodecError(f"Unknown cache serializer: {name}")
+        if _SERIALIZERS[SERIALIZER_NAMES[name]][0] is None:
+            logger.warning(f"Cache serializer {name} is not installed, using json")
+            name = "json"
+        self.serializer = name
+        self._serializer_id = SERIALIZER_NAMES[name]
+
+    def encode(self, data: Any) -> bytes:
+        dumps = _SERIALIZERS[self._serializer_id][0]
+        body = dumps(data)
+        compressor_id = self._choose_compressor(len(body))
+        body = _COMPRESSORS[compressor_id][0](body)
+        header = (ENVELOPE_VERSION << 6) | (self._serializer_id << 3) | compressor_id
+        return bytes((header,)) + body
+
+    def decode(self, payload: bytes) -> Any:
+        if not payload:
+            raise CodecError("Empty cache payload")
+
+        header = payload[0]
+        if header >> 6 != ENVELOPE_VERSION:
+            return self._decode_legacy(payload)
+
+        serializer_id, compressor_id = (header >> 3) & 0b111, header & 0b111
+        loads = _SERIALIZERS.get(serializer_id, (None, None))[1]
+        decompress = _COMPRESSORS.get(compressor_id, (None, None))[1]
+        if loads is None or decompress is None:
+            raise CodecError(f"No codec installed for cache header 0x{header:02x}")
+        return loads(decompress(payload[1:]))
+
+    def _choose_compressor(self, size: int) -> int:
+        if size < self.compression_threshold:
+            return COMPRESSOR_NONE
+        if size >= self.large_payload_threshold:
+            preference = (COMPRESSOR_ZSTD, COMPRESSOR_LZ4)
+        else:
+            preference = (COMPRESSOR_LZ4, COMPRESSOR_ZSTD)
+        for compressor_id in preference:
+            if _COMPRESSORS[compressor_id][0] is not None:
+                return compressor_id
+        return COMPRESSOR_ZLIB
+
+    @staticmethod
+    def _decode_legacy(payload: bytes) -> Any:
+        """Read entries written before the versioned envelope existed"""
+        if payload.startswith(_LEGACY_GZIP_MAGIC):
+            return json.loads(gzip.decompress(payload))
+        if payload.startswith(b"GZIP:"):
+            return json.loads(gzip.decompress(payload[5:]))
+        if payload.startswith(b"JSON:"):
+            return json.loads(payload[5:])
+        return json.loads(payload)
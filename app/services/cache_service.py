@@ -3,21 +3,25 @@ Advanced Redis caching service for high-performance document generation
 """
 
 import json
-import gzip
-import base64
 import hashlib
-import pickle
 import time
 import asyncio
 import logging
-import zlib
-from typing import Any, Dict, List, Optional, Union, Callable
+import sys
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Union, Callable
 from functools import wraps
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+import redis
 import redis.asyncio as aioredis
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session
+from starlette.requests import Request
 from config import settings
+from app.services.cache_codecs import CacheCodec
 
 # Configure logging
 cache_logger = logging.getLogger('cache_service')
@@ -32,6 +36,16 @@ class CacheMetrics:
     memory_usage: int = 0
     eviction_count: int = 0
     compression_ratio: float = 0.0
+    l1_entries: int = 0
+    # Per-namespace L1 counters: {namespace: {"hits": n, "misses": n, "evictions": n}}
+    namespaces: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def record_namespace(self, namespace: str, counter: str) -> None:
+        """Increment one per-namespace counter"""
+        stats = self.namespaces.get(namespace)
+        if stats is None:
+            stats = self.namespaces[namespace] = {"hits": 0, "misses": 0, "evictions": 0}
+        stats[counter] += 1
 
 @dataclass
 class CacheConfig:
@@ -41,10 +55,218 @@ class CacheConfig:
     eviction_policy: str = "allkeys-lru"
     compression_enabled: bool = True
     compression_threshold: int = 1024  # 1KB
+    large_payload_threshold: int = 64 * 1024  # zstd above this, lz4 below
+    serializer: str = settings.CACHE_SERIALIZER  # auto, orjson, msgpack, json
     cluster_enabled: bool = False
     replication_enabled: bool = False
     persistence_enabled: bool = True
     key_prefix: str = "mytypist:"
+    l1_max_entries: int = settings.CACHE_L1_MAX_ENTRIES
+    l1_max_bytes: int = settings.CACHE_L1_MAX_BYTES
+    l1_ttl: int = settings.CACHE_L1_TTL
+    l1_sweep_interval: int = settings.CACHE_L1_SWEEP_INTERVAL
+
+
+# Deletes every key in a tag set and the set itself in one atomic step.
+# Keys are unlinked in chunks to stay under Lua's unpack() stack limit.
+# Returns {deleted_count, members} so callers can evict the keys from L1.
+INVALIDATE_TAG_SCRIPT = """
+local members = redis.call('SMEMBERS', KEYS[1])
+local chunk_size = tonumber(ARGV[1])
+local deleted = 0
+for i = 1, #members, chunk_size do
+    local last = math.min(i + chunk_size - 1, #members)
+    deleted = deleted + redis.call('UNLINK', unpack(members, i, last))
+end
+redis.call('UNLINK', KEYS[1])
+return {deleted, members}
+"""
+TAG_INVALIDATION_CHUNK_SIZE = 500
+
+# Compare-and-delete so a slow loader never releases another caller's lock
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+SINGLE_FLIGHT_LOCK_MS = 5000
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+# Sentinel for "not cached", distinct from a cached None
+_MISSING = object()
+
+
+def _approximate_size(value: Any) -> int:
+    """Rough in-memory footprint of a cached value, in bytes"""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 49
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _approximate_size(k) + _approximate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(_approximate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class L1Cache:
+    """
+    In-process LRU tier in front of Redis.
+
+    Entries live in an OrderedDict kept in recency order, so lookups, inserts
+    and evictions are O(1). The tier is bounded by entry count and by the
+    approximate byte size of its values; expired entries are dropped on read
+    and by a sweep that runs at most once per sweep interval.
+
+    Entries can carry tags so a tag invalidation can drop them. The tag index
+    only holds keys that are currently in the tier: a key leaves it whenever
+    its entry is evicted, expires or is replaced.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, default_ttl: int,
+                 sweep_interval: int, metrics: CacheMetrics, key_prefix: str = ""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.metrics = metrics
+        self.key_prefix = key_prefix
+        self.total_bytes = 0
+        # key -> (value, expires_at, size, namespace)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # tag -> keys, and key -> tags for unlinking on removal
+        self._tags: Dict[str, Set[str]] = {}
+        self._key_tags: Dict[str, Set[str]] = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def namespace_of(self, key: str) -> str:
+        """Namespace of a cache key: its first segment after the key prefix"""
+        if self.key_prefix and key.startswith(self.key_prefix):
+            key = key[len(self.key_prefix):]
+        namespace, sep, _ = key.partition(":")
+        return namespace if sep else "default"
+
+    def get(self, key: str) -> Any:
+        """Return a live value (marking it most recently used) or None"""
+        now = time.monotonic()
+        self._maybe_sweep(now)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.metrics.record_namespace(self.namespace_of(key), "misses")
+            return None
+
+        value, expires_at, _, namespace = entry
+        if expires_at <= now:
+            self._remove(key)
+            self.metrics.record_namespace(namespace, "misses")
+            return None
+
+        self._entries.move_to_end(key)
+        self.metrics.record_namespace(namespace, "hits")
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, size: Optional[int] = None) -> None:
+        """Insert or replace a value, evicting least recently used entries to fit
+
+        size may be passed when the caller already knows the value's encoded
+        length (e.g. the Redis payload), avoiding a walk over the value.
+        """
+        now = time.monotonic()
+        self._maybe_sweep(now)
+
+        size = size if size is not None else _approximate_size(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush the whole tier
+            self._remove(key)
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (value, now + (ttl or self.default_ttl), size, self.namespace_of(key))
+        self.total_bytes += size
+
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            evicted_key, (_, _, evicted_size, namespace) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self._untag(evicted_key)
+            self.metrics.eviction_count += 1
+            self.metrics.record_namespace(namespace, "evictions")
+
+        self._sync_metrics()
+
+    def delete(self, key: str) -> bool:
+        """Drop a key; returns True if it was present"""
+        removed = self._remove(key)
+        self._sync_metrics()
+        return removed
+
+    def tag(self, key: str, tags: List[str]) -> None:
+        """Attach tags to a live entry; keys not held in the tier are not indexed"""
+        if key not in self._entries:
+            return
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        self._key_tags.setdefault(key, set()).update(tags)
+
+    def tagged(self, tag: str) -> Set[str]:
+        """Keys currently held under a tag"""
+        return set(self._tags.get(tag, ()))
+
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry carrying a tag; returns how many were removed"""
+        removed = sum(self._remove(key) for key in self._tags.pop(tag, set()))
+        self._sync_metrics()
+        return removed
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+        self.total_bytes = 0
+        self._sync_metrics()
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Remove every expired entry; returns how many were removed"""
+        now = now if now is not None else time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+        for key in expired:
+            self._remove(key)
+        self._next_sweep = now + self.sweep_interval
+        self._sync_metrics()
+        return len(expired)
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.total_bytes -= entry[2]
+        self._untag(key)
+        return True
+
+    def _untag(self, key: str) -> None:
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _sync_metrics(self) -> None:
+        self.metrics.l1_entries = len(self._entries)
+        self.metrics.memory_usage = self.total_bytes
 
 
 class CacheService:
@@ -61,16 +283,40 @@ class CacheService:
     def __init__(self, config: Optional[CacheConfig] = None):
         self.config = config or CacheConfig()
         self.redis: Optional[aioredis.Redis] = None
+        self._sync_redis: Optional[redis.Redis] = None
         self.compression_threshold = self.config.compression_threshold
+        self.codec = CacheCodec(
+            serializer=self.config.serializer,
+            compression_threshold=self.config.compression_threshold,
+            large_payload_threshold=self.config.large_payload_threshold
+        )
         self.metrics = CacheMetrics()
         self.cache_dependencies: Dict[str, List[str]] = {}
-        self.cache_tags: Dict[str, List[str]] = {}
         self.warming_tasks: Dict[str, asyncio.Task] = {}
 
         # L1 Cache (In-memory)
-        self.l1_cache: Dict[str, Dict[str, Any]] = {}
-        self.l1_max_size = 1000
-        self.l1_ttl = 300  # 5 minutes
+        self.l1_cache = L1Cache(
+            max_entries=self.config.l1_max_entries,
+            max_bytes=self.config.l1_max_bytes,
+            default_ttl=self.config.l1_ttl,
+            sweep_interval=self.config.l1_sweep_interval,
+            metrics=self.metrics,
+            key_prefix=self.config.key_prefix
+        )
+
+        # Cross-worker L1 invalidation bus
+        self.instance_id = uuid.uuid4().hex
+        self.invalidation_channel = f"{self.config.key_prefix}l1:invalidate"
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._invalidate_tag_script = None
+
+        # Single-flight state for get_or_compute
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refresh_tasks: set = set()
+        self._release_lock_script = None
+
+        # Tag invalidations handed off from synchronous code inside the loop
+        self._invalidation_tasks: set = set()
 
     async def initialize(self):
         """Initialize Redis connection"""
@@ -90,27 +336,95 @@ class CacheService:
             print(f"Redis initialization failed: {e}")
             return False
 
-    def _serialize_data(self, data: Any) -> bytes:
-        """Serialize and optionally compress data"""
+    async def start_invalidation_listener(self) -> None:
+        """Subscribe this worker to the L1 invalidation channel"""
+        if self.redis and self._invalidation_task is None:
+            self._invalidation_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def stop_invalidation_listener(self) -> None:
+        """Cancel the invalidation subscription on shutdown"""
+        task, self._invalidation_task = self._invalidation_task, None
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _listen_for_invalidations(self) -> None:
+        """Evict L1 entries invalidated by other workers
+
+        Messages published while the subscription is down are lost, so L1 is
+        cleared after every reconnect rather than risking stale entries.
+        """
+        backoff = 1
+        connected_before = False
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.invalidation_channel)
+                if connected_before:
+                    self.l1_cache.clear()
+                connected_before = True
+                backoff = 1
+
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                cache_logger.warning(f"L1 invalidation listener error, reconnecting in {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def _apply_invalidation(self, payload: Union[bytes, str]) -> None:
+        """Evict the keys and tags named in one invalidation message"""
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            cache_logger.warning("Ignoring malformed L1 invalidation message")
+            return
+
+        # The publishing worker already evicted its own entries
+        if message.get("origin") == self.instance_id:
+            return
+
+        for key in message.get("keys", []):
+            self.l1_cache.delete(key)
+        for tag in message.get("tags", []):
+            self.l1_cache.invalidate_tag(tag)
+
+    async def _publish_invalidation(self, keys: List[str] = None, tags: List[str] = None) -> None:
+        """Tell every other worker to drop these keys/tags from their L1"""
+        if not self.redis or not (keys or tags):
+            return
         try:
-            # Serialize to JSON first
-            json_data = json.dumps(data, default=str).encode('utf-8')
+            await self.redis.publish(self.invalidation_channel, json.dumps({
+                "origin": self.instance_id,
+                "keys": keys or [],
+                "tags": tags or []
+            }))
+        except Exception as e:
+            cache_logger.warning(f"Failed to publish L1 invalidation: {e}")
 
-            # Compress if data is large enough
-            if len(json_data) > self.compression_threshold:
-                return gzip.compress(json_data)
-            return json_data
+    def _serialize_data(self, data: Any) -> Optional[bytes]:
+        """Encode a value with the configured cache codec"""
+        try:
+            return self.codec.encode(data)
         except Exception as e:
             cache_logger.error(f"Serialization error: {e}")
             return None
 
     def _deserialize_data(self, data: bytes) -> Any:
-        """Deserialize and decompress data"""
+        """Decode a payload written by any cache codec version"""
         try:
-            # Check if data is compressed
-            if data.startswith(b'\x1f\x8b'):  # gzip magic number
-                data = gzip.decompress(data)
-            return json.loads(data.decode('utf-8'))
+            return self.codec.decode(data)
         except Exception as e:
             cache_logger.error(f"Deserialization error: {e}")
             return None
@@ -239,116 +553,63 @@ class CacheService:
             for key in keys:
                 self.cache_dependencies[key] = tags
                 
-            # Store tag -> key mapping
-            for tag in tags:
-                if tag not in self.cache_tags:
-                    self.cache_tags[tag] = []
-                self.cache_tags[tag].extend(keys)
+            # Store tag -> key mapping for entries held in L1
+            for key in keys:
+                self.l1_cache.tag(key, tags)
                 
             return True
         except Exception as e:
             cache_logger.error(f"Error tracking dependencies: {e}")
             return False
 
-    async def invalidate_by_tag(self, tag: str) -> bool:
-        """Invalidate all cache entries with the given tag"""
-        try:
-            if tag not in self.cache_tags:
-                return True
-                
-            # Get all keys for this tag
-            keys = self.cache_tags[tag]
-            if not keys:
-                return True
-                
-            # Delete all keys
-            await self.redis.delete(*keys)
-            
-            # Clean up tracking
-            del self.cache_tags[tag]
-            for key in keys:
-                if key in self.cache_dependencies:
-                    del self.cache_dependencies[key]
-                    
-            return True
-        except Exception as e:
-            cache_logger.error(f"Error invalidating by tag: {e}")
-            return False
-            
-            # Compress if data is large enough
-            if len(json_data) > self.compression_threshold:
-                compressed = gzip.compress(json_data)
-                # Mark as compressed with prefix
-                return b'GZIP:' + compressed
-            else:
-                return b'JSON:' + json_data
-
-        except Exception:
-            # Fallback to pickle for complex objects
-            pickled = pickle.dumps(data)
-            if len(pickled) > self.compression_threshold:
-                compressed = gzip.compress(pickled)
-                return b'GZIP_PICKLE:' + compressed
-            else:
-                return b'PICKLE:' + pickled
-
-    def _deserialize_data(self, data: bytes) -> Any:
-        """Deserialize and decompress data"""
-        try:
-            if data.startswith(b'GZIP:'):
-                decompressed = gzip.decompress(data[5:])
-                return json.loads(decompressed.decode('utf-8'))
-            elif data.startswith(b'JSON:'):
-                return json.loads(data[5:].decode('utf-8'))
-            elif data.startswith(b'GZIP_PICKLE:'):
-                decompressed = gzip.decompress(data[12:])
-                return pickle.loads(decompressed)
-            elif data.startswith(b'PICKLE:'):
-                return pickle.loads(data[7:])
-            else:
-                # Legacy format
-                return json.loads(data.decode('utf-8'))
-        except Exception:
-            return None
-
     async def set(self,
                   key: str,
                   value: Any,
                   expire: int = 300,
                   namespace: str = "",
                   tags: List[str] = None,
-                  dependencies: Optional[List[str]] = None) -> bool:
+                  dependencies: Optional[List[str]] = None,
+                  l1_ttl: Optional[int] = None) -> bool:
         """
         Set value in multi-layer cache with advanced features
+
+        l1_ttl caps how long the in-process copy lives when it should expire
+        before the Redis copy (e.g. values kept in Redis for stale serving).
         """
         cache_key = self._generate_cache_key(key, namespace) if namespace else key
         ttl = expire or self.config.default_ttl
 
         try:
-            # Store in L1 cache
-            self._set_to_l1(cache_key, value, ttl)
-
             # Store in L2 cache (Redis)
             if self.redis:
                 serialized = self._serialize_data(value)
-                success = await self.redis.setex(cache_key, ttl, serialized)
+
+                # Store in L1 cache, sized by the encoded payload
+                self._set_to_l1(cache_key, value, l1_ttl or ttl, len(serialized) if serialized else None)
+
+                if tags:
+                    # Value and tag memberships go out in one round trip
+                    async with self.redis.pipeline(transaction=True) as pipe:
+                        pipe.setex(cache_key, ttl, serialized)
+                        for tag in tags:
+                            pipe.sadd(f"tag:{tag}", cache_key)
+                            pipe.expire(f"tag:{tag}", ttl + 60)
+                        success = (await pipe.execute())[0]
+                else:
+                    success = await self.redis.setex(cache_key, ttl, serialized)
                 if not success:
                     return False
 
-                # Add tags for grouped invalidation
-                if tags and success:
-                    for tag in tags:
-                        await self.redis.sadd(f"tag:{tag}", cache_key)
-                        await self.redis.expire(f"tag:{tag}", ttl + 60)
-
-                        # Update local tag registry
-                        if tag not in self.cache_tags:
-                            self.cache_tags[tag] = []
-                        self.cache_tags[tag].append(cache_key)
+                # Update local tag registry
+                self.l1_cache.tag(cache_key, tags or [])
 
                 # Handle dependencies for cascade invalidation
                 if dependencies:
                     self._register_dependencies(cache_key, dependencies)
+            else:
+                # Store in L1 cache
+                self._set_to_l1(cache_key, value, l1_ttl or ttl)
+                self.l1_cache.tag(cache_key, tags or [])
 
             return True
 
@@ -365,30 +626,11 @@ class CacheService:
 
     def _get_from_l1(self, key: str) -> Any:
         """Get from L1 (memory) cache"""
-        if key in self.l1_cache:
-            entry = self.l1_cache[key]
-            if entry['expires_at'] > time.time():
-                return entry['value']
-            else:
-                # Expired, remove from L1
-                del self.l1_cache[key]
-        return None
+        return self.l1_cache.get(key)
 
-    def _set_to_l1(self, key: str, value: Any, ttl: int = None):
+    def _set_to_l1(self, key: str, value: Any, ttl: int = None, size: Optional[int] = None):
         """Set to L1 (memory) cache with LRU eviction"""
-        # Implement LRU eviction if cache is full
-        if len(self.l1_cache) >= self.l1_max_size:
-            # Remove oldest entry
-            oldest_key = min(self.l1_cache.keys(),
-                           key=lambda k: self.l1_cache[k]['created_at'])
-            del self.l1_cache[oldest_key]
-
-        ttl = ttl or self.l1_ttl
-        self.l1_cache[key] = {
-            'value': value,
-            'created_at': time.time(),
-            'expires_at': time.time() + ttl
-        }
+        self.l1_cache.set(key, value, ttl, size)
 
     def _update_response_time(self, start_time: float):
         """Update average response time metric"""
@@ -425,7 +667,7 @@ class CacheService:
                     result = self._deserialize_data(data)
                     if result is not None:
                         # Store in L1 for faster future access
-                        self._set_to_l1(cache_key, result)
+                        self._set_to_l1(cache_key, result, size=len(data))
                         self.metrics.hit_count += 1
                         self._update_response_time(start_time)
                         return result
@@ -439,13 +681,165 @@ class CacheService:
             cache_logger.error(f"Cache get failed for key {cache_key}: {e}")
             return default
 
+    async def get_or_compute(self,
+                             key: str,
+                             loader: Callable[[], Any],
+                             ttl: int = 300,
+                             namespace: str = "",
+                             tags: List[str] = None,
+                             stale_ttl: int = 0) -> Any:
+        """
+        Return a cached value, computing it at most once per key on a miss.
+
+        Concurrent misses in this process await the same future, and a short
+        Redis lock keeps other workers from running the loader at the same
+        time; they wait for the lock holder's value instead. With stale_ttl,
+        values stay in Redis that much longer than ttl and an expired value is
+        returned immediately while one caller refreshes it in the background.
+        """
+        cache_key = self._generate_cache_key(key, namespace) if namespace else key
+
+        value, fresh = await self._lookup(cache_key, ttl, stale_ttl)
+        if value is not _MISSING:
+            if not fresh and cache_key not in self._inflight:
+                task = asyncio.create_task(self._single_flight(cache_key, loader, ttl, tags, stale_ttl))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._finish_refresh)
+            return value
+
+        return await self._single_flight(cache_key, loader, ttl, tags, stale_ttl)
+
+    async def _lookup(self, cache_key: str, ttl: int, stale_ttl: int):
+        """Read a key through L1/L2, returning (value or _MISSING, is_fresh)"""
+        start_time = time.time()
+        self.metrics.total_requests += 1
+
+        value = self._get_from_l1(cache_key)
+        if value is not None:
+            self.metrics.hit_count += 1
+            self._update_response_time(start_time)
+            return value, True
+
+        data, fresh = None, True
+        if self.redis:
+            try:
+                if stale_ttl:
+                    data, fresh = await self.redis.mget([cache_key, f"{cache_key}:fresh"])
+                else:
+                    data = await self.redis.get(cache_key)
+            except Exception as e:
+                cache_logger.error(f"Cache get failed for key {cache_key}: {e}")
+
+        value = self._deserialize_data(data) if data is not None else None
+        if value is None:
+            self.metrics.miss_count += 1
+            self._update_response_time(start_time)
+            return _MISSING, False
+
+        if fresh:
+            self._set_to_l1(cache_key, value, ttl, size=len(data))
+        self.metrics.hit_count += 1
+        self._update_response_time(start_time)
+        return value, bool(fresh)
+
+    async def _single_flight(self, cache_key: str, loader: Callable[[], Any], ttl: int,
+                             tags: Optional[List[str]], stale_ttl: int) -> Any:
+        """Run the loader once for all concurrent callers of this key"""
+        future = self._inflight.get(cache_key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The computing caller was cancelled; take over
+                return await self._single_flight(cache_key, loader, ttl, tags, stale_ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        # Avoid "exception never retrieved" warnings when nobody else waited
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[cache_key] = future
+        try:
+            value = await self._compute_with_lock(cache_key, loader, ttl, tags, stale_ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(cache_key, None)
+
+    async def _compute_with_lock(self, cache_key: str, loader: Callable[[], Any], ttl: int,
+                                 tags: Optional[List[str]], stale_ttl: int) -> Any:
+        """Compute under a cross-worker lock, or wait for the worker holding it"""
+        lock_key = f"{cache_key}:lock"
+        token = uuid.uuid4().hex
+        locked = False
+
+        if self.redis:
+            try:
+                locked = bool(await self.redis.set(lock_key, token, nx=True, px=SINGLE_FLIGHT_LOCK_MS))
+                if not locked:
+                    value = await self._wait_for_value(cache_key)
+                    if value is not _MISSING:
+                        return value
+            except Exception as e:
+                cache_logger.warning(f"Single-flight lock unavailable for {cache_key}: {e}")
+
+        try:
+            value = loader()
+            if asyncio.iscoroutine(value) or isinstance(value, asyncio.Future):
+                value = await value
+
+            await self.set(cache_key, value, ttl + stale_ttl, tags=tags, l1_ttl=ttl)
+            if stale_ttl and self.redis:
+                await self.redis.setex(f"{cache_key}:fresh", ttl, b"1")
+            return value
+        finally:
+            if locked:
+                await self._release_lock(lock_key, token)
+
+    async def _wait_for_value(self, cache_key: str) -> Any:
+        """Poll Redis while another worker holds the compute lock"""
+        deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_MS / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+            data = await self.redis.get(cache_key)
+            if data is not None:
+                value = self._deserialize_data(data)
+                if value is not None:
+                    return value
+            if not await self.redis.exists(f"{cache_key}:lock"):
+                break
+        return _MISSING
+
+    async def _release_lock(self, lock_key: str, token: str) -> None:
+        """Delete the lock only if this caller still owns it"""
+        try:
+            if self._release_lock_script is None:
+                self._release_lock_script = self.redis.register_script(RELEASE_LOCK_SCRIPT)
+            await self._release_lock_script(keys=[lock_key], args=[token])
+        except Exception as e:
+            cache_logger.warning(f"Failed to release single-flight lock {lock_key}: {e}")
+
+    def _finish_refresh(self, task: asyncio.Task) -> None:
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            cache_logger.warning(f"Background cache refresh failed: {task.exception()}")
+
     async def delete(self, key: str) -> bool:
         """Delete cached value"""
+        self.l1_cache.delete(key)
         if not self.redis:
             return False
 
         try:
-            return await self.redis.delete(key) > 0
+            deleted = await self.redis.delete(key) > 0
+            await self._publish_invalidation(keys=[key])
+            return deleted
         except Exception:
             return False
 
@@ -455,15 +849,69 @@ class CacheService:
             return 0
 
         try:
-            keys = await self.redis.smembers(f"tag:{tag}")
-            if keys:
-                deleted = await self.redis.delete(*keys)
-                await self.redis.delete(f"tag:{tag}")
-                return deleted
+            if self._invalidate_tag_script is None:
+                self._invalidate_tag_script = self.redis.register_script(INVALIDATE_TAG_SCRIPT)
+
+            deleted, members = await self._invalidate_tag_script(
+                keys=[f"tag:{tag}"], args=[TAG_INVALIDATION_CHUNK_SIZE]
+            )
+            keys = [key.decode() if isinstance(key, bytes) else key for key in members]
+
+            for key in keys:
+                self.l1_cache.delete(key)
+            self.l1_cache.invalidate_tag(tag)
+            await self._publish_invalidation(keys=keys, tags=[tag])
+            return deleted
+        except Exception as e:
+            cache_logger.error(f"Tag invalidation failed for {tag}: {e}")
             return 0
-        except Exception:
+
+    def invalidate_by_tag_sync(self, tag: str) -> int:
+        """invalidate_by_tag for code outside the event loop (ORM hooks, Celery tasks)"""
+        self.l1_cache.invalidate_tag(tag)
+        if not settings.REDIS_ENABLED:
             return 0
 
+        try:
+            if self._sync_redis is None:
+                self._sync_redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+            deleted, members = self._sync_redis.eval(
+                INVALIDATE_TAG_SCRIPT, 1, f"tag:{tag}", TAG_INVALIDATION_CHUNK_SIZE
+            )
+            keys = [key.decode() if isinstance(key, bytes) else key for key in members]
+            for key in keys:
+                self.l1_cache.delete(key)
+            self._sync_redis.publish(self.invalidation_channel, json.dumps({
+                "origin": self.instance_id,
+                "keys": keys,
+                "tags": [tag]
+            }))
+            return deleted
+        except Exception as e:
+            cache_logger.error(f"Tag invalidation failed for {tag}: {e}")
+            return 0
+
+    def invalidate_by_tag_nowait(self, tag: str) -> None:
+        """Invalidate a tag from synchronous code without blocking the event loop
+
+        ORM commit hooks run inside async route handlers as well as in
+        threadpool handlers and Celery tasks. Inside a running loop the local
+        entries are dropped at once and the Redis side goes through the async
+        client as a background task; without a loop the sync client is used.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.invalidate_by_tag_sync(tag)
+            return
+
+        if not self.redis:
+            self.l1_cache.invalidate_tag(tag)
+            return
+        task = loop.create_task(self.invalidate_by_tag(tag))
+        self._invalidation_tasks.add(task)
+        task.add_done_callback(self._invalidation_tasks.discard)
+
     async def mget(self, keys: List[str]) -> Dict[str, Any]:
         """Get multiple cache values"""
         if not self.redis or not keys:
@@ -500,50 +948,79 @@ class CacheService:
 cache_service = CacheService()
 
 
-def cache_response(expire: int = 300, key_prefix: str = "api", tags: List[str] = None):
-    """Decorator for caching API responses"""
+def _caller_key(value: Any) -> Optional[str]:
+    """Cache key part for an authenticated caller (Principal or User), else None"""
+    from app.models.user import User
+    from app.services.principal_service import Principal
+
+    if isinstance(value, (Principal, User)):
+        return f"user:{value.id}"
+    return None
+
+
+def _key_params(args: tuple, kwargs: Dict[str, Any]) -> str:
+    """Stable parameter string for decorator cache keys
+
+    DB sessions are skipped: their reprs differ on every call and would make
+    every lookup a miss. The authenticated caller is keyed by id, so
+    per-user results are never shared; a Request contributes its path, its
+    query string and the principal AuthMiddleware attached to it.
+    """
+    def normalize(value: Any) -> Any:
+        if isinstance(value, Request):
+            return (
+                value.url.path,
+                tuple(sorted(value.query_params.multi_items())),
+                _caller_key(getattr(value.state, "current_user", None))
+            )
+        return _caller_key(value) or value
+
+    kept_args = tuple(normalize(arg) for arg in args if not isinstance(arg, Session))
+    kept_kwargs = tuple(sorted(
+        (name, normalize(value)) for name, value in kwargs.items() if not isinstance(value, Session)
+    ))
+    return str(kept_args + kept_kwargs)
+
+
+def cache_response(expire: int = 300, key_prefix: str = "api", tags: List[str] = None,
+                   stale_ttl: int = 0):
+    """Decorator for caching API responses
+
+    Results are cached as JSON-compatible data (models go through
+    jsonable_encoder); FastAPI validates them against the route's
+    response_model on the way out.
+    """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key from function and parameters
-            params_hash = hashlib.md5(str(sorted(kwargs.items())).encode()).hexdigest()
+            params_hash = hashlib.md5(_key_params(args, kwargs).encode()).hexdigest()
             cache_key = f"{key_prefix}:{func.__name__}:{params_hash}"
 
-            # Try cache first
-            cached = await cache_service.get(cache_key)
-            if cached is not None:
-                return cached
+            async def load():
+                return jsonable_encoder(await func(*args, **kwargs))
 
-            # Execute function
-            result = await func(*args, **kwargs)
-
-            # Cache result
-            await cache_service.set(cache_key, result, expire, tags or [])
-            return result
+            # Concurrent misses share one execution
+            return await cache_service.get_or_compute(
+                cache_key, load, expire, tags=tags or [], stale_ttl=stale_ttl
+            )
         return wrapper
     return decorator
 
 
-def cache_query(expire: int = 600, key_prefix: str = "query"):
+def cache_query(expire: int = 600, key_prefix: str = "query", stale_ttl: int = 0):
     """Decorator for caching database query results"""
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Create cache key from query parameters
-            query_hash = hashlib.md5(str(args + tuple(sorted(kwargs.items()))).encode()).hexdigest()
+            query_hash = hashlib.md5(_key_params(args, kwargs).encode()).hexdigest()
             cache_key = f"{key_prefix}:{func.__name__}:{query_hash}"
 
-            # Try cache first
-            cached = await cache_service.get(cache_key)
-            if cached is not None:
-                return cached
-
-            # Execute query
-            result = await func(*args, **kwargs)
-
-            # Cache result
-            await cache_service.set(cache_key, result, expire)
-            return result
+            # Concurrent misses share one execution
+            return await cache_service.get_or_compute(
+                cache_key, lambda: func(*args, **kwargs), expire, stale_ttl=stale_ttl
+            )
         return wrapper
     return decorator
 
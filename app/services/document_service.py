@@ -14,7 +14,7 @@ import asyncio
 from io import BytesIO
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
+from sqlalchemy import desc, and_, or_, insert
 from docx import Document as DocxDocument
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
@@ -29,6 +29,9 @@ from app.schemas.document import (
     DocumentSearch, DocumentStats, DocumentPreview
 )
 from app.services.encryption_service import EncryptionService
+from app.services.render_plan_service import RenderPlanService
+from app.services.ooxml_render_service import OOXMLRenderService, RENDER_ENGINE_OOXML
+from app.utils.pagination import Page, paginate
 from database import get_db
 
 import logging
@@ -109,32 +112,45 @@ class DocumentService:
         return document
 
     @staticmethod
-    def create_document_for_batch(db: Session, template_id: int, doc_data: Dict[str, Any],
-                                user_id: int, batch_id: str) -> Document:
-        """Create document for batch processing"""
-
-        filename = f"{uuid.uuid4()}.docx"
-        file_path = os.path.join(settings.DOCUMENTS_PATH, filename)
-
-        document = Document(
-            title=doc_data["title"],
-            description=doc_data.get("description"),
-            placeholder_data=doc_data["placeholder_data"],
-            file_path=file_path,
-            file_format="docx",
-            user_id=user_id,
-            template_id=template_id,
-            status=DocumentStatus.PROCESSING
-        )
-
-        # Add batch metadata
-        document.placeholder_data["_batch_id"] = batch_id
+    def create_documents_for_batch(db: Session, documents_data: List[Dict[str, Any]],
+                                   user_id: int, batch_id: str) -> List[Document]:
+        """Create all documents of a batch with a single INSERT ... RETURNING
+
+        Each item needs template_id, title and placeholder_data (description is
+        optional). Rows come back as detached Document instances in input
+        order, with ids and server defaults populated, after one commit.
+        """
+
+        if not documents_data:
+            return []
+
+        rows = []
+        for doc_data in documents_data:
+            filename = f"{uuid.uuid4()}.docx"
+            rows.append({
+                "title": doc_data["title"],
+                "description": doc_data.get("description"),
+                # Add batch metadata
+                "placeholder_data": {**(doc_data.get("placeholder_data") or {}), "_batch_id": batch_id},
+                "file_path": os.path.join(settings.DOCUMENTS_PATH, filename),
+                "file_format": "docx",
+                "user_id": user_id,
+                "template_id": doc_data["template_id"],
+                "status": DocumentStatus.PROCESSING
+            })
+
+        documents = db.scalars(
+            insert(Document).returning(Document, sort_by_parameter_order=True),
+            rows
+        ).all()
 
-        db.add(document)
+        # Detach before committing so the returned rows are not expired and
+        # reloaded one SELECT at a time when the caller reads them
+        for document in documents:
+            db.expunge(document)
         db.commit()
-        db.refresh(document)
 
-        return document
+        return documents
 
     @staticmethod
     def update_document(db: Session, document: Document, document_update: DocumentUpdate) -> Document:
@@ -165,7 +181,7 @@ class DocumentService:
                 pass
 
     @staticmethod
-    def search_documents(db: Session, user_id: int, search_params: DocumentSearch) -> Tuple[List[Document], int]:
+    def search_documents(db: Session, user_id: int, search_params: DocumentSearch) -> Page:
         """Search documents with advanced filters"""
 
         query = db.query(Document).filter(Document.user_id == user_id)
@@ -192,9 +208,6 @@ class DocumentService:
         if search_params.created_before:
             query = query.filter(Document.created_at <= search_params.created_before)
 
-        # Get total count
-        total = query.count()
-
         # Apply sorting
         if search_params.sort_by == "created_at":
             order_col = Document.created_at
@@ -205,17 +218,16 @@ class DocumentService:
         else:
             order_col = Document.updated_at
 
-        if search_params.sort_order == "asc":
-            query = query.order_by(order_col)
-        else:
-            query = query.order_by(desc(order_col))
-
-        # Apply pagination
-        documents = query.offset(
-            (search_params.page - 1) * search_params.per_page
-        ).limit(search_params.per_page).all()
-
-        return documents, total
+        # Keyset pagination on (sort column, id)
+        return paginate(
+            query,
+            [(order_col, search_params.sort_order != "asc")],
+            Document.id,
+            search_params.per_page,
+            cursor=search_params.cursor,
+            page=search_params.page,
+            exact_count=search_params.exact_count
+        )
 
     @staticmethod
     def get_user_document_stats(db: Session, user_id: int) -> DocumentStats:
@@ -292,52 +304,17 @@ class DocumentService:
                 return False
 
             template = db.query(Template).filter(Template.id == document.template_id).first()
-            if not template:
-                document.status = DocumentStatus.FAILED
-                document.error_message = "Template not found"
-                db.commit()
-                return False
-
-            start_time = datetime.utcnow()
-
-            # Load template document
-            template_path = os.path.join(settings.TEMPLATES_PATH, template.file_path)
-            if not os.path.exists(template_path):
-                document.status = DocumentStatus.FAILED
-                document.error_message = "Template file not found"
-                db.commit()
-                return False
 
             # Generate document
-            success = await DocumentService._process_template_placeholders(
-                template_path, document.file_path, template, placeholder_data
-            )
-
-            if success:
-                # Update document status
-                document.status = DocumentStatus.COMPLETED
-                document.completed_at = datetime.utcnow()
-                document.generation_time = (datetime.utcnow() - start_time).total_seconds()
-
-                # Calculate file size and hash
-                if os.path.exists(document.file_path):
-                    document.file_size = os.path.getsize(document.file_path)
-                    document.file_hash = DocumentService._calculate_file_hash(document.file_path)
-
-                # Encrypt if required
-                if document.is_encrypted:
-                    encrypted_path = await EncryptionService.encrypt_file(document.file_path)
-                    if encrypted_path:
-                        document.file_path = encrypted_path
-                        document.encryption_key_id = "default"  # Use default encryption key
-            else:
-                document.status = DocumentStatus.FAILED
-                document.error_message = "Failed to process template"
+            updates = await DocumentService.render_document(db, document, template, placeholder_data)
+            for field, value in updates.items():
+                if field != "id":
+                    setattr(document, field, value)
 
             db.commit()
             db.close()
 
-            return success
+            return updates["status"] == DocumentStatus.COMPLETED
 
         except Exception as e:
             # Update document with error
@@ -353,37 +330,72 @@ class DocumentService:
             return False
 
     @staticmethod
-    async def _process_template_placeholders(template_path: str, output_path: str,
+    async def render_document(db: Session, document: Document, template: Optional[Template],
+                              placeholder_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Render a document file and return its updated columns without committing
+
+        The returned mapping is keyed by Document column names (plus "id") so
+        batch generation can write status updates for many documents at once.
+        """
+
+        updates: Dict[str, Any] = {"id": document.id}
+
+        if not template:
+            updates.update(status=DocumentStatus.FAILED, error_message="Template not found")
+            return updates
+
+        start_time = datetime.utcnow()
+
+        # Load template document
+        template_path = os.path.join(settings.TEMPLATES_PATH, template.file_path)
+        if not os.path.exists(template_path):
+            updates.update(status=DocumentStatus.FAILED, error_message="Template file not found")
+            return updates
+
+        success = await DocumentService._process_template_placeholders(
+            db, template_path, document.file_path, template, placeholder_data
+        )
+        if not success:
+            updates.update(status=DocumentStatus.FAILED, error_message="Failed to process template")
+            return updates
+
+        updates.update(
+            status=DocumentStatus.COMPLETED,
+            completed_at=datetime.utcnow(),
+            generation_time=(datetime.utcnow() - start_time).total_seconds()
+        )
+
+        # Calculate file size and hash
+        if os.path.exists(document.file_path):
+            updates["file_size"] = os.path.getsize(document.file_path)
+            updates["file_hash"] = DocumentService._calculate_file_hash(document.file_path)
+
+        # Encrypt if required
+        if document.is_encrypted:
+            encrypted_path = await EncryptionService.encrypt_file(document.file_path)
+            if encrypted_path:
+                updates["file_path"] = encrypted_path
+                updates["encryption_key_id"] = "default"  # Use default encryption key
+
+        return updates
+
+    @staticmethod
+    async def _process_template_placeholders(db: Session, template_path: str, output_path: str,
                                            template: Template, placeholder_data: Dict[str, Any]) -> bool:
         """Process template placeholders and generate output document"""
 
         try:
-            # Load template document
-            doc = DocxDocument(template_path)
-
-            # Get placeholders for this template
-            db = next(get_db())
-            placeholders = db.query(Placeholder).filter(
-                Placeholder.template_id == template.id
-            ).order_by(
-                Placeholder.paragraph_index,
-                Placeholder.start_run_index
-            ).all()
-            db.close()
+            # Compiled plan is cached per template file, so placeholders are only queried on first use
+            plan = RenderPlanService.get_plan(db, template, template_path)
 
-            # Process placeholders
-            for placeholder in placeholders:
-                value = placeholder_data.get(placeholder.name, placeholder.default_value or "")
+            # Zip-level streaming engine skips the python-docx object model entirely
+            if template.render_engine == RENDER_ENGINE_OOXML:
+                OOXMLRenderService.render(template_path, output_path, plan, placeholder_data, template)
+                return True
 
-                # Format value based on placeholder type
-                formatted_value = DocumentService._format_placeholder_value(
-                    value, placeholder.placeholder_type, placeholder.casing
-                )
-
-                # Apply formatting
-                DocumentService._replace_placeholder_in_document(
-                    doc, placeholder, formatted_value
-                )
+            # Load template document and substitute all placeholders in one pass
+            doc = DocxDocument(template_path)
+            RenderPlanService.apply_plan(doc, plan, placeholder_data)
 
             # Apply document-level formatting
             DocumentService._apply_document_formatting(doc, template)
@@ -394,62 +406,9 @@ class DocumentService:
             return True
 
         except Exception as e:
-            print(f"Error processing template: {e}")
+            logger.error(f"Error processing template: {e}")
             return False
 
-    @staticmethod
-    def _format_placeholder_value(value: str, placeholder_type: str, casing: str) -> str:
-        """Format placeholder value based on type and casing"""
-
-        # Handle different types
-        if placeholder_type == "date" and value:
-            try:
-                from dateutil.parser import parse
-                date_obj = parse(value)
-                return date_obj.strftime("%B %d, %Y")
-            except:
-                pass
-
-        # Apply casing
-        if casing == "upper":
-            return value.upper()
-        elif casing == "lower":
-            return value.lower()
-        elif casing == "title":
-            return value.title()
-
-        return value
-
-    @staticmethod
-    def _replace_placeholder_in_document(doc: DocxDocument, placeholder: Placeholder, value: str):
-        """Replace placeholder in document with formatted value"""
-
-        try:
-            paragraph = doc.paragraphs[placeholder.paragraph_index]
-
-            # Find the placeholder text in runs
-            placeholder_text = f"${{{placeholder.name}}}"
-
-            # Simple replacement - in production, you'd want more sophisticated handling
-            full_text = "".join(run.text for run in paragraph.runs)
-            if placeholder_text in full_text:
-                # Clear all runs and add the replaced text
-                for run in paragraph.runs:
-                    run.clear()
-
-                # Add new text with formatting
-                new_run = paragraph.runs[0] if paragraph.runs else paragraph.add_run()
-                new_run.text = full_text.replace(placeholder_text, value)
-
-                # Apply formatting
-                new_run.bold = placeholder.bold
-                new_run.italic = placeholder.italic
-                new_run.underline = placeholder.underline
-
-        except (IndexError, AttributeError):
-            # Skip if paragraph index is invalid
-            pass
-
     @staticmethod
     def _apply_document_formatting(doc: DocxDocument, template: Template):
         """Apply document-level formatting"""
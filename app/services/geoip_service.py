@@ -0,0 +1,177 @@
+"""
+Process-wide GeoIP resolver
+
+Audit logging and visit tracking used to open a geoip2 Reader, and so
+re-open and re-parse the MMDB file, for every lookup. The resolver here
+opens GEOIP_DATABASE_PATH once per process in MODE_MMAP, so pages are shared
+between workers through the OS page cache, and keeps an LRU of results.
+
+Results are cached per /24 (IPv4) or /48 (IPv6) network when
+GEOIP_CACHE_BY_PREFIX is set, since City databases rarely split below that,
+and per address otherwise. Every GEOIP_RELOAD_CHECK_INTERVAL seconds the
+file is stat()ed; a new mtime or size swaps in a fresh reader and clears the
+cache. When geoip2 is not installed or the file is missing, lookups return
+None and callers apply their own defaults.
+"""
+
+import ipaddress
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import geoip2.database
+    import geoip2.errors
+    from maxminddb import MODE_MMAP
+    GEOIP_AVAILABLE = True
+except ImportError:
+    geoip2 = None
+    MODE_MMAP = None
+    GEOIP_AVAILABLE = False
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cached marker for addresses the database has no record of
+_NOT_FOUND = object()
+
+
+@dataclass(frozen=True)
+class GeoLocation:
+    """Where an IP address is, as far as the database knows"""
+    country: Optional[str] = None
+    region: Optional[str] = None
+    city: Optional[str] = None
+
+
+class GeoIPResolver:
+    """Shared MMDB reader with an LRU result cache and hot reload"""
+
+    def __init__(self, database_path: str = settings.GEOIP_DATABASE_PATH,
+                 cache_size: int = settings.GEOIP_CACHE_SIZE,
+                 cache_by_prefix: bool = settings.GEOIP_CACHE_BY_PREFIX,
+                 reload_check_interval: float = settings.GEOIP_RELOAD_CHECK_INTERVAL):
+        self.database_path = database_path
+        self.cache_size = cache_size
+        self.cache_by_prefix = cache_by_prefix
+        self.reload_check_interval = reload_check_interval
+        self._reader = None
+        self._file_stamp: Optional[Tuple[float, int]] = None
+        self._next_check = 0.0
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warned = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def lookup(self, ip_address: Optional[str]) -> Optional[GeoLocation]:
+        """Location of a public IP address, or None when unknown"""
+        if not ip_address:
+            return None
+        try:
+            address = ipaddress.ip_address(ip_address.strip())
+        except ValueError:
+            return None
+        if not address.is_global:
+            return None
+
+        self._maybe_reload()
+        key = self._cache_key(address)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return None if cached is _NOT_FOUND else cached
+            self.misses += 1
+            reader = self._reader
+
+        if reader is None:
+            return None
+
+        try:
+            response = reader.city(str(address))
+            result = GeoLocation(
+                country=response.country.name,
+                region=response.subdivisions.most_specific.name if response.subdivisions else None,
+                city=response.city.name
+            )
+        except geoip2.errors.AddressNotFoundError:
+            result = None
+        except Exception as e:
+            logger.warning(f"GeoIP lookup failed for {ip_address}: {e}")
+            return None
+
+        with self._lock:
+            self._cache[key] = _NOT_FOUND if result is None else result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _cache_key(self, address) -> str:
+        if not self.cache_by_prefix:
+            return str(address)
+        prefix = 24 if address.version == 4 else 48
+        return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_check_interval
+
+            try:
+                stat = os.stat(self.database_path)
+                stamp = (stat.st_mtime, stat.st_size)
+            except OSError:
+                stamp = None
+            if stamp == self._file_stamp:
+                return
+
+            old_reader = self._reader
+            self._reader = self._open() if stamp else None
+            self._file_stamp = stamp if self._reader is not None else None
+            self._cache.clear()
+            if self._reader is not None:
+                self.reloads += 1
+        if old_reader is not None:
+            old_reader.close()
+
+    def _open(self):
+        if not GEOIP_AVAILABLE:
+            self._warn("geoip2 is not installed")
+            return None
+        try:
+            return geoip2.database.Reader(self.database_path, mode=MODE_MMAP)
+        except Exception as e:
+            self._warn(f"cannot open {self.database_path}: {e}")
+            return None
+
+    def _warn(self, reason: str) -> None:
+        if not self._warned:
+            logger.warning(f"GeoIP lookups disabled, {reason}")
+            self._warned = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "available": self._reader is not None,
+            "database_path": self.database_path,
+            "cached": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+
+geoip_resolver = GeoIPResolver()
@@ -0,0 +1,257 @@
+"""
+Redis stream ingestion for landing page analytics events
+
+Landing visits and realtime interactions (page views, template and form
+interactions, scrolls) used to run SELECT by session_id, UPDATE or INSERT and
+COMMIT inside the request, one small transaction per click. Handlers now
+append a compact event to the LANDING_EVENT_STREAM Redis stream and return.
+
+ingest_landing_events_task reads the stream through a consumer group, folds
+a batch of events per session in memory, then loads every touched
+LandingVisit with one query and writes them back in one commit. Visit
+enrichment (user agent, referrer) also moves off the request path.
+
+Delivery is at least once: entries are acknowledged only after the commit,
+and entries left pending by a dead consumer are reclaimed after
+LANDING_EVENT_CLAIM_IDLE_MS. Applying them is idempotent:
+
+- each visit stores the stream ids folded into it
+  (visit_metadata["ingest_applied"]) in the same transaction, so a
+  redelivered entry is skipped while a reclaimed older one is still applied;
+  ids more than LANDING_EVENT_DEDUP_TTL seconds older than the newest are
+  dropped from the set
+- publishers may pass an idempotency key (e.g. a client event id); a
+  repeated key within LANDING_EVENT_DEDUP_TTL seconds is not appended again
+
+Consumers may work on the same session at once. Visits are locked with
+SELECT ... FOR UPDATE in id order, and a session without a row is created
+with INSERT ... ON CONFLICT (session_id) DO NOTHING against the unique index
+before being locked, so two consumers neither overwrite each other's folds
+nor insert the session twice.
+
+When the stream is unavailable publish() returns False and callers fall back
+to writing synchronously.
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import redis
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config import settings
+from app.models.analytics.visit import LandingVisit
+
+logger = logging.getLogger(__name__)
+
+STREAM = settings.LANDING_EVENT_STREAM
+GROUP = "landing-ingest"
+DEDUP_PREFIX = f"{STREAM}:key:"
+APPLIED_KEY = "ingest_applied"
+
+EVENT_VISIT = "visit"
+
+
+def _stream_id_key(stream_id: str) -> Tuple[int, int]:
+    millis, _, sequence = stream_id.partition("-")
+    return int(millis), int(sequence or 0)
+
+
+class LandingEventIngest:
+    """Publishes landing events to the stream and folds them into LandingVisit rows"""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis_client = redis_client
+        self.consumer_name = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._group_ready = False
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not (settings.REDIS_ENABLED and settings.LANDING_EVENT_INGEST_ENABLED):
+            return None
+        if self._redis_client is None:
+            self._redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+        return self._redis_client
+
+    # Producer side
+
+    def publish(self, event_type: str, session_id: str, data: Optional[Dict[str, Any]] = None,
+                idempotency_key: Optional[str] = None, timestamp: Optional[datetime] = None) -> bool:
+        """Append an event; False means the caller should write it synchronously"""
+        client = self._redis()
+        if client is None:
+            return False
+
+        at = timestamp or datetime.utcnow()
+        fields = {
+            "e": event_type,
+            "s": session_id,
+            "t": at.isoformat(),
+            "d": json.dumps(data or {}, separators=(",", ":"), default=str)
+        }
+        try:
+            if idempotency_key:
+                fresh = client.set(f"{DEDUP_PREFIX}{idempotency_key}", 1, nx=True,
+                                   ex=settings.LANDING_EVENT_DEDUP_TTL)
+                if not fresh:
+                    return True  # already accepted
+            client.xadd(STREAM, fields, maxlen=settings.LANDING_EVENT_STREAM_MAXLEN, approximate=True)
+            return True
+        except redis.RedisError as e:
+            logger.warning(f"Landing event stream unavailable, writing synchronously: {e}")
+            return False
+
+    # Consumer side
+
+    def _ensure_group(self, client: redis.Redis) -> None:
+        if self._group_ready:
+            return
+        try:
+            client.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+        except redis.ResponseError:
+            pass  # group already exists
+        self._group_ready = True
+
+    def _read_batch(self, client: redis.Redis) -> List[Tuple[str, Dict[bytes, bytes]]]:
+        batch_size = settings.LANDING_EVENT_BATCH_SIZE
+        # Entries a dead consumer read but never acknowledged come back first
+        _, claimed, *_ = client.xautoclaim(
+            STREAM, GROUP, self.consumer_name, settings.LANDING_EVENT_CLAIM_IDLE_MS, count=batch_size
+        )
+        entries = [(entry_id, fields) for entry_id, fields in claimed if fields]
+        if len(entries) < batch_size:
+            response = client.xreadgroup(
+                GROUP, self.consumer_name, {STREAM: ">"}, count=batch_size - len(entries), block=100
+            )
+            if response:
+                entries.extend(response[0][1])
+        return [
+            (entry_id.decode() if isinstance(entry_id, bytes) else entry_id, fields)
+            for entry_id, fields in entries
+        ]
+
+    def drain(self, db: Session, time_budget: float = None) -> Dict[str, int]:
+        """Fold stream entries into the database until the stream is empty or time runs out"""
+        stats = {"events": 0, "sessions": 0, "batches": 0}
+        client = self._redis()
+        if client is None:
+            return stats
+
+        self._ensure_group(client)
+        deadline = time.monotonic() + (time_budget or settings.LANDING_EVENT_DRAIN_SECONDS)
+        while time.monotonic() < deadline:
+            entries = self._read_batch(client)
+            if not entries:
+                break
+            try:
+                stats["sessions"] += self.apply_batch(db, entries)
+            except Exception:
+                # Left pending; reclaimed once LANDING_EVENT_CLAIM_IDLE_MS passes
+                db.rollback()
+                raise
+            # Acknowledge only after the rows are committed
+            ids = [entry_id for entry_id, _ in entries]
+            client.xack(STREAM, GROUP, *ids)
+            client.xdel(STREAM, *ids)
+            stats["events"] += len(entries)
+            stats["batches"] += 1
+        return stats
+
+    @staticmethod
+    def _decode(fields: Dict[Any, Any]) -> Dict[str, Any]:
+        fields = {
+            (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+            for key, value in fields.items()
+        }
+        return {
+            "event_type": fields["e"],
+            "session_id": fields["s"],
+            "at": datetime.fromisoformat(fields["t"]),
+            "data": json.loads(fields.get("d") or "{}")
+        }
+
+    def apply_batch(self, db: Session, entries: Iterable[Tuple[str, Dict[Any, Any]]]) -> int:
+        """Fold entries into their sessions' visits in one transaction; returns sessions touched"""
+        from app.services.realtime_analytics_service import RealtimeAnalyticsService
+
+        by_session: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        for entry_id, fields in entries:
+            try:
+                event = self._decode(fields)
+            except (KeyError, ValueError) as e:
+                logger.warning(f"Skipping malformed landing event {entry_id}: {e}")
+                continue
+            by_session.setdefault(event["session_id"], []).append((entry_id, event))
+        if not by_session:
+            return 0
+
+        visits = self._lock_visits(db, by_session)
+        missing = sorted(session_id for session_id in by_session if session_id not in visits)
+        if missing:
+            # Another consumer may be creating the same session; the unique index settles it
+            insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            for session_id in missing:
+                db.execute(
+                    insert(LandingVisit)
+                    .values(**self._new_visit(session_id, by_session[session_id]))
+                    .on_conflict_do_nothing(index_elements=["session_id"])
+                )
+            visits.update(self._lock_visits(db, missing))
+
+        for session_id, events in by_session.items():
+            visit = visits[session_id]
+            applied = set((visit.visit_metadata or {}).get(APPLIED_KEY) or [])
+            events.sort(key=lambda item: _stream_id_key(item[0]))
+            for entry_id, event in events:
+                if entry_id in applied:
+                    continue  # already folded before a redelivery
+                if event["event_type"] != EVENT_VISIT:
+                    RealtimeAnalyticsService.apply_interaction(
+                        visit, event["event_type"], event["data"], event["at"]
+                    )
+                applied.add(entry_id)
+            # Reassign so the JSON column is flagged dirty
+            visit.visit_metadata = {**(visit.visit_metadata or {}), APPLIED_KEY: self._retained(applied)}
+
+        db.commit()
+        return len(by_session)
+
+    @staticmethod
+    def _lock_visits(db: Session, session_ids: Iterable[str]) -> Dict[str, LandingVisit]:
+        """Load and row-lock the sessions' visits, in id order so consumers cannot deadlock"""
+        return {
+            visit.session_id: visit
+            for visit in db.query(LandingVisit).filter(
+                LandingVisit.session_id.in_(list(session_ids))
+            ).order_by(LandingVisit.id).with_for_update()
+        }
+
+    @staticmethod
+    def _retained(applied: Iterable[str]) -> List[str]:
+        """Applied ids still young enough to be redelivered, oldest first"""
+        ordered = sorted(applied, key=_stream_id_key)
+        horizon = _stream_id_key(ordered[-1])[0] - settings.LANDING_EVENT_DEDUP_TTL * 1000
+        return [entry_id for entry_id in ordered if _stream_id_key(entry_id)[0] >= horizon]
+
+    @staticmethod
+    def _new_visit(session_id: str, events: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Column values for a session's row, from its visit event when the batch has one"""
+        from app.services.analytics.visit_tracking import VisitTrackingService
+
+        event = next((event for _, event in events if event["event_type"] == EVENT_VISIT), events[0][1])
+        data = event["data"] if event["event_type"] == EVENT_VISIT else {}
+        columns = {column.key for column in LandingVisit.__table__.columns}
+        visit_data = VisitTrackingService.enrich_visit_data(data)
+        visit_data["created_at"] = event["at"]
+        values = {key: value for key, value in visit_data.items() if key in columns and key not in ("id", "session_id")}
+        values["session_id"] = session_id
+        return values
+
+
+landing_event_ingest = LandingEventIngest()
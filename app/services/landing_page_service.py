@@ -9,14 +9,21 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Float, desc, func
+from sqlalchemy.exc import IntegrityError
 from fastapi import Request
 
 from app.models.analytics.visit import LandingVisit
 from app.services.analytics.visit_tracking import VisitTrackingService
+from app.services.landing_event_ingest import EVENT_VISIT, landing_event_ingest
+from app.services.realtime_counters import CONVERSION, realtime_counters
+from app.services.template_search_index import TemplateSearchIndex, template_search_index
 from database import Base
 
 logger = logging.getLogger(__name__)
 
+# Landing visits are stored in the shared analytics visit table
+LandingPageVisit = LandingVisit
+
 
 class LandingPageTemplate(Base):
     """Popular templates for landing page display with enhanced SEO and preview capabilities"""
@@ -88,18 +95,6 @@ class LandingPageService:
     ) -> Dict[str, Any]:
         """Track a new landing page visit"""
         try:
-            # Check if visit already exists for this session
-            existing_visit = db.query(LandingVisit).filter(
-                LandingVisit.session_id == session_id
-            ).first()
-
-            if existing_visit:
-                return {
-                    "success": True,
-                    "visit_id": existing_visit.id,
-                    "existing_visit": True
-                }
-
             # Get request data
             request_data = {}
             if request:
@@ -120,6 +115,35 @@ class LandingPageService:
                 })
             # ...existing code...
 
+            realtime_counters.record(EVENT_VISIT, session_id=session_id)
+
+            # Queue for the ingest worker, which creates the row unless the session has one
+            if landing_event_ingest.publish(
+                EVENT_VISIT,
+                session_id,
+                request_data,
+                idempotency_key=f"visit:{session_id}"
+            ):
+                return {
+                    "success": True,
+                    "visit_id": None,
+                    "existing_visit": False,
+                    "session_id": session_id,
+                    "queued": True
+                }
+
+            # Check if visit already exists for this session
+            existing_visit = db.query(LandingVisit).filter(
+                LandingVisit.session_id == session_id
+            ).first()
+
+            if existing_visit:
+                return {
+                    "success": True,
+                    "visit_id": existing_visit.id,
+                    "existing_visit": True
+                }
+
             # Use shared tracking service to enrich visit data
             visit_data = VisitTrackingService.enrich_visit_data(request_data)
 
@@ -130,7 +154,19 @@ class LandingPageService:
             )
 
             db.add(visit)
-            db.commit()
+            try:
+                db.commit()
+            except IntegrityError:
+                # Created concurrently (session_id is unique); report the winner's row
+                db.rollback()
+                existing_visit = db.query(LandingVisit).filter(
+                    LandingVisit.session_id == session_id
+                ).one()
+                return {
+                    "success": True,
+                    "visit_id": existing_visit.id,
+                    "existing_visit": True
+                }
             db.refresh(visit)
 
             logger.info(f"Landing page visit tracked: {visit.id} for session {session_id}")
@@ -222,52 +258,31 @@ class LandingPageService:
             # Track search
             LandingPageService._track_search_activity(db, session_id, search_term)
 
-            # Perform search
-            from app.models.template import Template
-
-            # Simple search implementation (can be enhanced with full-text search)
-            search_results = db.query(Template).filter(
-                (Template.name.ilike(f"%{search_term}%")) |
-                (Template.description.ilike(f"%{search_term}%")) |
-                (Template.category.ilike(f"%{search_term}%"))
-            ).limit(limit).all()
-
-            # Get landing page settings for these templates
-            template_ids = [t.id for t in search_results]
-            landing_settings = db.query(LandingPageTemplate).filter(
-                LandingPageTemplate.template_id.in_(template_ids),
-                LandingPageTemplate.is_active == True
-            ).all()
+            # Served from the in-process index of public templates
+            index = template_search_index.get()
 
-            landing_map = {ls.template_id: ls for ls in landing_settings}
-
-            # Format results
-            results_data = []
-            for template in search_results:
-                landing_template = landing_map.get(template.id)
-
-                results_data.append({
+            results_data = [
+                {
                     "template_id": template.id,
                     "name": template.name,
                     "description": template.description,
                     "category": template.category,
                     "price_tokens": template.price or 0,
-                    "is_free": template.price == 0 or template.price is None,
-                    "preview_image": landing_template.preview_image_url if landing_template else f"/api/templates/{template.id}/preview",
-                    "is_featured": landing_template.is_featured if landing_template else False,
+                    "is_free": not template.price,
+                    "preview_image": template.preview_image or f"/api/templates/{template.id}/preview",
+                    "is_featured": template.is_featured,
                     "estimated_time_minutes": LandingPageService._estimate_completion_time(template),
-                    "relevance_score": LandingPageService._calculate_relevance(template, search_term)
-                })
-
-            # Sort by relevance
-            results_data.sort(key=lambda x: x["relevance_score"], reverse=True)
+                    "relevance_score": round(score, 3)
+                }
+                for template, score in index.search(search_term, limit)
+            ]
 
             return {
                 "success": True,
                 "search_term": search_term,
                 "results": results_data,
                 "total_count": len(results_data),
-                "suggestions": LandingPageService._get_search_suggestions(db, search_term)
+                "suggestions": LandingPageService._get_search_suggestions(index, search_term)
             }
 
         except Exception as e:
@@ -282,29 +297,20 @@ class LandingPageService:
     ) -> Dict[str, Any]:
         """Track when a user views a template preview"""
         try:
-            # Get landing page visit
-            visit = db.query(LandingVisit).filter(
-                LandingVisit.session_id == session_id
-            ).first()
-
-            if visit:
-                # Update viewed templates
-                current_interactions = visit.metadata.get("template_interactions", []) if visit.metadata else []
-
-                # Add new template view
-                template_view = {
-                    "template_id": template_id,
-                    "action": "view",
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                current_interactions.append(template_view)
+            from app.services.realtime_analytics_service import RealtimeAnalyticsService
+
+            view = {"template_id": template_id, "action": "view"}
+            realtime_counters.record("template_interaction", session_id=session_id, template_id=template_id)
+            if not landing_event_ingest.publish("template_interaction", session_id, view):
+                # Stream unavailable, update the visit record directly
+                visit = db.query(LandingVisit).filter(
+                    LandingVisit.session_id == session_id
+                ).first()
 
-                # Update visit metadata
-                visit.metadata = visit.metadata or {}
-                visit.metadata["template_interactions"] = current_interactions
-                visit.templates_viewed_count = (visit.templates_viewed_count or 0) + 1
-                    visit.viewed_templates = json.dumps(viewed_templates)
-                    visit.templates_viewed_count = len(viewed_templates)
+                if visit:
+                    RealtimeAnalyticsService.apply_interaction(
+                        visit, "template_interaction", view, datetime.utcnow()
+                    )
                     db.commit()
 
             # Update landing template stats
@@ -513,6 +519,8 @@ class LandingPageService:
                 draft.session_id = None  # Clear session since now belongs to user
                 db.commit()
 
+            realtime_counters.record(CONVERSION, session_id=session_id)
+
             # Update visit tracking with conversion
             visit = db.query(LandingVisit).filter(
                 LandingVisit.session_id == session_id
@@ -743,29 +751,22 @@ class LandingPageService:
             return base_time
 
     @staticmethod
-    def _calculate_relevance(template, search_term: str) -> float:
-        """Calculate relevance score for search results"""
-        score = 0.0
-        term_lower = search_term.lower()
-
-        # Name match (highest weight)
-        if term_lower in template.name.lower():
-            score += 10.0
-
-        # Description match
-        if template.description and term_lower in template.description.lower():
-            score += 5.0
-
-        # Category match
-        if template.category and term_lower in template.category.lower():
-            score += 3.0
-
-        return score
+    def _get_search_suggestions(index: TemplateSearchIndex, search_term: str) -> List[str]:
+        """Complete the word being typed from the indexed catalog vocabulary"""
+        words = search_term.lower().split()
+        if not words:
+            return []
+
+        head = " ".join(words[:-1])
+        completions = [
+            f"{head} {word}".strip()
+            for word in index.complete(words[-1], limit=6)
+            if word != words[-1]
+        ]
+        if completions:
+            return completions[:5]
 
-    @staticmethod
-    def _get_search_suggestions(db: Session, search_term: str) -> List[str]:
-        """Get search suggestions based on popular searches"""
-        # Simple implementation - in production, use more sophisticated suggestion engine
+        # Nothing in the catalog starts that way; fall back to common searches
         suggestions = [
             "invoice template",
             "business letter",
@@ -779,7 +780,7 @@ class LandingPageService:
         relevant_suggestions = [
             s for s in suggestions
             if search_term.lower() not in s.lower() and
-            any(word in s.lower() for word in search_term.lower().split())
+            any(word in s.lower() for word in words)
         ]
 
         return relevant_suggestions[:5]
@@ -0,0 +1,300 @@
+"""
+Incremental metrics rollups for the admin dashboard
+
+The dashboard used to run twenty-odd COUNT/SUM queries over users,
+documents, payments and page_visits on every load, most of them filtered by
+func.date(created_at), which can't use an index. Those numbers are now kept
+in analytics_summaries as one row per hour and one row per day.
+
+A Celery beat job (rollup_dashboard_metrics_task) finds the hours that
+gained or changed rows since each source's watermark and recomputes those
+hours and their days with indexed range queries. Then it advances the
+watermarks. The dashboard reads the daily rows and adds a live delta for
+rows newer than the watermark, which covers at most a few minutes of
+traffic.
+
+Known gaps: rows deleted from a source table stay counted until their hour
+changes again. Page, device and browser breakdowns don't include the live
+delta.
+"""
+
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import case, distinct, func, literal_column
+from sqlalchemy.orm import Session
+
+from config import settings
+from app.models.document import Document
+from app.models.payment import Payment, PaymentStatus
+from app.models.user import User
+from app.models.analytics.visit import PageVisit
+from app.services.admin_dashboard_service import AnalyticsRollupWatermark, AnalyticsSummary
+
+logger = logging.getLogger(__name__)
+
+HOUR = "hour"
+DAY = "day"
+TOP_PAGES_PER_PERIOD = 50
+
+# source -> (column that moves when a row needs rolling up, column it is bucketed by).
+# Payments are bucketed by creation time but must be re-rolled when their
+# status changes, so they are tracked by updated_at.
+ROLLUP_SOURCES = {
+    "users": (User.created_at, User.created_at),
+    "documents": (Document.created_at, Document.created_at),
+    "payments": (Payment.updated_at, Payment.created_at),
+    "page_visits": (PageVisit.created_at, PageVisit.created_at),
+}
+
+# Additive columns summed across daily rows
+_TOTALS = ("new_users", "documents_created", "revenue_amount", "total_visits")
+
+
+def _hour_bucket(db: Session, column):
+    """SQL expression truncating a timestamp to its hour"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("hour", column)
+    return func.strftime("%Y-%m-%d %H:00:00", column)
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _day_start(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _counter(raw: Optional[str]) -> Counter:
+    return Counter(json.loads(raw)) if raw else Counter()
+
+
+class MetricsRollupService:
+    """Maintain and read the analytics_summaries rollups"""
+
+    @staticmethod
+    def run(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Fold rows added or changed since the last run into hourly and daily rollups"""
+        now = now or datetime.utcnow()
+        # Rows newer than this may still be in uncommitted transactions
+        upto = now - timedelta(seconds=settings.METRICS_ROLLUP_LAG)
+
+        watermarks = {
+            mark.source: mark
+            for mark in db.query(AnalyticsRollupWatermark).with_for_update()
+        }
+
+        hours: Set[datetime] = set()
+        for source, (changed, bucketed) in ROLLUP_SOURCES.items():
+            query = db.query(_hour_bucket(db, bucketed)).filter(changed < upto)
+            mark = watermarks.get(source)
+            if mark is not None:
+                query = query.filter(changed >= mark.watermark)
+            hours.update(_as_datetime(value) for (value,) in query.distinct() if value is not None)
+
+        for hour in hours:
+            MetricsRollupService._store(
+                db, HOUR, hour, MetricsRollupService._compute(db, hour, min(hour + timedelta(hours=1), upto))
+            )
+
+        days = {_day_start(hour) for hour in hours}
+        for day in days:
+            end = min(day + timedelta(days=1), upto)
+            values = MetricsRollupService._compute(db, day, end)
+            values["total_users"] = db.query(func.count(User.id)).filter(User.created_at < end).scalar() or 0
+            MetricsRollupService._store(db, DAY, day, values)
+
+        for source in ROLLUP_SOURCES:
+            mark = watermarks.get(source)
+            if mark is None:
+                db.add(AnalyticsRollupWatermark(source=source, watermark=upto))
+            else:
+                mark.watermark = upto
+
+        pruned = db.query(AnalyticsSummary).filter(
+            AnalyticsSummary.granularity == HOUR,
+            AnalyticsSummary.date < upto - timedelta(days=settings.METRICS_HOURLY_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+
+        db.commit()
+        return {
+            "hours_updated": len(hours),
+            "days_updated": len(days),
+            "hours_pruned": pruned,
+            "watermark": upto.isoformat()
+        }
+
+    @staticmethod
+    def _compute(db: Session, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Recompute every rollup column for [start, end) from the source tables"""
+        new_users = db.query(func.count(User.id)).filter(
+            User.created_at >= start, User.created_at < end
+        ).scalar() or 0
+
+        documents_created = db.query(func.count(Document.id)).filter(
+            Document.created_at >= start, Document.created_at < end
+        ).scalar() or 0
+
+        payments, revenue = db.query(
+            func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0)
+        ).filter(
+            Payment.status == PaymentStatus.COMPLETED,
+            Payment.created_at >= start,
+            Payment.created_at < end
+        ).one()
+
+        in_period = (PageVisit.created_at >= start, PageVisit.created_at < end)
+        visits, sessions, users, bounces, duration_total, with_duration = db.query(
+            func.count(PageVisit.id),
+            func.count(distinct(PageVisit.session_id)),
+            func.count(distinct(PageVisit.user_id)),
+            func.coalesce(func.sum(case((PageVisit.bounce.is_(True), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((PageVisit.duration > 0, PageVisit.duration), else_=0)), 0),
+            func.coalesce(func.sum(case((PageVisit.duration > 0, 1), else_=0)), 0)
+        ).filter(*in_period).one()
+
+        top_pages = db.query(PageVisit.path, func.count(PageVisit.id)).filter(*in_period).group_by(
+            PageVisit.path
+        ).order_by(func.count(PageVisit.id).desc()).limit(TOP_PAGES_PER_PERIOD).all()
+
+        devices = db.query(PageVisit.device_type, func.count(PageVisit.id)).filter(
+            *in_period, PageVisit.device_type.isnot(None)
+        ).group_by(PageVisit.device_type).all()
+
+        browsers = db.query(PageVisit.browser_name, func.count(PageVisit.id)).filter(
+            *in_period, PageVisit.browser_name.isnot(None)
+        ).group_by(PageVisit.browser_name).all()
+
+        return {
+            "new_users": new_users,
+            "active_users": users,
+            "documents_created": documents_created,
+            "payments_completed": payments,
+            "revenue_amount": float(revenue),
+            "total_visits": visits,
+            "unique_visitors": sessions,
+            "bounce_rate": (bounces / visits * 100) if visits else 0.0,
+            "visit_duration_total": float(duration_total),
+            "visits_with_duration": with_duration,
+            "avg_visit_duration": (duration_total / with_duration) if with_duration else 0.0,
+            "top_pages": json.dumps([{"path": path, "count": count} for path, count in top_pages]),
+            "device_breakdown": json.dumps(dict(devices)),
+            "browser_breakdown": json.dumps(dict(browsers))
+        }
+
+    @staticmethod
+    def _store(db: Session, granularity: str, start: datetime, values: Dict[str, Any]):
+        row = db.query(AnalyticsSummary).filter(
+            AnalyticsSummary.granularity == granularity,
+            AnalyticsSummary.date == start
+        ).first()
+        if row is None:
+            row = AnalyticsSummary(granularity=granularity, date=start)
+            db.add(row)
+        for column, value in values.items():
+            setattr(row, column, value)
+
+    @staticmethod
+    def _as_of(db: Session) -> Optional[datetime]:
+        """Oldest watermark; rollups are complete for rows before it"""
+        marks = dict(db.query(AnalyticsRollupWatermark.source, AnalyticsRollupWatermark.watermark).all())
+        if any(source not in marks for source in ROLLUP_SOURCES):
+            return None
+        return min(marks.values())
+
+    @staticmethod
+    def _live_delta(db: Session, as_of: Optional[datetime], windows: Dict[str, datetime]) -> Dict[str, Dict[str, float]]:
+        """Per-window counts for rows the rollups don't cover yet"""
+        delta = {name: dict.fromkeys(_TOTALS, 0) for name in ("total", *windows)}
+        one = literal_column("1")
+        sources = (
+            ("new_users", User.created_at, one, ()),
+            ("documents_created", Document.created_at, one, ()),
+            ("revenue_amount", Payment.created_at, Payment.amount, (Payment.status == PaymentStatus.COMPLETED,)),
+            ("total_visits", PageVisit.created_at, one, ()),
+        )
+        for key, column, value, conditions in sources:
+            query = db.query(
+                func.coalesce(func.sum(value), 0),
+                *(func.coalesce(func.sum(case((column >= start, value), else_=0)), 0) for start in windows.values())
+            ).filter(*conditions)
+            if as_of is not None:
+                query = query.filter(column >= as_of)
+            row = query.one()
+            delta["total"][key] = row[0]
+            for name, amount in zip(windows, row[1:]):
+                delta[name][key] = amount
+        return delta
+
+    @staticmethod
+    def _merge_counts(rows: Iterable[AnalyticsSummary], attribute: str, limit: int) -> List[tuple]:
+        merged = Counter()
+        for row in rows:
+            raw = getattr(row, attribute)
+            if attribute == "top_pages":
+                merged.update({page["path"]: page["count"] for page in json.loads(raw)} if raw else {})
+            else:
+                merged.update(_counter(raw))
+        return merged.most_common(limit)
+
+    @staticmethod
+    def get_dashboard_metrics(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Totals, growth windows and breakdowns from the rollups plus the live delta"""
+        now = now or datetime.utcnow()
+        today = _day_start(now)
+        windows = {
+            "today": today,
+            "week": today - timedelta(days=7),
+            "month": today - timedelta(days=30)
+        }
+
+        as_of = MetricsRollupService._as_of(db)
+        days = db.query(AnalyticsSummary).filter(AnalyticsSummary.granularity == DAY).all() if as_of else []
+
+        metrics = {name: dict.fromkeys(_TOTALS, 0) for name in ("total", *windows)}
+        duration_total = 0.0
+        with_duration = 0
+        for row in days:
+            for key in _TOTALS:
+                value = getattr(row, key) or 0
+                metrics["total"][key] += value
+                for name, start in windows.items():
+                    if row.date >= start:
+                        metrics[name][key] += value
+            duration_total += row.visit_duration_total or 0
+            with_duration += row.visits_with_duration or 0
+
+        for name, values in MetricsRollupService._live_delta(db, as_of, windows).items():
+            for key, value in values.items():
+                metrics[name][key] += value
+
+        hourly = db.query(AnalyticsSummary).filter(
+            AnalyticsSummary.granularity == HOUR,
+            AnalyticsSummary.date >= now - timedelta(hours=24)
+        ).order_by(AnalyticsSummary.date).all() if as_of else []
+
+        return {
+            "as_of": as_of.isoformat() if as_of else None,
+            "totals": metrics["total"],
+            "windows": {name: metrics[name] for name in windows},
+            "average_visit_duration": (duration_total / with_duration) if with_duration else 0.0,
+            "popular_pages": MetricsRollupService._merge_counts(days, "top_pages", 10),
+            "devices": MetricsRollupService._merge_counts(days, "device_breakdown", 10),
+            "browsers": MetricsRollupService._merge_counts(days, "browser_breakdown", 10),
+            "hourly": [
+                {
+                    "hour": row.date.isoformat(),
+                    "new_users": row.new_users,
+                    "documents_created": row.documents_created,
+                    "revenue": row.revenue_amount,
+                    "visits": row.total_visits
+                }
+                for row in hourly
+            ]
+        }
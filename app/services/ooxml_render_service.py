@@ -0,0 +1,274 @@
+"""
+Streaming OOXML renderer for document generation
+
+Renders a .docx without building the python-docx object model. The template
+is treated as a zip archive: `word/document.xml` is stream-parsed one body
+element at a time and rewritten through a compiled render plan, header and
+footer parts are rewritten whole (they are small), the Normal style is
+updated in `word/styles.xml`, and every other member is decompressed and
+recompressed in chunks with its original compression method. Memory use
+stays flat regardless of page count.
+
+Untouched members are not copied as raw compressed bytes: zipfile has no
+public API for that, and re-emitting local headers means writing through
+its private internals. Their content and CRC are unchanged, but the
+compressed bytes may differ from the template's.
+
+Rewritten parts are parsed with python-docx's own oxml parser settings and
+serialized the same way python-docx saves them, so their XML is byte-identical
+to what the python-docx engine produces for the same plan.
+"""
+
+import copy
+import logging
+import posixpath
+import shutil
+import zipfile
+from typing import Any, Dict, Iterator, Tuple
+
+from lxml import etree
+from docx.oxml.ns import qn
+from docx.oxml.parser import element_class_lookup, parse_xml
+from docx.section import Section
+from docx.shared import Inches, Pt
+from docx.styles.style import StyleFactory
+
+from app.models.template import Template
+from app.services.render_plan_service import (
+    RenderPlan, RenderPlanService, render_paragraph, render_part, W_P
+)
+
+logger = logging.getLogger(__name__)
+
+RENDER_ENGINE_DOCX = "docx"
+RENDER_ENGINE_OOXML = "ooxml"
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+RT_STYLES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+PR_RELATIONSHIP = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+W_BODY = qn("w:body")
+W_PPR = qn("w:pPr")
+W_SECTPR = qn("w:sectPr")
+
+def _serialize(element) -> bytes:
+    """Serialize a part root exactly as python-docx does on save"""
+    return etree.tostring(element, encoding="UTF-8", standalone=True)
+
+
+def _qname(element) -> str:
+    """Prefixed tag name as it appears in serialized XML"""
+    local = etree.QName(element).localname
+    return f"{element.prefix}:{local}" if element.prefix else local
+
+
+def _serialize_in_scope(element) -> bytes:
+    """Serialize a child element as it appears inside its part
+
+    A standalone tostring() re-declares every inherited namespace on the
+    element's start tag; those declarations are stripped so the output matches
+    a whole-tree serialization, keeping any the element declares itself.
+    """
+    serialized = etree.tostring(element, encoding="UTF-8")
+    parent_nsmap = element.getparent().nsmap
+    tag_end = serialized.index(b">")
+    start_tag = serialized[:tag_end]
+
+    for prefix, uri in parent_nsmap.items():
+        if element.nsmap.get(prefix) != uri:
+            continue
+        declaration = f' xmlns:{prefix}="{uri}"' if prefix else f' xmlns="{uri}"'
+        start_tag = start_tag.replace(declaration.encode(), b"", 1)
+
+    return start_tag + serialized[tag_end:]
+
+
+def _rels_targets(archive: zipfile.ZipFile, source: str) -> Dict[str, str]:
+    """Map relationship type -> zip member name for a part's .rels file"""
+    directory, filename = posixpath.split(source)
+    rels_name = posixpath.join(directory, "_rels", f"{filename}.rels")
+    try:
+        rels = etree.fromstring(archive.read(rels_name))
+    except KeyError:
+        return {}
+
+    targets: Dict[str, str] = {}
+    for rel in rels.iter(PR_RELATIONSHIP):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = posixpath.normpath(posixpath.join(directory, rel.get("Target", ""))).lstrip("/")
+        targets.setdefault(rel.get("Type"), target)
+    return targets
+
+
+class OOXMLRenderService:
+    """Zip-level docx renderer driven by compiled render plans"""
+
+    @staticmethod
+    def render(template_path: str, output_path: str, plan: RenderPlan,
+               placeholder_data: Dict[str, Any], template: Template) -> None:
+        """Render a template into output_path without loading it into python-docx"""
+        values = RenderPlanService.resolve_values(plan, placeholder_data)
+
+        with zipfile.ZipFile(template_path) as src, \
+                zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as dst:
+
+            root_targets = _rels_targets(src, "")
+            document_part = root_targets.get(RT_OFFICE_DOCUMENT, "word/document.xml")
+            document_targets = _rels_targets(src, document_part)
+            styles_part = document_targets.get(RT_STYLES)
+
+            for info in src.infolist():
+                name = info.filename
+
+                if name == document_part:
+                    with src.open(info) as reader, OOXMLRenderService._open_member(dst, info) as writer:
+                        OOXMLRenderService._stream_document(reader, writer, plan, values, template)
+                elif name in plan.part_slots:
+                    part = parse_xml(src.read(info))
+                    render_part(part, name, plan, values)
+                    dst.writestr(OOXMLRenderService._member_info(info), _serialize(part))
+                elif name == styles_part:
+                    styles = parse_xml(src.read(info))
+                    OOXMLRenderService._apply_default_font(styles, template)
+                    dst.writestr(OOXMLRenderService._member_info(info), _serialize(styles))
+                else:
+                    OOXMLRenderService._copy_member(src, info, dst)
+
+    @staticmethod
+    def _member_info(info: zipfile.ZipInfo) -> zipfile.ZipInfo:
+        """Fresh ZipInfo for a rewritten member, keeping name and timestamp"""
+        member = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        member.compress_type = zipfile.ZIP_DEFLATED
+        member.external_attr = info.external_attr
+        return member
+
+    @staticmethod
+    def _open_member(dst: zipfile.ZipFile, info: zipfile.ZipInfo):
+        return dst.open(OOXMLRenderService._member_info(info), "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT)
+
+    @staticmethod
+    def _copy_member(src: zipfile.ZipFile, info: zipfile.ZipInfo, dst: zipfile.ZipFile) -> None:
+        """Recompress an untouched member into dst with its original compression method
+
+        The member is inflated and deflated again through ZipFile.open in
+        STREAM_CHUNK_SIZE chunks rather than copied raw, so only its content
+        and CRC are guaranteed to match the template.
+        """
+        member = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        member.compress_type = info.compress_type
+        member.external_attr = info.external_attr
+        member.comment = info.comment
+        with src.open(info) as reader, \
+                dst.open(member, "w", force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as writer:
+            shutil.copyfileobj(reader, writer, STREAM_CHUNK_SIZE)
+
+    @staticmethod
+    def _stream_document(reader, writer, plan: RenderPlan, values: Dict[str, str],
+                         template: Template) -> None:
+        """Rewrite word/document.xml one body element at a time
+
+        The pull parser builds the tree at most one read chunk ahead of the
+        events, and every body child is dropped once written, so only a small
+        window of the document is ever held in memory.
+        """
+        grouped = plan.slots_by_paragraph()
+        margins = template.page_margins or {}
+
+        root = body = None
+        body_empty = b""
+        paragraph_index = 0
+
+        for event, element in OOXMLRenderService._iter_events(reader):
+            if event == "start":
+                if root is None:
+                    root = element
+                elif body is None and element.tag == W_BODY and element.getparent() is root:
+                    body = element
+                    head, body_empty = OOXMLRenderService._document_head(root)
+                    writer.write(head)
+                continue
+
+            if body is not None and element.getparent() is body:
+                # Drop already-written siblings so the tree does not grow
+                while element.getprevious() is not None:
+                    body.remove(element.getprevious())
+
+                if element.tag == W_P:
+                    slots = grouped.get(paragraph_index)
+                    if slots:
+                        render_paragraph(element, slots, values)
+                    paragraph_index += 1
+                    sect_pr = element.find(f"{W_PPR}/{W_SECTPR}")
+                    if sect_pr is not None:
+                        OOXMLRenderService._apply_margins(sect_pr, margins)
+                elif element.tag == W_SECTPR:
+                    OOXMLRenderService._apply_margins(element, margins)
+
+                writer.write(_serialize_in_scope(element))
+
+            elif body is not None and element is body:
+                for child in list(body):
+                    body.remove(child)
+                writer.write(f"</{_qname(body)}>".encode())
+
+            elif body is not None and element is root:
+                # Anything the root holds after w:body is written in document order
+                serialized = _serialize(root)
+                writer.write(serialized[serialized.rindex(body_empty) + len(body_empty):])
+
+        if body is None:
+            raise ValueError("document part has no w:body element")
+
+    @staticmethod
+    def _document_head(root) -> Tuple[bytes, bytes]:
+        """Bytes up to and including <w:body>, plus the empty-body tag itself"""
+        shell = copy.deepcopy(root)
+        shell_body = shell.find(W_BODY)
+        for child in list(shell_body):
+            shell_body.remove(child)
+        while shell_body.getnext() is not None:
+            shell.remove(shell_body.getnext())
+
+        root_close = f"</{_qname(root)}>".encode()
+        serialized = _serialize(shell)[:-len(root_close)]
+        body_start = serialized.rindex(f"<{_qname(shell_body)}".encode())
+        body_empty = serialized[body_start:]
+        return serialized[:body_start] + body_empty[:-2] + b">", body_empty
+
+    @staticmethod
+    def _iter_events(reader) -> Iterator[Tuple[str, Any]]:
+        """Incrementally parse a member with python-docx's oxml element classes"""
+        parser = etree.XMLPullParser(events=("start", "end"), remove_blank_text=True, resolve_entities=False)
+        parser.set_element_class_lookup(element_class_lookup)
+
+        for chunk in iter(lambda: reader.read(STREAM_CHUNK_SIZE), b""):
+            parser.feed(chunk)
+            yield from parser.read_events()
+        parser.close()
+        yield from parser.read_events()
+
+    @staticmethod
+    def _apply_margins(sect_pr, margins: Dict[str, Any]) -> None:
+        """Mirror DocumentService._apply_document_formatting for one section"""
+        section = Section(sect_pr, None)
+        if margins.get('top'):
+            section.top_margin = Inches(margins['top'])
+        if margins.get('bottom'):
+            section.bottom_margin = Inches(margins['bottom'])
+        if margins.get('left'):
+            section.left_margin = Inches(margins['left'])
+        if margins.get('right'):
+            section.right_margin = Inches(margins['right'])
+
+    @staticmethod
+    def _apply_default_font(styles, template: Template) -> None:
+        """Mirror the Normal style font settings of the python-docx engine"""
+        style_element = styles.get_by_name("Normal")
+        if style_element is None:
+            raise KeyError("no style with name 'Normal'")
+        font = StyleFactory(style_element).font
+        font.name = template.font_family
+        font.size = Pt(template.font_size)
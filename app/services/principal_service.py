@@ -0,0 +1,219 @@
+"""
+Cached authenticated principals
+
+Authenticating a request only needs a handful of user fields, so instead of
+a SELECT on users per request the middleware and auth dependencies resolve
+a compact, immutable Principal snapshot through CacheService (process L1 +
+Redis). Entries are keyed by user id and token version and tagged per user.
+
+Invalidation is automatic: an ORM hook notices committed changes to the
+fields a snapshot carries (role, status, deletion, password, token version)
+and drops every cached snapshot for that user in all workers. Changing the
+password also bumps users.token_version, so tokens issued before the change
+stop validating.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from app.models.user import User, UserRole, UserStatus
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_TTL = 300
+PRINCIPAL_NAMESPACE = "principal"
+
+# Permission matrix by role; admins are granted everything
+ROLE_PERMISSIONS: Dict[UserRole, Dict[str, tuple]] = {
+    UserRole.USER: {
+        "documents": ("create", "read", "update", "delete"),
+        "templates": ("read", "use"),
+        "signatures": ("create", "read"),
+        "payments": ("create", "read"),
+        "analytics": ("read",)
+    },
+    UserRole.MODERATOR: {
+        "documents": ("create", "read", "update", "delete"),
+        "templates": ("create", "read", "update", "use"),
+        "signatures": ("create", "read"),
+        "payments": ("create", "read"),
+        "analytics": ("read",)
+    },
+    UserRole.GUEST: {
+        "documents": ("read",),
+        "templates": ("read",),
+        "signatures": ("read",)
+    }
+}
+
+# Columns whose change makes cached snapshots stale
+_SNAPSHOT_COLUMNS = ("role", "status", "deleted_at", "email_verified", "password_hash", "token_version")
+
+
+def role_permissions(role: UserRole) -> FrozenSet[str]:
+    """Permissions granted to a role, as "resource:action" strings"""
+    if role == UserRole.ADMIN:
+        return frozenset({"*"})
+    return frozenset(
+        f"{resource}:{action}"
+        for resource, actions in ROLE_PERMISSIONS.get(role, {}).items()
+        for action in actions
+    )
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Immutable snapshot of the authenticated user"""
+    id: int
+    role: UserRole
+    status: UserStatus
+    token_version: int = 0
+    email_verified: bool = False
+    deleted: bool = False
+    permissions: FrozenSet[str] = field(default_factory=frozenset)
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            role=user.role,
+            status=user.status,
+            token_version=user.token_version or 0,
+            email_verified=bool(user.email_verified),
+            deleted=user.deleted_at is not None,
+            permissions=role_permissions(user.role)
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Principal":
+        return cls(
+            id=data["id"],
+            role=UserRole(data["role"]),
+            status=UserStatus(data["status"]),
+            token_version=data["token_version"],
+            email_verified=data["email_verified"],
+            deleted=data["deleted"],
+            permissions=frozenset(data["permissions"])
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "role": self.role.value,
+            "status": self.status.value,
+            "token_version": self.token_version,
+            "email_verified": self.email_verified,
+            "deleted": self.deleted,
+            "permissions": sorted(self.permissions)
+        }
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == UserStatus.ACTIVE and not self.deleted
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRole.ADMIN
+
+    @property
+    def is_moderator(self) -> bool:
+        return self.role in (UserRole.MODERATOR, UserRole.ADMIN)
+
+    @property
+    def is_guest(self) -> bool:
+        return self.role == UserRole.GUEST
+
+    @property
+    def is_verified(self) -> bool:
+        return self.email_verified
+
+    def has_permission(self, resource: str, action: str) -> bool:
+        return "*" in self.permissions or f"{resource}:{action}" in self.permissions
+
+
+class PrincipalService:
+    """Resolve and invalidate cached principals"""
+
+    @staticmethod
+    async def get_principal(user_id: int, token_version: Optional[int] = None) -> Optional[Principal]:
+        """Snapshot for a user, or None if the user does not exist
+
+        token_version is the "tv" claim of the presented token. Tokens
+        issued before the claim existed pass None and are not version-checked.
+        """
+        key = f"{user_id}:{token_version if token_version is not None else '-'}"
+        data = await cache_service.get_or_compute(
+            key,
+            lambda: PrincipalService._load(user_id),
+            ttl=PRINCIPAL_CACHE_TTL,
+            namespace=PRINCIPAL_NAMESPACE,
+            tags=[PrincipalService._tag(user_id)]
+        )
+        if data is None:
+            return None
+        return Principal.from_dict(data)
+
+    @staticmethod
+    def token_is_current(principal: Principal, payload: Dict[str, Any]) -> bool:
+        """Whether a token payload was issued for the principal's current token version"""
+        token_version = payload.get("tv")
+        return token_version is None or int(token_version) == principal.token_version
+
+    @staticmethod
+    def invalidate(user_id: int) -> int:
+        """Drop every cached snapshot of a user, in all workers"""
+        return cache_service.invalidate_by_tag_sync(PrincipalService._tag(user_id))
+
+    @staticmethod
+    def _load(user_id: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            user = db.get(User, user_id)
+            return Principal.from_user(user).to_dict() if user else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _tag(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_token_version(session, flush_context, instances):
+    """Changing a password revokes tokens issued before the change"""
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if state.attrs.password_hash.history.has_changes() and \
+                    not state.attrs.token_version.history.has_changes():
+                obj.token_version = (obj.token_version or 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_principal_changes(session, flush_context):
+    changed = session.info.setdefault("principal_invalidations", set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _SNAPSHOT_COLUMNS):
+                changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session):
+    for user_id in session.info.pop("principal_invalidations", ()):
+        PrincipalService.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_changes(session):
+    session.info.pop("principal_invalidations", None)
@@ -11,13 +11,24 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from fastapi import HTTPException, status
 
-from app.services.cache_service import CacheService
+from app.services.cache_service import CacheService, cache_service
+from app.services.landing_event_ingest import landing_event_ingest
 from app.services.landing_page_service import LandingPageVisit, LandingPageTemplate
+from app.services.realtime_counters import realtime_counters
 from app.utils.security import sanitize_user_input
 from app.utils.validation import validate_analytics_data
 
 logger = logging.getLogger(__name__)
 
+
+def _json_list(value: Any) -> List[Any]:
+    """Interaction columns hold JSON-encoded lists; rows written as JSON arrays decode as lists"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return list(value)
+    return json.loads(value)
+
 class RealtimeAnalyticsService:
     """Service for real-time analytics tracking and reporting"""
 
@@ -39,35 +50,6 @@ class RealtimeAnalyticsService:
             if not RealtimeAnalyticsService._check_rate_limit(rate_limit_key):
                 logger.warning(f"Rate limit exceeded for session {session_id}")
                 return {"success": False, "error": "rate_limit_exceeded"}
-                
-            # Enhanced session tracking
-            now = timestamp or datetime.utcnow()
-            visit = db.query(LandingPageVisit).filter(
-                LandingPageVisit.session_id == session_id
-            ).first()
-            
-            if visit:
-                # Update engagement metrics
-                visit.active_time_seconds = RealtimeAnalyticsService._calculate_active_time(
-                    visit.active_time_seconds,
-                    visit.last_interaction_at,
-                    now
-                )
-                
-                # Update bounce classification
-                visit.bounce = False
-                visit.bounce_type = RealtimeAnalyticsService._classify_bounce_type(
-                    visit.created_at,
-                    now,
-                    visit.engagement_depth
-                )
-                
-                # Calculate conversion probability
-                visit.conversion_probability = RealtimeAnalyticsService._calculate_conversion_probability(
-                    visit.engagement_depth,
-                    visit.session_quality_score,
-                    visit.template_interactions
-                )
 
             # Validate and sanitize
             sanitized_data = sanitize_user_input(event_data)
@@ -75,40 +57,20 @@ class RealtimeAnalyticsService:
             if not validation_result["valid"]:
                 return {"success": False, "error": "invalid_data"}
 
-            @staticmethod
-            def _calculate_active_time(current_active_time: int, last_interaction: datetime, current_time: datetime) -> int:
-                """Calculate active time based on interaction gaps"""
-                if not last_interaction:
-                    return current_active_time
-                gap = (current_time - last_interaction).total_seconds()
-                if gap < 300:  # Consider gaps less than 5 minutes as active time
-                    return current_active_time + int(gap)
-                return current_active_time
-
-            @staticmethod
-            def _classify_bounce_type(created_at: datetime, current_time: datetime, engagement_depth: int) -> str:
-                """Classify bounce type based on session duration and engagement"""
-                duration = (current_time - created_at).total_seconds()
-                if duration < 10:
-                    return "quick"
-                elif duration < 30 and engagement_depth < 2:
-                    return "normal"
-                return "delayed"
-
-            @staticmethod
-            def _calculate_conversion_probability(engagement_depth: int, quality_score: float, interactions: str) -> float:
-                """Calculate probability of conversion using engagement metrics"""
-                base_score = min(quality_score * 0.4 + engagement_depth * 0.3, 1.0)
-                
-                if not interactions:
-                    return base_score
-                    
-                interaction_data = json.loads(interactions)
-                interaction_score = min(len(interaction_data) * 0.1, 0.3)
-                
-                return min(base_score + interaction_score, 1.0)
-
-            # Get visit record
+            current_time = timestamp or datetime.utcnow()
+
+            # Hand the event to the ingest worker; the visit row is updated in a batch
+            if landing_event_ingest.publish(
+                event_type,
+                session_id,
+                sanitized_data,
+                idempotency_key=sanitized_data.get("event_id"),
+                timestamp=current_time
+            ):
+                await RealtimeAnalyticsService._update_realtime_metrics(db, event_type, sanitized_data, session_id)
+                return {"success": True, "event_tracked": True, "queued": True}
+
+            # Stream unavailable, update the visit record directly
             visit = db.query(LandingPageVisit).filter(
                 LandingPageVisit.session_id == session_id
             ).with_for_update().first()
@@ -116,33 +78,13 @@ class RealtimeAnalyticsService:
             if not visit:
                 return {"success": False, "error": "visit_not_found"}
 
-            # Update metrics based on event type
-            current_time = timestamp or datetime.utcnow()
-            
-            if visit.first_interaction_at is None:
-                visit.first_interaction_at = current_time
-                visit.bounce = False
-            
-            visit.last_interaction_at = current_time
-            
-            # Track interaction by type
-            if event_type == "page_view":
-                RealtimeAnalyticsService._track_page_view(visit, sanitized_data)
-            elif event_type == "template_interaction":
-                RealtimeAnalyticsService._track_template_interaction(visit, sanitized_data)
-            elif event_type == "form_interaction":
-                RealtimeAnalyticsService._track_form_interaction(visit, sanitized_data)
-            elif event_type == "scroll":
-                RealtimeAnalyticsService._track_scroll(visit, sanitized_data)
-            
-            # Update session quality score
-            visit.session_quality_score = RealtimeAnalyticsService._calculate_session_quality(visit)
-            
+            RealtimeAnalyticsService.apply_interaction(visit, event_type, sanitized_data, current_time)
+
             # Commit changes
             db.commit()
-            
+
             # Update real-time cache
-            await RealtimeAnalyticsService._update_realtime_metrics(db, event_type, sanitized_data)
+            await RealtimeAnalyticsService._update_realtime_metrics(db, event_type, sanitized_data, session_id)
 
             return {
                 "success": True,
@@ -157,15 +99,97 @@ class RealtimeAnalyticsService:
                 detail="Failed to track interaction"
             )
 
+    @staticmethod
+    def apply_interaction(
+        visit: LandingPageVisit,
+        event_type: str,
+        data: Dict[str, Any],
+        current_time: datetime
+    ) -> None:
+        """Fold one interaction into a visit; shared by the request path and the ingest worker"""
+        # Update engagement metrics
+        visit.active_time_seconds = RealtimeAnalyticsService._calculate_active_time(
+            visit.active_time_seconds or 0,
+            visit.last_interaction_at,
+            current_time
+        )
+        if visit.last_interaction_at is None or current_time > visit.last_interaction_at:
+            visit.last_interaction_at = current_time
+        visit.clicks_count = (visit.clicks_count or 0) + 1
+
+        # Track interaction by type
+        if event_type == "page_view":
+            RealtimeAnalyticsService._track_page_view(visit, data, current_time)
+        elif event_type == "template_interaction":
+            RealtimeAnalyticsService._track_template_interaction(visit, data, current_time)
+        elif event_type == "form_interaction":
+            RealtimeAnalyticsService._track_form_interaction(visit, data, current_time)
+        elif event_type == "scroll":
+            RealtimeAnalyticsService._track_scroll(visit, data)
+
+        # Update bounce classification
+        visit.bounce = False
+        if visit.created_at:
+            visit.bounce_type = RealtimeAnalyticsService._classify_bounce_type(
+                visit.created_at,
+                current_time,
+                visit.engagement_depth or 0
+            )
+
+        # Update session quality score and conversion probability
+        visit.session_quality_score = RealtimeAnalyticsService._calculate_session_quality(visit)
+        visit.conversion_probability = RealtimeAnalyticsService._calculate_conversion_probability(
+            visit.engagement_depth or 0,
+            visit.session_quality_score,
+            visit.template_interactions
+        )
+
+    @staticmethod
+    def _calculate_active_time(current_active_time: int, last_interaction: Optional[datetime], current_time: datetime) -> int:
+        """Calculate active time based on interaction gaps"""
+        if not last_interaction:
+            return current_active_time
+        gap = (current_time - last_interaction).total_seconds()
+        if 0 < gap < 300:  # Consider gaps less than 5 minutes as active time
+            return current_active_time + int(gap)
+        return current_active_time
+
+    @staticmethod
+    def _classify_bounce_type(created_at: datetime, current_time: datetime, engagement_depth: int) -> str:
+        """Classify bounce type based on session duration and engagement"""
+        duration = (current_time - created_at).total_seconds()
+        if duration < 10:
+            return "quick"
+        elif duration < 30 and engagement_depth < 2:
+            return "normal"
+        return "delayed"
+
+    @staticmethod
+    def _calculate_conversion_probability(engagement_depth: int, quality_score: float, interactions: Any) -> float:
+        """Calculate probability of conversion using engagement metrics"""
+        base_score = min(quality_score * 0.4 + engagement_depth * 0.3, 1.0)
+
+        interaction_data = _json_list(interactions)
+        if not interaction_data:
+            return base_score
+
+        interaction_score = min(len(interaction_data) * 0.1, 0.3)
+
+        return min(base_score + interaction_score, 1.0)
+
     @staticmethod
     async def get_realtime_metrics(db: Session) -> Dict[str, Any]:
         """Get real-time analytics metrics with caching"""
         try:
+            # Served from the Redis counters; the queries below only run without them
+            snapshot = realtime_counters.snapshot()
+            if snapshot is not None:
+                return {"timestamp": datetime.utcnow().isoformat(), **snapshot}
+
             cache_key = f"{RealtimeAnalyticsService.CACHE_PREFIX}realtime_metrics"
-            cached_data = await CacheService.get(cache_key)
-            
+            cached_data = await cache_service.get(cache_key)
             if cached_data:
-                return json.loads(cached_data)
+                return cached_data
 
             current_time = datetime.utcnow()
             last_minute = current_time - timedelta(minutes=1)
@@ -177,7 +201,8 @@ class RealtimeAnalyticsService:
             ).count()
 
             conversions_last_minute = db.query(LandingPageVisit).filter(
-                LandingPageVisit.converted_at >= last_minute
+                LandingPageVisit.registered.is_(True),
+                LandingPageVisit.last_interaction_at >= last_minute
             ).count()
 
             page_views_last_minute = db.query(func.sum(LandingPageVisit.templates_viewed_count)).filter(
@@ -211,7 +236,7 @@ class RealtimeAnalyticsService:
             }
 
             # Cache for 30 seconds
-            await CacheService.set(cache_key, json.dumps(metrics), expire_in=30)
+            await cache_service.set(cache_key, metrics, expire=30)
 
             return metrics
 
@@ -234,37 +259,37 @@ class RealtimeAnalyticsService:
             return True  # Allow if Redis is down
 
     @staticmethod
-    def _track_page_view(visit: LandingPageVisit, data: Dict[str, Any]):
+    def _track_page_view(visit: LandingPageVisit, data: Dict[str, Any], current_time: Optional[datetime] = None):
         """Track page view interaction"""
-        pages = json.loads(visit.pages_viewed or "[]")
+        pages = _json_list(visit.pages_viewed)
         pages.append({
             "page": data["page"],
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": (current_time or datetime.utcnow()).isoformat(),
             "time_on_page": data.get("time_on_page", 0)
         })
         visit.pages_viewed = json.dumps(pages)
 
     @staticmethod
-    def _track_template_interaction(visit: LandingPageVisit, data: Dict[str, Any]):
+    def _track_template_interaction(visit: LandingPageVisit, data: Dict[str, Any], current_time: Optional[datetime] = None):
         """Track template interaction"""
-        interactions = json.loads(visit.template_interactions or "[]")
+        interactions = _json_list(visit.template_interactions)
         interactions.append({
             "template_id": data["template_id"],
             "action": data["action"],
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": (current_time or datetime.utcnow()).isoformat(),
             "duration": data.get("duration", 0)
         })
         visit.template_interactions = json.dumps(interactions)
-        visit.templates_viewed_count += 1
+        visit.templates_viewed_count = (visit.templates_viewed_count or 0) + 1
 
     @staticmethod
-    def _track_form_interaction(visit: LandingPageVisit, data: Dict[str, Any]):
+    def _track_form_interaction(visit: LandingPageVisit, data: Dict[str, Any], current_time: Optional[datetime] = None):
         """Track form interaction"""
-        interactions = json.loads(visit.form_interactions or "[]")
+        interactions = _json_list(visit.form_interactions)
         interactions.append({
             "field_id": data["field_id"],
             "action": data["action"],
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": (current_time or datetime.utcnow()).isoformat()
         })
         visit.form_interactions = json.dumps(interactions)
         visit.last_interaction_field = data["field_id"]
@@ -273,7 +298,7 @@ class RealtimeAnalyticsService:
     @staticmethod
     def _track_scroll(visit: LandingPageVisit, data: Dict[str, Any]):
         """Track scroll depth"""
-        visit.scroll_depth = max(visit.scroll_depth, data.get("scroll_depth", 0))
+        visit.scroll_depth = max(visit.scroll_depth or 0, data.get("scroll_depth", 0))
 
     @staticmethod
     def _calculate_session_quality(visit: LandingPageVisit) -> float:
@@ -281,17 +306,17 @@ class RealtimeAnalyticsService:
         score = 0.0
         
         # Base engagement metrics
-        if visit.templates_viewed_count > 0:
+        if (visit.templates_viewed_count or 0) > 0:
             score += min(visit.templates_viewed_count * 0.2, 2.0)
         
-        if visit.time_on_page_seconds > 0:
+        if (visit.time_on_page_seconds or 0) > 0:
             score += min(visit.time_on_page_seconds / 60.0, 2.0)
         
-        if visit.scroll_depth > 0:
+        if (visit.scroll_depth or 0) > 0:
             score += (visit.scroll_depth / 100.0)
         
         # Form engagement
-        if visit.form_completion > 0:
+        if (visit.form_completion or 0) > 0:
             score += (visit.form_completion * 2.0)
         
         # Conversion actions
@@ -310,24 +335,16 @@ class RealtimeAnalyticsService:
     async def _update_realtime_metrics(
         db: Session,
         event_type: str,
-        event_data: Dict[str, Any]
+        event_data: Dict[str, Any],
+        session_id: Optional[str] = None
     ):
-        """Update real-time metrics in cache"""
+        """Count the event in the realtime sliding-window counters"""
         try:
-            current_minute = datetime.utcnow().replace(second=0, microsecond=0)
-            cache_key = f"{RealtimeAnalyticsService.CACHE_PREFIX}events:{current_minute.isoformat()}"
-            
-            events = json.loads(await CacheService.get(cache_key) or "{}")
-            
-            # Update event counts
-            events[event_type] = events.get(event_type, 0) + 1
-            
-            # Track template-specific metrics
-            if "template_id" in event_data:
-                template_key = f"template:{event_data['template_id']}"
-                events[template_key] = events.get(template_key, 0) + 1
-            
-            await CacheService.set(cache_key, json.dumps(events), expire_in=300)  # Keep for 5 minutes
+            realtime_counters.record(
+                event_type,
+                session_id=session_id,
+                template_id=event_data.get("template_id")
+            )
 
         except Exception as e:
             logger.error(f"Failed to update realtime metrics: {e}")
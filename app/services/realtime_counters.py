@@ -0,0 +1,153 @@
+"""
+Sliding-window realtime counters
+
+get_realtime_metrics used to COUNT landing_visits for active sessions and
+conversions, and ranked templates by joining landing_page_templates on a
+JSON contains() match, a full scan of recent visits per refresh. Events now
+update Redis as they are tracked, and the realtime view reads a fixed number
+of small keys:
+
+- rt:ev:<second>           hash of event type -> count, one per second
+- rt:ses:<bucket>          HyperLogLog of session ids per
+                           REALTIME_SESSION_BUCKET_SECONDS bucket; PFCOUNT
+                           over the buckets in the window gives the union
+- rt:tpl:<minute>          sorted set of template id -> interactions
+- rt:tplv:<id>:<minute>    HyperLogLog of sessions that viewed a template
+
+Every key expires shortly after it leaves REALTIME_ACTIVE_WINDOW_SECONDS, so
+memory stays bounded regardless of traffic. Reads cost one pipeline whatever
+the event rate; top templates are ranked from the busiest candidates in the
+minute sets, then by distinct viewers.
+
+Counts are approximate (HyperLogLog error is about 0.8%). When Redis is
+unavailable, snapshot() returns None and callers fall back to the database.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "rt:"
+EVENT_WINDOW = 60  # seconds summed for per-minute rates
+CANDIDATES_PER_MINUTE = 20
+
+CONVERSION = "conversion"
+
+
+class RealtimeCounters:
+    """Per-second event counters and HyperLogLog session sets in Redis"""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self._redis_client = redis_client
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not (settings.REDIS_ENABLED and settings.REALTIME_COUNTERS_ENABLED):
+            return None
+        if self._redis_client is None:
+            self._redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+        return self._redis_client
+
+    @staticmethod
+    def _ttl() -> int:
+        return settings.REALTIME_ACTIVE_WINDOW_SECONDS + 120
+
+    def record(self, event_type: str, session_id: Optional[str] = None,
+               template_id: Optional[Any] = None, now: Optional[float] = None) -> bool:
+        """Count one event; False when Redis is unavailable"""
+        client = self._redis()
+        if client is None:
+            return False
+
+        now = int(now or time.time())
+        minute = now // 60
+        ttl = self._ttl()
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.hincrby(f"{PREFIX}ev:{now}", event_type, 1)
+            pipe.expire(f"{PREFIX}ev:{now}", EVENT_WINDOW + 60)
+            if session_id:
+                bucket = now // settings.REALTIME_SESSION_BUCKET_SECONDS
+                pipe.pfadd(f"{PREFIX}ses:{bucket}", session_id)
+                pipe.expire(f"{PREFIX}ses:{bucket}", ttl)
+            if template_id is not None:
+                pipe.zincrby(f"{PREFIX}tpl:{minute}", 1, str(template_id))
+                pipe.expire(f"{PREFIX}tpl:{minute}", ttl)
+                if session_id:
+                    pipe.pfadd(f"{PREFIX}tplv:{template_id}:{minute}", session_id)
+                    pipe.expire(f"{PREFIX}tplv:{template_id}:{minute}", ttl)
+            pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.debug(f"Realtime counters unavailable: {e}")
+            return False
+
+    def snapshot(self, now: Optional[float] = None, top: int = None) -> Optional[Dict[str, Any]]:
+        """Active sessions, per-minute rates and top templates, or None without Redis"""
+        client = self._redis()
+        if client is None:
+            return None
+
+        now = int(now or time.time())
+        window = settings.REALTIME_ACTIVE_WINDOW_SECONDS
+        bucket_seconds = settings.REALTIME_SESSION_BUCKET_SECONDS
+        minutes = list(range((now - window) // 60 + 1, now // 60 + 1))
+        session_buckets = range((now - window) // bucket_seconds + 1, now // bucket_seconds + 1)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for second in range(now - EVENT_WINDOW + 1, now + 1):
+                pipe.hmget(f"{PREFIX}ev:{second}", "page_view", CONVERSION)
+            pipe.pfcount(*[f"{PREFIX}ses:{bucket}" for bucket in session_buckets])
+            for minute in minutes:
+                pipe.zrevrange(f"{PREFIX}tpl:{minute}", 0, CANDIDATES_PER_MINUTE - 1, withscores=True)
+            results = pipe.execute()
+
+            per_second = results[:EVENT_WINDOW]
+            active_sessions = results[EVENT_WINDOW]
+            interactions: Dict[str, float] = {}
+            for ranking in results[EVENT_WINDOW + 1:]:
+                for member, score in ranking:
+                    member = member.decode() if isinstance(member, bytes) else member
+                    interactions[member] = interactions.get(member, 0) + score
+
+            top_templates = self._top_templates(client, interactions, minutes, top or settings.REALTIME_TOP_TEMPLATES)
+        except redis.RedisError as e:
+            logger.warning(f"Realtime counters unavailable, using database: {e}")
+            return None
+
+        return {
+            "active_sessions": active_sessions,
+            "page_views_per_minute": sum(int(views or 0) for views, _ in per_second),
+            "conversions_per_minute": sum(int(conversions or 0) for _, conversions in per_second),
+            "top_active_templates": top_templates
+        }
+
+    @staticmethod
+    def _top_templates(client: redis.Redis, interactions: Dict[str, float],
+                       minutes: List[int], top: int) -> List[Dict[str, Any]]:
+        """Busiest templates by interactions, ranked by distinct viewers"""
+        candidates = sorted(interactions, key=interactions.get, reverse=True)[:top * 4]
+        if not candidates:
+            return []
+
+        pipe = client.pipeline(transaction=False)
+        for template_id in candidates:
+            pipe.pfcount(*[f"{PREFIX}tplv:{template_id}:{minute}" for minute in minutes])
+        viewers = pipe.execute()
+
+        ranked = sorted(zip(candidates, viewers), key=lambda item: (-item[1], -interactions[item[0]]))
+        return [
+            {
+                "template_id": int(template_id) if template_id.isdigit() else template_id,
+                "active_viewers": count
+            }
+            for template_id, count in ranked[:top]
+        ]
+
+
+realtime_counters = RealtimeCounters()
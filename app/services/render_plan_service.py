@@ -0,0 +1,521 @@
+"""
+Compiled template render plans for document generation
+
+A render plan is built once per template file: the Placeholder rows are
+queried a single time and every `${name}` token is located in the template
+paragraphs as (run, offset) spans. Generation then substitutes values into
+those pre-located spans in one pass, without re-querying placeholders or
+re-joining paragraph runs for each placeholder.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from docx import Document as DocxDocument
+from docx.enum.text import WD_UNDERLINE
+from docx.opc.constants import CONTENT_TYPE as CT
+from docx.oxml.ns import qn
+from docx.text.run import Run
+
+from config import settings
+from app.models.template import Template, Placeholder
+
+logger = logging.getLogger(__name__)
+
+# Redis client for sharing compiled plans across workers
+redis_client = redis.Redis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    decode_responses=True
+)
+
+# Bump when the plan layout changes so stale Redis entries are ignored
+RENDER_PLAN_VERSION = 2
+
+W_P = qn("w:p")
+W_R = qn("w:r")
+W_T = qn("w:t")
+W_RPR = qn("w:rPr")
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+@dataclass
+class RenderSlot:
+    """A single pre-located placeholder occurrence inside a paragraph"""
+    name: str
+    paragraph_index: int
+    start_run: int
+    start_offset: int
+    end_run: int
+    end_offset: int  # exclusive, relative to end_run
+    placeholder_type: str = "text"
+    casing: str = "none"
+    default_value: Optional[str] = None
+    bold: bool = False
+    italic: bool = False
+    underline: bool = False
+
+
+@dataclass
+class RenderPlan:
+    """Compiled substitution plan for one template file"""
+    template_id: int
+    file_hash: str
+    slots: List[RenderSlot] = field(default_factory=list)
+    # Header/footer slots keyed by zip member name, e.g. "word/header1.xml"
+    part_slots: Dict[str, List[RenderSlot]] = field(default_factory=dict)
+    placeholder_names: List[str] = field(default_factory=list)
+    version: int = RENDER_PLAN_VERSION
+
+    @property
+    def cache_key(self) -> str:
+        return RenderPlanService.plan_key(self.template_id, self.file_hash)
+
+    def slots_by_paragraph(self, part_name: Optional[str] = None) -> Dict[int, List[RenderSlot]]:
+        """Group slots by paragraph, ordered by position within the paragraph"""
+        slots = self.part_slots.get(part_name, []) if part_name else self.slots
+        grouped: Dict[int, List[RenderSlot]] = {}
+        for slot in slots:
+            grouped.setdefault(slot.paragraph_index, []).append(slot)
+        for paragraph_slots in grouped.values():
+            paragraph_slots.sort(key=lambda s: (s.start_run, s.start_offset))
+        return grouped
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RenderPlan":
+        return cls(
+            template_id=data["template_id"],
+            file_hash=data["file_hash"],
+            slots=[RenderSlot(**slot) for slot in data.get("slots", [])],
+            part_slots={
+                part_name: [RenderSlot(**slot) for slot in slots]
+                for part_name, slots in data.get("part_slots", {}).items()
+            },
+            placeholder_names=data.get("placeholder_names", []),
+            version=data.get("version", RENDER_PLAN_VERSION),
+        )
+
+
+def _run_text(run) -> str:
+    """Concatenated w:t text of a run element"""
+    return "".join(t.text or "" for t in run.findall(W_T))
+
+
+def _set_run_text(run, text: str) -> None:
+    """Replace the w:t content of a run element, keeping other run content"""
+    text_nodes = run.findall(W_T)
+    if text_nodes:
+        first = text_nodes[0]
+        for node in text_nodes[1:]:
+            node.getparent().remove(node)
+    else:
+        first = run.makeelement(W_T, {})
+        run.append(first)
+    first.text = text
+    if text != text.strip():
+        first.set(XML_SPACE, "preserve")
+
+
+def _is_empty_run(run) -> bool:
+    """True when a run only carries properties and empty text"""
+    for child in run:
+        if child.tag == W_RPR:
+            continue
+        if child.tag == W_T and not child.text:
+            continue
+        return False
+    return True
+
+
+def _apply_run_formatting(run, slot: RenderSlot) -> None:
+    """Set the placeholder's bold/italic/underline flags on a run
+
+    Every flag is written, so a flag that is off also clears formatting
+    copied from the template run, as generation always has. `run` must be a
+    python-docx CT_R so rPr children are inserted in schema order.
+    """
+    font = Run(run, None).font
+    font.bold = slot.bold
+    font.italic = slot.italic
+    font.underline = WD_UNDERLINE.SINGLE if slot.underline else False
+
+
+def format_placeholder_value(value: Any, placeholder_type: str, casing: str) -> str:
+    """Format placeholder value based on type and casing"""
+    value = "" if value is None else str(value)
+
+    if placeholder_type == "date" and value:
+        try:
+            from dateutil.parser import parse
+            return parse(value).strftime("%B %d, %Y")
+        except (ValueError, OverflowError):
+            pass
+
+    if casing == "upper":
+        return value.upper()
+    elif casing == "lower":
+        return value.lower()
+    elif casing == "title":
+        return value.title()
+
+    return value
+
+
+def render_paragraph(paragraph, slots: List[RenderSlot], values: Dict[str, str]) -> None:
+    """Substitute resolved values into the pre-located slots of one w:p element"""
+    runs = [child for child in paragraph if child.tag == W_R]
+    touched = set()
+
+    # Walk backwards so earlier offsets stay valid while later runs are split
+    for slot in reversed(slots):
+        if slot.end_run >= len(runs):
+            continue
+
+        start_run = runs[slot.start_run]
+        end_run = runs[slot.end_run]
+        start_text = _run_text(start_run)
+        end_text = _run_text(end_run) if end_run is not start_run else start_text
+
+        prefix = start_text[:slot.start_offset]
+        suffix = end_text[slot.end_offset:]
+
+        value_run = copy.deepcopy(start_run)
+        _set_run_text(value_run, values.get(slot.name, ""))
+        _apply_run_formatting(value_run, slot)
+
+        if end_run is start_run:
+            _set_run_text(start_run, prefix)
+            start_run.addnext(value_run)
+            if suffix:
+                suffix_run = copy.deepcopy(start_run)
+                _set_run_text(suffix_run, suffix)
+                value_run.addnext(suffix_run)
+        else:
+            _set_run_text(start_run, prefix)
+            for middle in runs[slot.start_run + 1:slot.end_run]:
+                _set_run_text(middle, "")
+                touched.add(middle)
+            _set_run_text(end_run, suffix)
+            touched.add(end_run)
+            start_run.addnext(value_run)
+
+        touched.add(start_run)
+
+    for run in touched:
+        if run.getparent() is not None and _is_empty_run(run):
+            paragraph.remove(run)
+
+
+def render_body(body, plan: RenderPlan, values: Dict[str, str]) -> None:
+    """Apply a render plan to the w:body element of a document part"""
+    grouped = plan.slots_by_paragraph()
+    if not grouped:
+        return
+
+    for index, paragraph in enumerate(child for child in body if child.tag == W_P):
+        slots = grouped.get(index)
+        if slots:
+            render_paragraph(paragraph, slots, values)
+
+
+def render_part(element, part_name: str, plan: RenderPlan, values: Dict[str, str]) -> None:
+    """Apply the header/footer slots of a render plan to a part's root element"""
+    grouped = plan.slots_by_paragraph(part_name)
+    if not grouped:
+        return
+
+    for index, paragraph in enumerate(list(element.iter(W_P))):
+        slots = grouped.get(index)
+        if slots:
+            render_paragraph(paragraph, slots, values)
+
+
+def _story_parts(doc: DocxDocument):
+    """Yield (zip member name, part) for the header and footer parts of a document"""
+    for part in doc.part.package.iter_parts():
+        if part.content_type in (CT.WML_HEADER, CT.WML_FOOTER):
+            yield part.partname.lstrip("/"), part
+
+
+class RenderPlanService:
+    """Builds, caches and applies compiled template render plans"""
+
+    _plans: "OrderedDict[str, RenderPlan]" = OrderedDict()
+    _file_hashes: Dict[Tuple[str, int, int], str] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def plan_key(template_id: int, file_hash: str) -> str:
+        return f"render_plan:v{RENDER_PLAN_VERSION}:{template_id}:{file_hash}"
+
+    @staticmethod
+    def file_hash(template_path: str) -> str:
+        """SHA256 of the template file, memoised on (path, mtime, size)"""
+        stat = os.stat(template_path)
+        fingerprint = (template_path, stat.st_mtime_ns, stat.st_size)
+
+        cached = RenderPlanService._file_hashes.get(fingerprint)
+        if cached:
+            return cached
+
+        hash_sha256 = hashlib.sha256()
+        with open(template_path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                hash_sha256.update(chunk)
+        digest = hash_sha256.hexdigest()
+
+        with RenderPlanService._lock:
+            if len(RenderPlanService._file_hashes) >= settings.RENDER_PLAN_CACHE_SIZE:
+                RenderPlanService._file_hashes.clear()
+            RenderPlanService._file_hashes[fingerprint] = digest
+        return digest
+
+    @staticmethod
+    def get_plan(db: Session, template: Template, template_path: str) -> RenderPlan:
+        """Get the render plan for a template, compiling it on first use"""
+        file_hash = RenderPlanService.file_hash(template_path)
+        key = RenderPlanService.plan_key(template.id, file_hash)
+
+        plan = RenderPlanService._get_local(key)
+        if plan:
+            return plan
+
+        plan = RenderPlanService._get_remote(key)
+        if plan is None:
+            plan = RenderPlanService.compile_plan(db, template, template_path, file_hash)
+            RenderPlanService._set_remote(plan)
+
+        RenderPlanService._set_local(plan)
+        return plan
+
+    @staticmethod
+    def compile_plan(db: Session, template: Template, template_path: str,
+                     file_hash: str) -> RenderPlan:
+        """Locate every placeholder occurrence in the template paragraphs"""
+        placeholders = db.query(Placeholder).filter(
+            Placeholder.template_id == template.id
+        ).order_by(
+            Placeholder.paragraph_index,
+            Placeholder.start_run_index
+        ).all()
+
+        doc = DocxDocument(template_path)
+        paragraphs = [child for child in doc.element.body if child.tag == W_P]
+
+        plan = RenderPlan(template_id=template.id, file_hash=file_hash)
+        fields: Dict[str, Placeholder] = {}
+        seen = set()
+
+        for placeholder in placeholders:
+            if placeholder.name not in fields:
+                fields[placeholder.name] = placeholder
+                plan.placeholder_names.append(placeholder.name)
+
+            if not 0 <= placeholder.paragraph_index < len(paragraphs):
+                continue
+            paragraph = paragraphs[placeholder.paragraph_index]
+
+            for slot in RenderPlanService._slots_for(paragraph, placeholder.paragraph_index, placeholder):
+                marker = (slot.paragraph_index, slot.start_run, slot.start_offset)
+                if marker not in seen:
+                    seen.add(marker)
+                    plan.slots.append(slot)
+
+        # Headers and footers have no Placeholder rows of their own, so every
+        # known placeholder token is located in them by name
+        for part_name, part in _story_parts(doc):
+            part_slots = []
+            for index, paragraph in enumerate(part.element.iter(W_P)):
+                for placeholder in fields.values():
+                    part_slots.extend(RenderPlanService._slots_for(paragraph, index, placeholder))
+            if part_slots:
+                plan.part_slots[part_name] = part_slots
+
+        return plan
+
+    @staticmethod
+    def _slots_for(paragraph, paragraph_index: int, placeholder: Placeholder) -> List[RenderSlot]:
+        """Build slots for every occurrence of a placeholder token in one paragraph"""
+        run_texts = [_run_text(r) for r in paragraph if r.tag == W_R]
+        return [
+            RenderSlot(
+                name=placeholder.name,
+                paragraph_index=paragraph_index,
+                start_run=start_run,
+                start_offset=start_offset,
+                end_run=end_run,
+                end_offset=end_offset,
+                placeholder_type=placeholder.placeholder_type,
+                casing=placeholder.casing,
+                default_value=placeholder.default_value,
+                bold=bool(placeholder.bold),
+                italic=bool(placeholder.italic),
+                underline=bool(placeholder.underline),
+            )
+            for start_run, start_offset, end_run, end_offset
+            in RenderPlanService._locate(run_texts, f"${{{placeholder.name}}}")
+        ]
+
+    @staticmethod
+    def _locate(run_texts: List[str], token: str) -> List[Tuple[int, int, int, int]]:
+        """Find (start_run, start_offset, end_run, end_offset) spans of a token"""
+        full_text = "".join(run_texts)
+
+        # Map every character position to (run index, offset within run)
+        positions = []
+        for run_index, text in enumerate(run_texts):
+            positions.extend((run_index, offset) for offset in range(len(text)))
+
+        spans = []
+        start = full_text.find(token)
+        while start != -1:
+            end = start + len(token) - 1
+            start_run, start_offset = positions[start]
+            end_run, end_offset = positions[end]
+            spans.append((start_run, start_offset, end_run, end_offset + 1))
+            start = full_text.find(token, start + len(token))
+        return spans
+
+    @staticmethod
+    def resolve_values(plan: RenderPlan, placeholder_data: Dict[str, Any]) -> Dict[str, str]:
+        """Format the submitted values once per placeholder name"""
+        values: Dict[str, str] = {}
+        for slot in plan.slots + [s for slots in plan.part_slots.values() for s in slots]:
+            if slot.name in values:
+                continue
+            value = placeholder_data.get(slot.name, slot.default_value or "")
+            values[slot.name] = format_placeholder_value(value, slot.placeholder_type, slot.casing)
+        return values
+
+    @staticmethod
+    def apply_plan(doc: DocxDocument, plan: RenderPlan, placeholder_data: Dict[str, Any]) -> None:
+        """Substitute placeholder values into a loaded python-docx document"""
+        values = RenderPlanService.resolve_values(plan, placeholder_data)
+        render_body(doc.element.body, plan, values)
+        for part_name, part in _story_parts(doc):
+            render_part(part.element, part_name, plan, values)
+
+    @staticmethod
+    def prime(plan: RenderPlan) -> None:
+        """Seed the process cache with a plan compiled elsewhere, e.g. by a batch coordinator"""
+        RenderPlanService._set_local(plan)
+
+    @staticmethod
+    def invalidate(template_id: int) -> None:
+        """Drop every cached plan for a template (e.g. after placeholder edits)"""
+        prefix = f"render_plan:v{RENDER_PLAN_VERSION}:{template_id}:"
+        with RenderPlanService._lock:
+            for key in [k for k in RenderPlanService._plans if k.startswith(prefix)]:
+                del RenderPlanService._plans[key]
+
+        if not settings.REDIS_ENABLED:
+            return
+        # Plans are registered in a per-template key set as they are shared,
+        # so dropping them never scans the keyspace
+        keys_key = RenderPlanService._template_keys_key(template_id)
+        try:
+            keys = redis_client.smembers(keys_key)
+            redis_client.delete(keys_key, *keys)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate render plans for template {template_id}: {e}")
+
+    @staticmethod
+    def _template_keys_key(template_id: int) -> str:
+        return f"render_plan_keys:v{RENDER_PLAN_VERSION}:{template_id}"
+
+    @staticmethod
+    def _get_local(key: str) -> Optional[RenderPlan]:
+        with RenderPlanService._lock:
+            plan = RenderPlanService._plans.get(key)
+            if plan is not None:
+                RenderPlanService._plans.move_to_end(key)
+            return plan
+
+    @staticmethod
+    def _set_local(plan: RenderPlan) -> None:
+        with RenderPlanService._lock:
+            RenderPlanService._plans[plan.cache_key] = plan
+            RenderPlanService._plans.move_to_end(plan.cache_key)
+            while len(RenderPlanService._plans) > settings.RENDER_PLAN_CACHE_SIZE:
+                RenderPlanService._plans.popitem(last=False)
+
+    @staticmethod
+    def _get_remote(key: str) -> Optional[RenderPlan]:
+        if not settings.REDIS_ENABLED:
+            return None
+        try:
+            raw = redis_client.get(key)
+            if raw:
+                return RenderPlan.from_dict(json.loads(raw))
+        except Exception as e:
+            logger.warning(f"Render plan cache read failed for {key}: {e}")
+        return None
+
+    @staticmethod
+    def _set_remote(plan: RenderPlan) -> None:
+        if not settings.REDIS_ENABLED:
+            return
+        keys_key = RenderPlanService._template_keys_key(plan.template_id)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.setex(plan.cache_key, settings.TEMPLATE_CACHE_TTL, json.dumps(plan.to_dict()))
+            pipe.sadd(keys_key, plan.cache_key)
+            pipe.expire(keys_key, settings.TEMPLATE_CACHE_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Render plan cache write failed for {plan.cache_key}: {e}")
+
+
+# Template columns a plan or its rendered output depends on; counters such
+# as download_count are bumped on every download and must not drop plans
+_PLAN_TEMPLATE_COLUMNS = ("file_path", "font_family", "font_size", "page_margins")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_render_plan_changes(session, flush_context):
+    changed = session.info.setdefault("render_plan_changes", set())
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Placeholder):
+            changed.add(obj.template_id)
+    for obj in session.deleted:
+        if isinstance(obj, Template):
+            changed.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Placeholder):
+            columns = [attr.key for attr in inspect(obj).mapper.column_attrs]
+            template_id = obj.template_id
+        elif isinstance(obj, Template):
+            columns = _PLAN_TEMPLATE_COLUMNS
+            template_id = obj.id
+        else:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in columns):
+            changed.add(template_id)
+        if isinstance(obj, Placeholder):
+            # A placeholder moved to another template leaves the old plan stale too
+            changed.update(state.attrs.template_id.history.deleted or ())
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_render_plans(session):
+    for template_id in session.info.pop("render_plan_changes", set()) - {None}:
+        RenderPlanService.invalidate(template_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_render_plan_changes(session):
+    session.info.pop("render_plan_changes", None)
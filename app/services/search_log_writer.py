@@ -0,0 +1,105 @@
+"""
+Buffered background writer for search telemetry
+
+AdvancedSearchService used to add a SearchQuery row and commit inside every
+search request. Rows now go through a BatchWriter: a bounded in-process queue
+and a daemon thread that bulk-inserts them in batches of
+SEARCH_LOG_BATCH_SIZE rows or every SEARCH_LOG_FLUSH_INTERVAL seconds,
+whichever comes first.
+
+Search logs only feed analytics and suggestions, so unlike the audit writer
+there is no spool: when the queue is full or an insert fails the rows are
+counted as dropped and the request carries on.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from config import settings
+from database import SessionLocal
+from app.services.batch_writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchLogWriterConfig:
+    """Queue and batching settings"""
+    async_writes: bool = settings.SEARCH_LOG_ASYNC_WRITES
+    queue_size: int = settings.SEARCH_LOG_QUEUE_SIZE
+    batch_size: int = settings.SEARCH_LOG_BATCH_SIZE
+    flush_interval: float = settings.SEARCH_LOG_FLUSH_INTERVAL
+
+
+@dataclass
+class SearchLogWriterStats:
+    """Counters for monitoring the writer"""
+    enqueued: int = 0
+    written: int = 0
+    flushes: int = 0
+    dropped: int = 0
+    last_flush: Optional[float] = None
+    last_error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+
+
+class SearchLogWriter(BatchWriter):
+    """Bounded queue plus background bulk-insert thread for SearchQuery rows"""
+
+    thread_name = "search-log-writer"
+
+    def __init__(self, config: Optional[SearchLogWriterConfig] = None):
+        super().__init__(config or SearchLogWriterConfig())
+        self.stats = SearchLogWriterStats()
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        """Queue one SearchQuery row (a dict of column values)"""
+        row.setdefault("created_at", datetime.utcnow())
+        if not self.config.async_writes:
+            self._flush([row])
+            return
+
+        self.stats.enqueued += 1
+        if not self._enqueue(row):
+            self.stats.dropped += 1
+
+    def _flush(self, rows: List[Dict[str, Any]]) -> bool:
+        from app.services.advanced_search_service import SearchQuery
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(SearchQuery), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats.dropped += len(rows)
+            self.stats.last_error = str(e)
+            logger.warning(f"Dropped {len(rows)} search log rows: {e}")
+            return False
+        finally:
+            db.close()
+
+        self.stats.flushes += 1
+        self.stats.written += len(rows)
+        self.stats.last_flush = time.time()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize(),
+            "queue_size": self.config.queue_size,
+            "enqueued": self.stats.enqueued,
+            "written": self.stats.written,
+            "flushes": self.stats.flushes,
+            "dropped": self.stats.dropped,
+            "last_flush": self.stats.last_flush,
+            "last_error": self.stats.last_error,
+        }
+
+
+search_log_writer = SearchLogWriter()
@@ -0,0 +1,199 @@
+"""
+Precomputed search suggestions
+
+Suggestions used to be two queries per search: an ILIKE '%query%' GROUP BY
+over the last 30 days of search_queries, then a match on template names.
+A periodic job (rebuild_search_suggestions_task) now folds recent searches
+that found something, plus public template names, into search_suggestions:
+the top SEARCH_SUGGESTION_LIMIT completions for every prefix of every word
+start, so "agre" completes both "agreement" and "tenancy agreement".
+
+Each worker serves suggestions from an in-process copy of that table. The
+job bumps a version key in Redis after a rebuild and workers reload when
+they see it change (checked every SEARCH_SUGGESTION_SYNC_INTERVAL seconds).
+Without Redis they reload every SEARCH_SUGGESTION_REBUILD_INTERVAL seconds.
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis
+from sqlalchemy import delete, desc, func, insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from app.models.template import Template
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "search:suggestions:version"
+MIN_PREFIX = 3
+MAX_PREFIX = 64  # SearchSuggestion.prefix length
+MAX_SUGGESTION = 255
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: Optional[str]) -> str:
+    return _WHITESPACE_RE.sub(" ", (text or "").lower()).strip()[:MAX_SUGGESTION]
+
+
+def build_prefix_table(candidates: Dict[str, float], limit: int) -> Dict[str, List[Tuple[str, float]]]:
+    """Top completions for every prefix of every word start in the candidates"""
+    table: Dict[str, List[Tuple[str, float]]] = {}
+    for phrase, score in candidates.items():
+        starts = [0] + [match.end() for match in re.finditer(" ", phrase)]
+        seen = set()
+        for start in starts:
+            tail = phrase[start:]
+            for length in range(MIN_PREFIX, min(len(tail), MAX_PREFIX) + 1):
+                prefix = tail[:length]
+                if prefix not in seen:
+                    seen.add(prefix)
+                    table.setdefault(prefix, []).append((phrase, score))
+
+    for prefix, completions in table.items():
+        # Phrases that start with the prefix beat mid-phrase matches on ties
+        completions.sort(key=lambda item: (-item[1], not item[0].startswith(prefix), item[0]))
+        del completions[limit:]
+    return table
+
+
+class SearchSuggestionService:
+    """Rebuilds the suggestion table and serves it from memory"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._table: Optional[Dict[str, List[str]]] = None
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._redis_client: Optional[redis.Redis] = None
+
+    def suggest(self, query: str, limit: int = None) -> List[str]:
+        """Completions for what the user has typed so far"""
+        term = normalize_query(query)
+        if len(term) < MIN_PREFIX:
+            return []
+        completions = self._current().get(term[:MAX_PREFIX], [])
+        if len(term) > MAX_PREFIX:
+            completions = [phrase for phrase in completions if term in phrase]
+        return [phrase for phrase in completions if phrase != term][:limit or settings.SEARCH_SUGGESTION_LIMIT]
+
+    def rebuild(self, db: Session) -> int:
+        """Recompute search_suggestions from recent history; returns rows written"""
+        from app.services.advanced_search_service import SearchQuery, SearchSuggestion
+
+        since = datetime.utcnow() - timedelta(days=settings.SEARCH_SUGGESTION_WINDOW_DAYS)
+        phrase = func.lower(SearchQuery.query_text)
+        searches = db.query(phrase, func.count(SearchQuery.id)).filter(
+            SearchQuery.created_at >= since,
+            SearchQuery.results_count > 0
+        ).group_by(phrase).order_by(desc(func.count(SearchQuery.id))).limit(
+            settings.SEARCH_SUGGESTION_MAX_QUERIES
+        ).all()
+
+        candidates: Dict[str, float] = {}
+        for text, count in searches:
+            term = normalize_query(text)
+            if len(term) >= MIN_PREFIX:
+                candidates[term] = candidates.get(term, 0.0) + count
+
+        # Template names fill in prefixes nobody has searched yet
+        names = db.query(Template.name).filter(
+            Template.is_active == True,
+            Template.is_public == True,
+            Template.deleted_at.is_(None)
+        ).all()
+        for (name,) in names:
+            term = normalize_query(name)
+            if len(term) >= MIN_PREFIX:
+                candidates[term] = candidates.get(term, 0.0) + 1.0
+
+        table = build_prefix_table(candidates, settings.SEARCH_SUGGESTION_LIMIT)
+        built_at = datetime.utcnow()
+        rows = [
+            {"prefix": prefix, "suggestion": suggestion, "score": score, "rank": rank, "built_at": built_at}
+            for prefix, completions in table.items()
+            for rank, (suggestion, score) in enumerate(completions)
+        ]
+
+        # Swap the whole table in one transaction so readers never see it half built
+        db.execute(delete(SearchSuggestion))
+        for start in range(0, len(rows), 1000):
+            db.execute(insert(SearchSuggestion), rows[start:start + 1000])
+        db.commit()
+
+        client = self._redis()
+        if client is not None:
+            try:
+                client.incr(VERSION_KEY)
+            except redis.RedisError as e:
+                logger.warning(f"Failed to publish search suggestion version: {e}")
+        self._table = None
+        return len(rows)
+
+    def _current(self) -> Dict[str, List[str]]:
+        table = self._table
+        now = time.monotonic()
+        if table is not None and now - self._checked_at < settings.SEARCH_SUGGESTION_SYNC_INTERVAL:
+            return table
+
+        with self._lock:
+            self._checked_at = now
+            version = self._remote_version()
+            stale = self._table is None or (
+                self._version != version if version is not None
+                else now - self._loaded_at >= settings.SEARCH_SUGGESTION_REBUILD_INTERVAL
+            )
+            if stale:
+                try:
+                    self._table = self._load()
+                    self._version = version
+                    self._loaded_at = now
+                except Exception as e:
+                    logger.warning(f"Search suggestions unavailable: {e}")
+                    if self._table is None:
+                        return {}
+            return self._table
+
+    def _load(self) -> Dict[str, List[str]]:
+        from app.services.advanced_search_service import SearchSuggestion
+
+        db = self.session_factory()
+        try:
+            rows = db.query(SearchSuggestion.prefix, SearchSuggestion.suggestion).order_by(
+                SearchSuggestion.prefix, SearchSuggestion.rank
+            ).all()
+        finally:
+            db.close()
+
+        table: Dict[str, List[str]] = {}
+        for prefix, suggestion in rows:
+            table.setdefault(prefix, []).append(suggestion)
+        return table
+
+    def _remote_version(self) -> Optional[int]:
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            return int(client.get(VERSION_KEY) or 0)
+        except (redis.RedisError, ValueError):
+            return None
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not settings.REDIS_ENABLED:
+            return None
+        if self._redis_client is None:
+            self._redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+        return self._redis_client
+
+
+search_suggestions = SearchSuggestionService()
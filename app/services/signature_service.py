@@ -24,6 +24,7 @@ from app.schemas.signature import (
     SignatureStats, SignatureValidation
 )
 from app.services.encryption_service import EncryptionService
+from app.services.user_agent_service import user_agent_classifier
 from config import settings
 
 # Configure logging
@@ -436,17 +437,15 @@ class SignatureService:
         """Extract device information from request"""
 
         import json
-        from user_agents import parse
 
-        user_agent_string = request.headers.get("user-agent", "")
-        user_agent = parse(user_agent_string)
+        user_agent = user_agent_classifier.classify(request.headers.get("user-agent", ""))
 
         device_info = {
-            "browser": f"{user_agent.browser.family} {user_agent.browser.version_string}",
-            "os": f"{user_agent.os.family} {user_agent.os.version_string}",
-            "device": user_agent.device.family,
-            "is_mobile": user_agent.is_mobile,
-            "is_tablet": user_agent.is_tablet,
+            "browser": f"{user_agent.browser_name} {user_agent.browser_version or ''}".strip(),
+            "os": f"{user_agent.os_name} {user_agent.os_version or ''}".strip(),
+            "device": user_agent.device_family,
+            "is_mobile": user_agent.device_type == "mobile",
+            "is_tablet": user_agent.device_type == "tablet",
             "is_pc": user_agent.is_pc
         }
 
@@ -0,0 +1,489 @@
+"""
+In-memory inverted index over public templates
+
+Anonymous landing-page search used to run ILIKE queries against templates
+on every keystroke and then score the rows in Python. The public catalog is
+small, so it is now held in process:
+
+- postings: token -> {template_id: field weight} over name, description,
+  category, keywords and tags
+- a prefix trie of every indexed token, for autocomplete and for matching
+  the word still being typed
+- a popularity boost per template (usage, rating, landing conversions,
+  featured), computed when the template is indexed
+
+Workers share one serialized snapshot in Redis. A worker checks the
+snapshot version at most every TEMPLATE_INDEX_SYNC_INTERVAL seconds and
+loads it when it is newer. Commits that touch a template's searchable
+fields or its landing settings queue those ids for a background thread,
+which patches just those entries and publishes a new snapshot. The same
+thread rebuilds the whole index from the database every
+TEMPLATE_INDEX_REBUILD_INTERVAL seconds to refresh popularity, so neither
+runs inside a request. Publishing is a compare-and-set on the version key:
+a worker that lost a race re-syncs from the winner's snapshot and applies
+its change again. Without Redis, each worker keeps its own index.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from app.models.template import Template
+from app.services.cache_codecs import CacheCodec
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "landing:template_index"
+VERSION_KEY = "landing:template_index:version"
+REBUILD_LOCK_KEY = "landing:template_index:rebuild"
+PUBLISH_ATTEMPTS = 5
+
+# Field weights, in the order _calculate_relevance used to score them
+FIELD_WEIGHTS = {"name": 10.0, "description": 5.0, "keywords": 4.0, "tags": 4.0, "category": 3.0}
+# A token only matched by prefix counts for less than an exact word
+PREFIX_MATCH_FACTOR = 0.7
+MAX_PREFIX_EXPANSIONS = 50
+
+STOP_WORDS = {"the", "and", "or", "for", "of", "to", "in", "on", "a", "an", "with", "by"}
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Columns whose change affects what the index holds
+_TEMPLATE_COLUMNS = ("name", "description", "category", "keywords", "tags", "price",
+                     "is_active", "is_public", "deleted_at")
+_LANDING_COLUMNS = ("is_active", "is_featured", "preview_image_url", "template_id")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+@dataclass
+class IndexedTemplate:
+    """What landing search needs to know about a public template"""
+    id: int
+    name: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    keywords: Optional[str] = None
+    tags: List[str] = field(default_factory=list)
+    price: float = 0.0
+    preview_image: Optional[str] = None
+    is_featured: bool = False
+    boost: float = 0.0
+
+    @classmethod
+    def from_rows(cls, template: Template, landing=None) -> "IndexedTemplate":
+        conversions = (landing.conversions_count or 0) if landing else 0
+        is_featured = bool(landing and landing.is_featured)
+        return cls(
+            id=template.id,
+            name=template.name,
+            description=template.description,
+            category=template.category,
+            keywords=template.keywords,
+            tags=[str(tag) for tag in template.tags] if isinstance(template.tags, list) else [],
+            price=template.price or 0.0,
+            preview_image=landing.preview_image_url if landing else None,
+            is_featured=is_featured,
+            boost=(
+                math.log1p(template.usage_count or 0)
+                + (template.rating or 0.0) * 0.5
+                + math.log1p(conversions) * 0.5
+                + (3.0 if is_featured else 0.0)
+            )
+        )
+
+    def field_tokens(self) -> Dict[str, List[str]]:
+        return {
+            "name": tokenize(self.name),
+            "description": tokenize(self.description),
+            "keywords": tokenize(self.keywords),
+            "tags": [token for tag in self.tags for token in tokenize(tag)],
+            "category": tokenize(self.category)
+        }
+
+
+class _TrieNode:
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.terminal = False
+
+
+class TemplateSearchIndex:
+    """Inverted index with a prefix trie
+
+    Not safe to mutate while other threads search it; the manager patches
+    a copy and swaps it in.
+    """
+
+    def __init__(self, entries: Iterable[IndexedTemplate] = (), version: int = 0,
+                 built_at: Optional[float] = None):
+        self.version = version
+        self.built_at = built_at if built_at is not None else time.time()
+        self.entries: Dict[int, IndexedTemplate] = {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self._trie = _TrieNode()
+        for entry in entries:
+            self.upsert(entry)
+
+    def upsert(self, entry: IndexedTemplate) -> None:
+        self.remove(entry.id)
+        self.entries[entry.id] = entry
+        weights: Dict[str, float] = {}
+        for field_name, tokens in entry.field_tokens().items():
+            for token in tokens:
+                weights[token] = max(weights.get(token, 0.0), FIELD_WEIGHTS[field_name])
+        for token, weight in weights.items():
+            if token not in self.postings:
+                self.postings[token] = {}
+                self._insert(token)
+            self.postings[token][entry.id] = weight
+
+    def remove(self, template_id: int) -> None:
+        entry = self.entries.pop(template_id, None)
+        if entry is None:
+            return
+        for tokens in entry.field_tokens().values():
+            for token in tokens:
+                documents = self.postings.get(token)
+                if documents is not None:
+                    documents.pop(template_id, None)
+                    if not documents:
+                        # The trie keeps the word; completion skips tokens without postings
+                        del self.postings[token]
+
+    def _insert(self, token: str) -> None:
+        node = self._trie
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+        node.terminal = True
+
+    def complete(self, prefix: str, limit: int = MAX_PREFIX_EXPANSIONS) -> List[str]:
+        """Indexed words starting with prefix, most common first"""
+        node = self._trie
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+
+        words = []
+        stack = [(node, prefix)]
+        while stack and len(words) < limit * 4:
+            node, word = stack.pop()
+            if node.terminal and word in self.postings:
+                words.append(word)
+            stack.extend((child, word + char) for char, child in node.children.items())
+        words.sort(key=lambda word: (-len(self.postings[word]), word))
+        return words[:limit]
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[IndexedTemplate, float]]:
+        """Templates matching any query word (the last one also by prefix), best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for position, term in enumerate(terms):
+            hits = dict(self.postings.get(term, {}))
+            # Words still being typed, or cut short, match by prefix
+            if position == len(terms) - 1 or not hits:
+                for word in self.complete(term):
+                    if word == term:
+                        continue
+                    for template_id, weight in self.postings[word].items():
+                        hits[template_id] = max(hits.get(template_id, 0.0), weight * PREFIX_MATCH_FACTOR)
+            for template_id, weight in hits.items():
+                scores[template_id] = scores.get(template_id, 0.0) + weight
+                matched[template_id] = matched.get(template_id, 0) + 1
+
+        ranked = [
+            (self.entries[template_id], score * matched[template_id] / len(terms) + self.entries[template_id].boost)
+            for template_id, score in scores.items()
+        ]
+        ranked.sort(key=lambda item: (-item[1], item[0].id))
+        return ranked[:limit]
+
+    def to_snapshot(self) -> Dict:
+        return {
+            "version": self.version,
+            "built_at": self.built_at,
+            "entries": [asdict(entry) for entry in self.entries.values()]
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> "TemplateSearchIndex":
+        return cls(
+            (IndexedTemplate(**entry) for entry in snapshot["entries"]),
+            version=snapshot["version"],
+            built_at=snapshot["built_at"]
+        )
+
+
+class TemplateIndexManager:
+    """Per-process holder of the index, synchronized through Redis"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self.codec = CacheCodec()
+        self._index: Optional[TemplateSearchIndex] = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._redis_client: Optional[redis.Redis] = None
+        # Background refresh state
+        self._pending: Set[int] = set()
+        self._rebuild_requested = False
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def get(self) -> TemplateSearchIndex:
+        """The current index, syncing with the shared snapshot when due
+
+        Never builds inline: until the first build finishes an empty index
+        is returned, and a stale one is served while it is rebuilt.
+        """
+        index = self._index
+        if index is None or time.monotonic() - self._checked_at >= settings.TEMPLATE_INDEX_SYNC_INTERVAL:
+            self._checked_at = time.monotonic()
+            self._pull()
+            index = self._index
+            if index is None or time.time() - index.built_at >= settings.TEMPLATE_INDEX_REBUILD_INTERVAL:
+                self.schedule_rebuild()
+        return index if index is not None else TemplateSearchIndex()
+
+    def schedule_refresh(self, template_ids: Set[int]) -> None:
+        """Re-index templates in the background after a commit"""
+        with self._worker_lock:
+            self._pending |= template_ids
+        self._wake()
+
+    def schedule_rebuild(self) -> None:
+        """Rebuild the whole index in the background"""
+        self._rebuild_requested = True
+        self._wake()
+
+    def _wake(self) -> None:
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="template-index", daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._worker_lock:
+                template_ids, self._pending = self._pending, set()
+            rebuild, self._rebuild_requested = self._rebuild_requested, False
+            try:
+                self._process(template_ids, rebuild)
+            except Exception as e:
+                logger.error(f"Failed to update template index: {e}")
+
+    def _process(self, template_ids: Set[int], rebuild: bool) -> None:
+        """One round of queued work: a full rebuild when due, else a patch"""
+        self._pull()
+        if self._index is None:
+            self.rebuild()
+            return
+        if rebuild and time.time() - self._index.built_at >= settings.TEMPLATE_INDEX_REBUILD_INTERVAL \
+                and self._claim_rebuild():
+            self.rebuild()
+        elif template_ids:
+            self.refresh(template_ids)
+
+    def _remote_version(self) -> Optional[int]:
+        """Version of the shared snapshot, or None without Redis"""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            return int(client.get(VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Template index snapshot unavailable: {e}")
+            return None
+
+    def _pull(self) -> None:
+        """Load the shared snapshot when it is newer than ours"""
+        remote = self._remote_version()
+        if remote is None or remote <= (self._index.version if self._index else 0):
+            return
+        try:
+            payload = self._redis().get(SNAPSHOT_KEY)
+            if payload:
+                index = TemplateSearchIndex.from_snapshot(self.codec.decode(payload))
+                # The background thread may have published a newer one meanwhile
+                if index.version > (self._index.version if self._index else 0):
+                    self._index = index
+        except Exception as e:
+            logger.warning(f"Template index snapshot unavailable: {e}")
+
+    def rebuild(self) -> TemplateSearchIndex:
+        """Index every public template from the database and publish it"""
+        with self._lock:
+            for _ in range(PUBLISH_ATTEMPTS):
+                # Read the version first: a publish after it means our rows may be older
+                version = self._remote_version()
+                db = self.session_factory()
+                try:
+                    index = TemplateSearchIndex(self._load_entries(db))
+                finally:
+                    db.close()
+                if version is None:
+                    version = self._index.version if self._index is not None else 0
+                index.version = version
+                if self._publish(index):
+                    break
+            else:
+                logger.warning("Template index rebuild kept losing publish races; keeping it local")
+            self._index = index
+            return index
+
+    def refresh(self, template_ids: Set[int]) -> None:
+        """Re-index a few templates after they changed"""
+        with self._lock:
+            db = self.session_factory()
+            try:
+                entries = {entry.id: entry for entry in self._load_entries(db, template_ids)}
+            finally:
+                db.close()
+            for _ in range(PUBLISH_ATTEMPTS):
+                # Patch a copy so concurrent readers never see a half-updated index
+                current = self._index
+                index = TemplateSearchIndex(current.entries.values(), current.version, current.built_at)
+                for template_id in template_ids:
+                    if template_id in entries:
+                        index.upsert(entries[template_id])
+                    else:
+                        index.remove(template_id)
+                if self._publish(index):
+                    break
+                # Another worker published first; patch its snapshot instead
+                self._pull()
+            else:
+                logger.warning("Template index refresh kept losing publish races; keeping it local")
+            self._index = index
+
+    @staticmethod
+    def _load_entries(db: Session, template_ids: Optional[Set[int]] = None) -> List[IndexedTemplate]:
+        from app.services.landing_page_service import LandingPageTemplate
+
+        query = db.query(Template, LandingPageTemplate).outerjoin(
+            LandingPageTemplate,
+            (LandingPageTemplate.template_id == Template.id) & (LandingPageTemplate.is_active == True)
+        ).filter(
+            Template.is_active == True,
+            Template.is_public == True,
+            Template.deleted_at.is_(None)
+        )
+        if template_ids is not None:
+            query = query.filter(Template.id.in_(template_ids))
+
+        entries: Dict[int, IndexedTemplate] = {}
+        for template, landing in query:
+            if template.id not in entries or landing is not None:
+                entries[template.id] = IndexedTemplate.from_rows(template, landing)
+        return list(entries.values())
+
+    def _publish(self, index: TemplateSearchIndex) -> bool:
+        """Publish index as the version after the one it was built from
+
+        Compare-and-set on VERSION_KEY: if another worker published since,
+        nothing is written and False tells the caller to re-sync and retry.
+        """
+        client = self._redis()
+        if client is None:
+            return True
+        try:
+            with client.pipeline() as pipe:
+                pipe.watch(VERSION_KEY)
+                if int(pipe.get(VERSION_KEY) or 0) != index.version:
+                    return False
+                snapshot = index.to_snapshot()
+                snapshot["version"] = index.version + 1
+                pipe.multi()
+                pipe.set(SNAPSHOT_KEY, self.codec.encode(snapshot))
+                pipe.set(VERSION_KEY, index.version + 1)
+                pipe.execute()
+            index.version += 1
+            return True
+        except redis.WatchError:
+            return False
+        except Exception as e:
+            logger.warning(f"Failed to publish template index snapshot: {e}")
+            return True
+
+    def _claim_rebuild(self) -> bool:
+        """Let one worker rebuild when the shared index gets stale"""
+        client = self._redis()
+        if client is None:
+            return True
+        try:
+            return bool(client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=60))
+        except Exception:
+            return True
+
+    def _redis(self) -> Optional[redis.Redis]:
+        if not settings.REDIS_ENABLED:
+            return None
+        if self._redis_client is None:
+            self._redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+        return self._redis_client
+
+
+template_search_index = TemplateIndexManager()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_template_changes(session, flush_context):
+    from app.services.landing_page_service import LandingPageTemplate
+
+    changed = session.info.setdefault("template_index_changes", set())
+    for obj in session.new:
+        if isinstance(obj, Template):
+            changed.add(obj.id)
+        elif isinstance(obj, LandingPageTemplate):
+            changed.add(obj.template_id)
+    for obj in session.deleted:
+        if isinstance(obj, Template):
+            changed.add(obj.id)
+        elif isinstance(obj, LandingPageTemplate):
+            changed.add(obj.template_id)
+    for obj in session.dirty:
+        if isinstance(obj, Template):
+            columns = _TEMPLATE_COLUMNS
+        elif isinstance(obj, LandingPageTemplate):
+            columns = _LANDING_COLUMNS
+        else:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in columns):
+            changed.add(obj.id if isinstance(obj, Template) else obj.template_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_changed_templates(session):
+    changed = session.info.pop("template_index_changes", set()) - {None}
+    if changed:
+        template_search_index.schedule_refresh(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_template_changes(session):
+    session.info.pop("template_index_changes", None)
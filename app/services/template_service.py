@@ -23,7 +23,7 @@ from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_, func
+from sqlalchemy import desc, and_, or_, func, event, inspect
 from fastapi import UploadFile, HTTPException, status
 from docx import Document as DocxDocument
 import redis
@@ -35,7 +35,7 @@ from app.models.template_purchase import TemplatePurchase
 from app.models.template_favorite import TemplateFavorite
 from app.models.user import User
 from app.services.batch_process_service import BatchProcessService
-from app.services.cache_service import CacheService
+from app.services.cache_service import CacheService, cache_service
 from app.services.admin_service import AdminService
 from app.services.audit_service import AuditService
 from app.services.wallet_service import WalletService
@@ -482,3 +482,47 @@ class TemplateService:
             return True
 
         return False
+
+
+# Tag of the cached GET /api/templates responses
+TEMPLATE_LIST_CACHE_TAG = "template_list"
+
+# Template columns the list response shows or filters on. The usage,
+# download and preview counters are bumped on every download and are left
+# to catch up when the cached page expires, so they do not clear the tag.
+_TEMPLATE_LIST_COLUMNS = (
+    "name", "description", "category", "type", "file_path", "original_filename",
+    "file_size", "version", "language", "font_family", "font_size", "render_engine",
+    "is_active", "is_public", "is_premium", "price", "rating", "rating_count",
+    "tags", "keywords", "created_by"
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_template_list_changes(session, flush_context):
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, (Template, Placeholder)):
+            session.info["template_list_stale"] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Template):
+            columns = _TEMPLATE_LIST_COLUMNS
+        elif isinstance(obj, Placeholder):
+            columns = [attr.key for attr in inspect(obj).mapper.column_attrs]
+        else:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in columns):
+            session.info["template_list_stale"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_template_lists(session):
+    if session.info.pop("template_list_stale", False):
+        cache_service.invalidate_by_tag_nowait(TEMPLATE_LIST_CACHE_TAG)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_template_list_changes(session):
+    session.info.pop("template_list_stale", None)
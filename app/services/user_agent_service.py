@@ -0,0 +1,246 @@
+"""
+Cached user-agent classification
+
+user_agents.parse runs the full ua-parser regex list on every call, which
+costs hundreds of microseconds, and visit tracking, landing analytics,
+device fingerprinting and signature audit trails parse the same few
+thousand UA strings over and over. UserAgentClassifier puts three layers in
+front of it:
+
+- a bounded LRU keyed by a 16-byte blake2b digest of the UA string, so long
+  strings are not kept as keys
+- precompiled patterns for the browser/OS pairs that make up most traffic
+  (desktop Chrome, Firefox and Safari, Chrome on Android, Safari on iOS).
+  They only match UA strings with no extra product tokens, so Edge, Opera,
+  in-app browsers and the like still go to the full parser. Family names
+  follow ua-parser's
+- user_agents.parse, or keyword matching when it is not installed
+
+classify_many() classifies each distinct string once, for backfills.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    from user_agents import parse as parse_user_agent
+    USER_AGENTS_AVAILABLE = True
+except ImportError:
+    parse_user_agent = None
+    USER_AGENTS_AVAILABLE = False
+
+from config import settings
+
+_BOT_RE = re.compile(r"bot|crawl|spider|slurp|fetch|headless|scrap|curl|wget|python-requests|httpclient", re.I)
+
+_WINDOWS_VERSIONS = {"10.0": "10", "6.3": "8.1", "6.2": "8", "6.1": "7", "6.0": "Vista", "5.1": "XP"}
+
+_WEBKIT = r"AppleWebKit/[\d.]+ \(KHTML, like Gecko\)"
+_DESKTOP_PLATFORM = r"(?:Windows NT (?P<nt>[\d.]+)(?:; [^;)]+)*|Macintosh; Intel Mac OS X (?P<mac>[\d_.]+)|X11; (?:(?P<distro>Ubuntu); )?Linux [\w]+)"
+
+_DESKTOP_CHROME_RE = re.compile(
+    rf"^Mozilla/5\.0 \({_DESKTOP_PLATFORM}\) {_WEBKIT} "
+    r"Chrome/(?P<version>\d+\.\d+\.\d+)\.\d+ Safari/[\d.]+$"
+)
+_DESKTOP_FIREFOX_RE = re.compile(
+    rf"^Mozilla/5\.0 \({_DESKTOP_PLATFORM}; rv:[\d.]+\) Gecko/\d+ Firefox/(?P<version>\d+\.\d+)$"
+)
+_DESKTOP_SAFARI_RE = re.compile(
+    rf"^Mozilla/5\.0 \(Macintosh; Intel Mac OS X (?P<mac>[\d_]+)\) {_WEBKIT} "
+    r"Version/(?P<version>[\d.]+) Safari/[\d.]+$"
+)
+_ANDROID_CHROME_RE = re.compile(
+    rf"^Mozilla/5\.0 \(Linux; Android (?P<os>[\d.]+); (?P<device>[^;)]+)\) {_WEBKIT} "
+    r"Chrome/(?P<version>\d+\.\d+\.\d+)\.\d+ (?P<mobile>Mobile )?Safari/[\d.]+$"
+)
+_IOS_SAFARI_RE = re.compile(
+    r"^Mozilla/5\.0 \((?P<device>iPhone|iPad); CPU (?:iPhone )?OS (?P<os>[\d_]+) like Mac OS X\) "
+    rf"{_WEBKIT} Version/(?P<version>[\d.]+) Mobile/\w+ Safari/[\d.]+$"
+)
+
+
+@dataclass(frozen=True)
+class UserAgentInfo:
+    """Browser, OS and device class of a user agent"""
+    browser_name: str = "Other"
+    browser_version: Optional[str] = None
+    os_name: str = "Other"
+    os_version: Optional[str] = None
+    device_type: str = "desktop"  # desktop, mobile, tablet
+    device_family: str = "Other"
+    is_bot: bool = False
+
+    @property
+    def is_pc(self) -> bool:
+        return self.device_type == "desktop" and not self.is_bot
+
+    def visit_fields(self) -> Dict[str, Any]:
+        """Columns shared by the visit models"""
+        return {
+            "browser_name": self.browser_name,
+            "browser_version": self.browser_version,
+            "os_name": self.os_name,
+            "os_version": self.os_version,
+            "device_type": self.device_type
+        }
+
+
+def _desktop_os(match) -> Dict[str, Any]:
+    if match.group("nt"):
+        return {"os_name": "Windows", "os_version": _WINDOWS_VERSIONS.get(match.group("nt"), match.group("nt"))}
+    if match.group("mac"):
+        return {"os_name": "Mac OS X", "os_version": match.group("mac").replace("_", "."), "device_family": "Mac"}
+    return {"os_name": match.group("distro") or "Linux", "os_version": None}
+
+
+def _fast_path(user_agent: str) -> Optional[UserAgentInfo]:
+    """Classify the most common UA shapes without the full parser"""
+    if not user_agent.startswith("Mozilla/5.0 ("):
+        return None
+
+    match = _DESKTOP_CHROME_RE.match(user_agent)
+    if match:
+        return UserAgentInfo(browser_name="Chrome", browser_version=match.group("version"), **_desktop_os(match))
+
+    match = _ANDROID_CHROME_RE.match(user_agent)
+    if match:
+        mobile = bool(match.group("mobile"))
+        return UserAgentInfo(
+            browser_name="Chrome Mobile" if mobile else "Chrome",
+            browser_version=match.group("version"),
+            os_name="Android",
+            os_version=match.group("os"),
+            device_type="mobile" if mobile else "tablet",
+            device_family=match.group("device")
+        )
+
+    match = _IOS_SAFARI_RE.match(user_agent)
+    if match:
+        return UserAgentInfo(
+            browser_name="Mobile Safari",
+            browser_version=match.group("version"),
+            os_name="iOS",
+            os_version=match.group("os").replace("_", "."),
+            device_type="mobile" if match.group("device") == "iPhone" else "tablet",
+            device_family=match.group("device")
+        )
+
+    match = _DESKTOP_FIREFOX_RE.match(user_agent)
+    if match:
+        return UserAgentInfo(browser_name="Firefox", browser_version=match.group("version"), **_desktop_os(match))
+
+    match = _DESKTOP_SAFARI_RE.match(user_agent)
+    if match:
+        return UserAgentInfo(
+            browser_name="Safari",
+            browser_version=match.group("version"),
+            os_name="Mac OS X",
+            os_version=match.group("mac").replace("_", "."),
+            device_family="Mac"
+        )
+    return None
+
+
+def _full_parse(user_agent: str) -> UserAgentInfo:
+    if USER_AGENTS_AVAILABLE:
+        ua = parse_user_agent(user_agent)
+        return UserAgentInfo(
+            browser_name=ua.browser.family,
+            browser_version=ua.browser.version_string or None,
+            os_name=ua.os.family,
+            os_version=ua.os.version_string or None,
+            device_type="mobile" if ua.is_mobile else "tablet" if ua.is_tablet else "desktop",
+            device_family=ua.device.family,
+            is_bot=ua.is_bot
+        )
+
+    # Basic keyword matching when the user-agents package is not installed
+    ua_lower = user_agent.lower()
+
+    browser = "Other"
+    if "edg" in ua_lower:
+        browser = "Edge"
+    elif "chrome" in ua_lower:
+        browser = "Chrome"
+    elif "firefox" in ua_lower:
+        browser = "Firefox"
+    elif "safari" in ua_lower:
+        browser = "Safari"
+
+    os_name = "Other"
+    if "windows" in ua_lower:
+        os_name = "Windows"
+    elif "android" in ua_lower:
+        os_name = "Android"
+    elif "iphone" in ua_lower or "ipad" in ua_lower:
+        os_name = "iOS"
+    elif "mac os" in ua_lower:
+        os_name = "Mac OS X"
+    elif "linux" in ua_lower:
+        os_name = "Linux"
+
+    device_type = "desktop"
+    if any(x in ua_lower for x in ["ipad", "tablet"]):
+        device_type = "tablet"
+    elif any(x in ua_lower for x in ["mobile", "android", "iphone"]):
+        device_type = "mobile"
+
+    return UserAgentInfo(browser_name=browser, os_name=os_name, device_type=device_type,
+                         is_bot=bool(_BOT_RE.search(user_agent)))
+
+
+class UserAgentClassifier:
+    """Fast-path and LRU-cached user agent parsing"""
+
+    def __init__(self, cache_size: int = settings.USER_AGENT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, UserAgentInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.fast_path = 0
+        self.full_parses = 0
+
+    def classify(self, user_agent: Optional[str]) -> UserAgentInfo:
+        if not user_agent:
+            return UserAgentInfo(browser_name="Unknown", os_name="Unknown")
+
+        key = hashlib.blake2b(user_agent.encode("utf-8", "replace"), digest_size=16).digest()
+        with self._lock:
+            info = self._cache.get(key)
+            if info is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return info
+
+        info = _fast_path(user_agent)
+        if info is not None:
+            self.fast_path += 1
+        else:
+            info = _full_parse(user_agent)
+            self.full_parses += 1
+
+        with self._lock:
+            self._cache[key] = info
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return info
+
+    def classify_many(self, user_agents: Iterable[Optional[str]]) -> Dict[Optional[str], UserAgentInfo]:
+        """Classify each distinct user agent once"""
+        return {user_agent: self.classify(user_agent) for user_agent in set(user_agents)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "fast_path": self.fast_path,
+            "full_parses": self.full_parses,
+        }
+
+
+user_agent_classifier = UserAgentClassifier()
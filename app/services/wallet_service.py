@@ -15,6 +15,7 @@ from database import Base
 from app.models.user import User
 from app.services.audit_service import AuditService
 from app.services.payment_service import PaymentService
+from app.utils.pagination import paginate
 
 
 class TransactionType(str, Enum):
@@ -446,14 +447,15 @@ class WalletService:
     @staticmethod
     def get_transaction_history(db: Session, user_id: int, page: int = 1, per_page: int = 20,
                                transaction_type: str = None, start_date: datetime = None,
-                               end_date: datetime = None) -> Dict:
-        """Get wallet transaction history"""
+                               end_date: datetime = None, cursor: str = None,
+                               exact_count: bool = False) -> Dict:
+        """Get wallet transaction history, newest first"""
 
         wallet = WalletService.get_or_create_wallet(db, user_id)
 
         query = db.query(WalletTransaction).filter(
             WalletTransaction.wallet_id == wallet.id
-        ).order_by(desc(WalletTransaction.created_at))
+        )
 
         # Apply filters
         if transaction_type:
@@ -465,18 +467,19 @@ class WalletService:
         if end_date:
             query = query.filter(WalletTransaction.created_at <= end_date)
 
-        # Get total count
-        total = query.count()
-
-        # Apply pagination
-        transactions = query.offset((page - 1) * per_page).limit(per_page).all()
+        result = paginate(
+            query, [(WalletTransaction.created_at, True)], WalletTransaction.id, per_page,
+            cursor=cursor, page=page, exact_count=exact_count
+        )
 
         return {
-            "transactions": [WalletService._format_transaction(t) for t in transactions],
-            "total": total,
+            "transactions": [WalletService._format_transaction(t) for t in result.items],
+            "total": result.total,
+            "total_is_estimate": result.total_is_estimate,
             "page": page,
             "per_page": per_page,
-            "pages": (total + per_page - 1) // per_page
+            "pages": result.pages(per_page),
+            "next_cursor": result.next_cursor
         }
 
     @staticmethod
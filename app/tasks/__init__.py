@@ -5,6 +5,8 @@ Background tasks for MyTypist
 from .document_tasks import (
     generate_document_task,
     generate_batch_documents_task,
+    generate_document_chunk_task,
+    finalize_batch_generation_task,
     cleanup_temporary_files_task
 )
 from .payment_tasks import (
@@ -17,15 +19,25 @@ from .cleanup_tasks import (
     cleanup_expired_documents_task,
     cleanup_unused_files_task
 )
+from .analytics_tasks import (
+    rollup_dashboard_metrics_task,
+    rebuild_search_suggestions_task,
+    ingest_landing_events_task
+)
 
 __all__ = [
     "generate_document_task",
     "generate_batch_documents_task", 
+    "generate_document_chunk_task",
+    "finalize_batch_generation_task",
     "cleanup_temporary_files_task",
     "process_payment_webhook_task",
     "update_subscription_status_task",
     "send_payment_notification_task",
     "cleanup_old_audit_logs_task",
     "cleanup_expired_documents_task",
-    "cleanup_unused_files_task"
+    "cleanup_unused_files_task",
+    "rollup_dashboard_metrics_task",
+    "rebuild_search_suggestions_task",
+    "ingest_landing_events_task"
 ]
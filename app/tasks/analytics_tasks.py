@@ -0,0 +1,94 @@
+"""
+Analytics rollup tasks
+"""
+
+from celery import Celery
+
+from config import settings
+from database import SessionLocal
+from app.services.landing_event_ingest import landing_event_ingest
+from app.services.metrics_rollup_service import MetricsRollupService
+from app.services.search_suggestions import search_suggestions
+
+# Create Celery instance
+celery_app = Celery(
+    "analytics_tasks",
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND
+)
+
+
+@celery_app.task
+def rollup_dashboard_metrics_task():
+    """Fold new users, documents, payments and visits into the dashboard rollups"""
+
+    db = SessionLocal()
+
+    try:
+        return MetricsRollupService.run(db)
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task
+def rebuild_search_suggestions_task():
+    """Recompute the search suggestion prefix table from recent searches"""
+
+    db = SessionLocal()
+
+    try:
+        return search_suggestions.rebuild(db)
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+@celery_app.task
+def ingest_landing_events_task():
+    """Fold queued landing page events into their visit records"""
+
+    db = SessionLocal()
+
+    try:
+        return landing_event_ingest.drain(db)
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+# Schedule periodic tasks
+@celery_app.on_after_configure.connect
+def setup_periodic_tasks(sender, **kwargs):
+    """Set up periodic analytics tasks"""
+
+    # Keep dashboard rollups within a few minutes of live data
+    sender.add_periodic_task(
+        float(settings.METRICS_ROLLUP_INTERVAL),
+        rollup_dashboard_metrics_task.s(),
+        name='rollup dashboard metrics'
+    )
+
+    sender.add_periodic_task(
+        float(settings.SEARCH_SUGGESTION_REBUILD_INTERVAL),
+        rebuild_search_suggestions_task.s(),
+        name='rebuild search suggestions'
+    )
+
+    sender.add_periodic_task(
+        settings.LANDING_EVENT_INGEST_INTERVAL,
+        ingest_landing_events_task.s(),
+        name='ingest landing events'
+    )
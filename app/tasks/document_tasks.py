@@ -5,9 +5,11 @@ Document processing background tasks
 import os
 import time
 import asyncio
+import logging
 from datetime import datetime
-from typing import Dict, Any, List
-from celery import Celery
+from typing import Dict, Any, List, Optional
+import redis
+from celery import Celery, chord
 from sqlalchemy.orm import Session
 
 from config import settings
@@ -15,8 +17,15 @@ from database import SessionLocal
 from app.models.document import Document, DocumentStatus
 from app.models.template import Template
 from app.services.document_service import DocumentService
+from app.services.render_plan_service import RenderPlan, RenderPlanService
 from app.services.audit_service import AuditService
 
+logger = logging.getLogger(__name__)
+
+# Batch progress lives in one Redis hash per batch
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+BATCH_STATUS_TTL = 86400  # 24 hours
+
 # Create Celery instance
 celery_app = Celery(
     "document_tasks",
@@ -42,13 +51,7 @@ def generate_document_task(self, document_id: int, placeholder_data: Dict[str, A
         db.commit()
         
         # Generate document (run async function in sync context)
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        success = loop.run_until_complete(
+        success = _run_async(
             DocumentService.generate_document_from_template(document_id, placeholder_data)
         )
         
@@ -117,78 +120,179 @@ def generate_document_task(self, document_id: int, placeholder_data: Dict[str, A
         db.close()
 
 
+def _run_async(coro):
+    """Run a coroutine to completion from a synchronous Celery task"""
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop.run_until_complete(coro)
+
+
+def _batch_status_key(batch_id: str) -> str:
+    return f"batch_status:{batch_id}"
+
+
+def _start_batch_progress(batch_id: str, user_id: Optional[int], total_documents: int, total_chunks: int) -> None:
+    """Initialise the single Redis hash that tracks a batch's progress"""
+    key = _batch_status_key(batch_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.delete(key)
+        pipe.hset(key, mapping={
+            "status": "processing",
+            "user_id": user_id or "",
+            "total": total_documents,
+            "total_chunks": total_chunks,
+            "completed": 0,
+            "successful": 0,
+            "failed": 0,
+            "completed_chunks": 0,
+            "started_at": datetime.utcnow().isoformat()
+        })
+        pipe.expire(key, BATCH_STATUS_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to initialise progress for batch {batch_id}: {e}")
+
+
+def _record_chunk_progress(batch_id: str, successful: int, failed: int) -> None:
+    """Fold one finished chunk into the batch progress hash"""
+    key = _batch_status_key(batch_id)
+    try:
+        pipe = redis_client.pipeline()
+        pipe.hincrby(key, "successful", successful)
+        pipe.hincrby(key, "failed", failed)
+        pipe.hincrby(key, "completed", successful + failed)
+        pipe.hincrby(key, "completed_chunks", 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to record progress for batch {batch_id}: {e}")
+
+
+def get_batch_progress(batch_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Read a batch's aggregated progress, or None if it is unknown/expired
+
+    When Redis is unreachable the progress is counted from the batch's
+    document rows instead (without the chunk counters). Pass user_id to
+    limit that lookup to the owner's documents.
+    """
+    try:
+        raw = redis_client.hgetall(_batch_status_key(batch_id))
+    except redis.RedisError as e:
+        logger.warning(f"Batch progress for {batch_id} unavailable from Redis, using database: {e}")
+        return _batch_progress_from_db(batch_id, user_id)
+    if not raw:
+        return None
+
+    progress: Dict[str, Any] = dict(raw)
+    for field in ("total", "total_chunks", "completed", "successful", "failed", "completed_chunks"):
+        progress[field] = int(progress.get(field, 0))
+    progress["progress"] = int(progress["completed"] / progress["total"] * 100) if progress["total"] else 100
+    return progress
+
+
+def _batch_progress_from_db(batch_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Batch progress from document statuses, matching the Redis hash fields"""
+    db = SessionLocal()
+    try:
+        query = db.query(Document.user_id, Document.status).filter(
+            Document.placeholder_data["_batch_id"].as_string() == batch_id
+        )
+        if user_id is not None:
+            query = query.filter(Document.user_id == user_id)
+        rows = query.all()
+    finally:
+        db.close()
+    if not rows:
+        return None
+
+    successful = sum(1 for row in rows if row.status == DocumentStatus.COMPLETED)
+    failed = sum(1 for row in rows if row.status == DocumentStatus.FAILED)
+    completed = successful + failed
+    return {
+        "status": "completed" if completed == len(rows) else "processing",
+        "user_id": str(rows[0].user_id),
+        "total": len(rows),
+        "completed": completed,
+        "successful": successful,
+        "failed": failed,
+        "progress": int(completed / len(rows) * 100)
+    }
+
+
 @celery_app.task(bind=True)
 def generate_batch_documents_task(
-    self, 
-    batch_id: str, 
-    document_ids: List[int], 
-    placeholder_data_list: List[Dict[str, Any]]
+    self,
+    batch_id: str,
+    document_ids: List[int],
+    placeholder_data_list: Optional[List[Dict[str, Any]]] = None,
+    batch_settings: Optional[Dict[str, Any]] = None
 ):
-    """Generate multiple documents in batch"""
-    
+    """Generate multiple documents in batch
+
+    Splits the batch into chunks that run as a Celery chord across all
+    workers. Each template's render plan is compiled once here and shipped
+    with the chunks that need it; progress is aggregated into one Redis hash
+    and the chord callback records the final outcome.
+    """
+
     db = SessionLocal()
-    results = []
-    
+
     try:
-        total_documents = len(document_ids)
-        successful = 0
-        failed = 0
-        
-        for i, (document_id, placeholder_data) in enumerate(zip(document_ids, placeholder_data_list)):
-            try:
-                # Update progress
-                progress = int((i / total_documents) * 100)
-                self.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'current': i,
-                        'total': total_documents,
-                        'progress': progress,
-                        'batch_id': batch_id
-                    }
-                )
-                
-                # Generate document directly (not using delay to avoid recursion)
-                result_data = generate_document_task(document_id, placeholder_data)
-                
-                if result_data["success"]:
-                    successful += 1
-                else:
-                    failed += 1
-                
-                results.append({
-                    "document_id": document_id,
-                    "success": result_data["success"],
-                    "status": result_data["status"]
-                })
-            
-            except Exception as e:
-                failed += 1
-                results.append({
-                    "document_id": document_id,
-                    "success": False,
-                    "error": str(e)
-                })
-        
-        # Log batch completion
-        AuditService.log_system_event(
-            "BATCH_GENERATION_COMPLETED",
-            {
-                "batch_id": batch_id,
-                "total_documents": total_documents,
-                "successful": successful,
-                "failed": failed
+        documents = db.query(
+            Document.id, Document.user_id, Document.template_id, Document.placeholder_data
+        ).filter(
+            Document.id.in_(document_ids)
+        ).all()
+        documents_by_id = {doc.id: doc for doc in documents}
+
+        # Fall back to the placeholder data stored on each document
+        if placeholder_data_list is None:
+            placeholder_data_list = [
+                (documents_by_id[doc_id].placeholder_data or {}) if doc_id in documents_by_id else {}
+                for doc_id in document_ids
+            ]
+
+        items = [[doc_id, data] for doc_id, data in zip(document_ids, placeholder_data_list)]
+        total_documents = len(items)
+
+        # Compile each template's render plan once for the whole batch
+        template_ids = {doc.template_id for doc in documents if doc.template_id}
+        plans: Dict[str, Dict[str, Any]] = {}
+        for template in db.query(Template).filter(Template.id.in_(template_ids)).all():
+            template_path = os.path.join(settings.TEMPLATES_PATH, template.file_path)
+            if os.path.exists(template_path):
+                plans[str(template.id)] = RenderPlanService.get_plan(db, template, template_path).to_dict()
+
+        chunk_size = int((batch_settings or {}).get("chunk_size") or settings.BATCH_GENERATION_CHUNK_SIZE)
+        chunks = [items[i:i + chunk_size] for i in range(0, total_documents, chunk_size)]
+
+        user_id = documents[0].user_id if documents else None
+        _start_batch_progress(batch_id, user_id, total_documents, len(chunks))
+
+        if not chunks:
+            return finalize_batch_generation_task([], batch_id, 0)
+
+        header = []
+        for chunk in chunks:
+            chunk_template_ids = {
+                str(documents_by_id[doc_id].template_id)
+                for doc_id, _ in chunk if doc_id in documents_by_id
             }
-        )
-        
+            chunk_plans = {tid: plans[tid] for tid in chunk_template_ids if tid in plans}
+            header.append(generate_document_chunk_task.s(batch_id, chunk, chunk_plans))
+
+        chord(header)(finalize_batch_generation_task.s(batch_id, total_documents))
+
         return {
             "batch_id": batch_id,
             "total_documents": total_documents,
-            "successful": successful,
-            "failed": failed,
-            "results": results
+            "chunks": len(chunks),
+            "status": "processing"
         }
-    
+
     except Exception as exc:
         AuditService.log_system_event(
             "BATCH_GENERATION_FAILED",
@@ -198,10 +302,125 @@ def generate_batch_documents_task(
             }
         )
         raise exc
-    
+
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, max_retries=2)
+def generate_document_chunk_task(
+    self,
+    batch_id: str,
+    items: List[List[Any]],
+    plans: Dict[str, Dict[str, Any]]
+):
+    """Generate one chunk of a batch and write its status updates in bulk"""
+
+    db = SessionLocal()
+    placeholder_by_id = {document_id: data for document_id, data in items}
+
+    try:
+        # Reuse the coordinator's compiled plans instead of recompiling per worker
+        for plan_data in plans.values():
+            RenderPlanService.prime(RenderPlan.from_dict(plan_data))
+
+        documents = db.query(Document).filter(Document.id.in_(list(placeholder_by_id))).all()
+        template_ids = {doc.template_id for doc in documents if doc.template_id}
+        templates = {
+            template.id: template
+            for template in db.query(Template).filter(Template.id.in_(template_ids)).all()
+        }
+
+        mappings = []
+        for document in documents:
+            try:
+                updates = _run_async(DocumentService.render_document(
+                    db, document, templates.get(document.template_id), placeholder_by_id[document.id]
+                ))
+            except Exception as e:
+                updates = {"id": document.id, "status": DocumentStatus.FAILED, "error_message": str(e)}
+            mappings.append(updates)
+
+        # One round of UPDATEs and a single commit for the whole chunk
+        db.bulk_update_mappings(Document, mappings)
+        db.commit()
+
+        results = [
+            {
+                "document_id": updates["id"],
+                "success": updates["status"] == DocumentStatus.COMPLETED,
+                "status": updates["status"].value,
+                "error": updates.get("error_message")
+            }
+            for updates in mappings
+        ]
+        results.extend(
+            {"document_id": document_id, "success": False, "error": "Document not found"}
+            for document_id in set(placeholder_by_id) - {doc.id for doc in documents}
+        )
+
+    except Exception as exc:
+        db.rollback()
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc, countdown=30 * (self.request.retries + 1))
+
+        # Report the chunk as failed so the chord callback still runs
+        results = [
+            {"document_id": document_id, "success": False, "error": str(exc)}
+            for document_id in placeholder_by_id
+        ]
+
     finally:
         db.close()
 
+    successful = sum(1 for result in results if result["success"])
+    failed = len(results) - successful
+    _record_chunk_progress(batch_id, successful, failed)
+
+    return {
+        "successful": successful,
+        "failed": failed,
+        "results": results
+    }
+
+
+@celery_app.task
+def finalize_batch_generation_task(chunk_results: List[Dict[str, Any]], batch_id: str, total_documents: int):
+    """Chord callback: aggregate chunk results and close out the batch"""
+
+    successful = sum(chunk["successful"] for chunk in chunk_results)
+    failed = sum(chunk["failed"] for chunk in chunk_results)
+    results = [result for chunk in chunk_results for result in chunk["results"]]
+
+    try:
+        key = _batch_status_key(batch_id)
+        redis_client.hset(key, mapping={
+            "status": "completed",
+            "completed_at": datetime.utcnow().isoformat()
+        })
+        redis_client.expire(key, BATCH_STATUS_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to finalise progress for batch {batch_id}: {e}")
+
+    # Log batch completion
+    AuditService.log_system_event(
+        "BATCH_GENERATION_COMPLETED",
+        {
+            "batch_id": batch_id,
+            "total_documents": total_documents,
+            "successful": successful,
+            "failed": failed
+        }
+    )
+
+    return {
+        "batch_id": batch_id,
+        "total_documents": total_documents,
+        "successful": successful,
+        "failed": failed,
+        "results": results
+    }
+
 
 @celery_app.task
 def cleanup_temporary_files_task():
@@ -0,0 +1,161 @@
+"""
+Cache codec benchmark
+
+Compares encode/decode time and stored size for every cache codec available
+in this environment, against the previous json + gzip encoding, on payloads
+shaped like the template list and admin dashboard responses.
+
+Run with: python -m app.tests.benchmark_cache_codecs [--iterations N]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+# Add the parent directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from app.services import cache_codecs
+from app.services.cache_codecs import CacheCodec
+
+
+def template_list_payload(count: int = 50) -> Dict[str, Any]:
+    """A TemplateList page as returned by GET /api/templates"""
+    now = datetime(2025, 9, 1, 12, 0, 0)
+    categories = ["legal", "hr", "finance", "education", "real-estate"]
+    templates = []
+    for i in range(count):
+        templates.append({
+            "id": i + 1,
+            "name": f"Template {i + 1} - Tenancy Agreement",
+            "description": "Standard agreement covering rent, deposit, maintenance and termination terms. " * 3,
+            "category": categories[i % len(categories)],
+            "type": "agreement",
+            "file_path": f"templates/{i + 1:05d}_tenancy_agreement.docx",
+            "original_filename": "tenancy_agreement.docx",
+            "file_size": 48_000 + i * 13,
+            "version": "1.0",
+            "language": "en",
+            "font_family": "Times New Roman",
+            "font_size": 12,
+            "render_engine": "docx",
+            "is_active": True,
+            "is_public": i % 3 != 0,
+            "is_premium": i % 4 == 0,
+            "price": 1500.0 if i % 4 == 0 else 0.0,
+            "usage_count": 1200 - i * 7,
+            "download_count": 800 - i * 5,
+            "rating": 4.3,
+            "rating_count": 57,
+            "tags": ["tenancy", "lagos", "landlord", "agreement"],
+            "keywords": "tenancy agreement landlord tenant rent lagos",
+            "created_by": 3,
+            "created_at": now - timedelta(days=i),
+            "updated_at": now,
+            "placeholders": [
+                {
+                    "id": i * 10 + p,
+                    "name": name,
+                    "display_name": name.replace("_", " ").title(),
+                    "placeholder_type": "date" if name.endswith("date") else "text",
+                    "paragraph_index": p,
+                    "bold": p == 0,
+                    "italic": False,
+                    "underline": False,
+                    "casing": "none",
+                    "is_required": True,
+                }
+                for p, name in enumerate(["landlord_name", "tenant_name", "property_address",
+                                          "start_date", "rent_amount", "deposit_amount"])
+            ],
+        })
+    return {
+        "templates": templates,
+        "total": 1240,
+        "page": 1,
+        "per_page": count,
+        "pages": 25,
+        "categories": categories,
+        "types": ["agreement", "letter", "certificate"],
+    }
+
+
+def dashboard_payload() -> Dict[str, Any]:
+    """AdminService.get_dashboard_stats output"""
+    clusters = {f"cluster_{i}": 40 + i for i in range(12)}
+    return {
+        "users": {"total": 18234, "active": 15011, "new_today": 143, "activity_rate": 82.3},
+        "documents": {"total": 402113, "completed": 398001, "processing": 112,
+                      "failed": 4000, "success_rate": 98.97},
+        "templates": {
+            "total": 1240, "public": 980, "private": 260,
+            "classification": {"clusters": clusters, "classified_count": 1100,
+                               "top_keywords": [f"keyword_{i}" for i in range(30)]},
+            "clusters": {"total_clusters": len(clusters), "distribution": clusters,
+                         "top_keywords": [f"keyword_{i}" for i in range(30)],
+                         "classified_percent": 88.7},
+        },
+        "revenue": {"total": 48_200_500.0, "monthly": 3_100_250.0, "active_subscriptions": 2311},
+        "system": {"recent_errors": 17, "storage_usage_mb": 183_220.5, "storage_available_mb": 320_000.0},
+    }
+
+
+def _legacy_encode(data: Any) -> bytes:
+    """json + gzip at the default level, as CacheService used to store values"""
+    payload = json.dumps(data, default=str).encode("utf-8")
+    return gzip.compress(payload) if len(payload) > 1024 else payload
+
+
+def _legacy_decode(payload: bytes) -> Any:
+    if payload.startswith(b"\x1f\x8b"):
+        payload = gzip.decompress(payload)
+    return json.loads(payload)
+
+
+def _time(func: Callable[[], Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def _codecs() -> List[Tuple[str, Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    codecs = [("json+gzip (previous)", _legacy_encode, _legacy_decode)]
+    available = ["json"]
+    if cache_codecs.ORJSON_AVAILABLE:
+        available.append("orjson")
+    if cache_codecs.MSGPACK_AVAILABLE:
+        available.append("msgpack")
+    for name in available:
+        codec = CacheCodec(serializer=name)
+        codecs.append((f"{name} envelope", codec.encode, codec.decode))
+    return codecs
+
+
+def run(iterations: int) -> None:
+    payloads = {
+        "template list (50)": template_list_payload(),
+        "template list (500)": template_list_payload(500),
+        "admin dashboard": dashboard_payload(),
+    }
+    print(f"lz4: {cache_codecs.LZ4_AVAILABLE}  zstd: {cache_codecs.ZSTD_AVAILABLE}  iterations: {iterations}\n")
+    print(f"{'payload':<22}{'codec':<24}{'encode us':>12}{'decode us':>12}{'bytes':>12}")
+
+    for payload_name, payload in payloads.items():
+        for codec_name, encode, decode in _codecs():
+            encoded = encode(payload)
+            encode_us = _time(lambda: encode(payload), iterations)
+            decode_us = _time(lambda: decode(encoded), iterations)
+            print(f"{payload_name:<22}{codec_name:<24}{encode_us:>12.1f}{decode_us:>12.1f}{len(encoded):>12}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    run(parser.parse_args().iterations)
@@ -0,0 +1,132 @@
+"""
+Middleware stack benchmark
+
+Measures per-request overhead of the audit, CSRF, request validation,
+security, performance and compression middleware on a trivial endpoint,
+composed two ways: one BaseHTTPMiddleware per stage (the previous stack)
+and the single pure-ASGI MiddlewarePipeline. Requests are driven straight
+through the ASGI callable, so no HTTP client or server cost is included.
+Rate limiting and guest sessions need Redis and are left out of both.
+
+Run with: python -m app.tests.benchmark_middleware [--requests N]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add the parent directory to the path so we can import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-with-32-plus-chars")
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middleware.advanced_security import RequestValidationMiddleware
+from app.middleware.audit import AuditMiddleware
+from app.middleware.csrf_protection import CSRFProtectionMiddleware
+from app.middleware.performance import CompressionMiddleware, PerformanceMiddleware
+from app.middleware.pipeline import MiddlewarePipeline, PipelineStage, ResponseHead
+from app.middleware.security import SecurityMiddleware
+
+
+def _stages():
+    stages = [
+        AuditMiddleware(),
+        CSRFProtectionMiddleware(),
+        RequestValidationMiddleware(),
+        SecurityMiddleware(),
+        PerformanceMiddleware(),
+        CompressionMiddleware(),
+    ]
+    # Keep the comparison in-process: no Redis round trips for CSRF tokens
+    stages[1].redis = None
+    return stages
+
+
+def _endpoint_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+class _LayeredStage(BaseHTTPMiddleware):
+    """BaseHTTPMiddleware wrapper calling the stage hooks around call_next"""
+
+    def __init__(self, app, stage: PipelineStage):
+        super().__init__(app)
+        self.stage = stage
+
+    async def dispatch(self, request, call_next):
+        early = await self.stage.on_request(request)
+        if early is not None:
+            return early
+        response = await call_next(request)
+        head = ResponseHead({"status": response.status_code, "headers": response.raw_headers})
+        await self.stage.on_response(request, head)
+        response.raw_headers = head.raw_headers
+        await self.stage.on_complete(request, head)
+        return response
+
+
+def layered_app() -> FastAPI:
+    """One BaseHTTPMiddleware per stage, as main.py used to build it"""
+    app = _endpoint_app()
+    for stage in reversed(_stages()):
+        app.add_middleware(_LayeredStage, stage=stage)
+    return app
+
+
+def pipeline_app() -> FastAPI:
+    app = _endpoint_app()
+    app.add_middleware(MiddlewarePipeline, stages=_stages())
+    return app
+
+
+async def _drive(app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/ping", "raw_path": b"/ping",
+        "root_path": "", "query_string": b"", "server": ("testserver", 80),
+        "client": ("127.0.0.1", 5000),
+        "headers": [(b"host", b"testserver"), (b"user-agent", b"benchmark")],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up route resolution and lazy app construction
+    for _ in range(50):
+        await app(dict(scope, state={}), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope, state={}), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def run(requests: int) -> None:
+    print(f"requests: {requests}\n")
+    print(f"{'stack':<36}{'us/request':>12}")
+    results = {}
+    for name, build in (("BaseHTTPMiddleware per stage", layered_app),
+                        ("MiddlewarePipeline", pipeline_app)):
+        results[name] = asyncio.run(_drive(build(), requests))
+        print(f"{name:<36}{results[name]:>12.1f}")
+    before, after = results.values()
+    print(f"\nspeedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    run(parser.parse_args().requests)
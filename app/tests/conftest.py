@@ -8,6 +8,10 @@ import os
 from unittest.mock import Mock, patch
 import asyncio
 
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
 # Add the parent directory to the path so we can import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
@@ -20,6 +24,49 @@ def event_loop():
     loop.close()
 
 
+@pytest.fixture
+def sqlite_engine():
+    """In-memory SQLite database with every table, shared by all connections"""
+    import app.models  # noqa: F401 - register all mappers
+    from database import Base
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(sqlite_engine):
+    """Session factory bound to the in-memory database"""
+    return sessionmaker(bind=sqlite_engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    """Session on the in-memory database"""
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def placeholder():
+    """Factory for mock Placeholder rows as render plans read them"""
+    def make(name, paragraph_index, **overrides):
+        placeholder = Mock()
+        placeholder.name = name
+        placeholder.paragraph_index = paragraph_index
+        placeholder.placeholder_type = overrides.get("placeholder_type", "text")
+        placeholder.casing = overrides.get("casing", "none")
+        placeholder.default_value = overrides.get("default_value")
+        placeholder.bold = overrides.get("bold", False)
+        placeholder.italic = overrides.get("italic", False)
+        placeholder.underline = overrides.get("underline", False)
+        return placeholder
+    return make
+
+
 @pytest.fixture
 def mock_database():
     """Mock database session"""
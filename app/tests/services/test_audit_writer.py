@@ -0,0 +1,119 @@
+"""
+Tests for the batched audit log writer
+"""
+
+import glob
+import os
+import queue
+
+import pytest
+from unittest.mock import patch
+from sqlalchemy import event
+
+from app.models.audit import AuditLog, AuditEventType, AuditLevel
+from app.services import audit_writer as writer_module
+from app.services.audit_service import AuditService
+from app.services.audit_writer import AuditWriter, AuditWriterConfig
+
+
+@pytest.fixture
+def session_factory(session_factory, sqlite_engine):
+    session_factory.inserts = []
+    event.listen(sqlite_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statement.startswith("INSERT") and session_factory.inserts.append(statement))
+    with patch.object(writer_module, "SessionLocal", session_factory):
+        yield session_factory
+
+
+@pytest.fixture
+def writer(tmp_path, session_factory):
+    config = AuditWriterConfig(async_writes=True, queue_size=100, batch_size=50, flush_interval=0.05,
+                               spool_path=str(tmp_path / "spool.jsonl"))
+    writer = AuditWriter(config)
+    writer._redis_client = lambda: None
+    with patch.object(writer_module, "audit_writer", writer), \
+         patch("app.services.audit_service.audit_writer", writer):
+        yield writer
+    writer.close()
+
+
+def _log(message="Document viewed", level=AuditLevel.INFO):
+    return AuditService.log_event(AuditEventType.DOCUMENT_VIEWED, level, message)
+
+
+def test_events_are_bulk_inserted_off_thread(writer, session_factory):
+    for i in range(20):
+        _log(f"event {i}")
+    writer.flush()
+
+    db = session_factory()
+    assert db.query(AuditLog).count() == 20
+    assert len(session_factory.inserts) < 20
+    assert writer.stats.written == 20
+
+
+def test_overflow_spills_and_replays(writer, session_factory):
+    writer._queue = queue.Queue(maxsize=2)
+    with patch.object(writer, "_ensure_started"):
+        for i in range(5):
+            _log(f"event {i}")
+
+    assert writer.stats.spilled == 3
+    assert writer.replay_spool() == 3
+    assert session_factory().query(AuditLog).count() == 3
+
+
+def test_replay_takes_over_files_claimed_by_dead_processes(writer, session_factory):
+    writer._queue = queue.Queue(maxsize=1)
+    with patch.object(writer, "_ensure_started"):
+        for i in range(4):
+            _log(f"event {i}")
+    spool = writer.config.spool_path
+    lines = open(spool).read().splitlines()
+    os.remove(spool)
+    # Left behind by an earlier process with this pid, and by a dead one
+    with open(f"{spool}.{os.getpid()}.replay", "w") as claimed:
+        claimed.write(lines[0] + "\n")
+    with open(f"{spool}.424242.replay", "w") as claimed:
+        claimed.write("\n".join(lines[1:]) + "\n")
+
+    with patch.object(writer_module, "_process_alive", return_value=False):
+        assert writer.replay_spool() == 3
+
+    assert session_factory().query(AuditLog).count() == 3
+    assert not glob.glob(f"{spool}*")
+
+
+def test_live_process_claims_are_left_alone(writer):
+    claimed = f"{writer.config.spool_path}.424242.replay"
+    with open(claimed, "w") as spool:
+        spool.write("")
+
+    with patch.object(writer_module, "_process_alive", return_value=True):
+        assert writer.replay_spool() == 0
+    assert os.path.exists(claimed)
+
+
+def test_high_risk_event_alerts_before_queueing(writer):
+    with patch.object(AuditService, "_send_security_alert") as alert, \
+         patch.object(writer, "_ensure_started"):
+        audit_log = _log("Disk failure", level=AuditLevel.CRITICAL)
+
+    alert.assert_called_once_with(audit_log)
+    assert writer._queue.get_nowait()["_urgent"] is True
+
+
+def test_enrich_counts_earlier_rows_in_the_same_batch(session_factory):
+    from datetime import datetime
+
+    def row(event_type, ip="10.0.0.1"):
+        return {"event_type": event_type, "user_id": 7, "ip_address": ip,
+                "risk_score": 10, "anomaly_detected": False, "timestamp": datetime.utcnow()}
+
+    failures = [row(AuditEventType.LOGIN_FAILED) for _ in range(4)]
+    logins = [row(AuditEventType.LOGIN, ip="10.0.0.2") for _ in range(2)]
+    AuditWriter._enrich(session_factory(), failures + logins)
+
+    assert [r["anomaly_detected"] for r in failures] == [False, False, False, True]
+    # Only the first login from a new address is unusual
+    assert [r["risk_score"] for r in logins] == [35, 10]
@@ -0,0 +1,34 @@
+"""
+Tests for bulk batch document creation
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models.document import DocumentStatus
+from app.services.document_service import DocumentService
+
+
+@pytest.fixture
+def db(db, sqlite_engine):
+    db.statements = []
+    event.listen(sqlite_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: db.statements.append(statement))
+    return db
+
+
+def test_batch_rows_created_with_returning(db):
+    items = [
+        {"title": f"Letter {i}", "template_id": None, "placeholder_data": {"name": f"N{i}"}}
+        for i in range(3)
+    ]
+
+    documents = DocumentService.create_documents_for_batch(db, items, user_id=1, batch_id="b-1")
+
+    assert [doc.title for doc in documents] == ["Letter 0", "Letter 1", "Letter 2"]
+    assert all(doc.id and doc.created_at for doc in documents)
+    assert documents[1].placeholder_data == {"name": "N1", "_batch_id": "b-1"}
+    assert documents[0].status == DocumentStatus.PROCESSING
+    assert items[0]["placeholder_data"] == {"name": "N0"}
+    # Reading the returned rows must not trigger per-row reloads
+    assert not [s for s in db.statements if s.lstrip().upper().startswith("SELECT")]
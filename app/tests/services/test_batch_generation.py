@@ -0,0 +1,80 @@
+"""
+Tests for chunked parallel batch generation
+"""
+
+import pytest
+import redis
+from unittest.mock import AsyncMock, Mock, patch
+
+from app.models.document import Document, DocumentStatus
+from app.tasks import document_tasks
+
+
+@pytest.fixture
+def redis_client():
+    with patch.object(document_tasks, "redis_client") as client:
+        yield client
+
+
+@pytest.fixture
+def session():
+    db = Mock()
+    documents = [Mock(id=1, template_id=5), Mock(id=2, template_id=5)]
+    db.query.return_value.filter.return_value.all.side_effect = [documents, [Mock(id=5)]]
+    with patch.object(document_tasks, "SessionLocal", return_value=db):
+        yield db
+
+
+def test_chunk_commits_status_updates_in_bulk(session, redis_client):
+    render = AsyncMock(side_effect=[
+        {"id": 1, "status": DocumentStatus.COMPLETED, "file_size": 10},
+        RuntimeError("disk full"),
+    ])
+
+    with patch.object(document_tasks.DocumentService, "render_document", render):
+        result = document_tasks.generate_document_chunk_task("batch-1", [[1, {"a": "x"}], [2, {}]], {})
+
+    assert (result["successful"], result["failed"]) == (1, 1)
+    session.bulk_update_mappings.assert_called_once()
+    model, mappings = session.bulk_update_mappings.call_args.args
+    assert model is Document
+    assert mappings[1] == {"id": 2, "status": DocumentStatus.FAILED, "error_message": "disk full"}
+    session.commit.assert_called_once()
+    redis_client.pipeline.return_value.hincrby.assert_any_call("batch_status:batch-1", "completed", 2)
+
+
+def test_finalize_aggregates_chunk_results(redis_client):
+    chunks = [
+        {"successful": 2, "failed": 0, "results": [{"document_id": 1}, {"document_id": 2}]},
+        {"successful": 0, "failed": 1, "results": [{"document_id": 3}]},
+    ]
+
+    with patch.object(document_tasks.AuditService, "log_system_event"):
+        summary = document_tasks.finalize_batch_generation_task(chunks, "batch-1", 3)
+
+    assert summary["successful"] == 2
+    assert summary["failed"] == 1
+    assert [r["document_id"] for r in summary["results"]] == [1, 2, 3]
+    assert redis_client.hset.call_args.kwargs["mapping"]["status"] == "completed"
+
+
+def test_progress_falls_back_to_database_when_redis_is_down(redis_client, session_factory):
+    from app.services.document_service import DocumentService
+
+    db = session_factory()
+    items = [{"title": f"Letter {i}", "template_id": None, "placeholder_data": {}} for i in range(4)]
+    documents = DocumentService.create_documents_for_batch(db, items, user_id=3, batch_id="b-9")
+    for document, status in zip(documents, (DocumentStatus.COMPLETED, DocumentStatus.FAILED)):
+        db.query(Document).filter(Document.id == document.id).update({"status": status})
+    db.commit()
+    db.close()
+    redis_client.hgetall.side_effect = redis.ConnectionError("down")
+
+    with patch.object(document_tasks, "SessionLocal", session_factory):
+        progress = document_tasks.get_batch_progress("b-9", user_id=3)
+        assert document_tasks.get_batch_progress("b-9", user_id=4) is None
+
+    assert progress == {
+        "status": "processing", "user_id": "3", "total": 4, "completed": 2,
+        "successful": 1, "failed": 1, "progress": 50
+    }
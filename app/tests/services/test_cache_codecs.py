@@ -0,0 +1,45 @@
+"""
+Tests for cache serialization codecs
+"""
+
+import gzip
+import json
+
+import pytest
+
+from app.services import cache_codecs
+from app.services.cache_codecs import CacheCodec, CodecError
+
+
+PAYLOAD = {"id": 7, "name": "Offer letter", "tags": ["hr", "letter"], "price": 1500.0, "body": "x" * 4000}
+
+
+@pytest.mark.parametrize("serializer", ["json", "auto"])
+def test_round_trip_with_header_byte(serializer):
+    codec = CacheCodec(serializer=serializer)
+
+    small = codec.encode({"id": 1})
+    large = codec.encode(PAYLOAD)
+
+    assert 0x80 <= small[0] <= 0xBF
+    assert small[0] & 0b111 == cache_codecs.COMPRESSOR_NONE
+    assert large[0] & 0b111 != cache_codecs.COMPRESSOR_NONE
+    assert len(large) < len(json.dumps(PAYLOAD))
+    assert codec.decode(small) == {"id": 1}
+    assert codec.decode(large) == PAYLOAD
+
+
+def test_reads_payloads_from_other_codecs_and_legacy_formats():
+    writer, reader = CacheCodec(serializer="json"), CacheCodec(serializer="auto")
+    legacy_gzip = gzip.compress(json.dumps(PAYLOAD).encode())
+
+    assert reader.decode(writer.encode(PAYLOAD)) == PAYLOAD
+    assert reader.decode(legacy_gzip) == PAYLOAD
+    assert reader.decode(b"JSON:" + json.dumps([1, 2]).encode()) == [1, 2]
+    assert reader.decode(json.dumps({"a": 1}).encode()) == {"a": 1}
+
+
+def test_unknown_codec_in_header_is_rejected():
+    header = (cache_codecs.ENVELOPE_VERSION << 6) | (7 << 3)
+    with pytest.raises(CodecError):
+        CacheCodec().decode(bytes((header,)) + b"{}")
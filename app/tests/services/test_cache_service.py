@@ -0,0 +1,229 @@
+"""
+Tests for CacheService tiers and invalidation
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+from sqlalchemy.orm import Session
+
+from app.services.cache_service import CacheMetrics, CacheService, L1Cache
+
+
+def _cache(**overrides):
+    options = dict(max_entries=3, max_bytes=10_000, default_ttl=60, sweep_interval=30,
+                   metrics=CacheMetrics(), key_prefix="mytypist:")
+    options.update(overrides)
+    return L1Cache(**options)
+
+
+def test_evicts_least_recently_used_entry():
+    cache = _cache()
+    for key in ("api:a", "api:b", "api:c"):
+        cache.set(key, key)
+
+    cache.get("api:a")
+    cache.set("api:d", "d")
+
+    assert "api:b" not in cache
+    assert cache.get("api:a") == "api:a"
+    assert cache.metrics.namespaces["api"]["evictions"] == 1
+    assert cache.metrics.eviction_count == 1
+
+
+def test_byte_bound_evicts_until_it_fits():
+    cache = _cache(max_entries=100, max_bytes=100)
+    cache.set("query:a", "x", size=40)
+    cache.set("query:b", "y", size=40)
+    cache.set("query:c", "z", size=40)
+
+    assert len(cache) == 2
+    assert cache.total_bytes == 80
+    assert cache.metrics.memory_usage == 80
+
+    cache.set("query:huge", "w", size=500)
+    assert "query:huge" not in cache
+
+
+def test_tag_index_follows_entries_out_of_the_tier():
+    cache = _cache(max_entries=2)
+    cache.set("api:a", "a", ttl=60)
+    cache.set("api:b", "b", ttl=1)
+    for _ in range(3):
+        cache.set("api:a", "a", ttl=60)
+        cache.tag("api:a", ["list"])
+    cache.tag("api:b", ["list"])
+    cache.tag("api:missing", ["list"])
+
+    assert cache.tagged("list") == {"api:a", "api:b"}
+
+    cache.sweep(now=time.monotonic() + 5)
+    assert cache.tagged("list") == {"api:a"}
+
+    cache.set("api:c", "c")
+    cache.set("api:d", "d")
+    assert cache.tagged("list") == set()
+    assert cache._key_tags == {}
+
+
+def test_sweep_drops_expired_entries_and_counts_per_namespace():
+    with patch("app.services.cache_service.time.monotonic", return_value=1000.0):
+        cache = _cache(max_entries=10)
+        cache.set("mytypist:user_profile:1", {"id": 1}, ttl=10)
+        cache.set("template_placeholders:1", [1], ttl=100)
+        assert cache.get("mytypist:user_profile:1") == {"id": 1}
+        assert cache.get("template_placeholders:2") is None
+
+    with patch("app.services.cache_service.time.monotonic", return_value=1031.0):
+        cache.get("template_placeholders:1")
+
+    assert "mytypist:user_profile:1" not in cache
+    assert cache.metrics.l1_entries == 1
+    assert cache.metrics.namespaces["user_profile"] == {"hits": 1, "misses": 0, "evictions": 0}
+    assert cache.metrics.namespaces["template_placeholders"] == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_invalidation_from_other_worker_evicts_l1():
+    publisher, subscriber = CacheService(), CacheService()
+    publisher.redis = AsyncMock()
+    publisher.redis.delete.return_value = 1
+    publisher.redis.register_script = Mock(return_value=AsyncMock(return_value=[1, [b"generated_doc:abc"]]))
+    subscriber.l1_cache.set("user_profile:1", {"id": 1})
+    subscriber.l1_cache.set("generated_doc:abc", {"id": 2})
+    subscriber.l1_cache.tag("generated_doc:abc", ["user:1"])
+
+    asyncio.run(publisher.delete("user_profile:1"))
+    asyncio.run(publisher.invalidate_by_tag("user:1"))
+    messages = [call.args[1] for call in publisher.redis.publish.call_args_list]
+
+    for message in messages:
+        publisher._apply_invalidation(message)
+        subscriber._apply_invalidation(message)
+
+    assert len(messages) == 2
+    assert "user_profile:1" not in subscriber.l1_cache
+    assert "generated_doc:abc" not in subscriber.l1_cache
+
+
+def test_tagged_set_is_one_pipelined_round_trip():
+    service = CacheService()
+    service.redis = Mock()
+    pipe = Mock()
+    pipe.execute = AsyncMock(return_value=[True, 1, True, 1, True, 1, True])
+    service.redis.pipeline.return_value.__aenter__ = AsyncMock(return_value=pipe)
+    service.redis.pipeline.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    assert asyncio.run(service.set("doc:1", {"a": 1}, 60, tags=["a", "b", "c"]))
+
+    pipe.execute.assert_awaited_once()
+    assert pipe.sadd.call_count == 3
+    pipe.setex.assert_called_once()
+    assert service.l1_cache.tagged("b") == {"doc:1"}
+
+
+def test_get_or_compute_coalesces_concurrent_misses():
+    service = CacheService()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"templates": [1, 2]}
+
+    async def run():
+        return await asyncio.gather(*(service.get_or_compute("api:list", loader, 60) for _ in range(20)))
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result == {"templates": [1, 2]} for result in results)
+    assert asyncio.run(service.get_or_compute("api:list", loader, 60)) == {"templates": [1, 2]}
+    assert len(calls) == 1
+
+
+def test_get_or_compute_serves_stale_value_while_refreshing():
+    service = CacheService()
+    service.redis = AsyncMock()
+    service.redis.mget.return_value = [service._serialize_data("old"), None]
+    service.redis.set.return_value = True
+    service.redis.setex.return_value = True
+    service.redis.register_script = Mock(return_value=AsyncMock(return_value=1))
+
+    async def run():
+        value = await service.get_or_compute("query:stats", AsyncMock(return_value="new"), 60, stale_ttl=300)
+        await asyncio.gather(*service._refresh_tasks)
+        return value
+
+    assert asyncio.run(run()) == "old"
+    assert service.l1_cache.get("query:stats") == "new"
+    service.redis.setex.assert_any_call("query:stats:fresh", 60, b"1")
+
+
+def test_cache_response_keys_on_caller_and_all_arguments():
+    from app.models.user import UserRole, UserStatus
+    from app.services import cache_service as cache_module
+    from app.services.principal_service import Principal
+
+    calls = []
+
+    @cache_module.cache_response(expire=60, key_prefix="test")
+    async def listing(page, current_user=None, db=None):
+        calls.append((page, current_user.id))
+        return {"page": page, "owner": current_user.id}
+
+    ada = Principal(id=1, role=UserRole.USER, status=UserStatus.ACTIVE)
+    bob = Principal(id=2, role=UserRole.USER, status=UserStatus.ACTIVE)
+
+    async def run():
+        return [
+            await listing(1, current_user=ada, db=Mock(spec=Session)),
+            await listing(1, current_user=ada, db=Mock(spec=Session)),
+            await listing(2, current_user=ada, db=Mock(spec=Session)),
+            await listing(1, current_user=bob, db=Mock(spec=Session)),
+        ]
+
+    with patch.object(cache_module, "cache_service", CacheService()):
+        results = asyncio.run(run())
+
+    assert calls == [(1, 1), (2, 1), (1, 2)]
+    assert results[3] == {"page": 1, "owner": 2}
+
+
+def test_tag_invalidation_inside_loop_uses_async_client():
+    service = CacheService()
+    service.redis = AsyncMock()
+    service.redis.register_script = Mock(return_value=AsyncMock(return_value=[1, [b"api:list"]]))
+    service.l1_cache.set("api:list", {"templates": []})
+
+    async def run():
+        with patch.object(service, "invalidate_by_tag_sync") as sync:
+            service.invalidate_by_tag_nowait("template_list")
+            await asyncio.gather(*service._invalidation_tasks)
+        return sync
+
+    assert not asyncio.run(run()).called
+    assert "api:list" not in service.l1_cache
+    service.redis.publish.assert_awaited_once()
+
+
+def test_template_list_tag_ignores_counter_bumps(db):
+    from app.models.template import Template
+    from app.services import template_service
+
+    template = Template(
+        name="Offer Letter", category="hr", type="letter", file_path="t.docx",
+        original_filename="t.docx", file_size=1, file_hash="h", created_by=1
+    )
+    db.add(template)
+    db.commit()
+
+    with patch.object(template_service.cache_service, "invalidate_by_tag_nowait") as invalidate:
+        template.download_count += 1
+        template.preview_count += 1
+        db.commit()
+        invalidate.assert_not_called()
+
+        template.name = "Offer Letter Pro"
+        db.commit()
+    invalidate.assert_called_once_with(template_service.TEMPLATE_LIST_CACHE_TAG)
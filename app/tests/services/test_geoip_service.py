@@ -0,0 +1,89 @@
+"""
+Tests for the shared GeoIP resolver
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.geoip_service import GeoIPResolver, GeoLocation
+
+
+class FakeReader:
+    def __init__(self, city="Lagos"):
+        self.city_name = city
+        self.calls = []
+        self.closed = False
+
+    def city(self, ip):
+        self.calls.append(ip)
+        return SimpleNamespace(
+            country=SimpleNamespace(name="Nigeria"),
+            subdivisions=SimpleNamespace(most_specific=SimpleNamespace(name="Lagos State")),
+            city=SimpleNamespace(name=self.city_name)
+        )
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def mmdb(tmp_path):
+    path = tmp_path / "city.mmdb"
+    path.write_bytes(b"v1")
+    return path
+
+
+def _resolver(path, readers, **kwargs):
+    resolver = GeoIPResolver(str(path), cache_size=kwargs.pop("cache_size", 100),
+                             cache_by_prefix=kwargs.pop("cache_by_prefix", True), reload_check_interval=0)
+    resolver._open = lambda: readers.pop(0)
+    return resolver
+
+
+def test_lookups_are_cached_per_network(mmdb):
+    reader = FakeReader()
+    resolver = _resolver(mmdb, [reader])
+
+    assert resolver.lookup("41.58.1.10") == GeoLocation("Nigeria", "Lagos State", "Lagos")
+    assert resolver.lookup("41.58.1.200") == GeoLocation("Nigeria", "Lagos State", "Lagos")
+    assert reader.calls == ["41.58.1.10"]
+    assert resolver.get_stats()["hits"] == 1
+
+
+def test_cache_is_bounded(mmdb):
+    reader = FakeReader()
+    resolver = _resolver(mmdb, [reader], cache_size=2, cache_by_prefix=False)
+    for ip in ("41.58.1.1", "41.58.1.2", "41.58.1.3", "41.58.1.1"):
+        resolver.lookup(ip)
+
+    assert len(reader.calls) == 4
+    assert resolver.get_stats()["cached"] == 2
+
+
+def test_private_and_invalid_addresses_skip_the_database(mmdb):
+    reader = FakeReader()
+    resolver = _resolver(mmdb, [reader])
+
+    for ip in ("127.0.0.1", "10.0.0.4", "::1", "not-an-ip", None):
+        assert resolver.lookup(ip) is None
+    assert reader.calls == []
+
+
+def test_missing_database_degrades_to_none(tmp_path):
+    resolver = GeoIPResolver(str(tmp_path / "missing.mmdb"), reload_check_interval=0)
+    assert resolver.lookup("41.58.1.10") is None
+    assert resolver.get_stats()["available"] is False
+
+
+def test_changed_file_is_reloaded(mmdb):
+    first, second = FakeReader("Lagos"), FakeReader("Abuja")
+    resolver = _resolver(mmdb, [first, second])
+    assert resolver.lookup("41.58.1.10").city == "Lagos"
+
+    mmdb.write_bytes(b"version 2")
+    os.utime(mmdb, (1, 1))
+
+    assert resolver.lookup("41.58.1.10").city == "Abuja"
+    assert first.closed and resolver.get_stats()["reloads"] == 2
@@ -0,0 +1,126 @@
+"""
+Tests for the landing analytics event stream consumer
+"""
+
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from app.models.analytics.visit import LandingVisit
+from app.services.landing_event_ingest import APPLIED_KEY, LandingEventIngest
+
+
+def _entry(entry_id, event_type, session_id, data, at):
+    return entry_id, {
+        b"e": event_type.encode(),
+        b"s": session_id.encode(),
+        b"t": at.isoformat().encode(),
+        b"d": json.dumps(data).encode()
+    }
+
+
+def test_batch_creates_visit_and_folds_interactions(db):
+    start = datetime(2026, 10, 16, 12, 0, 0)
+    ingest = LandingEventIngest(redis_client=MagicMock())
+    entries = [
+        _entry("1000-0", "visit", "s1", {"user_agent": "curl/8.0", "referrer": "https://example.com/x"}, start),
+        _entry("1000-1", "page_view", "s1", {"page": "landing", "time_on_page": 5}, start + timedelta(seconds=5)),
+        _entry("1000-2", "scroll", "s1", {"scroll_depth": 60}, start + timedelta(seconds=20)),
+        _entry("1000-3", "page_view", "s2", {"page": "pricing"}, start),
+    ]
+
+    assert ingest.apply_batch(db, entries) == 2
+
+    visit = db.query(LandingVisit).filter(LandingVisit.session_id == "s1").one()
+    assert visit.referrer_domain == "example.com"
+    assert visit.scroll_depth == 60
+    assert visit.clicks_count == 2
+    assert visit.bounce is False
+    assert visit.active_time_seconds == 15
+    assert visit.last_interaction_at == start + timedelta(seconds=20)
+    assert len(json.loads(visit.pages_viewed)) == 1
+    assert visit.visit_metadata[APPLIED_KEY] == ["1000-0", "1000-1", "1000-2"]
+    assert db.query(LandingVisit).filter(LandingVisit.session_id == "s2").count() == 1
+
+
+def test_redelivered_entries_are_applied_once(db):
+    start = datetime(2026, 10, 16, 12, 0, 0)
+    ingest = LandingEventIngest(redis_client=MagicMock())
+    first = [
+        _entry("2000-0", "visit", "s1", {}, start),
+        _entry("2000-1", "template_interaction", "s1", {"template_id": 7, "action": "view"}, start),
+    ]
+    ingest.apply_batch(db, first)
+
+    # A consumer died before acknowledging; the same entries come back with a new one
+    ingest.apply_batch(db, first + [
+        _entry("2001-0", "template_interaction", "s1", {"template_id": 8, "action": "view"}, start)
+    ])
+
+    visit = db.query(LandingVisit).filter(LandingVisit.session_id == "s1").one()
+    assert visit.templates_viewed_count == 2
+    assert [item["template_id"] for item in json.loads(visit.template_interactions)] == [7, 8]
+
+
+def test_reclaimed_older_entry_is_still_applied(db):
+    start = datetime(2026, 10, 16, 12, 0, 0)
+    ingest = LandingEventIngest(redis_client=MagicMock())
+    ingest.apply_batch(db, [
+        _entry("3000-0", "visit", "s1", {}, start),
+        _entry("3002-0", "template_interaction", "s1", {"template_id": 8, "action": "view"}, start),
+    ])
+
+    # 3001-0 was read by a consumer that died; it is reclaimed after 3002-0 was applied
+    ingest.apply_batch(db, [
+        _entry("3001-0", "template_interaction", "s1", {"template_id": 7, "action": "view"}, start)
+    ])
+
+    visit = db.query(LandingVisit).filter(LandingVisit.session_id == "s1").one()
+    assert visit.templates_viewed_count == 2
+    assert visit.visit_metadata[APPLIED_KEY] == ["3000-0", "3001-0", "3002-0"]
+
+
+def test_session_created_elsewhere_is_not_inserted_twice(db):
+    start = datetime(2026, 10, 16, 12, 0, 0)
+    ingest = LandingEventIngest(redis_client=MagicMock())
+    # Another consumer commits the row after this one found no visit for the session
+    real_lock = ingest._lock_visits
+    calls = []
+
+    def lock_visits(session, session_ids):
+        if not calls:
+            session.add(LandingVisit(session_id="s1", entry_page="/"))
+            session.commit()
+            calls.append(session_ids)
+            return {}
+        return real_lock(session, session_ids)
+
+    with patch.object(ingest, "_lock_visits", side_effect=lock_visits):
+        ingest.apply_batch(db, [_entry("4000-0", "page_view", "s1", {"page": "landing"}, start)])
+
+    visit = db.query(LandingVisit).filter(LandingVisit.session_id == "s1").one()
+    assert visit.entry_page == "/"
+    assert visit.clicks_count == 1
+
+
+def test_applied_ids_are_pruned_past_the_dedup_window():
+    with patch("app.services.landing_event_ingest.settings") as settings:
+        settings.LANDING_EVENT_DEDUP_TTL = 10
+        assert LandingEventIngest._retained({"25000-0", "1000-0", "15000-1"}) == ["15000-1", "25000-0"]
+
+
+def test_publish_falls_back_without_redis():
+    with patch("app.services.landing_event_ingest.settings") as settings:
+        settings.REDIS_ENABLED = False
+        assert LandingEventIngest().publish("page_view", "s1", {"page": "landing"}) is False
+
+
+def test_publish_skips_repeated_idempotency_key():
+    client = MagicMock()
+    client.set.return_value = None  # key already present
+    ingest = LandingEventIngest(redis_client=client)
+    with patch("app.services.landing_event_ingest.settings") as settings:
+        settings.REDIS_ENABLED = True
+        settings.LANDING_EVENT_INGEST_ENABLED = True
+        assert ingest.publish("visit", "s1", {}, idempotency_key="visit:s1") is True
+    client.xadd.assert_not_called()
@@ -0,0 +1,66 @@
+"""
+Tests for incremental dashboard metrics rollups
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.document import Document
+from app.models.payment import Payment, PaymentMethod, PaymentStatus
+from app.models.user import User
+from app.models.analytics.visit import PageVisit
+from app.services.admin_dashboard_service import AnalyticsSummary
+from app.services.metrics_rollup_service import MetricsRollupService
+
+NOW = datetime(2026, 10, 16, 12, 30)
+
+
+def _activity(db, when, tag):
+    user = User(username=f"u{tag}", email=f"u{tag}@example.com", password_hash="x", created_at=when)
+    db.add(user)
+    db.flush()
+    db.add_all([
+        Document(title="Letter", user_id=user.id, created_at=when),
+        Payment(user_id=user.id, transaction_id=f"t{tag}", flutterwave_tx_ref=f"f{tag}", amount=100.0,
+                payment_method=PaymentMethod.CARD, status=PaymentStatus.COMPLETED,
+                created_at=when, updated_at=when),
+        PageVisit(session_id=f"s{tag}", path="/pricing", user_id=user.id, duration=30,
+                  device_type="mobile", created_at=when),
+    ])
+    db.commit()
+    return user
+
+
+def test_dashboard_combines_rollups_with_live_delta(db):
+    _activity(db, NOW - timedelta(days=3), 1)
+    _activity(db, NOW - timedelta(hours=2), 2)
+    MetricsRollupService.run(db, now=NOW)
+
+    # Newer than the watermark: served from the live delta
+    _activity(db, NOW - timedelta(seconds=30), 3)
+    metrics = MetricsRollupService.get_dashboard_metrics(db, now=NOW)
+
+    assert metrics["totals"] == {"new_users": 3, "documents_created": 3, "revenue_amount": 300.0, "total_visits": 3}
+    assert metrics["windows"]["today"]["new_users"] == 2
+    assert metrics["windows"]["week"]["revenue_amount"] == 300.0
+    assert metrics["popular_pages"] == [("/pricing", 2)]
+    assert metrics["average_visit_duration"] == 30
+
+
+def test_run_only_recomputes_hours_touched_since_watermark(db):
+    _activity(db, NOW - timedelta(days=3), 1)
+    first = MetricsRollupService.run(db, now=NOW)
+    assert (first["hours_updated"], first["days_updated"]) == (1, 1)
+
+    assert MetricsRollupService.run(db, now=NOW + timedelta(minutes=5))["hours_updated"] == 0
+
+    # A refund re-rolls the payment's original hour
+    payment = db.query(Payment).one()
+    payment.status = PaymentStatus.REFUNDED
+    payment.updated_at = NOW + timedelta(minutes=6)
+    db.commit()
+    MetricsRollupService.run(db, now=NOW + timedelta(minutes=10))
+
+    day = db.query(AnalyticsSummary).filter_by(granularity="day").one()
+    assert (day.new_users, day.revenue_amount, day.payments_completed) == (1, 0.0, 0)
@@ -0,0 +1,111 @@
+"""
+Tests for the streaming OOXML render engine
+"""
+
+import zipfile
+
+import pytest
+from unittest.mock import Mock, patch
+from docx import Document as DocxDocument
+
+from app.services.document_service import DocumentService
+from app.services.ooxml_render_service import OOXMLRenderService
+from app.services.render_plan_service import RenderPlanService
+
+
+@pytest.fixture(autouse=True)
+def offline_plan_cache():
+    RenderPlanService._plans.clear()
+    with patch("app.services.render_plan_service.redis_client") as client:
+        client.get.return_value = None
+        yield client
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    doc = DocxDocument()
+    doc.sections[0].header.paragraphs[0].text = "Prepared for ${client_name}"
+    intro = doc.add_paragraph()
+    intro.add_run("Dear ")
+    intro.add_run("${client_").bold = True
+    intro.add_run("name},")
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Amount"
+    for i in range(1000):
+        doc.add_paragraph(f"Clause {i}: the amount is ${{amount}} payable by ${{client_name}}.")
+    doc.add_paragraph("Untouched closing paragraph")
+    path = tmp_path / "template.docx"
+    doc.save(str(path))
+    with zipfile.ZipFile(path, "a") as archive:
+        archive.writestr("word/media/image1.png", b"\x89PNG" + bytes(range(256)) * 64, zipfile.ZIP_STORED)
+    return str(path)
+
+
+@pytest.fixture
+def mock_db(placeholder):
+    db = Mock()
+    placeholders = [placeholder("client_name", 0, casing="title", underline=True)]
+    for i in range(1, 1001):
+        placeholders += [placeholder("amount", i), placeholder("client_name", i, casing="title")]
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = placeholders
+    return db
+
+
+@pytest.fixture
+def template():
+    template = Mock()
+    template.id = 11
+    template.font_family = "Arial"
+    template.font_size = 11
+    template.page_margins = {"top": 1.25, "left": 0.75}
+    return template
+
+
+def _render_both(mock_db, template, template_file, tmp_path):
+    data = {"client_name": "ada obi", "amount": "NGN 5,000"}
+    plan = RenderPlanService.get_plan(mock_db, template, template_file)
+
+    docx_path = str(tmp_path / "docx.docx")
+    doc = DocxDocument(template_file)
+    RenderPlanService.apply_plan(doc, plan, data)
+    DocumentService._apply_document_formatting(doc, template)
+    doc.save(docx_path)
+
+    ooxml_path = str(tmp_path / "ooxml.docx")
+    OOXMLRenderService.render(template_file, ooxml_path, plan, data, template)
+    return docx_path, ooxml_path
+
+
+def test_rewritten_parts_match_python_docx_engine(mock_db, template, template_file, tmp_path):
+    docx_path, ooxml_path = _render_both(mock_db, template, template_file, tmp_path)
+
+    with zipfile.ZipFile(docx_path) as expected, zipfile.ZipFile(ooxml_path) as actual:
+        for name in ("word/document.xml", "word/header1.xml", "word/styles.xml"):
+            assert actual.read(name) == expected.read(name), name
+
+
+def test_output_opens_with_substituted_values(mock_db, template, template_file, tmp_path):
+    _, ooxml_path = _render_both(mock_db, template, template_file, tmp_path)
+
+    doc = DocxDocument(ooxml_path)
+    assert doc.paragraphs[0].text == "Dear Ada Obi,"
+    assert doc.paragraphs[1].text == "Clause 0: the amount is NGN 5,000 payable by Ada Obi."
+    assert doc.sections[0].header.paragraphs[0].text == "Prepared for Ada Obi"
+    assert doc.styles["Normal"].font.name == "Arial"
+    assert round(doc.sections[0].top_margin.inches, 2) == 1.25
+
+
+def test_untouched_members_keep_content_and_compression(mock_db, template, template_file, tmp_path):
+    _, ooxml_path = _render_both(mock_db, template, template_file, tmp_path)
+    rewritten = {"word/document.xml", "word/header1.xml", "word/styles.xml"}
+
+    with zipfile.ZipFile(template_file) as src, zipfile.ZipFile(ooxml_path) as out:
+        assert out.testzip() is None
+        assert [i.filename for i in out.infolist()] == [i.filename for i in src.infolist()]
+        for info in src.infolist():
+            if info.filename not in rewritten:
+                copied = out.getinfo(info.filename)
+                assert (copied.CRC, copied.file_size, copied.compress_type) == \
+                    (info.CRC, info.file_size, info.compress_type)
+                assert out.read(info.filename) == src.read(info.filename)
+        assert out.getinfo("word/media/image1.png").compress_type == zipfile.ZIP_STORED
@@ -0,0 +1,100 @@
+"""
+Tests for cached authenticated principals
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.models.user import User, UserRole, UserStatus
+from app.services.cache_service import CacheService
+from app.services import principal_service
+from app.services.principal_service import Principal, PrincipalService
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="ada", email="ada@example.com", password_hash="x", role=UserRole.USER)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_snapshot_round_trips_through_cache_payload(user):
+    principal = Principal.from_user(user)
+
+    assert Principal.from_dict(principal.to_dict()) == principal
+    assert principal.is_active and not principal.is_admin
+    assert principal.has_permission("documents", "create")
+    assert not principal.has_permission("templates", "delete")
+
+
+def test_password_change_bumps_token_version_and_invalidates(db, user):
+    with patch.object(PrincipalService, "invalidate") as invalidate:
+        user.bio = "profile edits keep cached snapshots"
+        db.commit()
+        invalidate.assert_not_called()
+
+        user.password_hash = "y"
+        db.commit()
+
+    invalidate.assert_called_once_with(user.id)
+    assert user.token_version == 1
+
+
+def test_deactivation_invalidates_only_after_commit(db, user):
+    with patch.object(PrincipalService, "invalidate") as invalidate:
+        user.status = UserStatus.SUSPENDED
+        db.flush()
+        invalidate.assert_not_called()
+        db.rollback()
+    invalidate.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_principal_is_loaded_once_per_token_version(user):
+    loaded = Principal.from_user(user).to_dict()
+    with patch.object(principal_service, "cache_service", CacheService()), \
+         patch.object(PrincipalService, "_load", return_value=loaded) as load:
+        first = await PrincipalService.get_principal(user.id, 0)
+        second = await PrincipalService.get_principal(user.id, 0)
+
+    assert first == second
+    assert load.call_count == 1
+    assert not PrincipalService.token_is_current(first, {"tv": 1})
+
+
+def test_identity_only_route_skips_users_query(user, session_factory, sqlite_engine):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from database import get_db
+    from app.routes import documents
+    from app.services.auth_service import AuthService
+
+    statements = []
+    event.listen(sqlite_engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+
+    def override_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/api/documents")
+    app.dependency_overrides[get_db] = override_db
+    token = AuthService.create_access_token({"sub": str(user.id), "tv": 0})
+
+    with patch.object(principal_service, "cache_service", CacheService()), \
+         patch.object(principal_service, "SessionLocal", session_factory):
+        client = TestClient(app)
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/api/documents/", headers=headers).status_code == 200
+        assert any("FROM users" in sql for sql in statements)
+
+        statements.clear()
+        assert client.get("/api/documents/", headers=headers).status_code == 200
+
+    assert statements and not any("FROM users" in sql for sql in statements)
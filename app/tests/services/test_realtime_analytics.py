@@ -2,7 +2,7 @@
 import json
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from sqlalchemy.orm import Session
 
 from app.services.realtime_analytics_service import RealtimeAnalyticsService
@@ -31,8 +31,7 @@ async def test_track_user_interaction_success(mock_db):
         "user_agent": "test_agent"
     }
     
-    mock_visit = MagicMock(spec=LandingPageVisit)
-    mock_visit.session_quality_score = 5.0
+    mock_visit = LandingPageVisit(session_id=session_id, pages_viewed="[]")
     mock_db.query.return_value.filter.return_value.with_for_update.return_value.first.return_value = mock_visit
     
     # Execute
@@ -46,7 +45,8 @@ async def test_track_user_interaction_success(mock_db):
     # Assert
     assert result["success"] is True
     assert result["event_tracked"] is True
-    assert result["session_quality_score"] == 5.0
+    assert result["session_quality_score"] == mock_visit.session_quality_score
+    assert mock_visit.clicks_count == 1
     mock_db.commit.assert_called_once()
 
 @pytest.mark.asyncio
@@ -88,8 +88,13 @@ async def test_get_realtime_metrics(mock_db):
     ]
     mock_db.query.return_value.join.return_value.filter.return_value.group_by.return_value.order_by.return_value.limit.return_value.all.return_value = mock_templates
     
-    # Execute
-    result = await RealtimeAnalyticsService.get_realtime_metrics(db=mock_db)
+    # Execute without the Redis counters
+    with patch('app.services.realtime_analytics_service.realtime_counters') as mock_counters, \
+            patch('app.services.realtime_analytics_service.cache_service') as mock_cache:
+        mock_counters.snapshot.return_value = None
+        mock_cache.get = AsyncMock(return_value=None)
+        mock_cache.set = AsyncMock(return_value=True)
+        result = await RealtimeAnalyticsService.get_realtime_metrics(db=mock_db)
     
     # Assert
     assert result["active_sessions"] == 10
@@ -97,6 +102,7 @@ async def test_get_realtime_metrics(mock_db):
     assert result["page_views_per_minute"] == 100
     assert len(result["top_active_templates"]) == 2
     assert result["top_active_templates"][0]["active_viewers"] == 50
+    mock_cache.set.assert_awaited_once_with("analytics:realtime_metrics", result, expire=30)
 
 @pytest.mark.asyncio
 async def test_calculate_session_quality():
@@ -174,17 +180,33 @@ def test_track_form_interaction():
 
 @pytest.mark.asyncio
 async def test_update_realtime_metrics():
-    """Test updating realtime metrics cache"""
-    with patch('app.services.realtime_analytics_service.CacheService') as mock_cache:
-        mock_cache.get.return_value = '{"page_view": 5}'
-        
+    """Test updating realtime counters"""
+    with patch('app.services.realtime_analytics_service.realtime_counters') as mock_counters:
         await RealtimeAnalyticsService._update_realtime_metrics(
             db=MagicMock(),
             event_type="page_view",
-            event_data={"template_id": 1}
+            event_data={"template_id": 1},
+            session_id="test_session_123"
         )
-        
-        mock_cache.set.assert_called_once()
-        call_args = mock_cache.set.call_args[0]
-        updated_data = json.loads(call_args[1])
-        assert updated_data["page_view"] == 6
+
+        mock_counters.record.assert_called_once_with(
+            "page_view", session_id="test_session_123", template_id=1
+        )
+
+@pytest.mark.asyncio
+async def test_get_realtime_metrics_from_counters(mock_db):
+    """Realtime metrics come from the counters without querying the database"""
+    snapshot = {
+        "active_sessions": 42,
+        "page_views_per_minute": 120,
+        "conversions_per_minute": 3,
+        "top_active_templates": [{"template_id": 1, "active_viewers": 9}]
+    }
+    with patch('app.services.realtime_analytics_service.realtime_counters') as mock_counters:
+        mock_counters.snapshot.return_value = snapshot
+
+        result = await RealtimeAnalyticsService.get_realtime_metrics(db=mock_db)
+
+    assert result["active_sessions"] == 42
+    assert result["top_active_templates"][0]["active_viewers"] == 9
+    mock_db.query.assert_not_called()
@@ -0,0 +1,63 @@
+"""
+Tests for the sliding-window realtime counters
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+
+from app.services.realtime_counters import RealtimeCounters
+
+
+@pytest.fixture
+def counter_settings():
+    with patch("app.services.realtime_counters.settings") as settings:
+        settings.REDIS_ENABLED = True
+        settings.REALTIME_COUNTERS_ENABLED = True
+        settings.REALTIME_ACTIVE_WINDOW_SECONDS = 300
+        settings.REALTIME_SESSION_BUCKET_SECONDS = 10
+        settings.REALTIME_TOP_TEMPLATES = 2
+        yield settings
+
+
+def test_record_updates_buckets_in_one_pipeline(counter_settings):
+    client = MagicMock()
+    pipe = client.pipeline.return_value
+    counters = RealtimeCounters(redis_client=client)
+
+    assert counters.record("template_interaction", session_id="s1", template_id=7, now=1_000_005) is True
+
+    pipe.hincrby.assert_called_once_with("rt:ev:1000005", "template_interaction", 1)
+    pipe.pfadd.assert_any_call("rt:ses:100000", "s1")
+    pipe.zincrby.assert_called_once_with("rt:tpl:16666", 1, "7")
+    pipe.pfadd.assert_any_call("rt:tplv:7:16666", "s1")
+    pipe.execute.assert_called_once()
+
+
+def test_snapshot_sums_window_and_ranks_by_viewers(counter_settings):
+    client = MagicMock()
+    pipe = client.pipeline.return_value
+    per_second = [[b"2", None]] * 59 + [[b"1", b"1"]]
+    minutes = [[(b"7", 10.0), (b"8", 4.0)], [(b"9", 6.0)], [], [], []]
+    pipe.execute.side_effect = [per_second + [31] + minutes, [2, 5, 3]]
+    counters = RealtimeCounters(redis_client=client)
+
+    snapshot = counters.snapshot(now=1_000_000)
+
+    assert snapshot["active_sessions"] == 31
+    assert snapshot["page_views_per_minute"] == 119
+    assert snapshot["conversions_per_minute"] == 1
+    # Candidates by interactions are 7, 9, 8; distinct viewers decide the order
+    assert snapshot["top_active_templates"] == [
+        {"template_id": 9, "active_viewers": 5},
+        {"template_id": 8, "active_viewers": 3},
+    ]
+
+
+def test_snapshot_returns_none_when_redis_fails(counter_settings):
+    client = MagicMock()
+    client.pipeline.return_value.execute.side_effect = redis.ConnectionError("down")
+
+    assert RealtimeCounters(redis_client=client).snapshot() is None
+    assert RealtimeCounters(redis_client=client).record("page_view", "s1") is False
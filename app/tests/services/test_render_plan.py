@@ -0,0 +1,158 @@
+"""
+Tests for compiled template render plans
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+from docx import Document as DocxDocument
+
+from app.models.template import Placeholder, Template
+from app.services.render_plan_service import RenderPlan, RenderPlanService
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    """Template with placeholders split across runs"""
+    doc = DocxDocument()
+    paragraph = doc.add_paragraph()
+    paragraph.add_run("Dear ")
+    paragraph.add_run("${clie")
+    paragraph.add_run("nt_name}, your invoice ${invoice} is due.")
+    doc.add_paragraph("Signed on ${date} by ${client_name}")
+    path = tmp_path / "template.docx"
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def mock_db(placeholder):
+    db = Mock()
+    placeholders = [
+        placeholder("client_name", 0, casing="upper", bold=True),
+        placeholder("invoice", 0),
+        placeholder("date", 1, placeholder_type="date"),
+        placeholder("client_name", 1, casing="upper", bold=True),
+    ]
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = placeholders
+    return db
+
+
+@pytest.fixture(autouse=True)
+def offline_plan_cache():
+    RenderPlanService._plans.clear()
+    with patch("app.services.render_plan_service.redis_client") as client, \
+            patch("app.services.render_plan_service.settings.REDIS_ENABLED", True):
+        client.get.return_value = None
+        yield client
+
+
+def _template(template_id=7):
+    template = Mock()
+    template.id = template_id
+    return template
+
+
+def test_compile_locates_tokens_across_runs(mock_db, template_file):
+    file_hash = RenderPlanService.file_hash(template_file)
+    plan = RenderPlanService.compile_plan(mock_db, _template(), template_file, file_hash)
+
+    spans = {(s.name, s.paragraph_index): s for s in plan.slots}
+    client = spans[("client_name", 0)]
+    assert (client.start_run, client.start_offset, client.end_run, client.end_offset) == (1, 0, 2, 8)
+    assert len(plan.slots) == 4
+    assert plan.placeholder_names == ["client_name", "invoice", "date"]
+
+
+def test_apply_plan_substitutes_in_single_pass(mock_db, template_file, tmp_path):
+    plan = RenderPlanService.get_plan(mock_db, _template(), template_file)
+
+    doc = DocxDocument(template_file)
+    RenderPlanService.apply_plan(doc, plan, {
+        "client_name": "Ada Obi",
+        "invoice": "INV-42",
+        "date": "2025-01-02",
+    })
+
+    assert doc.paragraphs[0].text == "Dear ADA OBI, your invoice INV-42 is due."
+    assert doc.paragraphs[1].text == "Signed on January 02, 2025 by ADA OBI"
+    bold_runs = [run.text for run in doc.paragraphs[0].runs if run.bold]
+    assert bold_runs == ["ADA OBI"]
+
+
+def test_formatting_flags_that_are_off_clear_template_formatting(placeholder, tmp_path):
+    doc = DocxDocument()
+    paragraph = doc.add_paragraph()
+    run = paragraph.add_run("${name}")
+    run.bold = run.italic = run.underline = True
+    path = str(tmp_path / "styled.docx")
+    doc.save(path)
+    db = Mock()
+    db.query.return_value.filter.return_value.order_by.return_value.all.return_value = [
+        placeholder("name", 0, italic=True)
+    ]
+
+    plan = RenderPlanService.get_plan(db, _template(), path)
+    doc = DocxDocument(path)
+    RenderPlanService.apply_plan(doc, plan, {"name": "Ada"})
+
+    value_run = doc.paragraphs[0].runs[0]
+    assert (value_run.bold, value_run.italic, value_run.underline) == (False, True, False)
+
+
+def test_get_plan_uses_process_cache(mock_db, template_file, offline_plan_cache):
+    first = RenderPlanService.get_plan(mock_db, _template(), template_file)
+    second = RenderPlanService.get_plan(mock_db, _template(), template_file)
+
+    assert first is second
+    assert mock_db.query.call_count == 1
+    pipe = offline_plan_cache.pipeline.return_value
+    pipe.setex.assert_called_once()
+    pipe.sadd.assert_called_once_with("render_plan_keys:v2:7", first.cache_key)
+
+
+def test_invalidate_drops_registered_plans_without_scanning(offline_plan_cache):
+    offline_plan_cache.smembers.return_value = {"render_plan:v2:7:abc"}
+
+    RenderPlanService.invalidate(7)
+
+    offline_plan_cache.delete.assert_called_once_with("render_plan_keys:v2:7", "render_plan:v2:7:abc")
+    offline_plan_cache.scan_iter.assert_not_called()
+
+
+def test_plan_round_trips_through_redis_payload(mock_db, template_file):
+    plan = RenderPlanService.get_plan(mock_db, _template(), template_file)
+    restored = RenderPlan.from_dict(plan.to_dict())
+
+    assert restored == plan
+    assert restored.cache_key == plan.cache_key
+
+
+def test_placeholder_commit_invalidates_template_plans(db):
+    db.add(Placeholder(
+        template_id=7, name="client_name", paragraph_index=0,
+        start_run_index=0, end_run_index=0
+    ))
+    with patch.object(RenderPlanService, "invalidate") as invalidate:
+        db.flush()
+        invalidate.assert_not_called()
+        db.commit()
+
+    invalidate.assert_called_once_with(7)
+
+
+def test_template_counter_bump_keeps_plans(db):
+    template = Template(
+        name="Offer Letter", category="hr", type="letter", file_path="t.docx",
+        original_filename="t.docx", file_size=1, file_hash="h", created_by=1
+    )
+    db.add(template)
+    db.commit()
+
+    with patch.object(RenderPlanService, "invalidate") as invalidate:
+        template.download_count = (template.download_count or 0) + 1
+        db.commit()
+        invalidate.assert_not_called()
+
+        template.file_path = "t2.docx"
+        db.commit()
+    invalidate.assert_called_once_with(template.id)
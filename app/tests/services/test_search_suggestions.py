@@ -0,0 +1,91 @@
+"""
+Tests for precomputed search suggestions and the search log writer
+"""
+
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.models.template import Template
+from app.models.user import User
+from app.services import search_log_writer as writer_module
+from app.services.advanced_search_service import SearchQuery, SearchSuggestion
+from app.services.search_log_writer import SearchLogWriter, SearchLogWriterConfig
+from app.services.search_suggestions import SearchSuggestionService, build_prefix_table
+
+
+@pytest.fixture
+def service(session_factory):
+    service = SearchSuggestionService(session_factory)
+    service._redis = lambda: None
+    return service
+
+
+def _search(db, text, results=3):
+    db.add(SearchQuery(query_text=text, search_type="template", results_count=results,
+                       created_at=datetime.utcnow()))
+
+
+def test_prefix_table_completes_word_starts():
+    table = build_prefix_table({"tenancy agreement": 4.0, "agreement letter": 2.0}, limit=5)
+
+    assert table["agr"] == [("tenancy agreement", 4.0), ("agreement letter", 2.0)]
+    assert table["ten"] == [("tenancy agreement", 4.0)]
+    assert "te" not in table
+
+
+def test_prefix_table_keeps_top_completions():
+    table = build_prefix_table({f"invoice {i}": float(i) for i in range(10)}, limit=3)
+    assert [phrase for phrase, _ in table["inv"]] == ["invoice 9", "invoice 8", "invoice 7"]
+
+
+def test_rebuild_and_suggest(service, session_factory):
+    db = session_factory()
+    for _ in range(3):
+        _search(db, "Tenancy Agreement")
+    _search(db, "offer letter")
+    _search(db, "nothing found", results=0)
+    user = User(username="ada", email="ada@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    db.add(Template(
+        name="Offer Letter Pro", category="hr", type="letter", file_path="t.docx",
+        original_filename="t.docx", file_size=1, file_hash="h", created_by=user.id, is_public=True
+    ))
+    db.commit()
+
+    written = service.rebuild(db)
+
+    assert written == db.query(SearchSuggestion).count() > 0
+    assert service.suggest("agree") == ["tenancy agreement"]
+    assert service.suggest("Offer") == ["offer letter", "offer letter pro"]
+    assert service.suggest("offer letter") == ["offer letter pro"]
+    assert service.suggest("nothing") == []
+    assert service.suggest("of") == []
+    db.close()
+
+
+def test_writer_bulk_inserts_off_thread(session_factory):
+    writer = SearchLogWriter(SearchLogWriterConfig(async_writes=True, queue_size=100, batch_size=50,
+                                                   flush_interval=0.05))
+    with patch.object(writer_module, "SessionLocal", session_factory):
+        for i in range(5):
+            writer.submit({"user_id": None, "query_text": f"q{i}", "search_type": "template",
+                           "filters_applied": {}, "results_count": i, "response_time_ms": 1})
+        writer.close()
+
+    db = session_factory()
+    assert db.query(SearchQuery).count() == 5
+    assert writer.get_stats()["written"] == 5
+    db.close()
+
+
+def test_writer_drops_when_full(session_factory):
+    writer = SearchLogWriter(SearchLogWriterConfig(async_writes=True, queue_size=1, batch_size=50,
+                                                   flush_interval=5))
+    writer._ensure_started = lambda: None
+    for i in range(3):
+        writer.submit({"query_text": f"q{i}", "search_type": "template"})
+
+    assert writer.get_stats()["dropped"] == 2
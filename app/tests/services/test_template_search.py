@@ -0,0 +1,72 @@
+"""
+Tests for template search ranking and pagination
+"""
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.template import Template
+from app.models.user import User
+from app.services.advanced_search_service import AdvancedSearchService
+
+
+@pytest.fixture(autouse=True)
+def telemetry():
+    with patch("app.services.advanced_search_service.search_log_writer") as writer, \
+         patch("app.services.advanced_search_service.search_suggestions") as suggestions:
+        suggestions.suggest.return_value = []
+        yield writer
+
+
+@pytest.fixture
+def db(db):
+    user = User(username="ada", email="ada@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    for index, (name, description) in enumerate([
+        ("Tenancy Agreement", "Residential lease"),
+        ("Offer Letter", "Employment offer"),
+        ("Sales Agreement", "Goods sale"),
+    ]):
+        db.add(Template(
+            name=name, description=description, category="legal", type="contract",
+            file_path=f"t{index}.docx", original_filename=f"t{index}.docx", file_size=1,
+            file_hash=str(index), created_by=user.id, is_public=True, rating=index
+        ))
+    db.commit()
+    return db
+
+
+def test_column_sort_pages_by_cursor(db):
+    result = AdvancedSearchService.search_templates(db, "agreement", sort_by="rating", per_page=1)
+
+    assert result["total"] == 2
+    assert result["pages"] == 2
+    assert [t["name"] for t in result["templates"]] == ["Sales Agreement"]
+
+    following = AdvancedSearchService.search_templates(
+        db, "agreement", sort_by="rating", per_page=1, cursor=result["next_cursor"]
+    )
+    assert [t["name"] for t in following["templates"]] == ["Tenancy Agreement"]
+    assert following["next_cursor"] is None
+
+    past_end = AdvancedSearchService.search_templates(db, "agreement", page=5, per_page=1)
+    assert past_end["templates"] == [] and past_end["total"] == 2
+
+
+def test_search_is_logged_without_committing(db, telemetry):
+    AdvancedSearchService.search_templates(db, "agreement")
+
+    row = telemetry.submit.call_args.args[0]
+    assert row["query_text"] == "agreement" and row["results_count"] == 2
+    assert not db.new and not db.dirty
+
+
+def test_tsquery_matches_prefixes_of_any_term():
+    ts_query = AdvancedSearchService._template_tsquery(["tenan", "lease"])
+    compiled = ts_query.compile(dialect=postgresql.dialect())
+
+    assert str(compiled).startswith("to_tsquery(")
+    assert list(compiled.params.values()) == ["english", "tenan:* | lease:*"]
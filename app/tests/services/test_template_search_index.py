@@ -0,0 +1,173 @@
+"""
+Tests for the in-memory landing page template index
+"""
+
+from unittest.mock import Mock, patch
+
+import redis
+
+from app.services.cache_codecs import CacheCodec
+from app.services import template_search_index as index_module
+from app.services.template_search_index import (
+    SNAPSHOT_KEY, VERSION_KEY, IndexedTemplate, TemplateIndexManager, TemplateSearchIndex
+)
+
+
+def _index():
+    return TemplateSearchIndex([
+        IndexedTemplate(id=1, name="Tenancy Agreement", description="Residential lease",
+                        category="legal", tags=["rent", "property"]),
+        IndexedTemplate(id=2, name="Invoice", description="Bill a client for services",
+                        category="business", keywords="payment receipt", boost=2.0),
+        IndexedTemplate(id=3, name="Offer Letter", description="Employment offer agreement",
+                        category="hr"),
+    ])
+
+
+def test_name_match_outranks_description_match():
+    results = _index().search("agreement")
+    assert [entry.id for entry, _ in results] == [1, 3]
+    assert results[0][1] > results[1][1]
+
+
+def test_last_word_matches_by_prefix():
+    assert [entry.id for entry, _ in _index().search("tenan")] == [1]
+    assert [entry.id for entry, _ in _index().search("paym")] == [2]
+
+
+def test_keywords_and_tags_are_indexed():
+    assert [entry.id for entry, _ in _index().search("property")] == [1]
+    assert [entry.id for entry, _ in _index().search("receipt")] == [2]
+
+
+def test_stop_words_only_query_returns_nothing():
+    assert _index().search("the and") == []
+
+
+def test_complete_skips_removed_words():
+    index = _index()
+    assert "offer" in index.complete("of")
+    index.remove(3)
+    assert index.complete("of") == []
+    assert [entry.id for entry, _ in index.search("agreement")] == [1]
+
+
+def test_upsert_replaces_previous_tokens():
+    index = _index()
+    index.upsert(IndexedTemplate(id=2, name="Quotation", category="business"))
+    assert index.search("invoice") == []
+    assert [entry.id for entry, _ in index.search("quotation")] == [2]
+
+
+def test_snapshot_round_trip():
+    codec = CacheCodec()
+    index = _index()
+    index.version = 7
+    restored = TemplateSearchIndex.from_snapshot(codec.decode(codec.encode(index.to_snapshot())))
+    assert restored.version == 7
+    assert restored.search("invoice")[0][0] == index.search("invoice")[0][0]
+
+
+class _FakeRedis:
+    """Just enough of redis-py for WATCH / MULTI publishing"""
+
+    def __init__(self):
+        self.data = {}
+        self.before_exec = None
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, **kwargs):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def watch(self, key):
+        self.key, self.watched = key, self.client.get(key)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def multi(self):
+        pass
+
+    def set(self, key, value):
+        self.writes.append((key, value))
+
+    def execute(self):
+        # Another worker publishes between our check and EXEC
+        if self.client.before_exec:
+            hook, self.client.before_exec = self.client.before_exec, None
+            hook()
+        if self.client.get(self.key) != self.watched:
+            raise redis.WatchError()
+        for key, value in self.writes:
+            self.client.set(key, value)
+
+
+def _manager(client, rows):
+    manager = TemplateIndexManager(session_factory=Mock)
+    manager._redis = lambda: client
+    loader = patch.object(TemplateIndexManager, "_load_entries",
+                          side_effect=lambda db, ids=None: [row for row in rows if ids is None or row.id in ids])
+    return manager, loader
+
+
+def test_refresh_resyncs_and_retries_after_losing_publish_race():
+    client = _FakeRedis()
+    rows = [IndexedTemplate(id=1, name="Invoice"), IndexedTemplate(id=2, name="Receipt")]
+    manager, loader = _manager(client, rows)
+    with loader:
+        manager.rebuild()
+        assert client.get(VERSION_KEY) == b"1"
+
+        # Another worker adds template 3 while this one patches template 2
+        other = TemplateSearchIndex(rows + [IndexedTemplate(id=3, name="Quotation")], version=2)
+
+        def publish_elsewhere():
+            client.set(SNAPSHOT_KEY, manager.codec.encode(other.to_snapshot()))
+            client.set(VERSION_KEY, 2)
+
+        client.before_exec = publish_elsewhere
+        rows[1] = IndexedTemplate(id=2, name="Sales Receipt")
+        manager.refresh({2})
+
+    shared = TemplateSearchIndex.from_snapshot(manager.codec.decode(client.get(SNAPSHOT_KEY)))
+    assert client.get(VERSION_KEY) == b"3"
+    assert shared.version == manager.get().version == 3
+    assert [entry.id for entry, _ in shared.search("quotation")] == [3]
+    assert [entry.id for entry, _ in shared.search("sales")] == [2]
+
+
+def test_commit_hook_only_queues_the_refresh():
+    with patch.object(index_module.template_search_index, "schedule_refresh") as schedule, \
+         patch.object(index_module.template_search_index, "refresh") as refresh:
+        session = type("FakeSession", (), {"info": {"template_index_changes": {4, None}}})()
+        index_module._refresh_changed_templates(session)
+
+    schedule.assert_called_once_with({4})
+    refresh.assert_not_called()
+
+
+def test_get_never_builds_inline():
+    manager, loader = _manager(None, [IndexedTemplate(id=1, name="Invoice")])
+    manager._redis = lambda: None
+    with loader as load, patch.object(manager, "schedule_rebuild") as schedule:
+        assert manager.get().entries == {}
+
+    schedule.assert_called_once()
+    load.assert_not_called()
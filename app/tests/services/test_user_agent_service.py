@@ -0,0 +1,73 @@
+"""
+Tests for cached user agent classification
+"""
+
+import pytest
+
+from app.services import user_agent_service
+from app.services.user_agent_service import UserAgentClassifier, _fast_path
+
+CHROME_WINDOWS = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.6099.109 Safari/537.36")
+EDGE_WINDOWS = CHROME_WINDOWS + " Edg/120.0.2210.91"
+CHROME_ANDROID = ("Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/120.0.6099.144 Mobile Safari/537.36")
+SAFARI_IPHONE = ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_1_2 like Mac OS X) AppleWebKit/605.1.15 "
+                 "(KHTML, like Gecko) Version/17.1.2 Mobile/15E148 Safari/604.1")
+SAFARI_MAC = ("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+              "(KHTML, like Gecko) Version/17.1 Safari/605.1.15")
+FIREFOX_LINUX = "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0"
+GOOGLEBOT = "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+
+FAST_PATH_AGENTS = [CHROME_WINDOWS, CHROME_ANDROID, SAFARI_IPHONE, SAFARI_MAC, FIREFOX_LINUX]
+
+
+def test_fast_path_classifies_common_browsers():
+    chrome = _fast_path(CHROME_WINDOWS)
+    assert (chrome.browser_name, chrome.browser_version, chrome.os_name, chrome.os_version) == \
+        ("Chrome", "120.0.6099", "Windows", "10")
+
+    android = _fast_path(CHROME_ANDROID)
+    assert (android.browser_name, android.os_name, android.device_type) == ("Chrome Mobile", "Android", "mobile")
+
+    iphone = _fast_path(SAFARI_IPHONE)
+    assert (iphone.browser_name, iphone.os_version, iphone.device_type) == ("Mobile Safari", "17.1.2", "mobile")
+
+
+def test_fast_path_leaves_other_products_to_the_parser():
+    assert _fast_path(EDGE_WINDOWS) is None
+    assert _fast_path(GOOGLEBOT) is None
+
+
+@pytest.mark.parametrize("user_agent", FAST_PATH_AGENTS)
+def test_fast_path_agrees_with_full_parser(user_agent):
+    pytest.importorskip("user_agents")
+    fast, full = _fast_path(user_agent), user_agent_service._full_parse(user_agent)
+    assert (fast.browser_name, fast.browser_version, fast.os_name, fast.os_version, fast.device_type) == \
+        (full.browser_name, full.browser_version, full.os_name, full.os_version, full.device_type)
+
+
+def test_results_are_cached_and_bounded():
+    classifier = UserAgentClassifier(cache_size=2)
+    for user_agent in (CHROME_WINDOWS, CHROME_WINDOWS, EDGE_WINDOWS, GOOGLEBOT, CHROME_WINDOWS):
+        classifier.classify(user_agent)
+
+    stats = classifier.get_stats()
+    assert stats["hits"] == 1
+    assert stats["cached"] == 2
+    assert stats["fast_path"] == 2 and stats["full_parses"] == 2
+
+
+def test_bots_and_missing_agents():
+    classifier = UserAgentClassifier()
+    assert classifier.classify(GOOGLEBOT).is_bot
+    assert not classifier.classify(GOOGLEBOT).is_pc
+    assert classifier.classify(None).browser_name == "Unknown"
+
+
+def test_classify_many_parses_each_agent_once():
+    classifier = UserAgentClassifier()
+    results = classifier.classify_many([CHROME_WINDOWS, SAFARI_MAC, CHROME_WINDOWS])
+
+    assert set(results) == {CHROME_WINDOWS, SAFARI_MAC}
+    assert classifier.get_stats()["fast_path"] == 2
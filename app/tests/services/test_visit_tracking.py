@@ -212,7 +212,7 @@ def test_anonymize_user_analytics(tracking_service):
 
 
 def test_export_analytics_data(tracking_service):
-    """Test analytics data export in different formats"""
+    """Test streamed analytics export in different formats"""
     db = Mock(spec=Session)
     user_id = 101
     document_id = 1
@@ -232,23 +232,39 @@ def test_export_analytics_data(tracking_service):
             time_reading=300,
             bounce=False,
             device_fingerprint="abc123",
-            metadata={"source": "direct"}
+            visit_metadata={"source": "direct"}
         )
     ]
     
-    db.query.return_value.join.return_value.filter.return_value.all.return_value = visits
+    query = db.query.return_value.join.return_value.filter.return_value.filter.return_value
+    query.order_by.return_value.yield_per.return_value = visits
     
     # Test CSV export
-    csv_data = tracking_service.export_analytics_data(db, user_id, document_id, days, "csv")
-    assert csv_data["format"] == "csv"
-    assert len(csv_data["data"]) == 1
-    assert csv_data["data"][0]["visit_id"] == 1
-    assert csv_data["data"][0]["document_id"] == document_id
-    
-    # Test JSON export
-    json_data = tracking_service.export_analytics_data(db, user_id, document_id, days, "json")
-    assert json_data["format"] == "json"
-    assert len(json_data["visits"]) == 1
-    assert json_data["visits"][0]["visit_id"] == 1
-    assert "visitor_info" in json_data["visits"][0]
-    assert "engagement" in json_data["visits"][0]
\ No newline at end of file
+    csv_data = b"".join(tracking_service.export_analytics_data(
+        user_id, document_id, days, "csv", session_factory=lambda: db
+    )).decode()
+    lines = csv_data.strip().splitlines()
+    assert lines[0].startswith("visit_id,document_id,visit_type")
+    assert len(lines) == 2
+    assert lines[1].startswith(f"1,{document_id},view,US")
+    
+    # Test NDJSON export
+    json_data = b"".join(tracking_service.export_analytics_data(
+        user_id, document_id, days, "ndjson", session_factory=lambda: db
+    )).decode()
+    records = [json.loads(line) for line in json_data.splitlines()]
+    assert len(records) == 1
+    assert records[0]["visit_id"] == 1
+    assert "visitor_info" in records[0]
+    assert "engagement" in records[0]
+    assert records[0]["metadata"] == {"source": "direct"}
+    
+    # Test JSON export keeps the document shape
+    json_document = json.loads(b"".join(tracking_service.export_analytics_data(
+        user_id, document_id, days, "json", session_factory=lambda: db
+    )))
+    assert json_document["format"] == "json"
+    assert json_document["period_days"] == days
+    assert json_document["total_records"] == 1
+    assert json_document["visits"][0]["visit_id"] == 1
+    db.close.assert_called()
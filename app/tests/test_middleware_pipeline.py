@@ -0,0 +1,115 @@
+"""
+Tests for the pure-ASGI middleware pipeline
+"""
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.performance import CompressionMiddleware
+from app.middleware.pipeline import MiddlewarePipeline, PipelineStage
+
+
+class RecordingStage(PipelineStage):
+    def __init__(self, name, calls, block=None, fail=None):
+        super().__init__()
+        self.name = name
+        self.calls = calls
+        self.block = block
+        self.fail = fail
+
+    async def on_request(self, request):
+        self.calls.append(f"{self.name}.request")
+        if self.fail:
+            raise HTTPException(status_code=self.fail, detail="nope")
+        return self.block
+
+    async def on_response(self, request, response):
+        self.calls.append(f"{self.name}.response")
+        response.headers[f"x-{self.name}"] = "1"
+
+    async def on_complete(self, request, response):
+        self.calls.append(f"{self.name}.complete:{response.status_code}")
+
+
+def _client(stages, skip=None):
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b"a" * 800, b"b" * 800]), media_type="text/plain")
+
+    @app.get("/archive")
+    async def archive():
+        return Response(b"PK" + b"\0" * 4096, media_type="application/zip")
+
+    app.add_middleware(MiddlewarePipeline, stages=stages, skip=skip)
+    return TestClient(app)
+
+
+def test_hooks_run_in_nested_order():
+    calls = []
+    response = _client([RecordingStage("outer", calls), RecordingStage("inner", calls)]).get("/api/ping")
+
+    assert response.headers["x-outer"] == response.headers["x-inner"] == "1"
+    assert calls == [
+        "outer.request", "inner.request",
+        "inner.response", "outer.response",
+        "inner.complete:200", "outer.complete:200",
+    ]
+
+
+def test_short_circuit_only_reaches_outer_stages():
+    calls = []
+    stages = [RecordingStage("outer", calls), RecordingStage("inner", calls, fail=403)]
+    response = _client(stages).get("/api/ping")
+
+    assert response.status_code == 403
+    assert response.json() == {"detail": "nope"}
+    assert "x-inner" not in response.headers
+    assert calls == ["outer.request", "inner.request", "outer.response", "outer.complete:403"]
+
+
+def test_skip_table_bypasses_stages_by_prefix():
+    calls = []
+    client = _client([RecordingStage("audit", calls), RecordingStage("security", calls)],
+                     skip={"/health": {"audit"}})
+    response = client.get("/health")
+
+    assert "x-audit" not in response.headers
+    assert calls == ["security.request", "security.response", "security.complete:200"]
+
+
+def test_compression_stage_covers_streamed_bodies():
+    client = _client([CompressionMiddleware(minimum_size=1024)])
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert "content-length" not in response.headers
+    assert response.content == b"a" * 800 + b"b" * 800
+
+
+def test_compression_skips_archives_and_unaccepted_codings():
+    client = _client([CompressionMiddleware(minimum_size=1024)])
+
+    assert "content-encoding" not in client.get("/archive", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/stream", headers={"Accept-Encoding": "gzip;q=0"}).headers
+
+
+def test_compression_negotiates_by_server_preference():
+    stage = CompressionMiddleware()
+    stage.encoders = {"br": None, "zstd": None, "gzip": None}
+
+    assert stage.select_encoding("gzip, zstd;q=0.5") == "zstd"
+    assert stage.select_encoding("br;q=0, gzip") == "gzip"
+    assert stage.select_encoding("*") == "br"
+    assert stage.select_encoding("identity") is None
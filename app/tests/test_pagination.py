@@ -0,0 +1,67 @@
+"""
+Tests for keyset pagination
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.document import Document, DocumentStatus
+from app.utils.pagination import CursorError, decode_cursor, encode_cursor, paginate
+
+
+@pytest.fixture
+def db(db):
+    start = datetime(2026, 1, 1)
+    for index in range(7):
+        # Pairs of equal timestamps exercise the id tie-breaker
+        db.add(Document(
+            title=f"Doc {index}", user_id=1, status=DocumentStatus.DRAFT,
+            created_at=start + timedelta(hours=index // 2), updated_at=start
+        ))
+    db.commit()
+    return db
+
+
+def _walk(db, order):
+    titles, cursor = [], None
+    while True:
+        page = paginate(db.query(Document), order, Document.id, 3, cursor=cursor)
+        titles.extend(doc.title for doc in page.items)
+        if page.next_cursor is None:
+            return titles, page
+        cursor = page.next_cursor
+
+
+def test_cursor_walk_matches_offset_order(db):
+    order = [(Document.created_at, True)]
+    titles, last = _walk(db, order)
+
+    expected = [doc.title for doc in db.query(Document).order_by(
+        Document.created_at.desc(), Document.id.desc()
+    )]
+    assert titles == expected
+    assert last.total == 7 and not last.total_is_estimate
+    assert last.pages(3) == 3
+
+
+def test_page_number_without_cursor(db):
+    page = paginate(db.query(Document), [(Document.title, False)], Document.id, 3, page=3)
+    assert [doc.title for doc in page.items] == ["Doc 6"]
+    assert page.next_cursor is None
+
+
+def test_enum_and_datetime_values_round_trip():
+    values = [DocumentStatus.DRAFT, datetime(2026, 1, 1, 12), 5]
+    token = encode_cursor("status:a,id:a", values)
+    assert decode_cursor("status:a,id:a", token) == ["DRAFT", datetime(2026, 1, 1, 12), 5]
+
+
+def test_rejects_tampered_or_foreign_cursor():
+    token = encode_cursor("created_at:d,id:d", [1])
+    with pytest.raises(CursorError):
+        decode_cursor("title:a,id:a", token)
+    with pytest.raises(CursorError):
+        decode_cursor("created_at:d,id:d", token[:-2] + "xx")
+    with pytest.raises(CursorError):
+        decode_cursor("created_at:d,id:d", "not a cursor")
@@ -0,0 +1,63 @@
+"""
+Tests for the GCRA rate limiting middleware
+"""
+
+from unittest.mock import AsyncMock, Mock
+
+import redis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.rate_limit import LocalTokenBucket, RateLimitMiddleware
+
+
+def _client(script):
+    redis_client = Mock()
+    redis_client.register_script.return_value = script
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, redis_client=redis_client)
+    return TestClient(app)
+
+
+def test_headers_come_from_single_script_call():
+    script = AsyncMock(return_value=[1, 999, 0, 3600])
+    response = _client(script).get("/api/ping")
+
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Remaining"] == "999"
+    script.assert_awaited_once()
+    assert script.await_args.kwargs["args"] == [1000, 3600 * 1000]
+
+
+def test_rejected_request_gets_429_with_retry_after():
+    script = AsyncMock(return_value=[0, 0, 1500, 3600000])
+    response = _client(script).get("/api/ping")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+
+
+def test_local_bucket_enforces_limit_when_redis_is_down():
+    script = AsyncMock(side_effect=redis.ConnectionError("down"))
+    client = _client(script)
+
+    codes = [client.get("/api/ping").status_code for _ in range(1002)]
+
+    assert codes.count(200) == 1000
+    assert codes[-1] == 429
+    # Redis is skipped for a while after the first error
+    assert script.await_count == 1
+
+
+def test_local_bucket_refills_over_time():
+    bucket = LocalTokenBucket()
+    assert all(bucket.take("k", 2, 60)[0] for _ in range(2))
+    allowed, _, retry_after, _ = bucket.take("k", 2, 60)
+    assert not allowed
+    assert 0 < retry_after <= 30
@@ -0,0 +1,89 @@
+"""
+Tests for streaming CSV / NDJSON exports
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+from app.models.audit import AuditEventType, AuditLevel, AuditLog
+from app.services.audit_service import AuditService
+from app.utils.streaming_export import stream_export
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    for index in range(5):
+        session.add(AuditLog(
+            event_type=AuditEventType.LOGIN, event_level=AuditLevel.INFO,
+            event_message=f"event {index}", user_id=1 if index != 2 else 2,
+            timestamp=datetime(2026, 10, 16, 12, index)
+        ))
+    session.commit()
+    session.close()
+    return session_factory
+
+
+def _export(session_factory, format, **kwargs):
+    return stream_export(
+        lambda db: db.query(AuditLog).filter(AuditLog.user_id == 1),
+        AuditLog.id,
+        lambda log: {"id": log.id, "message": log.event_message},
+        format,
+        fieldnames=["id", "message"],
+        session_factory=session_factory,
+        **kwargs
+    )
+
+
+def test_csv_export_writes_header_and_rows_in_id_order(session_factory):
+    lines = b"".join(_export(session_factory, "csv")).decode().splitlines()
+
+    assert lines == ["id,message", "1,event 0", "2,event 1", "4,event 3", "5,event 4"]
+
+
+def test_output_is_split_into_chunks(session_factory):
+    chunks = list(_export(session_factory, "ndjson", chunk_bytes=40, batch_size=2))
+
+    assert len(chunks) > 1
+    records = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [record["id"] for record in records] == [1, 2, 4, 5]
+
+
+def test_cursor_resumes_after_last_id(session_factory):
+    records = [json.loads(line) for line in b"".join(_export(session_factory, "ndjson", cursor=2)).decode().splitlines()]
+
+    assert [record["id"] for record in records] == [4, 5]
+
+
+def test_json_export_streams_enveloped_document(session_factory):
+    chunks = list(_export(
+        session_factory, "json", chunk_bytes=20,
+        envelope={"format": "json"}, items_key="events", count_key="total_events"
+    ))
+
+    assert len(chunks) > 1
+    document = json.loads(b"".join(chunks))
+    assert document["format"] == "json"
+    assert document["total_events"] == 4
+    assert [event["id"] for event in document["events"]] == [1, 2, 4, 5]
+
+
+def test_json_export_without_rows_is_valid(session_factory):
+    assert json.loads(b"".join(_export(session_factory, "json", cursor=5))) == []
+
+
+def test_audit_export_streams_user_events(session_factory):
+    rows = AuditService.export_audit_data(1, "ndjson", session_factory=session_factory)
+    records = [json.loads(line) for line in b"".join(rows).decode().splitlines()]
+
+    assert len(records) == 4
+    assert records[0]["event_type"] == AuditEventType.LOGIN.value
+    assert records[0]["timestamp"] == "2026-10-16T12:00:00"
+
+
+def test_unknown_format_is_rejected(session_factory):
+    with pytest.raises(ValueError):
+        list(_export(session_factory, "xml"))
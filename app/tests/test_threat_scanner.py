@@ -0,0 +1,66 @@
+"""
+Tests for the shared request threat scanner
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.middleware.pipeline import MiddlewarePipeline
+from app.middleware.security import SecurityMiddleware
+from app.middleware.threat_scanner import (
+    ADVANCED_PROFILE, ADVANCED_RULES, SECURITY_PROFILE, SECURITY_RULES, ThreatScanner
+)
+
+
+def _scanner():
+    scanner = ThreatScanner(cache_size=2)
+    scanner.register(SECURITY_PROFILE, SECURITY_RULES)
+    scanner.register(ADVANCED_PROFILE, ADVANCED_RULES)
+    return scanner
+
+
+def test_rules_apply_only_to_their_fields():
+    scanner = _scanner()
+
+    assert scanner.scan(SECURITY_PROFILE, "/api/docs", "q=1 UNION SELECT x").category == "injection"
+    assert scanner.scan(SECURITY_PROFILE, "/a/../etc/passwd").category == "path_traversal"
+    # Traversal is only checked in the path, agents only in the user agent
+    assert scanner.scan(SECURITY_PROFILE, "/api/files", "next=../x") is None
+    assert scanner.scan(SECURITY_PROFILE, "/api/sqlmap", "", "Mozilla/5.0") is None
+    match = scanner.scan(SECURITY_PROFILE, "/api/docs", "", "sqlmap/1.7")
+    assert (match.category, match.field) == ("scanner_agent", "agent")
+
+
+def test_url_patterns_win_over_agent_in_advanced_profile():
+    scanner = _scanner()
+
+    match = scanner.scan(ADVANCED_PROFILE, "/x", "a=<script>", "Nikto")
+    assert (match.rule, match.field) == ("xss", "query")
+    assert scanner.scan(ADVANCED_PROFILE, "/x", "", "Nikto").category == "scanner_agent"
+
+
+def test_verdicts_are_cached_in_a_bounded_lru():
+    scanner = _scanner()
+
+    for _ in range(3):
+        scanner.scan(SECURITY_PROFILE, "/api/documents", "page=2")
+    scanner.scan(SECURITY_PROFILE, "/api/templates")
+    scanner.scan(SECURITY_PROFILE, "/api/users")
+
+    assert (scanner.hits, scanner.misses) == (2, 3)
+    assert len(scanner._verdicts) == 2
+
+
+def test_security_middleware_blocks_through_scanner():
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(MiddlewarePipeline, stages=[SecurityMiddleware()])
+    client = TestClient(app)
+
+    assert client.get("/api/ping", params={"q": "report"}).status_code == 200
+    assert client.get("/api/ping", params={"q": "1; DROP TABLE users"}).status_code == 403
+    assert client.get("/api/ping", headers={"User-Agent": "WPScan v3"}).status_code == 403
@@ -0,0 +1,193 @@
+"""
+Keyset pagination and row count estimates for list endpoints
+
+OFFSET pagination makes the database walk and discard every row before the
+requested page, and an exact COUNT(*) walks all matching rows on every
+request. For users with large histories both get slower the deeper they go.
+
+paginate() orders a query by its sort columns plus the primary key and
+returns an opaque cursor for the row after the page. Passing that cursor
+back resumes with a WHERE on (sort key, id) that an index can seek to, so
+every page costs the same. A page number is still accepted when no cursor is
+given, which keeps old clients and page 1 working.
+
+Totals come from the planner's row estimate on PostgreSQL (pg_class for an
+unfiltered table, EXPLAIN otherwise) unless an exact count is requested.
+Estimates below PAGINATION_EXACT_COUNT_THRESHOLD are replaced with an exact
+count, since counting that few rows is cheap. Other databases always count.
+"""
+
+import base64
+import enum
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Query
+
+from config import settings
+
+# (column, descending) pairs, most significant first
+SortOrder = Sequence[Tuple[Any, bool]]
+
+
+class CursorError(ValueError):
+    """Raised when a cursor token is malformed, tampered with or for another sort"""
+
+
+@dataclass
+class Page:
+    """One page of results and how to fetch the next"""
+    items: List[Any]
+    total: int
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+
+    def pages(self, per_page: int) -> int:
+        return (self.total + per_page - 1) // per_page
+
+
+def _sign(body: bytes) -> bytes:
+    return hmac.new(settings.SECRET_KEY.encode(), body, hashlib.sha256).digest()[:12]
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return {"e": value.name}
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "e" in value:
+            return value["e"]
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise CursorError("Unknown cursor value")
+    return value
+
+
+def encode_cursor(sort_name: str, values: Sequence[Any]) -> str:
+    """Opaque, signed token for the position after a row"""
+    body = json.dumps([sort_name, [_dump_value(v) for v in values]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(_sign(body) + body).rstrip(b"=").decode()
+
+
+def decode_cursor(sort_name: str, token: str) -> List[Any]:
+    """Values encoded by encode_cursor for the same sort"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        signature, body = raw[:12], raw[12:]
+        if not hmac.compare_digest(signature, _sign(body)):
+            raise CursorError("Invalid cursor")
+        cursor_sort, values = json.loads(body)
+    except CursorError:
+        raise
+    except Exception:
+        raise CursorError("Invalid cursor")
+
+    if cursor_sort != sort_name:
+        raise CursorError("Cursor belongs to a different sort order")
+    return [_load_value(v) for v in values]
+
+
+def _seek_condition(order: SortOrder, values: Sequence[Any]):
+    """Rows strictly after values in the given order"""
+    clauses = []
+    for position, (column, descending) in enumerate(order):
+        ties = [order[i][0] == values[i] for i in range(position)]
+        beyond = column < values[position] if descending else column > values[position]
+        clauses.append(and_(*ties, beyond))
+    return or_(*clauses)
+
+
+def _sort_name(order: SortOrder) -> str:
+    return ",".join(f"{column.key}:{'d' if descending else 'a'}" for column, descending in order)
+
+
+def paginate(query: Query, order: SortOrder, id_column, per_page: int, cursor: Optional[str] = None,
+             page: int = 1, exact_count: bool = False) -> Page:
+    """
+    Fetch one page of an entity query ordered by order, then id_column.
+
+    The sort columns must be non-null columns of the queried entity. With a
+    cursor, page is ignored.
+    """
+    order = list(order) + [(id_column, order[-1][1] if order else False)]
+    sort_name = _sort_name(order)
+
+    total, total_is_estimate = count_rows(query, exact=exact_count)
+
+    paged = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order])
+    if cursor:
+        values = decode_cursor(sort_name, cursor)
+        if len(values) != len(order):
+            raise CursorError("Invalid cursor")
+        paged = paged.filter(_seek_condition(order, values))
+    elif page > 1:
+        paged = paged.offset((page - 1) * per_page)
+
+    # One extra row says whether there is a next page without a count
+    rows = paged.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(sort_name, [getattr(last, column.key) for column, _ in order])
+
+    return Page(items=items, total=total, total_is_estimate=total_is_estimate, next_cursor=next_cursor)
+
+
+def count_rows(query: Query, exact: bool = False) -> Tuple[int, bool]:
+    """
+    Number of rows the query matches, and whether it is an estimate
+    """
+    query = query.order_by(None)
+    session = query.session
+    if exact or session.get_bind().dialect.name != "postgresql":
+        return query.count(), False
+
+    estimate = _estimate_rows(query)
+    if estimate is None or estimate < settings.PAGINATION_EXACT_COUNT_THRESHOLD:
+        return query.count(), False
+    return estimate, True
+
+
+def _estimate_rows(query: Query) -> Optional[int]:
+    session = query.session
+    try:
+        # A failed EXPLAIN must not abort the caller's transaction
+        with session.begin_nested():
+            statement = query.statement
+            froms = statement.get_final_froms()
+            if statement.whereclause is None and len(froms) == 1 and hasattr(froms[0], "name"):
+                reltuples = session.execute(
+                    text("SELECT reltuples FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+                    {"name": froms[0].name}
+                ).scalar()
+                # -1 means the table has never been analyzed
+                if reltuples is not None and reltuples >= 0:
+                    return int(reltuples)
+
+            compiled = statement.compile(
+                dialect=session.get_bind().dialect,
+                compile_kwargs={"render_postcompile": True}
+            )
+            plan = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params
+            ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return None
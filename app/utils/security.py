@@ -4,7 +4,7 @@ Security utility functions
 
 from jose import jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 from pathlib import Path
 from fastapi import Depends, HTTPException, status, Request, UploadFile
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -14,6 +14,7 @@ from config import settings
 from database import get_db
 from app.models.user import User, UserRole
 from app.services.auth_service import AuthService
+from app.services.principal_service import Principal, PrincipalService
 
 security = HTTPBearer()
 
@@ -72,6 +73,14 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"}
             )
         
+        # Tokens issued before a password change are revoked
+        if payload.get("tv") is not None and int(payload["tv"]) != user.token_version:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
         return user
     
     except jwt.JWTError:
@@ -82,6 +91,43 @@ async def get_current_user(
         )
 
 
+async def get_current_principal(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Principal:
+    """Get the cached principal for routes that only need identity and role
+
+    Reuses the snapshot AuthMiddleware attached to the request, if any;
+    otherwise resolves it from the principal cache without a users query.
+    """
+    
+    principal = getattr(request.state, "current_user", None)
+    if isinstance(principal, Principal):
+        return principal
+    
+    payload = AuthService.verify_token(credentials.credentials, "access")
+    if not payload or not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    token_version = payload.get("tv")
+    principal = await PrincipalService.get_principal(
+        int(payload["sub"]), int(token_version) if token_version is not None else None
+    )
+    if not principal or not principal.is_active or not PrincipalService.token_is_current(principal, payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user account or revoked token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    request.state.current_user = principal
+    return principal
+
+
 async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
@@ -144,6 +190,17 @@ def sanitize_content(content: str) -> str:
     return sanitized
 
 
+def sanitize_user_input(data: Any) -> Any:
+    """Sanitize every string in user-supplied data, recursing into dicts and lists"""
+    if isinstance(data, str):
+        return sanitize_content(data)
+    if isinstance(data, dict):
+        return {key: sanitize_user_input(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [sanitize_user_input(value) for value in data]
+    return data
+
+
 def verify_resource_access(user: User, resource_user_id: int, admin_override: bool = True) -> bool:
     """Verify user can access resource"""
     
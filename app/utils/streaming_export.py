@@ -0,0 +1,114 @@
+"""
+Streaming CSV / NDJSON / JSON exports
+
+Export endpoints used to load every matching row with query.all() and build
+the whole CSV or JSON document before responding, so memory grew with the
+size of the export. stream_export() instead walks the query in id order with
+yield_per (a server-side cursor on PostgreSQL), serializes each row as it
+arrives and yields the output in EXPORT_CHUNK_BYTES chunks for a
+StreamingResponse. CompressionMiddleware gzips those chunks as they are
+sent, so neither side of the encoder holds the full export.
+
+JSON exports keep the document shape the endpoints always returned: the
+envelope fields first, then the records array, then the record count,
+which is only known once the last row has been written.
+
+Exports resume from a cursor: every record carries its id, and passing the
+last id received as the cursor restarts the export just after it. The
+session is owned by the generator rather than the request, because the body
+is still being produced after the endpoint has returned.
+"""
+
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from config import settings
+from database import SessionLocal
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def export_headers(filename: str, format: str) -> Dict[str, str]:
+    """Response headers for an export download"""
+    return {"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+
+
+def stream_export(
+    build_query: Callable[[Session], Query],
+    id_column,
+    serialize: Callable[[Any], Dict[str, Any]],
+    format: str,
+    fieldnames: Optional[List[str]] = None,
+    cursor: Optional[int] = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = None,
+    chunk_bytes: int = None,
+    envelope: Optional[Dict[str, Any]] = None,
+    items_key: str = "items",
+    count_key: Optional[str] = None
+) -> Iterator[bytes]:
+    """
+    Serialize the rows of build_query(db) after cursor, in id order
+
+    serialize maps a row to a flat dict (CSV) or any JSON-able dict (NDJSON,
+    JSON). CSV needs fieldnames; the header is written on every request,
+    including resumed ones, so each response is a complete file. JSON
+    writes a bare array, or with envelope an object of the envelope fields,
+    the array under items_key and the number of records under count_key.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: {format}")
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    chunk_bytes = chunk_bytes or settings.EXPORT_CHUNK_BYTES
+
+    buffer = io.StringIO()
+    writer = None
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+    elif format == "json":
+        if envelope is not None:
+            fields = json.dumps(envelope, default=str, separators=(",", ":"))[1:-1]
+            buffer.write("{" + (fields + "," if fields else "") + json.dumps(items_key) + ":")
+        buffer.write("[")
+    count = 0
+
+    db = session_factory()
+    try:
+        query = build_query(db)
+        if cursor is not None:
+            query = query.filter(id_column > cursor)
+        for row in query.order_by(id_column).yield_per(batch_size):
+            record = serialize(row)
+            if writer is not None:
+                writer.writerow(record)
+            elif format == "json":
+                buffer.write(("," if count else "") + json.dumps(record, default=str, separators=(",", ":")))
+            else:
+                buffer.write(json.dumps(record, default=str, separators=(",", ":")))
+                buffer.write("\n")
+            count += 1
+
+            if buffer.tell() >= chunk_bytes:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+    finally:
+        db.close()
+
+    if format == "json":
+        buffer.write("]")
+        if envelope is not None:
+            if count_key:
+                buffer.write(f",{json.dumps(count_key)}:{count}")
+            buffer.write("}")
+    if buffer.tell():
+        yield buffer.getvalue().encode()
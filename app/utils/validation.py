@@ -295,6 +295,27 @@ def validate_json_data(data: Any) -> bool:
         return False
 
 
+def validate_analytics_data(data: Any) -> Dict[str, Any]:
+    """Validate the payload of a tracked analytics event"""
+    
+    errors = []
+    
+    if not isinstance(data, dict):
+        errors.append("Event data must be an object")
+    elif not validate_json_data(data):
+        errors.append("Event data must be JSON serializable and under 1MB")
+    else:
+        for field in ("scroll_depth", "time_on_page"):
+            value = data.get(field)
+            if value is not None and (not isinstance(value, (int, float)) or value < 0):
+                errors.append(f"{field} must be a non-negative number")
+    
+    return {
+        "valid": len(errors) == 0,
+        "errors": errors
+    }
+
+
 def sanitize_html_input(text: str) -> str:
     """Sanitize HTML input to prevent XSS"""
     
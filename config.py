@@ -147,7 +147,14 @@ class Settings(BaseSettings):
     # Performance
     CACHE_TTL: int = 3600  # 1 hour
     TEMPLATE_CACHE_TTL: int = 86400  # 24 hours
+    RENDER_PLAN_CACHE_SIZE: int = int(os.getenv("RENDER_PLAN_CACHE_SIZE", "256"))  # compiled plans per worker
+    CACHE_L1_MAX_ENTRIES: int = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1000"))
+    CACHE_L1_MAX_BYTES: int = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))  # 64MB per process
+    CACHE_L1_TTL: int = int(os.getenv("CACHE_L1_TTL", "300"))  # 5 minutes
+    CACHE_L1_SWEEP_INTERVAL: int = int(os.getenv("CACHE_L1_SWEEP_INTERVAL", "60"))  # seconds between expiry sweeps
+    CACHE_SERIALIZER: str = os.getenv("CACHE_SERIALIZER", "auto")  # auto, orjson, msgpack, json
     DOCUMENT_GENERATION_TIMEOUT: int = 30  # seconds
+    BATCH_GENERATION_CHUNK_SIZE: int = int(os.getenv("BATCH_GENERATION_CHUNK_SIZE", "25"))  # documents per chunk task
 
     # Advanced Performance Settings
     MAX_CONCURRENT_UPLOADS: int = 10
@@ -161,6 +168,58 @@ class Settings(BaseSettings):
     DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
     DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "3600"))
 
+    # Admin dashboard rollups
+    METRICS_ROLLUP_INTERVAL: int = int(os.getenv("METRICS_ROLLUP_INTERVAL", "300"))  # seconds between rollup runs
+    METRICS_ROLLUP_LAG: int = int(os.getenv("METRICS_ROLLUP_LAG", "120"))  # seconds; rows this recent are left to the live delta
+    METRICS_HOURLY_RETENTION_DAYS: int = int(os.getenv("METRICS_HOURLY_RETENTION_DAYS", "90"))
+
+    # List pagination
+    PAGINATION_EXACT_COUNT_THRESHOLD: int = int(os.getenv("PAGINATION_EXACT_COUNT_THRESHOLD", "10000"))  # planner estimates below this are counted exactly
+
+    # Search telemetry and suggestions
+    SEARCH_LOG_ASYNC_WRITES: bool = os.getenv("SEARCH_LOG_ASYNC_WRITES", "true").lower() == "true"
+    SEARCH_LOG_QUEUE_SIZE: int = int(os.getenv("SEARCH_LOG_QUEUE_SIZE", "10000"))  # rows buffered per process
+    SEARCH_LOG_BATCH_SIZE: int = int(os.getenv("SEARCH_LOG_BATCH_SIZE", "200"))  # rows per bulk insert
+    SEARCH_LOG_FLUSH_INTERVAL: float = float(os.getenv("SEARCH_LOG_FLUSH_INTERVAL", "2.0"))  # seconds
+    SEARCH_SUGGESTION_REBUILD_INTERVAL: int = int(os.getenv("SEARCH_SUGGESTION_REBUILD_INTERVAL", "900"))  # seconds between rebuilds
+    SEARCH_SUGGESTION_SYNC_INTERVAL: float = float(os.getenv("SEARCH_SUGGESTION_SYNC_INTERVAL", "30"))  # seconds between version checks
+    SEARCH_SUGGESTION_WINDOW_DAYS: int = int(os.getenv("SEARCH_SUGGESTION_WINDOW_DAYS", "30"))
+    SEARCH_SUGGESTION_MAX_QUERIES: int = int(os.getenv("SEARCH_SUGGESTION_MAX_QUERIES", "2000"))  # most frequent searches considered
+    SEARCH_SUGGESTION_LIMIT: int = int(os.getenv("SEARCH_SUGGESTION_LIMIT", "5"))  # completions kept per prefix
+
+    # GeoIP lookups
+    GEOIP_DATABASE_PATH: str = os.getenv("GEOIP_DATABASE_PATH", "/usr/share/GeoIP/GeoLite2-City.mmdb")
+    GEOIP_CACHE_SIZE: int = int(os.getenv("GEOIP_CACHE_SIZE", "50000"))  # cached networks per process
+    GEOIP_CACHE_BY_PREFIX: bool = os.getenv("GEOIP_CACHE_BY_PREFIX", "true").lower() == "true"  # key by /24 (/48 for IPv6)
+    GEOIP_RELOAD_CHECK_INTERVAL: float = float(os.getenv("GEOIP_RELOAD_CHECK_INTERVAL", "60"))  # seconds between file checks
+
+    # Landing analytics event stream
+    LANDING_EVENT_INGEST_ENABLED: bool = os.getenv("LANDING_EVENT_INGEST_ENABLED", "true").lower() == "true"  # needs REDIS_ENABLED
+    LANDING_EVENT_STREAM: str = os.getenv("LANDING_EVENT_STREAM", "analytics:landing_events")
+    LANDING_EVENT_STREAM_MAXLEN: int = int(os.getenv("LANDING_EVENT_STREAM_MAXLEN", "1000000"))  # approximate cap on unread entries
+    LANDING_EVENT_BATCH_SIZE: int = int(os.getenv("LANDING_EVENT_BATCH_SIZE", "500"))  # entries folded per commit
+    LANDING_EVENT_INGEST_INTERVAL: float = float(os.getenv("LANDING_EVENT_INGEST_INTERVAL", "5"))  # seconds between drains
+    LANDING_EVENT_DRAIN_SECONDS: float = float(os.getenv("LANDING_EVENT_DRAIN_SECONDS", "4"))  # time budget per drain
+    LANDING_EVENT_CLAIM_IDLE_MS: int = int(os.getenv("LANDING_EVENT_CLAIM_IDLE_MS", "60000"))  # reclaim unacknowledged entries after
+    LANDING_EVENT_DEDUP_TTL: int = int(os.getenv("LANDING_EVENT_DEDUP_TTL", "86400"))  # seconds an idempotency key is remembered
+
+    # Streaming exports
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # rows fetched per server-side cursor round trip
+    EXPORT_CHUNK_BYTES: int = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))  # serialized bytes per response chunk
+
+    # Realtime analytics counters
+    REALTIME_COUNTERS_ENABLED: bool = os.getenv("REALTIME_COUNTERS_ENABLED", "true").lower() == "true"  # needs REDIS_ENABLED
+    REALTIME_ACTIVE_WINDOW_SECONDS: int = int(os.getenv("REALTIME_ACTIVE_WINDOW_SECONDS", "300"))  # a session counts as active this long
+    REALTIME_SESSION_BUCKET_SECONDS: int = int(os.getenv("REALTIME_SESSION_BUCKET_SECONDS", "10"))  # HyperLogLog bucket width
+    REALTIME_TOP_TEMPLATES: int = int(os.getenv("REALTIME_TOP_TEMPLATES", "5"))
+
+    # User agent classification
+    USER_AGENT_CACHE_SIZE: int = int(os.getenv("USER_AGENT_CACHE_SIZE", "20000"))  # distinct UA strings cached per process
+
+    # Landing page template search index
+    TEMPLATE_INDEX_SYNC_INTERVAL: float = float(os.getenv("TEMPLATE_INDEX_SYNC_INTERVAL", "5"))  # seconds between snapshot version checks
+    TEMPLATE_INDEX_REBUILD_INTERVAL: int = int(os.getenv("TEMPLATE_INDEX_REBUILD_INTERVAL", "900"))  # full rebuild, refreshes popularity
+
     # Control dev shortcuts
     # When True the app will skip any automatic DB table creation at startup.
     SKIP_DB_TABLE_CREATION: bool = os.getenv("SKIP_DB_TABLE_CREATION",
@@ -170,6 +229,12 @@ class Settings(BaseSettings):
     GDPR_ENABLED: bool = True
     SOC2_ENABLED: bool = True
     AUDIT_LOG_RETENTION_DAYS: int = 2555  # 7 years
+    AUDIT_ASYNC_WRITES: bool = os.getenv("AUDIT_ASYNC_WRITES", "true").lower() == "true"
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))  # events buffered per process
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "500"))  # rows per bulk insert
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))  # seconds
+    AUDIT_BACKPRESSURE: str = os.getenv("AUDIT_BACKPRESSURE", "spill")  # spill, block, drop
+    AUDIT_SPOOL_PATH: str = os.getenv("AUDIT_SPOOL_PATH", "storage/audit_spool.jsonl")
 
     # Subscription Plans
     FREE_PLAN_DOCUMENTS_PER_MONTH: int = 5
@@ -12,6 +12,7 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from sqlalchemy import text
 import redis
+import redis.asyncio as aioredis
 from celery import Celery
 
 from config import settings
@@ -26,8 +27,12 @@ from app.middleware.performance import PerformanceMiddleware, CompressionMiddlew
 from app.middleware.advanced_security import RequestValidationMiddleware
 from app.middleware.csrf_protection import CSRFProtectionMiddleware
 from app.middleware.guest_session import GuestSessionMiddleware
+from app.middleware.pipeline import MiddlewarePipeline
 from app.services.audit_service import AuditService
+from app.services.audit_writer import audit_writer
+from app.services.search_log_writer import search_log_writer
 from app.services.cache_service import cache_service
+from app.services.template_search_index import template_search_index
 # Enterprise services removed for MVP
 
 
@@ -46,6 +51,17 @@ redis_client = redis.Redis(
     retry_on_timeout=True
 )
 
+# Async client for request-path Redis calls (never block the event loop)
+async_redis_client = aioredis.Redis(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    password=settings.REDIS_PASSWORD,
+    decode_responses=True,
+    socket_connect_timeout=5,
+    socket_timeout=5,
+    retry_on_timeout=True
+)
+
 # Test Redis connection on startup - fail fast if Redis is not available
 try:
     redis_client.ping()
@@ -60,7 +76,7 @@ celery_app = Celery(
     "mytypist",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=['app.tasks.document_tasks', 'app.tasks.payment_tasks', 'app.tasks.cleanup_tasks']
+    include=['app.tasks.document_tasks', 'app.tasks.payment_tasks', 'app.tasks.cleanup_tasks', 'app.tasks.analytics_tasks']
 )
 
 # Configure Celery
@@ -87,6 +103,7 @@ async def lifespan(app: FastAPI):
     # Initialize cache service
     try:
         await cache_service.initialize()
+        await cache_service.start_invalidation_listener()
         print("✅ Cache service initialized")
     except Exception as e:
         print(f"⚠️ Cache service failed to initialize: {e}")
@@ -107,6 +124,12 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
 
+    # Load or build the landing search index before the first search needs it
+    try:
+        template_search_index.get()
+    except Exception as e:
+        print(f"⚠️ Template search index failed to load: {e}")
+
     # Initialize audit service
     try:
         AuditService.log_system_event(audit.AuditEventType.SYSTEM_STARTUP.value, {"service": settings.APP_NAME})
@@ -119,10 +142,13 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     print("🛑 MyTypist Backend Shutting down...")
+    await cache_service.stop_invalidation_listener()
     try:
         AuditService.log_system_event(audit.AuditEventType.SYSTEM_SHUTDOWN.value, {})
     except Exception as e:
         print(f"⚠️ Audit service error during shutdown: {e}")
+    audit_writer.close()
+    search_log_writer.close()
 
 
 # Create FastAPI app
@@ -134,15 +160,30 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Performance and security middleware (order matters!)
-app.add_middleware(CompressionMiddleware, minimum_size=1024, compression_level=6)
-app.add_middleware(PerformanceMiddleware, slow_request_threshold=1.0)
-# Use consolidated security middleware
-app.add_middleware(SecurityMiddleware)
-app.add_middleware(RequestValidationMiddleware)
-app.add_middleware(CSRFProtectionMiddleware)
-app.add_middleware(AuditMiddleware)
-app.add_middleware(RateLimitMiddleware, redis_client=redis_client)  # type: ignore
+# Performance and security middleware, composed into one pure-ASGI pipeline.
+# Stages run outermost first; MIDDLEWARE_SKIP lists stages a path prefix bypasses.
+MIDDLEWARE_SKIP = {
+    "/health": {"guest_session", "rate_limit", "audit", "csrf"},
+    "/metrics": {"guest_session", "rate_limit", "audit", "csrf"},
+    "/api/docs": {"guest_session", "audit"},
+    "/api/redoc": {"guest_session", "audit"},
+    "/openapi.json": {"guest_session", "audit"},
+}
+
+app.add_middleware(
+    MiddlewarePipeline,
+    stages=[
+        GuestSessionMiddleware(),
+        RateLimitMiddleware(redis_client=async_redis_client),
+        AuditMiddleware(),
+        CSRFProtectionMiddleware(),
+        RequestValidationMiddleware(),
+        SecurityMiddleware(),
+        PerformanceMiddleware(slow_request_threshold=1.0),
+        CompressionMiddleware(minimum_size=settings.COMPRESSION_THRESHOLD, compression_level=6),
+    ],
+    skip=MIDDLEWARE_SKIP
+)
 
 # CORS middleware
 app.add_middleware(
@@ -153,9 +194,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Guest session middleware for anonymous users
-app.add_middleware(GuestSessionMiddleware)
-
 # Trusted host middleware
 app.add_middleware(
     TrustedHostMiddleware,
@@ -163,35 +201,6 @@ app.add_middleware(
 )
 
 
-# Performance monitoring middleware
-@app.middleware("http")
-async def performance_middleware(request: Request, call_next):
-    """Monitor API performance"""
-    start_time = time.time()
-
-    response = await call_next(request)
-
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-
-    # Log slow requests
-    if process_time > 1.0:  # Log requests taking more than 1 second
-        try:
-            AuditService.log_performance_issue(
-                "slow_request",
-                {
-                    "path": request.url.path,
-                    "method": request.method,
-                    "duration": process_time,
-                    "status_code": response.status_code
-                }
-            )
-        except Exception as e:
-            print(f"Performance audit logging failed: {e}")
-
-    return response
-
-
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):